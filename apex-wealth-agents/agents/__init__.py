@@ -2,9 +2,10 @@
 from .parsing_agent import ParsingAgent
 from .strategy_agent import StrategyAgent
 from .risk_agent import RiskAgent
+from .strategy_risk_agent import StrategyRiskAgent
 from .output_agent import OutputAgent
 from .analysis_agent import AnalysisAgent
 from .implementation_agent import ImplementationAgent
 
-__all__ = ['ParsingAgent', 'StrategyAgent', 'RiskAgent', 'OutputAgent', 'AnalysisAgent', 'ImplementationAgent']
+__all__ = ['ParsingAgent', 'StrategyAgent', 'RiskAgent', 'StrategyRiskAgent', 'OutputAgent', 'AnalysisAgent', 'ImplementationAgent']
 
@@ -3,6 +3,8 @@ Analysis Agent: ML + Rule-based financial health analysis with visualizations
 """
 import os
 from typing import Dict, Any, Optional
+from app.metrics import MODEL_LOADS_TOTAL
+from app.tracing import traced
 import matplotlib
 matplotlib.use('Agg')  # Use non-interactive backend
 import matplotlib.pyplot as plt
@@ -50,13 +52,17 @@ class AnalysisAgent:
             if os.path.exists(self.model_path):
                 import joblib
                 self.model = joblib.load(self.model_path)
+                MODEL_LOADS_TOTAL.inc(model="default", outcome="loaded")
                 print(f"✅ Loaded financial health model from {self.model_path}")
             else:
+                MODEL_LOADS_TOTAL.inc(model="default", outcome="missing")
                 print(f"ℹ️  ML model not found at {self.model_path}. Using rule-based analysis.")
         except Exception as e:
+            MODEL_LOADS_TOTAL.inc(model="default", outcome="error")
             print(f"⚠️  Could not load ML model: {e}. Using rule-based analysis.")
             self.model = None
     
+    @traced("agent.analysis.analyze")
     def analyze(
         self,
         financial_data: Dict[str, Any],
@@ -88,7 +94,9 @@ class AnalysisAgent:
                 try:
                     import joblib
                     model_to_use = joblib.load(user_model_path)
+                    MODEL_LOADS_TOTAL.inc(model="user", outcome="loaded")
                 except Exception as e:
+                    MODEL_LOADS_TOTAL.inc(model="user", outcome="error")
                     print(f"Could not load user model: {e}")
         
         income = financial_data.get("income", 0)
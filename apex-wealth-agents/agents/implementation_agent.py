@@ -2,6 +2,7 @@
 Implementation Agent: Converts investment strategies into actionable execution steps
 """
 from typing import Dict, Any, List, Optional
+from app.tracing import traced
 
 
 class ImplementationAgent:
@@ -65,6 +66,7 @@ class ImplementationAgent:
         ]
     }
     
+    @traced("agent.implementation.generate_plan")
     def generate_implementation_plan(
         self,
         risk_profile: str,
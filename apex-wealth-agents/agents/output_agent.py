@@ -2,6 +2,7 @@
 Output Agent: Formats final response for user
 """
 from typing import Dict, Any, List
+from app.tracing import traced
 
 
 class OutputAgent:
@@ -13,6 +14,7 @@ class OutputAgent:
     - Knowledge context
     """
     
+    @traced("agent.output.format_response")
     def format_response(
         self,
         user_query: str,
@@ -93,6 +95,7 @@ class OutputAgent:
             }
         }
     
+    @traced("agent.output.format_simple_response")
     def format_simple_response(
         self,
         answer: str,
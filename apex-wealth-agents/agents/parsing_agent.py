@@ -3,6 +3,8 @@ Parsing Agent: Analyzes user queries and extracts intent
 """
 from typing import Dict, Any, List
 from llm.llm_client import LLMClient
+from app.deadline import expected, stage_allowed
+from app.tracing import traced
 
 
 class ParsingAgent:
@@ -16,6 +18,7 @@ class ParsingAgent:
     def __init__(self, llm_client: LLMClient = None):
         self.llm_client = llm_client or LLMClient()
     
+    @traced("agent.parsing.parse_query")
     def parse_query(self, user_query: str, context: List[Dict[str, str]] = None) -> Dict[str, Any]:
         """
         Parse user query to extract intent and requirements
@@ -30,6 +33,10 @@ class ParsingAgent:
             - keywords: List[str] (keywords for VectorDB search)
             - risk_profile_needed: bool
         """
+        # The parse is only worth an LLM call if an answer call still fits after it
+        if not stage_allowed("parse", expected("llm") * 2, fallback="keyword parse"):
+            return self._fallback_parse(user_query)
+        
         context_str = ""
         if context:
             recent = context[-3:]  # Last 3 messages
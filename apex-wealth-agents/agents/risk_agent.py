@@ -1,8 +1,55 @@
 """
 Risk Agent: Assesses and validates risk alignment
 """
+import re
 from typing import Dict, Any, Optional, List
 from llm.llm_client import LLMClient
+from app.tracing import traced
+
+# Allocation limits (percent of portfolio) per risk tolerance, from the risk profile guides
+# in scripts/populate_knowledge.py. Hybrid funds count half equity, half debt.
+RISK_LIMITS = {
+    "conservative": {"max_equity": 40, "max_small_mid_cap": 0, "max_speculative": 0, "min_debt": 50},
+    "moderate": {"max_equity": 70, "max_small_mid_cap": 30, "max_speculative": 5, "min_debt": 20},
+    "aggressive": {"max_equity": 90, "max_small_mid_cap": 60, "max_speculative": 10, "min_debt": 10},
+}
+RISK_TOLERANCE_ALIASES = {"safe": "conservative", "low": "conservative", "medium": "moderate",
+                          "balanced": "moderate", "high": "aggressive"}
+
+# Checked in order; the first matching bucket wins. Tax-saving equity (ELSS) comes first so
+# names like "Tax saving options (ELSS)" are not taken for options trading
+_ASSET_BUCKETS = [
+    ("equity", re.compile(r"\belss\b", re.I)),
+    ("speculative", re.compile(r"crypto|bitcoin|\bderivatives?\b|\bfutures\b|\boptions? trading\b|\bf&o\b|speculat",
+                               re.I)),
+    ("hybrid", re.compile(r"hybrid|balanced|multi.?asset", re.I)),
+    ("debt", re.compile(r"debt|bond|gilt|fixed deposit|\bfd|ppf|liquid|government|treasury|scss|cash", re.I)),
+    ("small_mid_cap", re.compile(r"small|mid", re.I)),
+    ("equity", re.compile(r"equity|stock|share|large|cap\b|index|nifty|sensex|elss|sector|international", re.I)),
+]
+
+
+def risk_limits(risk_tolerance: Optional[str]) -> Dict[str, float]:
+    """Allocation limits for a risk tolerance (unknown values get the moderate limits)"""
+    key = str(risk_tolerance or "moderate").strip().lower()
+    return RISK_LIMITS.get(RISK_TOLERANCE_ALIASES.get(key, key), RISK_LIMITS["moderate"])
+
+
+def parse_percent(value: Any) -> float:
+    """Allocation percentage from an LLM value such as 60, "60%", " 12.5 % " or "1,000"; missing is 0"""
+    if value is None or value == "":
+        return 0.0
+    if isinstance(value, str):
+        value = value.replace("%", "").replace(",", "").strip()
+    return float(value)
+
+
+def asset_bucket(category: str) -> str:
+    """Risk bucket of an allocation category: speculative, hybrid, debt, small_mid_cap, equity or other"""
+    for bucket, pattern in _ASSET_BUCKETS:
+        if pattern.search(category or ""):
+            return bucket
+    return "other"
 
 
 class RiskAgent:
@@ -14,6 +61,7 @@ class RiskAgent:
     def __init__(self, llm_client: LLMClient = None):
         self.llm_client = llm_client or LLMClient()
     
+    @traced("agent.risk.assess_risk")
     def assess_risk(
         self,
         strategy: Dict[str, Any],
@@ -31,13 +79,7 @@ class RiskAgent:
         Returns:
             Dict with risk assessment and adjusted recommendations
         """
-        # Extract risk-related knowledge
-        risk_knowledge = ""
-        if knowledge_context:
-            risk_knowledge = "RISK GUIDANCE:\n"
-            for chunk in knowledge_context:
-                if chunk.get('metadata', {}).get('type') == 'risk_guidance':
-                    risk_knowledge += f"- {chunk.get('content', '')}\n"
+        risk_knowledge = self.risk_guidance_text(knowledge_context)
         
         user_risk = risk_profile.get('risk_tolerance', 'moderate')
         user_goals = risk_profile.get('goals', [])
@@ -102,6 +144,146 @@ Assess and provide risk-adjusted feedback in JSON:
                 "suitability": "unknown"
             }
     
+    @staticmethod
+    def risk_guidance_text(knowledge_context: List[Dict[str, Any]] = None) -> str:
+        """Risk guidance chunks from the retrieved knowledge, as a prompt section"""
+        risk_knowledge = ""
+        if knowledge_context:
+            risk_knowledge = "RISK GUIDANCE:\n"
+            for chunk in knowledge_context:
+                if chunk.get('metadata', {}).get('type') == 'risk_guidance':
+                    risk_knowledge += f"- {chunk.get('content', '')}\n"
+        return risk_knowledge
+    
+    @traced("agent.risk.validate_allocation")
+    def validate_allocation(
+        self,
+        recommendations: List[Dict[str, Any]],
+        risk_profile: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Check allocations against RISK_LIMITS for the user's risk tolerance, without an LLM
+        
+        Over-limit speculative, small/mid-cap and equity exposure is scaled down and moved
+        to debt, as is any shortfall against the minimum debt share.
+        
+        Args:
+            recommendations: Strategy recommendations (category, allocation_percentage or adjusted_allocation)
+            risk_profile: User risk profile
+            
+        Returns:
+            Dict in the assess_risk() shape, plus the limits applied and the violations found
+        """
+        limits = risk_limits(risk_profile.get('risk_tolerance'))
+        items = []
+        unreadable = []
+        for rec in recommendations or []:
+            value = rec.get('adjusted_allocation', rec.get('allocation_percentage'))
+            try:
+                pct = parse_percent(value)
+            except (TypeError, ValueError):
+                # Not zeroed: that would silently shift its share to the other lines
+                unreadable.append(f"Allocation for {rec.get('category', 'Unknown')} is not a percentage ({value!r}); "
+                                  "the allocation could not be checked against risk limits")
+                continue
+            items.append({"rec": rec, "bucket": asset_bucket(str(rec.get('category', ''))), "original": pct, "pct": max(pct, 0.0)})
+        
+        total = sum(item["pct"] for item in items)
+        if unreadable or not items or total <= 0:
+            # Nothing to check, or shares that can't be rebalanced without the unreadable lines
+            return {
+                "risk_alignment": "medium",
+                "risk_score": 5,
+                "adjustments_needed": False,
+                "adjusted_recommendations": [],
+                "risk_warnings": unreadable,
+                "suitability": "moderately_suitable" if unreadable else "suitable",
+                "validator": "local",
+                "limits": limits,
+                "violations": unreadable
+            }
+        
+        violations = []
+        if abs(total - 100) > 1:
+            violations.append(f"Allocations add up to {total:g}%; scaled to 100%")
+        for item in items:
+            item["pct"] = item["pct"] * 100.0 / total
+        
+        def exposure(buckets, hybrid_share=0.0):
+            return sum(item["pct"] for item in items if item["bucket"] in buckets) + \
+                hybrid_share * sum(item["pct"] for item in items if item["bucket"] == "hybrid")
+        
+        def move_to_debt(buckets, amount, label):
+            # Scale the given buckets down by `amount` points and add them to debt
+            pool = [item for item in items if item["bucket"] in buckets]
+            held = sum(item["pct"] for item in pool)
+            if amount <= 0.05 or held <= 0:
+                return
+            for item in pool:
+                item["pct"] -= amount * item["pct"] / held
+            debt = [item for item in items if item["bucket"] == "debt"]
+            if not debt:
+                debt = [{"rec": {"category": "Debt", "rationale": f"Added to keep {label} within limits"},
+                         "bucket": "debt", "original": 0.0, "pct": 0.0}]
+                items.extend(debt)
+            debt_held = sum(item["pct"] for item in debt)
+            for item in debt:
+                item["pct"] += amount * (item["pct"] / debt_held if debt_held else 1.0 / len(debt))
+        
+        tolerance = str(risk_profile.get('risk_tolerance', 'moderate')).lower()
+        # (limit, buckets counted, hybrid share counted, label); over-limit buckets are scaled down
+        checks = [
+            ("max_speculative", ("speculative",), 0.0, "speculative assets"),
+            ("max_small_mid_cap", ("small_mid_cap",), 0.0, "small/mid-cap equity"),
+            ("max_equity", ("equity", "small_mid_cap", "speculative"), 0.5, "equity"),
+        ]
+        for limit_key, buckets, hybrid_share, label in checks:
+            held = exposure(buckets, hybrid_share)
+            excess = held - limits[limit_key]
+            if excess > 0.05:
+                violations.append(f"{label.capitalize()} at {held:.0f}% exceeds the {limits[limit_key]}% limit for the {tolerance} profile")
+                move_to_debt(buckets, min(excess, exposure(buckets)), label)
+        debt_held = exposure(("debt",), 0.5)
+        if limits["min_debt"] - debt_held > 0.05:
+            violations.append(f"Debt at {debt_held:.0f}% is below the {limits['min_debt']}% minimum for the {tolerance} profile")
+            move_to_debt(("equity", "small_mid_cap", "speculative", "other"), limits["min_debt"] - debt_held, "debt")
+        
+        # Round to one decimal, keeping the total at 100
+        for item in items:
+            item["pct"] = round(item["pct"], 1)
+        largest = max(items, key=lambda item: item["pct"])
+        largest["pct"] = round(largest["pct"] + 100.0 - sum(item["pct"] for item in items), 1)
+        
+        moved = sum(abs(item["pct"] - item["original"]) for item in items) / 2
+        adjusted = []
+        if violations:
+            for item in items:
+                rec = item["rec"]
+                adjusted.append({
+                    "category": rec.get('category', 'Unknown'),
+                    "original_allocation": round(item["original"], 1),
+                    "adjusted_allocation": item["pct"],
+                    "allocation_percentage": item["pct"],
+                    "rationale": rec.get('rationale', rec.get('reason', '')),
+                    "specific_products": rec.get('specific_products', []),
+                    "reason": "Within limits" if abs(item["pct"] - item["original"]) < 0.05 else "Adjusted to risk limits"
+                })
+        
+        equity = exposure(("equity", "small_mid_cap", "speculative"), 0.5)
+        score = 1 + equity * 0.06 + exposure(("small_mid_cap",)) * 0.02 + exposure(("speculative",)) * 0.1
+        return {
+            "risk_alignment": "high" if not violations else ("medium" if moved <= 10 else "low"),
+            "risk_score": int(min(10, max(1, round(score)))),
+            "adjustments_needed": bool(violations),
+            "adjusted_recommendations": adjusted,
+            "risk_warnings": violations,
+            "suitability": "suitable" if not violations else ("moderately_suitable" if moved <= 10 else "not_suitable"),
+            "validator": "local",
+            "limits": limits,
+            "violations": violations
+        }
+    
+    @traced("agent.risk.get_risk_profile")
     def get_risk_profile(self, user_id: str = None) -> Dict[str, Any]:
         """
         Get user risk profile (from MongoDB or file-based storage)
@@ -112,39 +294,19 @@ Assess and provide risk-adjusted feedback in JSON:
         Returns:
             Risk profile dictionary
         """
-        # Try MongoDB first if user_id is provided
-        if user_id:
-            try:
-                from database.mongodb_service import get_mongodb_service
-                mongodb = get_mongodb_service()
-                if mongodb.is_connected():
-                    profile = mongodb.get_user_profile(user_id)
-                    if profile:
-                        return {
-                            "risk_tolerance": profile.get('risk_preference', 'moderate'),
-                            "goals": profile.get('goals', []),
-                            "time_horizon": profile.get('time_horizon', 'medium'),
-                            "user_id": user_id
-                        }
-            except Exception:
-                pass
-        
-        # Fallback to file-based profile
-        import os
-        import json
+        # Per-user profile cache: MongoDB for user_id, else state/profile.json
         try:
-            profile_path = os.path.join(
-                os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
-                'state', 'profile.json'
-            )
-            if os.path.exists(profile_path):
-                with open(profile_path, 'r') as f:
-                    profile = json.load(f)
-                    return {
-                        "risk_tolerance": profile.get('risk_preference', 'moderate'),
-                        "goals": profile.get('goals', []),
-                        "time_horizon": profile.get('time_horizon', 'medium')
-                    }
+            from database.profile_cache import get_profile_cache
+            profile = get_profile_cache().get(user_id)
+            if profile:
+                risk_profile = {
+                    "risk_tolerance": profile.get('risk_preference', 'moderate'),
+                    "goals": profile.get('goals', []),
+                    "time_horizon": profile.get('time_horizon', 'medium')
+                }
+                if user_id and profile.get('user_id') == user_id:
+                    risk_profile["user_id"] = user_id
+                return risk_profile
         except Exception:
             pass
         
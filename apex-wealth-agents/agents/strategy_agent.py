@@ -3,6 +3,7 @@ Strategy Agent: Generates investment strategies based on knowledge and context
 """
 from typing import Dict, Any, List
 from llm.llm_client import LLMClient
+from app.tracing import traced
 
 
 class StrategyAgent:
@@ -17,27 +18,14 @@ class StrategyAgent:
     def __init__(self, llm_client: LLMClient = None):
         self.llm_client = llm_client or LLMClient()
     
-    def generate_strategy(
+    def _context_text(
         self,
-        user_query: str,
         knowledge_context: List[Dict[str, Any]],
         risk_profile: Dict[str, Any] = None,
         transaction_summary: Dict[str, Any] = None,
         market_context: Dict[str, Any] = None
-    ) -> Dict[str, Any]:
-        """
-        Generate investment strategy recommendation
-        
-        Args:
-            user_query: Original user query
-            knowledge_context: Retrieved knowledge chunks from VectorDB
-            risk_profile: User risk profile (if available)
-            transaction_summary: Summary of transaction patterns (if available)
-            market_context: Current market data (if available)
-            
-        Returns:
-            Dict with strategy recommendations
-        """
+    ) -> str:
+        """Knowledge, risk profile, transaction and market sections of the strategy prompt"""
         # Build knowledge context string
         knowledge_text = ""
         if knowledge_context:
@@ -70,17 +58,37 @@ class StrategyAgent:
             market_text += f"- Market conditions: {market_context.get('conditions', 'N/A')}\n"
             market_text += f"- Key indicators: {market_context.get('indicators', {})}\n"
         
+        return f"{knowledge_text}\n\n{risk_text}\n\n{transaction_text}\n\n{market_text}"
+    
+    @traced("agent.strategy.generate_strategy")
+    def generate_strategy(
+        self,
+        user_query: str,
+        knowledge_context: List[Dict[str, Any]],
+        risk_profile: Dict[str, Any] = None,
+        transaction_summary: Dict[str, Any] = None,
+        market_context: Dict[str, Any] = None
+    ) -> Dict[str, Any]:
+        """
+        Generate investment strategy recommendation
+        
+        Args:
+            user_query: Original user query
+            knowledge_context: Retrieved knowledge chunks from VectorDB
+            risk_profile: User risk profile (if available)
+            transaction_summary: Summary of transaction patterns (if available)
+            market_context: Current market data (if available)
+            
+        Returns:
+            Dict with strategy recommendations
+        """
+        context_text = self._context_text(knowledge_context, risk_profile, transaction_summary, market_context)
+        
         prompt = f"""You are a financial strategy advisor. Generate a personalized investment strategy based on the provided context.
 
 USER QUERY: {user_query}
 
-{knowledge_text}
-
-{risk_text}
-
-{transaction_text}
-
-{market_text}
+{context_text}
 
 Generate a comprehensive strategy recommendation in JSON format:
 {{
@@ -0,0 +1,195 @@
+"""
+Strategy-Risk Agent: Generates a strategy and its risk assessment in one LLM call
+
+The default investment path calls StrategyAgent.generate_strategy and then
+RiskAgent.assess_risk, which sends the strategy, profile and risk knowledge
+back in a second prompt. In fused mode one prompt asks for the strategy,
+the risk assessment and allocations that already respect the profile's limits,
+so the reply does not repeat them as adjusted allocations. The reply is
+validated against llm.schemas.strategy_risk_schema, and the allocations are
+then checked against the per-tolerance limits by RiskAgent.validate_allocation
+(no LLM), which makes any adjustment still needed.
+
+Environment overrides:
+  - APEX_STRATEGY_MODE=two_call|fused (default two_call)
+"""
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.metrics import FUSED_STRATEGY_TOTAL
+from app.tracing import traced
+from llm.json_guard import validate_json, validate_json_response
+from llm.llm_client import LLMClient
+from llm.schemas import strategy_risk_schema
+from .risk_agent import RiskAgent, risk_limits
+from .strategy_agent import StrategyAgent
+
+STRATEGY_MODES = ("two_call", "fused")
+
+
+def strategy_mode() -> str:
+    """Investment path mode from APEX_STRATEGY_MODE (two_call or fused)"""
+    mode = os.getenv("APEX_STRATEGY_MODE", "two_call").strip().lower()
+    return mode if mode in STRATEGY_MODES else "two_call"
+
+
+def _parse_reply(text: str) -> Optional[Dict[str, Any]]:
+    """JSON object from a model reply, tolerating code fences and surrounding prose"""
+    try:
+        obj = validate_json_response(text)
+    except ValueError:
+        start, end = text.find("{"), text.rfind("}")
+        if start < 0 or end <= start:
+            return None
+        try:
+            obj = json.loads(text[start:end + 1])
+        except ValueError:
+            return None
+    return obj if isinstance(obj, dict) else None
+
+
+class StrategyRiskAgent(StrategyAgent):
+    """
+    Fused StrategyAgent + RiskAgent: one structured LLM response, then local risk validation
+    """
+
+    def __init__(self, llm_client: LLMClient = None, risk_agent: RiskAgent = None):
+        super().__init__(llm_client)
+        self.risk_agent = risk_agent or RiskAgent(self.llm_client)
+
+    def build_prompt(
+        self,
+        user_query: str,
+        knowledge_context: List[Dict[str, Any]],
+        risk_profile: Dict[str, Any],
+        transaction_summary: Dict[str, Any] = None,
+        market_context: Dict[str, Any] = None
+    ) -> str:
+        """Single prompt covering generate_strategy() and assess_risk()"""
+        context_text = self._context_text(knowledge_context, risk_profile, transaction_summary, market_context)
+        risk_knowledge = self.risk_agent.risk_guidance_text(knowledge_context)
+        limits = risk_limits(risk_profile.get('risk_tolerance'))
+
+        return f"""You are a financial strategy advisor and risk assessment specialist. Generate a personalized investment strategy and validate it against the user's risk profile.
+
+USER QUERY: {user_query}
+
+{context_text}
+
+{risk_knowledge}
+
+ALLOCATION LIMITS FOR THIS RISK PROFILE (percent of portfolio):
+- Equity at most {limits['max_equity']}% (hybrid funds count half)
+- Small/mid-cap at most {limits['max_small_mid_cap']}%
+- Speculative assets (crypto, derivatives) at most {limits['max_speculative']}%
+- Debt at least {limits['min_debt']}%
+
+Respond with only this JSON; recommendations must already respect the limits and add up to 100:
+{{
+    "strategy_summary": "Brief 2-3 sentence summary",
+    "recommendations": [
+        {{
+            "category": "string (e.g., Equity, Debt, Hybrid)",
+            "allocation_percentage": number,
+            "rationale": "why this allocation",
+            "specific_products": ["product1", "product2"]
+        }}
+    ],
+    "action_items": ["action1", "action2"],
+    "risk_notes": "risk considerations",
+    "time_horizon": "short/medium/long term focus",
+    "risk_assessment": {{
+        "risk_alignment": "high/medium/low",
+        "risk_score": number (1-10, where 10 is highest risk),
+        "risk_warnings": ["warning1", "warning2"],
+        "suitability": "suitable/moderately_suitable/not_suitable"
+    }}
+}}"""
+
+    @traced("agent.strategy_risk.generate")
+    def generate_strategy_with_risk(
+        self,
+        user_query: str,
+        knowledge_context: List[Dict[str, Any]],
+        risk_profile: Dict[str, Any],
+        transaction_summary: Dict[str, Any] = None,
+        market_context: Dict[str, Any] = None
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Generate strategy and risk assessment with one LLM call
+
+        Args:
+            user_query: Original user query
+            knowledge_context: Retrieved knowledge chunks from VectorDB
+            risk_profile: User risk profile
+            transaction_summary: Summary of transaction patterns (if available)
+            market_context: Current market data (if available)
+
+        Returns:
+            (strategy, risk_assessment) in the generate_strategy() / assess_risk() shapes
+        """
+        prompt = self.build_prompt(user_query, knowledge_context, risk_profile, transaction_summary, market_context)
+        try:
+            reply = self.llm_client.complete(prompt)
+        except Exception as e:
+            FUSED_STRATEGY_TOTAL.inc(outcome="error")
+            strategy = {
+                "strategy_summary": f"Strategy generation encountered an error: {str(e)}",
+                "recommendations": [],
+                "action_items": [],
+                "risk_notes": "",
+                "time_horizon": "medium"
+            }
+            return strategy, self.risk_agent.validate_allocation([], risk_profile)
+
+        parsed = _parse_reply(reply)
+        if parsed is None:
+            FUSED_STRATEGY_TOTAL.inc(outcome="unparsed")
+            parsed = {"strategy_summary": reply[:200]}
+        else:
+            valid, _, error = validate_json(parsed, strategy_risk_schema)
+            FUSED_STRATEGY_TOTAL.inc(outcome="valid" if valid else "invalid")
+            if not valid:
+                print(f"Fused strategy response failed schema validation: {error.splitlines()[0]}")
+        return self._split(parsed, risk_profile)
+
+    def _split(self, parsed: Dict[str, Any], risk_profile: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Strategy and locally validated risk assessment from a (possibly partial) fused reply"""
+        recommendations = [r for r in parsed.get("recommendations") or [] if isinstance(r, dict)]
+        strategy = {
+            "strategy_summary": str(parsed.get("strategy_summary", "")),
+            "recommendations": recommendations,
+            "action_items": [str(a) for a in parsed.get("action_items") or []],
+            "risk_notes": str(parsed.get("risk_notes", "")),
+            "time_horizon": str(parsed.get("time_horizon", "medium"))
+        }
+
+        model_risk = parsed.get("risk_assessment") if isinstance(parsed.get("risk_assessment"), dict) else {}
+        model_adjusted = [r for r in model_risk.get("adjusted_recommendations") or []
+                          if isinstance(r, dict) and r.get("adjusted_allocation") is not None]
+        if model_risk.get("adjustments_needed") and model_adjusted:
+            # Carry rationale/products over to the model's adjusted rows before validating them
+            by_category = {str(r.get("category")): r for r in recommendations}
+            allocation = []
+            for row in model_adjusted:
+                merged = dict(by_category.get(str(row.get("category")), {}))
+                merged.update(row)
+                merged["allocation_percentage"] = row["adjusted_allocation"]
+                allocation.append(merged)
+        else:
+            allocation = recommendations
+
+        assessment = self.risk_agent.validate_allocation(allocation, risk_profile)
+        if not assessment["adjustments_needed"] and allocation is not recommendations:
+            assessment["adjustments_needed"] = True
+            assessment["adjusted_recommendations"] = allocation
+
+        if model_risk:
+            warnings = [str(w) for w in model_risk.get("risk_warnings") or []]
+            assessment["risk_warnings"] = warnings + [v for v in assessment["risk_warnings"] if v not in warnings]
+            if not assessment["violations"]:
+                for key in ("risk_alignment", "risk_score", "suitability"):
+                    if model_risk.get(key) is not None:
+                        assessment[key] = model_risk[key]
+        return strategy, assessment
@@ -0,0 +1,125 @@
+"""
+Dynamic micro-batching of single-item calls.
+
+Concurrent requests that each need one item computed by a batch-friendly
+function (an embedding model encoding one query) hand the item to a
+MicroBatcher instead of calling the function themselves. A background
+worker takes the first waiting item, collects more for up to max_wait_ms
+or until max_batch items are queued, runs the function once on the whole
+batch and resolves each caller's future:
+
+    batcher = MicroBatcher("embedding", lambda texts: model.encode(texts).tolist())
+    vector = batcher.submit(text)
+
+One batch runs at a time, so callers no longer contend for the model and
+the per-call overhead is paid once per batch. The worker only holds items
+back while there is concurrent traffic (the previous batch had more than
+one item); on an idle service a lone call goes straight through. Items
+of a request that was cancelled while queued are dropped
+(RequestCancelled) rather than computed.
+
+Batch sizes and queue waits are exported as apex_microbatch_size and
+apex_microbatch_queue_wait_seconds.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Sequence
+
+from app.deadline import Deadline, RequestCancelled, check_cancelled, current_deadline
+from app.metrics import CANCELLED_WORK_TOTAL, MICROBATCH_QUEUE_WAIT_SECONDS, MICROBATCH_SIZE
+
+
+class _Item:
+    """One submitted item and the caller waiting for its result"""
+
+    __slots__ = ("value", "future", "deadline", "enqueued")
+
+    def __init__(self, value: Any, deadline: Optional[Deadline]):
+        self.value = value
+        self.future: Future = Future()
+        self.deadline = deadline
+        self.enqueued = time.perf_counter()
+
+
+class MicroBatcher:
+    """Collects concurrent single-item calls into batches for one worker thread"""
+
+    def __init__(self, name: str, fn: Callable[[List[Any]], Sequence[Any]], max_batch: int = 32,
+                 max_wait_ms: float = 5.0):
+        """
+        Args:
+            name: Batcher name (metrics label and worker thread name)
+            fn: Computes a list of items, returning one result per item in order
+            max_batch: Most items per call of fn
+            max_wait_ms: How long the worker holds the first item while more arrive
+        """
+        self.name = name
+        self.fn = fn
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: "queue.SimpleQueue[_Item]" = queue.SimpleQueue()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._last_size = 0
+
+    def submit(self, value: Any) -> Any:
+        """Compute value in the next batch and return its result (re-raising fn's error)"""
+        return self.submit_async(value).result()
+
+    def submit_async(self, value: Any) -> Future:
+        """Queue value for the next batch; the future holds its result"""
+        check_cancelled(self.name)
+        item = _Item(value, current_deadline())
+        self._ensure_worker()
+        self._queue.put(item)
+        return item.future
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name=f"apex-batch-{self.name}", daemon=True)
+                self._worker.start()
+
+    def _collect(self) -> List[_Item]:
+        """Block for the first item, then gather more until the batch is full or the wait is over"""
+        batch = [self._queue.get()]
+        # Idle (last batch was a single item): take only what is already queued
+        closes_at = time.perf_counter() + (self.max_wait if self._last_size > 1 else 0.0)
+        while len(batch) < self.max_batch:
+            left = closes_at - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=left) if left > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            self._last_size = len(batch)
+            started = time.perf_counter()
+            live = []
+            for item in batch:
+                if item.deadline is not None and item.deadline.cancelled.is_set():
+                    CANCELLED_WORK_TOTAL.inc(stage=self.name)
+                    item.future.set_exception(RequestCancelled(self.name))
+                else:
+                    MICROBATCH_QUEUE_WAIT_SECONDS.observe(started - item.enqueued, batcher=self.name)
+                    live.append(item)
+            if not live:
+                continue
+            MICROBATCH_SIZE.observe(len(live), batcher=self.name)
+            try:
+                results = self.fn([item.value for item in live])
+                if len(results) != len(live):
+                    raise RuntimeError(f"{self.name} batch returned {len(results)} results for {len(live)} items")
+            except BaseException as e:
+                for item in live:
+                    item.future.set_exception(e)
+                continue
+            for item, result in zip(live, results):
+                item.future.set_result(result)
@@ -0,0 +1,198 @@
+"""
+Bounded executors for offloading blocking work from async route handlers.
+
+CPU-bound work (pandas, DuckDB, matplotlib) and I/O-bound work (LLM calls,
+MongoDB) run on separately sized thread pools, so slow LLM calls cannot starve
+cheap endpoints like /health. Each pool admits at most ``max_workers +
+max_queue`` jobs; anything beyond that is rejected with OverloadedError,
+which the API turns into a 429 response. A third pool runs the LLM client's
+HTTP attempts, so a request can stop waiting for a call when it is
+cancelled without a thread being started per attempt. Jobs of a request that was
+cancelled (client disconnected) while they were queued are dropped when
+they reach a worker.
+
+Environment overrides:
+  - APEX_CPU_WORKERS / APEX_CPU_QUEUE (default: cpu_count / 4 * cpu_count)
+  - APEX_IO_WORKERS / APEX_IO_QUEUE (default: 32 / 64)
+  - APEX_LLM_HTTP_WORKERS / APEX_LLM_HTTP_QUEUE (default: 32 / 64)
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from app.deadline import check_cancelled
+
+
+class OverloadedError(RuntimeError):
+    """Raised when a pool's admission queue is full"""
+
+    def __init__(self, pool: str, retry_after: int = 1):
+        super().__init__(f"Server busy: {pool} queue is full, retry later")
+        self.pool = pool
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    """
+    Thread pool with admission control.
+
+    Jobs run with a copy of the caller's contextvars so request-scoped state
+    set in the async handler is visible inside the worker thread.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int, retry_after: int = 1):
+        self.name = name
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(0, int(max_queue))
+        self.retry_after = retry_after
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix=f"apex-{self.name}"
+                    )
+        return self._executor
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
+        self._slots.release()
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs):
+        """Submit a job, raising OverloadedError if the pool is saturated"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise OverloadedError(self.name, self.retry_after)
+        with self._lock:
+            self._in_flight += 1
+        ctx = contextvars.copy_context()
+        try:
+            future = self._get_executor().submit(ctx.run, self._run_job, functools.partial(fn, *args, **kwargs))
+        except Exception:
+            self._release(None)
+            raise
+        # Release the slot when the thread finishes, not when the awaiting
+        # coroutine returns, so cancelled requests still count until done
+        future.add_done_callback(self._release)
+        return future
+
+    def _run_job(self, job: Callable[[], Any]) -> Any:
+        # Raises RequestCancelled instead of starting work nobody will read
+        check_cancelled(f"{self.name}_pool")
+        return job()
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking callable on this pool and await its result"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            in_flight = self._in_flight
+            return {
+                "workers": self.max_workers,
+                "queue_capacity": self.max_queue,
+                "in_flight": in_flight,
+                "queued": max(0, in_flight - self.max_workers),
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self, wait: bool = False) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+_CPU_COUNT = os.cpu_count() or 4
+
+cpu_pool = BoundedExecutor(
+    "cpu",
+    max_workers=_env_int("APEX_CPU_WORKERS", _CPU_COUNT),
+    max_queue=_env_int("APEX_CPU_QUEUE", _CPU_COUNT * 4),
+)
+io_pool = BoundedExecutor(
+    "io",
+    max_workers=_env_int("APEX_IO_WORKERS", 32),
+    max_queue=_env_int("APEX_IO_QUEUE", 64),
+    retry_after=2,
+)
+# Separate from io_pool: its jobs are waited on from io_pool threads
+llm_http_pool = BoundedExecutor(
+    "llm_http",
+    max_workers=_env_int("APEX_LLM_HTTP_WORKERS", 32),
+    max_queue=_env_int("APEX_LLM_HTTP_QUEUE", 64),
+    retry_after=2,
+)
+
+
+async def run_cpu(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run CPU-bound work (pandas, DuckDB, charts) on the CPU pool"""
+    return await cpu_pool.run(fn, *args, **kwargs)
+
+
+async def run_io(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run I/O-bound work (LLM, MongoDB, network) on the I/O pool"""
+    return await io_pool.run(fn, *args, **kwargs)
+
+
+def offload(pool: BoundedExecutor):
+    """
+    Turn a sync route handler into an async one that runs on ``pool``.
+
+    The wrapped function keeps its signature, so FastAPI still resolves
+    path/query/form parameters from it.
+    """
+    def decorator(fn: Callable[..., Any]):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            return await pool.run(fn, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Snapshot of the pools for health/metrics reporting"""
+    return {"cpu": cpu_pool.stats(), "io": io_pool.stats(), "llm_http": llm_http_pool.stats()}
+
+
+def shutdown_pools(wait: bool = False) -> None:
+    cpu_pool.shutdown(wait=wait)
+    io_pool.shutdown(wait=wait)
+    llm_http_pool.shutdown(wait=wait)
+
+
+__all__ = [
+    "OverloadedError",
+    "BoundedExecutor",
+    "cpu_pool",
+    "io_pool",
+    "llm_http_pool",
+    "run_cpu",
+    "run_io",
+    "offload",
+    "pool_stats",
+    "shutdown_pools",
+]
@@ -0,0 +1,426 @@
+"""
+Per-request deadlines and cancellation.
+
+A deadline is the time budget of one request (chat turn, historical query).
+It starts when the request arrives, from the X-Deadline-Ms header or
+APEX_REQUEST_DEADLINE_MS, and can be tightened by the ChatReq deadline_ms
+field. It lives in a ContextVar, so like the trace it follows the handler
+into the worker pools (app.concurrency copies the context).
+
+Before an expensive stage, the pipeline asks whether the remaining budget
+covers the stage's expected cost:
+
+    if stage_allowed("charts", expected("charts") + expected("llm"), fallback="no charts"):
+        ...
+
+If it does not, the stage is skipped or a cheaper path is taken (keyword
+parsing, fused strategy+risk, data-only answer). Each skip is recorded and
+reported in the response's "deadline" block. Expected costs are rolling
+estimates of observed stage times (``observe``), seeded with defaults.
+LLMClient caps each HTTP timeout at the remaining budget and gives up on
+retries that cannot fit. The SQL tools refuse to start once the deadline
+has passed (DeadlineExceeded).
+
+A request is also cancelled when its client disconnects
+(DeadlineMiddleware watches for it). A cancelled request has no time left:
+every gate skips, LLMClient stops waiting for its HTTP call, queued pool
+jobs and chart renders are dropped, and the data tools raise
+RequestCancelled. Work dropped this way is counted in
+apex_cancelled_work_total instead of the deadline skips.
+
+Without a deadline every check passes, so code paths outside a request
+(scripts, warm-up) behave as before.
+
+Environment overrides:
+  - APEX_REQUEST_DEADLINE_MS=60000 default budget for /chat and /historical/analyze (0 = none)
+  - APEX_DEADLINE_ESTIMATES=llm:4,charts:2 seed expected seconds per stage kind
+"""
+import asyncio
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Union
+
+from app.metrics import CANCELLED_WORK_TOTAL, DEADLINE_SKIPS_TOTAL
+
+# Seconds; refined by observe()
+_DEFAULT_ESTIMATES = {"llm": 4.0, "charts": 2.0, "analysis": 0.5, "knowledge": 0.3}
+
+_current_deadline: ContextVar[Optional["Deadline"]] = ContextVar("apex_deadline", default=None)
+
+
+class DeadlineExceeded(RuntimeError):
+    """Raised by stages that cannot run because the request's deadline has passed"""
+
+    # Tied to the caller's request: single-flight followers rerun instead of sharing it
+    request_scoped = True
+
+    def __init__(self, stage: str, reason: str = "Request deadline exceeded"):
+        super().__init__(f"{reason} before {stage}")
+        self.stage = stage
+
+
+class RequestCancelled(DeadlineExceeded):
+    """Raised by stages of a request whose client has gone away"""
+
+    def __init__(self, stage: str):
+        super().__init__(stage, reason="Request cancelled")
+
+
+class Deadline:
+    """Time budget of one request, its cancellation, and the stages skipped to meet them"""
+
+    def __init__(self, budget_s: Optional[float]):
+        """
+        Args:
+            budget_s: Seconds from now; None for a request that is only cancellable
+        """
+        self.started = time.monotonic()
+        self.budget_s = budget_s
+        self.expires = self.started + budget_s if budget_s is not None else float("inf")
+        self.skipped: List[Dict[str, str]] = []
+        self.cancelled = threading.Event()
+        self._on_cancel: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        self.detach: Callable[[], None] = lambda: None
+
+    def remaining(self) -> float:
+        if self.cancelled.is_set():
+            return 0.0
+        return max(0.0, self.expires - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.cancelled.is_set() or time.monotonic() >= self.expires
+
+    def tighten(self, budget_s: float) -> None:
+        """Shorten the budget (measured from the request's arrival); never extends it"""
+        if self.budget_s is None or budget_s < self.budget_s:
+            self.budget_s = budget_s
+            self.expires = self.started + budget_s
+
+    def cancel(self, stage: str = "request") -> None:
+        """Cancel the request (or branch): all remaining stages are skipped or dropped"""
+        with self._lock:
+            if self.cancelled.is_set():
+                return
+            self.cancelled.set()
+            callbacks, self._on_cancel = self._on_cancel, []
+        CANCELLED_WORK_TOTAL.inc(stage=stage)
+        for callback in callbacks:
+            callback()
+
+    def child(self) -> "Deadline":
+        """
+        Deadline for one branch of parallel work (e.g. a hedged LLM call)
+
+        Same expiry; cancelled with this one, and cancellable on its own
+        (cancel(stage=...)) without affecting the request. Call detach() when done.
+        """
+        branch = Deadline(None)
+        branch.started, branch.budget_s, branch.expires = self.started, self.budget_s, self.expires
+        branch.detach = self.on_cancel(functools.partial(branch.cancel, "branch"))
+        return branch
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """Call callback when the request is cancelled (now, if it already is); returns an unregister function"""
+        with self._lock:
+            if not self.cancelled.is_set():
+                self._on_cancel.append(callback)
+                return functools.partial(self._remove_callback, callback)
+        callback()
+        return lambda: None
+
+    def _remove_callback(self, callback: Callable[[], None]) -> None:
+        with self._lock:
+            if callback in self._on_cancel:
+                self._on_cancel.remove(callback)
+
+    def skip(self, stage: str, fallback: str) -> None:
+        with self._lock:
+            self.skipped.append({"stage": stage, "fallback": fallback})
+        if self.cancelled.is_set():
+            CANCELLED_WORK_TOTAL.inc(stage=stage)
+        else:
+            DEADLINE_SKIPS_TOTAL.inc(stage=stage)
+
+    def report(self) -> Dict[str, Any]:
+        """Summary for API responses"""
+        with self._lock:
+            skipped = list(self.skipped)
+        return {
+            "budget_ms": round(self.budget_s * 1000) if self.budget_s is not None else None,
+            "elapsed_ms": round((time.monotonic() - self.started) * 1000, 1),
+            "cancelled": self.cancelled.is_set(),
+            "skipped_stages": skipped,
+        }
+
+
+def default_budget_ms() -> Optional[float]:
+    try:
+        budget = float(os.getenv("APEX_REQUEST_DEADLINE_MS", 60000))
+    except ValueError:
+        return None
+    return budget if budget > 0 else None
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+
+@contextmanager
+def start_deadline(budget_ms: Optional[float], cancellable: bool = False) -> Iterator[Optional[Deadline]]:
+    """
+    Run a block under a deadline, or tighten the one already active
+
+    Args:
+        budget_ms: Budget in milliseconds; None or <= 0 keeps the current deadline (if any)
+        cancellable: Start a Deadline without a budget rather than none, so the block can be cancelled
+
+    Yields:
+        The active Deadline, or None when there is none
+    """
+    existing = _current_deadline.get()
+    if existing is not None:
+        if budget_ms and budget_ms > 0:
+            existing.tighten(budget_ms / 1000.0)
+        yield existing
+        return
+    has_budget = bool(budget_ms and budget_ms > 0)
+    if not has_budget and not cancellable:
+        yield None
+        return
+    deadline = Deadline(budget_ms / 1000.0 if has_budget else None)
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+@contextmanager
+def use_deadline(deadline: Optional[Deadline]) -> Iterator[Optional[Deadline]]:
+    """Run a block (typically on another thread) under the given deadline"""
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def remaining(default: Optional[float] = None) -> Optional[float]:
+    """Seconds left in the current request's budget (default when there is no budget)"""
+    deadline = _current_deadline.get()
+    if deadline is None or (deadline.budget_s is None and not deadline.cancelled.is_set()):
+        return default
+    return deadline.remaining()
+
+
+def cancelled() -> bool:
+    """Whether the current request has been cancelled"""
+    deadline = _current_deadline.get()
+    return deadline is not None and deadline.cancelled.is_set()
+
+
+def sleep(seconds: float) -> None:
+    """time.sleep that returns early when the current request is cancelled"""
+    deadline = _current_deadline.get()
+    if deadline is None:
+        time.sleep(seconds)
+    else:
+        deadline.cancelled.wait(seconds)
+
+
+class _Estimate:
+    """Rolling mean and mean deviation of a stage's duration"""
+
+    __slots__ = ("mean", "deviation")
+
+    def __init__(self, seed: float):
+        self.mean = seed
+        self.deviation = seed / 4
+
+    def add(self, seconds: float, alpha: float = 0.2) -> None:
+        self.deviation += alpha * (abs(seconds - self.mean) - self.deviation)
+        self.mean += alpha * (seconds - self.mean)
+
+
+def _seed_estimates() -> Dict[str, _Estimate]:
+    seeds = dict(_DEFAULT_ESTIMATES)
+    for item in os.getenv("APEX_DEADLINE_ESTIMATES", "").split(","):
+        kind, _, seconds = item.partition(":")
+        try:
+            seeds[kind.strip()] = float(seconds)
+        except ValueError:
+            continue
+    return {kind: _Estimate(seconds) for kind, seconds in seeds.items()}
+
+
+_estimates = _seed_estimates()
+_estimates_lock = threading.Lock()
+
+
+def observe(kind: str, seconds: float) -> None:
+    """Record how long a stage of this kind took"""
+    with _estimates_lock:
+        estimate = _estimates.get(kind)
+        if estimate is None:
+            _estimates[kind] = _Estimate(seconds)
+        else:
+            estimate.add(seconds)
+
+
+def expected(kind: str) -> float:
+    """Expected seconds for a stage kind (mean plus one deviation)"""
+    with _estimates_lock:
+        estimate = _estimates.get(kind)
+        return estimate.mean + estimate.deviation if estimate is not None else 0.0
+
+
+def stage_allowed(stage: str, needs: Union[str, float], fallback: str = "skipped") -> bool:
+    """
+    Whether a stage fits in the remaining budget; records the skip if not
+
+    Args:
+        stage: Stage name reported in skipped_stages
+        needs: Seconds required, or a stage kind whose expected() cost is required
+        fallback: What the pipeline does instead (reported with the skip)
+    """
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return True
+    seconds = expected(needs) if isinstance(needs, str) else float(needs)
+    if deadline.remaining() >= seconds:
+        return True
+    deadline.skip(stage, fallback)
+    return False
+
+
+def check(stage: str) -> None:
+    """Raise DeadlineExceeded if the current request's deadline has passed (RequestCancelled if cancelled)"""
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return
+    if deadline.cancelled.is_set():
+        CANCELLED_WORK_TOTAL.inc(stage=stage)
+        raise RequestCancelled(stage)
+    if deadline.expired():
+        raise DeadlineExceeded(stage)
+
+
+def check_cancelled(stage: str) -> None:
+    """Raise RequestCancelled if the current request has been cancelled (a passed deadline is allowed)"""
+    deadline = _current_deadline.get()
+    if deadline is not None and deadline.cancelled.is_set():
+        CANCELLED_WORK_TOTAL.inc(stage=stage)
+        raise RequestCancelled(stage)
+
+
+def drop_if_cancelled(stage: str, result: Any = None) -> Callable[[Callable], Callable]:
+    """Decorator: return result without running fn when the current request is cancelled"""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if cancelled():
+                CANCELLED_WORK_TOTAL.inc(stage=stage)
+                return result
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class DeadlineMiddleware:
+    """
+    ASGI middleware: runs requests to `paths` under a Deadline and cancels it if the client disconnects
+
+    The budget comes from the X-Deadline-Ms header, else default_budget_ms().
+    Once the request body has been read, a watcher waits for the server's
+    http.disconnect message; downstream receive() calls share that wait.
+    """
+
+    def __init__(self, app: Any, paths: Sequence[str] = ()):
+        self.app = app
+        self.paths = tuple(paths)
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        budget_ms = default_budget_ms()
+        for name, value in scope.get("headers") or ():
+            if name == b"x-deadline-ms":
+                try:
+                    budget_ms = float(value)
+                except ValueError:
+                    pass
+        with start_deadline(budget_ms, cancellable=True) as deadline:
+            watcher = _DisconnectWatcher(deadline, receive, send)
+            try:
+                await self.app(scope, watcher.receive, watcher.send)
+            finally:
+                watcher.stop()
+
+
+class _DisconnectWatcher:
+    """receive/send wrappers that cancel a Deadline when the client goes away mid-request"""
+
+    def __init__(self, deadline: Deadline, receive: Callable, send: Callable):
+        self.deadline = deadline
+        self._receive = receive
+        self._send = send
+        self._watch = None
+        self._responded = False
+
+    async def receive(self) -> Dict[str, Any]:
+        if self._watch is not None:
+            return await asyncio.shield(self._watch)
+        message = await self._receive()
+        if message["type"] == "http.disconnect":
+            self._disconnected()
+        elif message["type"] == "http.request" and not message.get("more_body", False):
+            self._watch = asyncio.ensure_future(self._wait_for_disconnect())
+        return message
+
+    async def send(self, message: Dict[str, Any]) -> None:
+        if message["type"] == "http.response.body" and not message.get("more_body", False):
+            # The server reports a disconnect once the response is complete; that one is not a cancellation
+            self._responded = True
+        await self._send(message)
+
+    async def _wait_for_disconnect(self) -> Dict[str, Any]:
+        message = await self._receive()
+        if message["type"] == "http.disconnect":
+            self._disconnected()
+        return message
+
+    def _disconnected(self) -> None:
+        if not self._responded:
+            self.deadline.cancel()
+
+    def stop(self) -> None:
+        self._responded = True
+        if self._watch is not None and not self._watch.done():
+            self._watch.cancel()
+
+
+__all__ = [
+    "Deadline",
+    "DeadlineExceeded",
+    "DeadlineMiddleware",
+    "RequestCancelled",
+    "cancelled",
+    "check",
+    "check_cancelled",
+    "current_deadline",
+    "default_budget_ms",
+    "drop_if_cancelled",
+    "expected",
+    "observe",
+    "remaining",
+    "sleep",
+    "stage_allowed",
+    "start_deadline",
+    "use_deadline",
+]
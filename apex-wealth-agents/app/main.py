@@ -1,5 +1,5 @@
-from fastapi import FastAPI, UploadFile, File, Form
-from fastapi.responses import FileResponse, RedirectResponse
+from fastapi import FastAPI, UploadFile, File, Form, Request, Depends
+from fastapi.responses import FileResponse, RedirectResponse, JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi import Query
 from fastapi.middleware.cors import CORSMiddleware
@@ -7,19 +7,39 @@ from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 import os, importlib, httpx
 import tempfile
+import time
 import shutil
 import json
+from contextlib import asynccontextmanager
 
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from app.deadline import DeadlineMiddleware, RequestCancelled, start_deadline
+from app.concurrency import OverloadedError, cpu_pool, io_pool, offload, run_cpu, shutdown_pools
+from app.metrics import CONTENT_TYPE, HTTP_REQUEST_SECONDS, render_latest
+from app.services import ServiceContainer, get_service_container, get_services
+from app.tracing import recent_traces, start_trace, tracing_enabled
+from app.warmup import readiness, selected_targets, start_background_warmup
 from orchestrator import chat as chat_fn
 try:
     from enhanced_orchestrator import process_historical_query  # optional, not required for /chat
 except Exception:
     process_historical_query = None
 
-app = FastAPI(title="Apex Advisor")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Heavy subsystems are built lazily; warm the selected ones in the
+    # background so liveness is immediate and readiness follows
+    app.state.services = get_service_container()
+    await app.state.services.start()
+    start_background_warmup(selected_targets())
+    yield
+    await app.state.services.close()
+    shutdown_pools(wait=False)
+
+
+app = FastAPI(title="Apex Advisor", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -35,45 +55,151 @@ BASE_DIR = os.path.dirname(__file__)
 STATIC_DIR = os.path.join(BASE_DIR, "static")
 app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 
+
+@app.exception_handler(OverloadedError)
+async def overloaded_handler(request: Request, exc: OverloadedError):
+    """Backpressure: tell clients to retry instead of queueing unboundedly"""
+    return JSONResponse(
+        status_code=429,
+        content={"status": "error", "type": "overloaded", "error": str(exc), "pool": exc.pool},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+@app.exception_handler(RequestCancelled)
+async def cancelled_handler(request: Request, exc: RequestCancelled):
+    """The client has gone away; nobody reads this (499 as in nginx)"""
+    return JSONResponse(status_code=499, content={"status": "error", "type": "cancelled", "error": str(exc)})
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    # With APEX_TRACING=1 every request gets a root span; the trace follows
+    # the handler into the worker pools via the copied context
+    if not tracing_enabled():
+        return await call_next(request)
+    with start_trace(f"{request.method} {request.url.path}", **{"http.method": request.method}) as trace:
+        response = await call_next(request)
+        trace.root.set_attribute("http.status_code", response.status_code)
+    return response
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    # Label by route template (/historical/year/{year}) to keep cardinality bounded
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status),
+        )
+
+
+# Outermost: the budget starts on arrival (X-Deadline-Ms or APEX_REQUEST_DEADLINE_MS)
+# and the request is cancelled if the client disconnects; like the trace, the
+# deadline follows the handler into the worker pools
+DEADLINE_ROUTES = ("/chat", "/historical/analyze")
+app.add_middleware(DeadlineMiddleware, paths=DEADLINE_ROUTES)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint (text exposition format)"""
+    return Response(render_latest(), media_type=CONTENT_TYPE)
+
+
+@app.get("/debug/traces")
+async def debug_traces(limit: int = Query(20)):
+    """Timings of recent traced requests (requires APEX_TRACING=1 or include_timings)"""
+    return {"tracing_enabled": tracing_enabled(), "traces": recent_traces(limit)}
+
+
 class ChatReq(BaseModel):
-    session_id: str
+    session_id: str  # server-side conversation (summary + last turn); context is only needed without one
     message: str
     context: List[Dict[str, str]] = []
     user_id: Optional[str] = None
+    include_timings: bool = False  # add a per-stage "timings" block to the response
+    deadline_ms: Optional[int] = None  # time budget from arrival; can only shorten X-Deadline-Ms / the default
 
 class CategorizeReq(BaseModel):
     user_id: str
     tx_ids: List[str] = []
 
 @app.get("/")
-def root():
+async def root():
     return RedirectResponse(url="/landing")
 
 @app.get("/ui")
-def ui():
+async def ui():
     index_path = os.path.join(STATIC_DIR, "index.html")
     return FileResponse(index_path)
 
 @app.get("/landing")
-def landing():
+async def landing():
     landing_path = os.path.join(STATIC_DIR, "landing.html")
     return FileResponse(landing_path)
 
 @app.get("/health")
-def health():
+async def health():
     return {"ok": True}
 
+@app.get("/health/live")
+async def health_live():
+    """Liveness: the process is up and the event loop is responsive"""
+    return {"ok": True}
+
+@app.get("/health/ready")
+async def health_ready():
+    """Readiness: selected warm-up targets have finished building"""
+    report = readiness()
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
+
 @app.post("/chat")
+@offload(io_pool)
 def chat_api(req: ChatReq):
-    try:
-        response = chat_fn(req.message, req.context, user_id=req.user_id)
-        if isinstance(response, dict):
-            return response
-        return {"answer": str(response), "status": "success", "type": "text"}
-    except Exception as e:
-        return {"answer": f"I apologize, but I encountered an error: {str(e)}", "status": "error", "type": "error"}
+    with start_deadline(req.deadline_ms) as deadline, \
+            start_trace("chat", force=req.include_timings, session_id=req.session_id) as trace:
+        try:
+            response = chat_fn(req.message, req.context, user_id=req.user_id, session_id=req.session_id)
+            if not isinstance(response, dict):
+                response = {"answer": str(response), "status": "success", "type": "text"}
+        except Exception as e:
+            response = {"answer": f"I apologize, but I encountered an error: {str(e)}", "status": "error", "type": "error"}
+        if deadline is not None:
+            response["deadline"] = deadline.report()
+    if req.include_timings and trace is not None:
+        response["timings"] = trace.timings()
+    return response
+
+@app.get("/session/{session_id}")
+@offload(io_pool)
+def get_session(session_id: str, history: bool = Query(False), services: ServiceContainer = Depends(get_services)):
+    """Rolling summary and last turn of a chat session (history=true adds the stored turn log)"""
+    store = services.session_store()
+    session = store.get(session_id)
+    if session is None:
+        return {"success": False, "error": "Session not found"}
+    out = {"success": True, "session": session.to_dict()}
+    if history:
+        out["history"] = store.history(session_id)
+    return out
+
+@app.delete("/session/{session_id}")
+@offload(io_pool)
+def delete_session(session_id: str, services: ServiceContainer = Depends(get_services)):
+    """Forget a chat session (start a new conversation)"""
+    services.session_store().delete(session_id)
+    return {"success": True}
 
 @app.get("/selftest")
+@offload(io_pool)
 def selftest():
     out = {}
     out["csv_exists"] = os.path.exists("data/transactions.csv")
@@ -99,32 +225,37 @@ def selftest():
 
 # Flowise-compatible endpoints (minimal)
 @app.post("/tools/categorize_txn")
+@offload(io_pool)
 def categorize_txn(req: CategorizeReq):
     from run_expense_categorizer import run as run_cat
     # For demo, ignore tx_ids and run on current CSV
     return run_cat(transactions_path="data/transactions.csv", use_llm=True)
 
 @app.get("/reports/spend_mtd")
+@offload(cpu_pool)
 def spend_mtd(user_id: str = Query(...)):
     from app.tools.budget import run as budget_run
     return budget_run()
 
 @app.get("/budgets")
+@offload(cpu_pool)
 def budgets(user_id: str = Query(...)):
     from app.tools.budget import DEFAULT_LIMITS
     return DEFAULT_LIMITS
 
 @app.get("/series/daily_net_flow")
-def daily_net_flow(user_id: str = Query(...), window: int = Query(365)):
+async def daily_net_flow(user_id: str = Query(...), window: int = Query(365)):
     # Simple placeholder: return empty series for now (Flowise template stub)
     return []
 
 @app.post("/models/forecast")
+@offload(cpu_pool)
 def forecast(series: Any):
     from run_cashflow_predictor import run as run_forecast
     return run_forecast()
 
 @app.post("/tools/query_csv")
+@offload(cpu_pool)
 def http_query_csv(payload: Dict[str, Any]):
     from app.tools.csv_tools import query_csv
     sql = str(payload.get("sql") or "").strip()
@@ -132,34 +263,45 @@ def http_query_csv(payload: Dict[str, Any]):
     return query_csv(sql=sql, limit=limit)
 
 @app.get("/tools/spend_aggregate")
+@offload(cpu_pool)
 def http_spend_aggregate(month: str | None = Query(None), group_by: str = Query("category")):
     from app.tools.csv_tools import spend_aggregate
     return spend_aggregate(month=month, group_by=group_by)
 
 @app.get("/tools/top_merchants")
+@offload(cpu_pool)
 def http_top_merchants(month: str | None = Query(None), n: int = Query(10)):
     from app.tools.csv_tools import top_merchants
     return top_merchants(month=month, n=n)
 
 @app.get("/tools/describe_csv")
+@offload(cpu_pool)
 def http_describe_csv():
     from app.tools.csv_tools import describe_csv
     return describe_csv()
 
 @app.post("/historical/analyze")
+@offload(io_pool)
 def historical_analysis(req: ChatReq):
     """Dedicated endpoint for historical analysis with charts"""
-    try:
-        response = process_historical_query(req.message, req.context)
-        return response
-    except Exception as e:
-        return {
-            "answer": f"Error in historical analysis: {str(e)}",
-            "status": "error",
-            "type": "error"
-        }
+    with start_deadline(req.deadline_ms) as deadline, \
+            start_trace("historical_analyze", force=req.include_timings, session_id=req.session_id) as trace:
+        try:
+            response = process_historical_query(req.message, req.context, session_id=req.session_id)
+        except Exception as e:
+            response = {
+                "answer": f"Error in historical analysis: {str(e)}",
+                "status": "error",
+                "type": "error"
+            }
+        if deadline is not None and isinstance(response, dict):
+            response["deadline"] = deadline.report()
+    if req.include_timings and trace is not None and isinstance(response, dict):
+        response["timings"] = trace.timings()
+    return response
 
 @app.get("/historical/years")
+@offload(cpu_pool)
 def get_available_years():
     """Get list of available years in the dataset"""
     try:
@@ -170,6 +312,7 @@ def get_available_years():
         return {"error": str(e), "status": "error"}
 
 @app.get("/historical/year/{year}")
+@offload(cpu_pool)
 def get_year_data(year: int):
     """Get data for a specific year"""
     try:
@@ -180,6 +323,7 @@ def get_year_data(year: int):
         return {"error": str(e), "status": "error"}
 
 @app.get("/historical/range/{start_year}/{end_year}")
+@offload(cpu_pool)
 def get_year_range_data(start_year: int, end_year: int):
     """Get data for a range of years"""
     try:
@@ -191,38 +335,17 @@ def get_year_range_data(start_year: int, end_year: int):
 
 
 # Personalization endpoints
-@app.post("/personalization/upload")
-async def upload_personal_data(
-    file: UploadFile = File(...),
-    user_id: str = Form(...),
-    overwrite: bool = Form(False)
-):
-    """
-    Upload personal finance CSV data for personalization
-    
-    Args:
-        file: CSV file with transaction data
-        user_id: Unique user identifier
-        overwrite: Whether to overwrite existing data
-    """
+def _process_upload(services: ServiceContainer, fileobj, user_id: str, overwrite: bool) -> Dict[str, Any]:
+    """Spool an uploaded CSV to disk and process it (runs on the CPU pool)"""
     try:
-        from app.tools.personalization import PersonalizationEngine
-        
-        # Validate file type
-        if not file.filename.endswith('.csv'):
-            return {
-                "success": False,
-                "error": "File must be a CSV file"
-            }
-        
         # Save uploaded file temporarily
         with tempfile.NamedTemporaryFile(delete=False, suffix='.csv') as tmp_file:
-            shutil.copyfileobj(file.file, tmp_file)
+            shutil.copyfileobj(fileobj, tmp_file)
             tmp_path = tmp_file.name
         
         try:
             # Process CSV
-            engine = PersonalizationEngine()
+            engine = services.personalization_engine()
             result = engine.process_user_csv(tmp_path, user_id, overwrite=overwrite)
             return result
         finally:
@@ -237,10 +360,37 @@ async def upload_personal_data(
         }
 
 
+@app.post("/personalization/upload")
+async def upload_personal_data(
+    file: UploadFile = File(...),
+    user_id: str = Form(...),
+    overwrite: bool = Form(False),
+    services: ServiceContainer = Depends(get_services)
+):
+    """
+    Upload personal finance CSV data for personalization
+    
+    Args:
+        file: CSV file with transaction data
+        user_id: Unique user identifier
+        overwrite: Whether to overwrite existing data
+    """
+    # Validate file type
+    if not (file.filename or "").endswith('.csv'):
+        return {
+            "success": False,
+            "error": "File must be a CSV file"
+        }
+    
+    return await run_cpu(_process_upload, services, file.file, user_id, overwrite)
+
+
 @app.post("/personalization/train")
+@offload(cpu_pool)
 def train_personal_model(
     user_id: str = Form(...),
-    retrain: bool = Form(False)
+    retrain: bool = Form(False),
+    services: ServiceContainer = Depends(get_services)
 ):
     """
     Train a personalized model for a user
@@ -250,9 +400,7 @@ def train_personal_model(
         retrain: Whether to retrain if model already exists
     """
     try:
-        from app.tools.personalization import PersonalizationEngine
-        
-        engine = PersonalizationEngine()
+        engine = services.personalization_engine()
         result = engine.train_user_model(user_id, retrain=retrain)
         return result
     except Exception as e:
@@ -263,7 +411,8 @@ def train_personal_model(
 
 
 @app.get("/personalization/status/{user_id}")
-def get_personalization_status(user_id: str):
+@offload(io_pool)
+def get_personalization_status(user_id: str, services: ServiceContainer = Depends(get_services)):
     """
     Get personalization status for a user
     
@@ -271,9 +420,7 @@ def get_personalization_status(user_id: str):
         user_id: Unique user identifier
     """
     try:
-        from app.tools.personalization import PersonalizationEngine
-        
-        engine = PersonalizationEngine()
+        engine = services.personalization_engine()
         
         # Get metadata
         metadata = engine.get_user_metadata(user_id)
@@ -296,24 +443,16 @@ def get_personalization_status(user_id: str):
         }
 
 
-@app.post("/personalization/validate")
-async def validate_csv(file: UploadFile = File(...)):
-    """
-    Validate CSV file structure before upload
-    
-    Args:
-        file: CSV file to validate
-    """
+def _validate_upload(services: ServiceContainer, fileobj) -> Dict[str, Any]:
+    """Spool an uploaded CSV to disk and validate it (runs on the CPU pool)"""
     try:
-        from app.tools.personalization import PersonalizationEngine
-        
         # Save uploaded file temporarily
         with tempfile.NamedTemporaryFile(delete=False, suffix='.csv') as tmp_file:
-            shutil.copyfileobj(file.file, tmp_file)
+            shutil.copyfileobj(fileobj, tmp_file)
             tmp_path = tmp_file.name
         
         try:
-            engine = PersonalizationEngine()
+            engine = services.personalization_engine()
             result = engine.validate_csv(tmp_path)
             return result
         finally:
@@ -328,29 +467,30 @@ async def validate_csv(file: UploadFile = File(...)):
         }
 
 
+@app.post("/personalization/validate")
+async def validate_csv(file: UploadFile = File(...), services: ServiceContainer = Depends(get_services)):
+    """
+    Validate CSV file structure before upload
+    
+    Args:
+        file: CSV file to validate
+    """
+    return await run_cpu(_validate_upload, services, file.file)
+
+
 @app.get("/personalization/users")
-def list_personalized_users():
+@offload(io_pool)
+def list_personalized_users(services: ServiceContainer = Depends(get_services)):
     """List all users with personalized data"""
     try:
-        from app.tools.personalization import PersonalizationEngine
+        engine = services.personalization_engine()
         
-        engine = PersonalizationEngine()
-        users = engine.list_users()
-        
-        # Get status for each user
-        user_statuses = []
-        for user_id in users:
-            metadata = engine.get_user_metadata(user_id)
-            model_path = engine.get_user_model_path(user_id)
-            user_statuses.append({
-                "user_id": user_id,
-                "has_model": model_path is not None,
-                "metadata": metadata
-            })
+        # One directory index + one bulk metadata lookup for all users
+        user_statuses = engine.list_users_with_status()
         
         return {
             "users": user_statuses,
-            "count": len(users)
+            "count": len(user_statuses)
         }
     except Exception as e:
         return {
@@ -359,11 +499,15 @@ def list_personalized_users():
         }
 
 
-# User Profile Management Endpoints (MongoDB)
+# User Profile Management Endpoints (MongoDB, async pooled client)
+_MONGODB_DOWN = "MongoDB not connected. Please check your MongoDB setup."
+
+
 @app.post("/profile/create")
-def create_user_profile(
+async def create_user_profile(
     user_id: str = Form(...),
-    profile_data: str = Form(...)  # JSON string
+    profile_data: str = Form(...),  # JSON string
+    services: ServiceContainer = Depends(get_services)
 ):
     """
     Create or update user profile in MongoDB
@@ -373,20 +517,14 @@ def create_user_profile(
         profile_data: JSON string with profile data
     """
     try:
-        from database.mongodb_service import get_mongodb_service
-        
-        mongodb = get_mongodb_service()
+        mongodb = services.async_mongodb()
         if not mongodb.is_connected():
-            return {
-                "success": False,
-                "error": "MongoDB not connected. Please check your MongoDB setup."
-            }
-        
-        # Parse JSON profile data
-        import json
+            return {"success": False, "error": _MONGODB_DOWN}
         profile = json.loads(profile_data)
-        
-        result = mongodb.create_user_profile(user_id, profile)
+        result = await mongodb.create_user_profile(user_id, profile)
+        if result.get("success"):
+            # Write-through: the next chat turn sees the stored (merged) profile
+            services.profile_cache().put(user_id, await mongodb.get_user_profile(user_id))
         return result
     except json.JSONDecodeError:
         return {"success": False, "error": "Invalid JSON in profile_data"}
@@ -394,41 +532,53 @@ def create_user_profile(
         return {"success": False, "error": str(e)}
 
 
+@app.get("/profile/list")
+async def list_all_profiles(services: ServiceContainer = Depends(get_services)):
+    """List all user profiles"""
+    try:
+        mongodb = services.async_mongodb()
+        if not mongodb.is_connected():
+            return {"success": False, "error": "MongoDB not connected", "users": []}
+        users = await mongodb.list_all_users()
+        return {
+            "success": True,
+            "users": users,
+            "count": len(users)
+        }
+    except Exception as e:
+        return {"success": False, "error": str(e), "users": []}
+
+
 @app.get("/profile/{user_id}")
-def get_user_profile(user_id: str):
+async def get_user_profile(user_id: str, services: ServiceContainer = Depends(get_services)):
     """
-    Get user profile from MongoDB
+    Get user profile from MongoDB (falls back to state/profile.json)
     
     Args:
         user_id: Unique user identifier
     """
     try:
-        from database.mongodb_service import get_mongodb_service
-        
-        mongodb = get_mongodb_service()
+        mongodb = services.async_mongodb()
         if not mongodb.is_connected():
-            # Fallback to file-based profile
-            import os
-            import json
-            profile_path = os.path.join("apex-wealth-agents", "state", "profile.json")
-            if os.path.exists(profile_path):
-                with open(profile_path, 'r') as f:
-                    return {"success": True, "profile": json.load(f), "source": "file"}
+            from database.async_mongodb_service import load_file_profile
+            profile = load_file_profile()
+            if profile is not None:
+                return {"success": True, "profile": profile, "source": "file"}
             return {"success": False, "error": "Profile not found"}
-        
-        profile = mongodb.get_user_profile(user_id)
+
+        profile = await services.profile_cache().aget(user_id, fallback=False)
         if profile:
             return {"success": True, "profile": profile, "source": "mongodb"}
-        else:
-            return {"success": False, "error": "Profile not found"}
+        return {"success": False, "error": "Profile not found"}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 
 @app.put("/profile/{user_id}")
-def update_user_profile(
+async def update_user_profile(
     user_id: str,
-    updates: str = Form(...)  # JSON string
+    updates: str = Form(...),  # JSON string
+    services: ServiceContainer = Depends(get_services)
 ):
     """
     Update user profile fields
@@ -438,18 +588,15 @@ def update_user_profile(
         updates: JSON string with fields to update
     """
     try:
-        from database.mongodb_service import get_mongodb_service
-        import json
-        
-        mongodb = get_mongodb_service()
+        mongodb = services.async_mongodb()
         if not mongodb.is_connected():
-            return {
-                "success": False,
-                "error": "MongoDB not connected"
-            }
-        
+            return {"success": False, "error": "MongoDB not connected"}
         update_data = json.loads(updates)
-        result = mongodb.update_user_profile(user_id, update_data)
+        result = await mongodb.update_user_profile(user_id, update_data)
+        if result.get("success"):
+            services.profile_cache().put(user_id, await mongodb.get_user_profile(user_id))
+        else:
+            services.profile_cache().invalidate(user_id)
         return result
     except json.JSONDecodeError:
         return {"success": False, "error": "Invalid JSON in updates"}
@@ -458,7 +605,7 @@ def update_user_profile(
 
 
 @app.delete("/profile/{user_id}")
-def delete_user_profile(user_id: str):
+async def delete_user_profile(user_id: str, services: ServiceContainer = Depends(get_services)):
     """
     Delete user profile
     
@@ -466,59 +613,21 @@ def delete_user_profile(user_id: str):
         user_id: Unique user identifier
     """
     try:
-        from database.mongodb_service import get_mongodb_service
-        
-        mongodb = get_mongodb_service()
+        mongodb = services.async_mongodb()
         if not mongodb.is_connected():
-            return {
-                "success": False,
-                "error": "MongoDB not connected"
-            }
-        
-        result = mongodb.delete_user_profile(user_id)
+            return {"success": False, "error": "MongoDB not connected"}
+        result = await mongodb.delete_user_profile(user_id)
+        services.profile_cache().put(user_id, None)
         return result
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 
-@app.get("/profile/list")
-def list_all_profiles():
-    """List all user profiles"""
-    try:
-        from database.mongodb_service import get_mongodb_service
-        
-        mongodb = get_mongodb_service()
-        if not mongodb.is_connected():
-            return {
-                "success": False,
-                "error": "MongoDB not connected",
-                "users": []
-            }
-        
-        users = mongodb.list_all_users()
-        return {
-            "success": True,
-            "users": users,
-            "count": len(users)
-        }
-    except Exception as e:
-        return {"success": False, "error": str(e), "users": []}
-
-
 @app.get("/database/status")
-def database_status():
-    """Check MongoDB connection status"""
+async def database_status(services: ServiceContainer = Depends(get_services)):
+    """Check MongoDB connection status (cached by the background health check)"""
     try:
-        from database.mongodb_service import get_mongodb_service
-        
-        mongodb = get_mongodb_service()
-        is_connected = mongodb.is_connected()
-        
-        return {
-            "mongodb_connected": is_connected,
-            "database_name": mongodb.database_name if is_connected else None,
-            "status": "connected" if is_connected else "disconnected"
-        }
+        return services.async_mongodb().status()
     except Exception as e:
         return {
             "mongodb_connected": False,
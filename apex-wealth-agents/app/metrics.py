@@ -0,0 +1,344 @@
+"""
+In-process metrics with Prometheus text exposition.
+
+A small registry of counters, gauges and histograms (no external client or
+collector needed); GET /metrics renders it in the Prometheus 0.0.4 text
+format. Metrics used across the app are defined here so names and labels
+stay consistent:
+
+    from app.metrics import LLM_REQUEST_SECONDS
+    with LLM_REQUEST_SECONDS.time(provider="free"):
+        ...
+
+Values that are cheap to read but live elsewhere (worker-pool depth, cache
+hit counts) are refreshed by scrape hooks right before rendering.
+"""
+import abc
+import functools
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry: List["_Metric"] = []
+_scrape_hooks: List[Callable[[], None]] = []
+_registry_lock = threading.Lock()
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric(abc.ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    @abc.abstractmethod
+    def _samples(self) -> List[str]:
+        """Exposition lines for every label set, without the HELP/TYPE header"""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing value per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set_total(self, value: float, **labels: str) -> None:
+        """Mirror a total kept elsewhere (scrape hooks only)"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    """Value that can go up and down"""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        self.set_total(value, **labels)
+
+
+class Histogram(_Metric):
+    """Cumulative bucketed observations (seconds unless the name says otherwise)"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * len(self.buckets)
+                self._sums[key] = 0.0
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._sums[key] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the duration of a block (also when it raises)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            return sum(self._counts.get(self._key(labels), []))
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(c), self._sums[k]) for k, c in sorted(self._counts.items())]
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = ("le", _format_value(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def timed(histogram: Histogram, **labels: str) -> Callable[[Callable], Callable]:
+    """Decorator: observe each call's duration in histogram"""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with histogram.time(**labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_duckdb_scan(tool: str, source_path: str) -> None:
+    """Count one DuckDB scan of source_path, the Arrow/Parquet store or CSV it read (bytes = file size)"""
+    DUCKDB_SCANS_TOTAL.inc(tool=tool)
+    try:
+        DUCKDB_SCAN_BYTES_TOTAL.inc(os.path.getsize(source_path), tool=tool)
+    except OSError:
+        pass
+
+
+def register_scrape_hook(hook: Callable[[], None]) -> None:
+    """Run hook before each render (refresh gauges from their source)"""
+    with _registry_lock:
+        _scrape_hooks.append(hook)
+
+
+def render_latest() -> str:
+    """All metrics in Prometheus text exposition format"""
+    with _registry_lock:
+        hooks, metrics = list(_scrape_hooks), list(_registry)
+    for hook in hooks:
+        try:
+            hook()
+        except Exception as e:
+            print(f"Metrics scrape hook failed: {e}")
+    return "\n".join(m.render() for m in metrics) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# ---- metrics used across the app -------------------------------------------
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "apex_http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status"))
+
+LLM_REQUESTS_TOTAL = Counter(
+    "apex_llm_requests_total", "LLM completions by provider and outcome", ("provider", "outcome"))
+LLM_REQUEST_SECONDS = Histogram(
+    "apex_llm_request_duration_seconds", "LLM completion latency (including retries)", ("provider",))
+LLM_RETRIES_TOTAL = Counter(
+    "apex_llm_retries_total", "LLM HTTP attempts retried", ("provider",))
+LLM_ERRORS_TOTAL = Counter(
+    "apex_llm_errors_total", "LLM failures by kind (network, http, response, ...)", ("provider", "kind"))
+LLM_CIRCUIT_STATE = Gauge(
+    "apex_llm_circuit_state", "LLM provider circuit breaker state (0 closed, 1 half-open, 2 open)", ("provider",))
+LLM_REJECTED_TOTAL = Counter(
+    "apex_llm_rejected_total", "LLM calls refused without an HTTP attempt (circuit_open, rate_limited)",
+    ("provider", "reason"))
+LLM_ROUTED_TOTAL = Counter(
+    "apex_llm_routed_calls_total", "LLM calls sent by the provider router, by role (primary, hedge, failover)",
+    ("provider", "role"))
+LLM_HEDGE_OUTCOMES_TOTAL = Counter(
+    "apex_llm_hedge_outcomes_total", "Hedged LLM calls by the branch that answered first (primary, hedge, none)",
+    ("winner",))
+LLM_PROVIDER_LATENCY_SECONDS = Gauge(
+    "apex_llm_provider_latency_seconds", "Rolling LLM latency quantiles per provider (router statistics)",
+    ("provider", "quantile"))
+LLM_RATE_LIMIT_WAIT_SECONDS = Counter(
+    "apex_llm_rate_limit_wait_seconds_total", "Time LLM calls waited for the provider rate limiter", ("provider",))
+
+MICROBATCH_SIZE = Histogram(
+    "apex_microbatch_size", "Items per micro-batch (e.g. query embeddings encoded together)", ("batcher",),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+MICROBATCH_QUEUE_WAIT_SECONDS = Histogram(
+    "apex_microbatch_queue_wait_seconds", "Time items wait for their micro-batch to start", ("batcher",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+
+CHROMA_QUERY_SECONDS = Histogram(
+    "apex_chroma_query_duration_seconds", "ChromaDB collection query latency", ("namespace",))
+
+DUCKDB_SCANS_TOTAL = Counter(
+    "apex_duckdb_scans_total", "DuckDB scans of the transactions store", ("tool",))
+DUCKDB_SCAN_BYTES_TOTAL = Counter(
+    "apex_duckdb_scan_bytes_total",
+    "Size of the file behind each DuckDB scan (columnar cache file, or the CSV without one)", ("tool",))
+SQL_QUERY_SECONDS = Histogram(
+    "apex_sql_query_duration_seconds", "Parameterized transaction-store query latency", ("statement",))
+SQL_CONNECTIONS_TOTAL = Counter(
+    "apex_sql_connections_total", "Store connections opened (persistent per worker thread, or one-off)", ("kind",))
+
+QUICK_ANSWERS_TOTAL = Counter(
+    "apex_quick_answers_total", "Chat questions answered from templates by shape and phrasing", ("kind", "phrasing"))
+
+ANSWER_CACHE_LOOKUPS_TOTAL = Counter(
+    "apex_answer_cache_lookups_total", "Semantic answer cache lookups by result", ("result",))
+ANSWER_CACHE_SAVED_SECONDS = Counter(
+    "apex_answer_cache_saved_seconds_total", "Strategy pipeline time skipped by answer cache hits")
+ANSWER_CACHE_ENTRIES = Gauge("apex_answer_cache_entries", "Answers held in the semantic answer cache")
+
+FUSED_STRATEGY_TOTAL = Counter(
+    "apex_fused_strategy_total", "Fused strategy+risk LLM replies by outcome (valid, invalid, unparsed, error)", ("outcome",))
+
+DEADLINE_SKIPS_TOTAL = Counter(
+    "apex_deadline_skipped_stages_total", "Pipeline stages skipped or downgraded to meet request deadlines", ("stage",))
+CANCELLED_WORK_TOTAL = Counter(
+    "apex_cancelled_work_total",
+    "Work dropped because the client disconnected, by stage (stage=request counts disconnects)",
+    ("stage",))
+
+CHART_RENDER_SECONDS = Histogram(
+    "apex_chart_render_duration_seconds", "Chart render time (matplotlib)", ("chart",))
+
+MODEL_LOADS_TOTAL = Counter(
+    "apex_analysis_model_loads_total", "AnalysisAgent model loads", ("model", "outcome"))
+
+POOL_WORKERS = Gauge("apex_pool_workers", "Worker threads per pool", ("pool",))
+POOL_QUEUE_CAPACITY = Gauge("apex_pool_queue_capacity", "Queued tasks allowed per pool", ("pool",))
+POOL_IN_FLIGHT = Gauge("apex_pool_in_flight", "Tasks running or queued per pool", ("pool",))
+POOL_QUEUE_DEPTH = Gauge("apex_pool_queue_depth", "Tasks waiting for a worker per pool", ("pool",))
+POOL_COMPLETED_TOTAL = Counter("apex_pool_completed_total", "Tasks completed per pool", ("pool",))
+POOL_REJECTED_TOTAL = Counter("apex_pool_rejected_total", "Tasks rejected with 429 per pool", ("pool",))
+
+PROFILE_CACHE_LOOKUPS_TOTAL = Counter(
+    "apex_profile_cache_lookups_total", "Profile cache lookups by result", ("result",))
+
+SESSION_LOOKUPS_TOTAL = Counter(
+    "apex_session_lookups_total", "Chat session lookups by result (hit, load from SQLite, miss)", ("result",))
+SESSIONS_IN_MEMORY = Gauge("apex_sessions_in_memory", "Chat sessions held in the in-memory LRU")
+
+FRAME_CACHE_BYTES = Gauge("apex_frame_cache_bytes", "Memory held by cached transaction frames")
+STRING_POOL_ENTRIES = Gauge("apex_string_pool_entries", "Distinct label strings in the shared pool")
+
+
+def _scrape_pools() -> None:
+    from app.concurrency import pool_stats
+    for name, stats in pool_stats().items():
+        POOL_WORKERS.set(stats["workers"], pool=name)
+        POOL_QUEUE_CAPACITY.set(stats["queue_capacity"], pool=name)
+        POOL_IN_FLIGHT.set(stats["in_flight"], pool=name)
+        POOL_QUEUE_DEPTH.set(stats["queued"], pool=name)
+        POOL_COMPLETED_TOTAL.set_total(stats["completed"], pool=name)
+        POOL_REJECTED_TOTAL.set_total(stats["rejected"], pool=name)
+
+
+def _scrape_profile_cache() -> None:
+    from database.profile_cache import get_profile_cache
+    stats = get_profile_cache().stats()
+    PROFILE_CACHE_LOOKUPS_TOTAL.set_total(stats["hits"], result="hit")
+    PROFILE_CACHE_LOOKUPS_TOTAL.set_total(stats["misses"], result="miss")
+
+
+def _scrape_session_store() -> None:
+    # Only report once a session has been used; the store may open SQLite
+    module = sys.modules.get("database.session_store")
+    if module is None or module._default_session_store is None:
+        return
+    stats = module._default_session_store.stats()
+    SESSION_LOOKUPS_TOTAL.set_total(stats["hits"], result="hit")
+    SESSION_LOOKUPS_TOTAL.set_total(stats["loads"], result="load")
+    SESSION_LOOKUPS_TOTAL.set_total(stats["misses"], result="miss")
+    SESSIONS_IN_MEMORY.set(stats["sessions"])
+
+
+def _scrape_frame_cache() -> None:
+    # Only report once the loader is in use; importing it here would pull in pandas
+    module = sys.modules.get("app.tools.transactions_frame")
+    if module is None:
+        return
+    report = module.cache_report()
+    FRAME_CACHE_BYTES.set(report["total_bytes"])
+    STRING_POOL_ENTRIES.set(report["string_pool_entries"])
+
+
+register_scrape_hook(_scrape_pools)
+register_scrape_hook(_scrape_profile_cache)
+register_scrape_hook(_scrape_frame_cache)
+register_scrape_hook(_scrape_session_store)
@@ -0,0 +1,329 @@
+"""
+Templated answers for numeric spending questions.
+
+"How much did I spend in March 2024?" or "top 5 merchants last year" used
+to take the full chat pipeline: a ParsingAgent LLM call, several CSV scans
+and a final completion whose only job was to restate numbers. Questions of
+these shapes are recognized here and answered from the aggregate tools,
+with no LLM call:
+
+  - total:      how much did I spend / total spending [on <category>] [period]
+  - merchants:  top N merchants / where did I spend the most [period]
+  - categories: top N categories / spending by category [period]
+  - monthly:    monthly spending / spending by month [period]
+
+A period is a year, a month of a year, a month name alone (that month in
+every year, as the data-context tools treat it), or this/last month/year.
+The relative forms count back from the latest transaction: the data is an
+export, not a live feed. Questions asking for advice, explanations, charts
+or comparisons, multi-year ranges, any other period wording ("last 3
+months", "yesterday", "q1 2024", "since June") and qualifiers a template
+cannot filter on ("top merchants for food") go to the full pipeline.
+
+Environment overrides:
+  - APEX_QUICK_ANSWERS=template (default) answers from the templates
+  - APEX_QUICK_ANSWERS=llm has the LLM phrase the computed figures; the
+    template answer is used if the call fails
+  - APEX_QUICK_ANSWERS=off sends every question through the full pipeline
+"""
+import calendar
+import os
+import re
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.deadline import stage_allowed
+from app.metrics import QUICK_ANSWERS_TOTAL
+from app.tools.enhanced_csv_tools import (
+    category_stats,
+    format_currency,
+    merchant_stats,
+    monthly_spend,
+    parse_historical_query,
+    time_coverage,
+    total_spend,
+)
+
+TOTAL = "total"
+MERCHANTS = "merchants"
+CATEGORIES = "categories"
+MONTHLY = "monthly"
+
+DEFAULT_TOP_N = 5
+MAX_TOP_N = 25
+MAX_WORDS = 20
+
+_SPEND = r"(?:spend|spent|spending|expenses?|expenditure|paid)"
+_SHAPES = (
+    (MERCHANTS, re.compile(r"\b(?:top|biggest|largest|highest|most)\b.*\bmerchants?\b|"
+                           r"\bwhich merchants?\b|\bwhere (?:did|do) i spend (?:the )?most\b")),
+    (CATEGORIES, re.compile(r"\b(?:top|biggest|largest|highest)\b.*\bcategor(?:y|ies)\b|"
+                            r"\b(?:by|per|each) category\b|\bcategory(?:-| )wise\b|\bcategory breakdown\b|"
+                            r"\bwhich categor(?:y|ies)\b")),
+    (MONTHLY, re.compile(rf"\b(?:monthly|month by month|by month|per month|each month)\b.*\b{_SPEND}\b|"
+                         rf"\b{_SPEND}\b.*\b(?:monthly|month by month|by month|per month|each month)\b")),
+    (TOTAL, re.compile(rf"\bhow much\b.*\b(?:{_SPEND}|spend|pay)\b|\btotal\b.*\b{_SPEND}\b|"
+                       rf"\bwhat (?:did|was|were|is|are) (?:i|my)\b.*\b{_SPEND}\b")),
+)
+# Questions that need reasoning, advice or charts rather than a figure
+_DEFER = re.compile(
+    r"\b(?:why|should|could|would|how (?:can|do|should)|recommend\w*|advi[cs]e|suggest\w*|tips?|"
+    r"improve|reduce|cut|save|saving|invest\w*|plan|afford|compare\w*|comparison|vs|versus|between|"
+    r"trend\w*|predict\w*|forecast\w*|chart|graph|plot|visuali[sz]\w*|pie|diagram|picture|image|"
+    r"average|per day|daily|weekly|income|budget\w*|"
+    r"least|lowest|smallest|less|fewest|fewer|bottom|cheapest|minimum)\b"
+)
+_TOP_N = re.compile(r"\btop\s+(\d{1,2})\b")
+_MONTH_NAME = re.compile(r"\b(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|"
+                         r"sept?(?:ember)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\b")
+_NUMERIC_MONTH = re.compile(r"\b(?:(?:19|20)\d{2}[-/](?:0?[1-9]|1[0-2])|(?:0?[1-9]|1[0-2])[-/](?:19|20)\d{2})\b")
+_RELATIVE = re.compile(r"\b(this|current|latest|last|previous|past)\s+(month|year)\b")
+# Periods the templates cannot resolve; answering them with the year (or all time) would be wrong
+_UNSUPPORTED_PERIOD = re.compile(
+    r"\b(?:\d+|few|several|couple(?: of)?)\s+(?:days?|weeks?|months?|years?|quarters?)\b|"
+    r"\b(?:day|days|week|weeks|weekend|fortnight|yesterday|today|tonight|quarter\w*|q[1-4]|h[12]|half|"
+    r"since|before|after|until|till|through|upto|ytd)\b|"
+    r"\bso far\b|\bto date\b|\bup to\b"
+)
+# "at Zomato", "on Food": a qualifier the templates can only honour for category totals
+_QUALIFIER = re.compile(r"\b(?:at|on|for|with|from|to)\s+([a-z][a-z&'-]*)")
+_QUALIFIER_OK = {"the", "my", "a", "all", "everything", "things", "stuff", "total", "this", "last", "current",
+                 "latest", "previous", "past", "month", "year", "in"}
+
+
+def quick_answer_mode() -> str:
+    mode = os.getenv("APEX_QUICK_ANSWERS", "template").strip().lower()
+    if mode in ("0", "false", "no", "off"):
+        return "off"
+    return "llm" if mode == "llm" else "template"
+
+
+class QuickQuestion:
+    """A recognized question: its shape and the filters to answer it with"""
+
+    def __init__(self, kind: str, year: Optional[int] = None, month: Optional[int] = None,
+                 top_n: Optional[int] = DEFAULT_TOP_N, category: Optional[str] = None):
+        self.kind = kind
+        self.year = year
+        self.month = month
+        self.top_n = top_n
+        self.category = category
+
+    def __repr__(self) -> str:
+        return (f"QuickQuestion({self.kind}, year={self.year}, month={self.month}, "
+                f"top_n={self.top_n}, category={self.category!r})")
+
+
+def _latest_date() -> Optional[date]:
+    latest = time_coverage().get("max")
+    return date.fromisoformat(latest) if latest else None
+
+
+def _resolve_period(msg: str, extract_year_month: Callable[[str], tuple]) -> Optional[Tuple[Optional[int], Optional[int]]]:
+    """(year, month) the question refers to, or None if it is not a single period"""
+    if _UNSUPPORTED_PERIOD.search(msg):
+        return None
+    parsed = parse_historical_query(msg)
+    if len(set(parsed["years"])) > 1 or parsed["date_range"]:
+        return None
+    year, month = extract_year_month(msg)
+    # A bare number ("top 5 merchants") is not a month
+    if month is not None and not (_MONTH_NAME.search(msg) or _NUMERIC_MONTH.search(msg)):
+        month = None
+
+    relative = _RELATIVE.search(msg)
+    if relative is None:
+        return year, month
+    if year is not None or month is not None:
+        return None
+    latest = _latest_date()
+    if latest is None:
+        return None
+    back = 0 if relative.group(1) in ("this", "current", "latest") else 1
+    if relative.group(2) == "year":
+        return latest.year - back, None
+    index = latest.year * 12 + latest.month - 1 - back
+    return index // 12, index % 12 + 1
+
+
+def _match_category(msg: str) -> Optional[str]:
+    for item in category_stats().get("items", []):
+        name = str(item.get("category", ""))
+        if name and re.search(rf"\b{re.escape(name.lower())}\b", msg):
+            return name
+    return None
+
+
+def match_question(message: str, extract_year_month: Callable[[str], tuple]) -> Optional[QuickQuestion]:
+    """
+    Recognize a numeric spending question
+
+    Args:
+        message: User message
+        extract_year_month: The orchestrator's year/month extractor
+
+    Returns:
+        QuickQuestion, or None when the question needs the full pipeline
+    """
+    msg = " ".join(message.lower().split())
+    if not msg or len(msg.split()) > MAX_WORDS or _DEFER.search(msg):
+        return None
+    kind = next((k for k, pattern in _SHAPES if pattern.search(msg)), None)
+    if kind is None:
+        return None
+    period = _resolve_period(msg, extract_year_month)
+    if period is None:
+        return None
+    year, month = period
+
+    top = _TOP_N.search(msg)
+    top_n = min(int(top.group(1)), MAX_TOP_N) if top else DEFAULT_TOP_N
+    if top_n <= 0:
+        return None
+    if kind == CATEGORIES and not re.search(r"\b(?:top|biggest|largest|highest)\b", msg):
+        top_n = None  # "spending by category" lists them all
+
+    # Only category totals can filter; other qualifiers (a merchant, a category
+    # on a merchant list) would be silently ignored, so defer those questions
+    category = _match_category(msg) if kind == TOTAL else None
+    for word in _QUALIFIER.findall(msg):
+        known = (category and word == category.lower()) or _MONTH_NAME.fullmatch(word)
+        if not known and word not in _QUALIFIER_OK:
+            return None
+    return QuickQuestion(kind, year, month, top_n, category)
+
+
+def _period_label(year: Optional[int], month: Optional[int]) -> str:
+    if year is not None and month is not None:
+        return f"in {calendar.month_name[month]} {year}"
+    if year is not None:
+        return f"in {year}"
+    if month is not None:
+        return f"in {calendar.month_name[month]} (all years)"
+    return "across all your transactions"
+
+
+def _no_data(label: str) -> str:
+    cov = time_coverage()
+    if cov.get("min") and cov.get("max"):
+        return f"I found no spending {label}. Your transactions run from {cov['min']} to {cov['max']}."
+    return f"I found no spending {label}."
+
+
+def _ranked(items: List[Dict[str, Any]], key: str, total: Optional[float] = None) -> List[str]:
+    lines = []
+    for i, item in enumerate(items, 1):
+        line = f"{i}. {item.get(key, 'Unknown')}: {format_currency(item.get('spent', 0.0))}"
+        if total:
+            line += f" ({item.get('spent', 0.0) / total:.0%})"
+        lines.append(line)
+    return lines
+
+
+def compute_answer(q: QuickQuestion) -> Dict[str, Any]:
+    """
+    Figures and templated reply for a recognized question
+
+    Returns:
+        {"answer": text, "data": figures used}
+    """
+    label = _period_label(q.year, q.month)
+    data: Dict[str, Any] = {"kind": q.kind, "year": q.year, "month": q.month}
+
+    if q.kind == TOTAL and q.category:
+        items = category_stats(year=q.year, month=q.month).get("items", [])
+        spent = next((it.get("spent", 0.0) for it in items if it.get("category") == q.category), 0.0)
+        data.update(category=q.category, total=spent)
+        if not spent:
+            return {"answer": _no_data(f"on {q.category} {label}"), "data": data}
+        return {"answer": f"You spent {format_currency(spent)} on {q.category} {label}.", "data": data}
+
+    if q.kind == TOTAL:
+        total = total_spend(year=q.year, month=q.month).get("total", 0.0)
+        data["total"] = total
+        if not total:
+            return {"answer": _no_data(label), "data": data}
+        return {"answer": f"You spent {format_currency(total)} {label}.", "data": data}
+
+    if q.kind == MERCHANTS:
+        result = merchant_stats(year=q.year, month=q.month, top_n=q.top_n)
+        items = result.get("items", [])
+        data["items"] = items
+        if not items:
+            return {"answer": _no_data(label), "data": data}
+        lines = [f"Your top {len(items)} merchants {label}:"] + _ranked(items, "merchant")
+        if result.get("approximate"):
+            data["approximate"] = True
+            lines.append(f"(Approximate: each figure is within {format_currency(result.get('max_error', 0.0))}.)")
+        return {"answer": "\n".join(lines), "data": data}
+
+    if q.kind == CATEGORIES:
+        items = category_stats(year=q.year, month=q.month).get("items", [])
+        total = sum(it.get("spent", 0.0) for it in items)
+        shown = items[:q.top_n] if q.top_n else items
+        data.update(items=shown, total=total)
+        if not items:
+            return {"answer": _no_data(label), "data": data}
+        heading = f"Your top {len(shown)} categories {label}" if len(items) > len(shown) else f"Spending by category {label}"
+        lines = [f"{heading} (total {format_currency(total)}):"] + _ranked(shown, "category", total)
+        return {"answer": "\n".join(lines), "data": data}
+
+    # MONTHLY; a month filter narrows it to that month of each year
+    items = [it for it in monthly_spend(year=q.year).get("items", []) if str(it.get("month", ""))[:4].isdigit()]
+    if q.month is not None:
+        items = [it for it in items if int(str(it["month"])[5:7]) == q.month]
+    data["items"] = items
+    if not items:
+        return {"answer": _no_data(label), "data": data}
+    lines = [f"Monthly spending {label}:"]
+    for it in items:
+        y, m = int(it["month"][:4]), int(it["month"][5:7])
+        lines.append(f"- {calendar.month_abbr[m]} {y}: {format_currency(it.get('spent', 0.0))}")
+    lines.append(f"Total: {format_currency(sum(it.get('spent', 0.0) for it in items))}")
+    return {"answer": "\n".join(lines), "data": data}
+
+
+def _llm_phrasing(message: str, figures: str, llm_client: Any, user_id: Optional[str]) -> str:
+    from llm.prompts import system_advisor_for
+    prompt = (
+        f"{system_advisor_for(user_id)}\n\n"
+        f"FIGURES (exact; do not change or add numbers):\n{figures}\n\n"
+        f"User Question: {message}\n\n"
+        "Answer the question in one or two sentences using only these figures."
+    )
+    return (llm_client.complete(prompt) or "").strip()
+
+
+def quick_answer(message: str, extract_year_month: Callable[[str], tuple], llm_client: Any = None,
+                 user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Chat response for a numeric spending question, or None to use the full pipeline
+
+    Args:
+        message: User message
+        extract_year_month: The orchestrator's year/month extractor
+        llm_client: Used only when APEX_QUICK_ANSWERS=llm
+        user_id: Optional user ID (advisor prompt personalization in llm mode)
+    """
+    mode = quick_answer_mode()
+    if mode == "off":
+        return None
+    q = match_question(message, extract_year_month)
+    if q is None:
+        return None
+    result = compute_answer(q)
+    answer, phrasing = result["answer"], "template"
+    if mode == "llm" and llm_client is not None and stage_allowed("quick_answer.phrasing", "llm", fallback="template"):
+        try:
+            answer = _llm_phrasing(message, result["answer"], llm_client, user_id) or result["answer"]
+            phrasing = "llm"
+        except Exception as e:
+            print(f"Quick answer phrasing failed, using template: {e}")
+            phrasing = "llm_fallback"
+    QUICK_ANSWERS_TOTAL.inc(kind=q.kind, phrasing=phrasing)
+    return {
+        "answer": answer,
+        "status": "success",
+        "type": "quick_answer",
+        "data": {**result["data"], "phrasing": phrasing},
+    }
@@ -0,0 +1,111 @@
+"""
+App-scoped service container.
+
+Routes used to build a fresh PersonalizationEngine (and re-check the MongoDB
+connection) on every request. The container builds each shared service once
+per process, lazily and thread-safely, and routes receive it through
+FastAPI dependency injection:
+
+    @app.get("/personalization/users")
+    @offload(io_pool)
+    def list_users(services: ServiceContainer = Depends(get_services)):
+        return services.personalization_engine().list_users_with_status()
+
+MongoDB access goes through the pooled async service (motor); the API
+lifespan starts it on the event loop and blocking callers get a thin
+synchronous adapter over the same client.
+"""
+import threading
+from typing import Any, Optional
+
+from fastapi import Request
+
+
+class ServiceContainer:
+    """Holds process-wide services; each is built on first use"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._mongodb: Any = None
+        self._personalization_engine = None
+        self._async_mongodb = None
+
+    def async_mongodb(self):
+        """Pooled async MongoDB service (may be disconnected; check is_connected())"""
+        if self._async_mongodb is None:
+            with self._lock:
+                if self._async_mongodb is None:
+                    from database.async_mongodb_service import get_async_mongodb_service
+                    self._async_mongodb = get_async_mongodb_service()
+        return self._async_mongodb
+
+    async def start(self) -> None:
+        """Connect the async MongoDB pool (call once from the API lifespan)"""
+        service = self.async_mongodb()
+        if service.configured:
+            await service.start()
+
+    async def close(self) -> None:
+        if self._async_mongodb is not None:
+            await self._async_mongodb.close()
+
+    def profile_cache(self):
+        """Per-user profile cache shared with RiskAgent and the advisor prompt"""
+        from database.profile_cache import get_profile_cache
+        return get_profile_cache()
+
+    def session_store(self):
+        """Server-side chat sessions shared with the orchestrators"""
+        from database.session_store import get_session_store
+        return get_session_store()
+
+    def mongodb(self) -> Optional[Any]:
+        """Blocking adapter over the async pool while it is connected, else None (checked on every call)"""
+        adapter = self._blocking_mongodb()
+        return adapter if adapter.is_connected() else None
+
+    def _blocking_mongodb(self):
+        if self._mongodb is None:
+            service = self.async_mongodb()
+            with self._lock:
+                if self._mongodb is None:
+                    self._mongodb = service.blocking()
+        return self._mongodb
+
+    def personalization_engine(self):
+        """Shared PersonalizationEngine (directories created once; MongoDB used whenever the pool is connected)"""
+        if self._personalization_engine is None:
+            # The adapter reads the pool's health flag on every is_connected(),
+            # so the engine picks MongoDB up again after a late start or an outage
+            mongodb = self._blocking_mongodb()
+            with self._lock:
+                if self._personalization_engine is None:
+                    from app.tools.personalization import PersonalizationEngine
+                    self._personalization_engine = PersonalizationEngine(mongodb=mongodb)
+        return self._personalization_engine
+
+    def reset(self) -> None:
+        """Drop cached services so they are rebuilt on next use"""
+        with self._lock:
+            self._mongodb = None
+            self._personalization_engine = None
+
+
+_default_container: Optional[ServiceContainer] = None
+_default_container_lock = threading.Lock()
+
+
+def get_service_container() -> ServiceContainer:
+    """Process-wide container for code outside request handlers"""
+    global _default_container
+    if _default_container is None:
+        with _default_container_lock:
+            if _default_container is None:
+                _default_container = ServiceContainer()
+    return _default_container
+
+
+async def get_services(request: Request) -> ServiceContainer:
+    """FastAPI dependency: the container attached to app.state (async, so it never hits a thread pool)"""
+    services = getattr(request.app.state, "services", None)
+    return services if services is not None else get_service_container()
@@ -0,0 +1,206 @@
+"""
+Single-flight request coalescing.
+
+When many clients ask for the same thing at once (a dashboard loading
+/historical/years, /tools/spend_aggregate, ...), only the first caller runs
+the computation; concurrent callers with the same key wait for it and share
+its result or exception (except errors marked ``request_scoped``, such as
+the leader's own deadline or cancellation: followers then run it
+themselves). A follower waits only as long as its own deadline allows and
+raises DeadlineExceeded / RequestCancelled when its budget runs out or its
+request is cancelled, even if the leader is still running. Finished
+results are kept for a short window so a burst that arrives just after
+completion is served without recomputing:
+
+    @coalesce("csv")
+    def spend_aggregate(month=None, group_by="category", csv_path=DATA_PATH): ...
+
+Shared results must be treated as read-only; dict results are shallow-copied
+per caller so adding top-level keys (e.g. "timings") is safe.
+
+Environment overrides:
+  - APEX_COALESCE=0 disables coalescing (every call runs)
+  - APEX_COALESCE_TTL seconds to keep finished results (default 2.0)
+"""
+import functools
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from app.deadline import check, current_deadline
+from app.metrics import Counter
+
+COALESCED_CALLS_TOTAL = Counter(
+    "apex_coalesced_calls_total",
+    "Coalesced calls by group and result (leader ran it, shared an in-flight call, or cached)",
+    ("group", "result"),
+)
+
+
+def coalescing_enabled() -> bool:
+    return os.getenv("APEX_COALESCE", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def _default_ttl() -> float:
+    try:
+        return max(0.0, float(os.getenv("APEX_COALESCE_TTL", 2.0)))
+    except ValueError:
+        return 2.0
+
+
+# How often a waiting follower re-checks its deadline and cancellation
+_WAIT_SLICE = 0.05
+
+
+class _Call:
+    """One in-flight computation that followers wait on"""
+
+    __slots__ = ("done", "result", "error", "finished_at")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.finished_at = 0.0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key.
+
+    Thread-based: tool functions run on the app.concurrency pools, so
+    followers block on an Event rather than awaiting.
+    """
+
+    def __init__(self, name: str, ttl: Optional[float] = None, max_entries: int = 256):
+        self.name = name
+        self.ttl = _default_ttl() if ttl is None else ttl
+        self.max_entries = max_entries
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) once per key among concurrent callers"""
+        if not coalescing_enabled():
+            return fn(*args, **kwargs)
+
+        now = time.monotonic()
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None and call.done.is_set() and (call.error is not None or now - call.finished_at > self.ttl):
+                call = None
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self._prune(now)
+
+        if not leader:
+            result = "cached" if call.done.is_set() else "shared"
+            self._wait(call)
+            COALESCED_CALLS_TOTAL.inc(group=self.name, result=result)
+            if call.error is not None:
+                if getattr(call.error, "request_scoped", False):
+                    return self.do(key, fn, *args, **kwargs)
+                raise call.error
+            return _copy(call.result)
+
+        COALESCED_CALLS_TOTAL.inc(group=self.name, result="leader")
+        try:
+            call.result = fn(*args, **kwargs)
+            return _copy(call.result)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            call.finished_at = time.monotonic()
+            call.done.set()
+            if call.error is not None or self.ttl <= 0:
+                with self._lock:
+                    if self._calls.get(key) is call:
+                        del self._calls[key]
+
+    @staticmethod
+    def _wait(call: _Call) -> None:
+        # Follower: wait for the leader, but within the caller's own deadline
+        # (DeadlineExceeded / RequestCancelled), not the leader's
+        deadline = current_deadline()
+        if deadline is None:
+            call.done.wait()
+            return
+        while not call.done.wait(min(_WAIT_SLICE, deadline.remaining())):
+            check("singleflight")
+
+    def _prune(self, now: float) -> None:
+        # Called with the lock held; drops expired results, then the oldest
+        # finished ones if still over max_entries (in-flight calls are kept)
+        expired = [k for k, c in self._calls.items() if c.done.is_set() and now - c.finished_at > self.ttl]
+        for k in expired:
+            del self._calls[k]
+        if len(self._calls) > self.max_entries:
+            finished = sorted((k for k, c in self._calls.items() if c.done.is_set()),
+                              key=lambda k: self._calls[k].finished_at)
+            for k in finished[:len(self._calls) - self.max_entries]:
+                del self._calls[k]
+
+    def forget(self, key: Optional[Hashable] = None) -> None:
+        """Drop the cached result for key (all finished results if None)"""
+        with self._lock:
+            if key is not None:
+                call = self._calls.get(key)
+                if call is not None and call.done.is_set():
+                    del self._calls[key]
+            else:
+                for k in [k for k, c in self._calls.items() if c.done.is_set()]:
+                    del self._calls[k]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            in_flight = sum(1 for c in self._calls.values() if not c.done.is_set())
+            return {"in_flight": in_flight, "cached": len(self._calls) - in_flight, "ttl_seconds": self.ttl}
+
+
+def _copy(result: Any) -> Any:
+    return dict(result) if isinstance(result, dict) else result
+
+
+def _freeze(value: Any) -> Hashable:
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return repr(value)
+
+
+def call_key(fn: Callable, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Hashable:
+    """Key for fn(*args, **kwargs); positional and keyword spellings differ"""
+    return (fn.__module__, fn.__qualname__, _freeze(args), _freeze(kwargs))
+
+
+_groups: Dict[str, SingleFlight] = {}
+_groups_lock = threading.Lock()
+
+
+def get_group(name: str) -> SingleFlight:
+    """Shared SingleFlight per group name (created on first use)"""
+    group = _groups.get(name)
+    if group is None:
+        with _groups_lock:
+            group = _groups.setdefault(name, SingleFlight(name))
+    return group
+
+
+def coalesce(group: str = "default") -> Callable[[Callable], Callable]:
+    """Decorator: coalesce concurrent identical calls of fn within group"""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return get_group(group).do(call_key(fn, args, kwargs), fn, *args, **kwargs)
+        return wrapper
+    return decorator
+
@@ -0,0 +1,351 @@
+"""
+Columnar cache of transaction CSVs.
+
+Tokenizing CSV text is the main cost of every cold tool call. The first
+reader converts the CSV once into a columnar file in a cache directory next
+to it; later readers, in any worker process, open that file instead:
+
+  - Arrow IPC (when pyarrow is importable): memory-mapped, so tables are
+    zero-copy views over the OS page cache that all workers share. Tables
+    go to DuckDB through ``register`` and to pandas through
+    ``to_pandas(self_destruct=True)``
+  - Parquet (DuckDB only): written once by DuckDB and scanned in place with
+    ``read_parquet``; workers share the file through the page cache
+
+At build time the date column's format is inferred once from a sample (see
+date_formats) and persisted as a typed DATE column, ``__date``; rows are
+sorted by it, so Parquet row-group min/max statistics act as zone maps and
+year/month range filters on ``__date`` skip whole row groups. Mixed-format
+columns also get ``__date_format``, the layout each row was parsed with.
+``register_duckdb(..., internal=True)`` and ``read_frame`` expose these
+columns; the plain relation keeps the CSV's own columns.
+
+Cache files are named by a BLAKE2 checksum of the CSV bytes, so a changed
+file never reads a stale cache. The checksum is only recomputed when the
+file's mtime or size changes, and new cache files are written to a temp
+name and renamed into place, so concurrent workers never see a partial file.
+
+Environment overrides:
+  - APEX_COLUMNAR_CACHE=0 disables the cache (tools parse the CSV directly)
+  - APEX_COLUMNAR_CACHE_DIR: directory for cache files (default .apex_cache next to the CSV)
+  - APEX_COLUMNAR_FORMAT: arrow or parquet (default arrow when pyarrow is importable)
+"""
+import glob
+import hashlib
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+
+from app.metrics import Counter
+from app.tools.date_formats import DATE_COLUMNS, SAMPLE_SIZE, DateFormat, infer_date_format
+
+try:
+    import pyarrow as pa  # type: ignore
+    import pyarrow.csv as pa_csv  # type: ignore
+    _HAS_PYARROW = True
+except ImportError:
+    _HAS_PYARROW = False
+
+try:
+    import duckdb  # type: ignore
+    _HAS_DUCKDB = True
+except Exception:
+    _HAS_DUCKDB = False
+
+COLUMNAR_CACHE_TOTAL = Counter(
+    "apex_columnar_cache_total",
+    "Columnar cache opens by format and result (hit, build, or csv fallback)",
+    ("format", "result"),
+)
+
+CACHE_DIRNAME = ".apex_cache"
+# Bumped when the stored layout changes so older cache files are rebuilt
+STORE_VERSION = 2
+DATE_KEY = "__date"
+DATE_FORMAT_KEY = "__date_format"
+INTERNAL_COLUMNS = (DATE_KEY, DATE_FORMAT_KEY)
+_EXTENSIONS = {"arrow": "arrow", "parquet": "parquet"}
+_READ_BLOCK = 1 << 20
+
+
+def cache_enabled() -> bool:
+    return os.getenv("APEX_COLUMNAR_CACHE", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def cache_format() -> Optional[str]:
+    """Format used for new cache files, None if neither backend is installed"""
+    requested = os.getenv("APEX_COLUMNAR_FORMAT", "").strip().lower()
+    if requested == "parquet" and _HAS_DUCKDB:
+        return "parquet"
+    if _HAS_PYARROW:
+        return "arrow"
+    return "parquet" if _HAS_DUCKDB else None
+
+
+def source_checksum(csv_path: str) -> str:
+    """BLAKE2 digest of the file contents"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(csv_path, "rb") as f:
+        for block in iter(lambda: f.read(_READ_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _sql_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _cache_dir(csv_path: str) -> str:
+    return os.getenv("APEX_COLUMNAR_CACHE_DIR") or os.path.join(os.path.dirname(os.path.abspath(csv_path)), CACHE_DIRNAME)
+
+
+def _cache_stem(csv_path: str) -> str:
+    # File name plus a hash of its location, so a shared cache dir keeps same-named CSVs apart
+    location = hashlib.blake2b(os.path.abspath(csv_path).encode("utf-8"), digest_size=4).hexdigest()
+    return f"{os.path.basename(csv_path)}-{location}"
+
+
+def _quote(column: str) -> str:
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _date_column(columns) -> Optional[str]:
+    return next((c for c in DATE_COLUMNS if c in columns), None)
+
+
+def _normalized_select(con: Any, relation: str) -> str:
+    """SELECT over relation adding the typed date column(s), sorted by date"""
+    types = {row[0]: str(row[1]).upper() for row in con.execute(f"DESCRIBE {relation}").fetchall()}
+    date_col = _date_column(types)
+    if date_col is None:
+        return f"SELECT * FROM {relation}"
+    quoted = _quote(date_col)
+    if types[date_col] == "DATE" or types[date_col].startswith("TIMESTAMP"):
+        fmt = DateFormat((), typed=True)
+    else:
+        sample = con.execute(
+            f"SELECT CAST({quoted} AS VARCHAR) AS v FROM {relation} WHERE {quoted} IS NOT NULL "
+            f"USING SAMPLE reservoir({SAMPLE_SIZE} ROWS) REPEATABLE (42)"
+        ).df()["v"]
+        fmt = infer_date_format(sample)
+    extra = f", {fmt.sql(quoted)} AS {DATE_KEY}"
+    if fmt.mixed:
+        extra += f", {fmt.sql_row_format(quoted)} AS {DATE_FORMAT_KEY}"
+    return f"SELECT *{extra} FROM {relation} ORDER BY {DATE_KEY} NULLS LAST"
+
+
+def _with_date_key(df: pd.DataFrame) -> pd.DataFrame:
+    """pandas equivalent of _normalized_select (without the sort)"""
+    date_col = _date_column(df.columns)
+    if date_col is not None and DATE_KEY not in df.columns:
+        fmt = infer_date_format(df[date_col])
+        df[DATE_KEY] = fmt.parse(df[date_col])
+        if fmt.mixed:
+            df[DATE_FORMAT_KEY] = fmt.row_formats(df[date_col])
+    return df
+
+
+def _build_arrow(csv_path: str, target: str) -> None:
+    table = pa_csv.read_csv(csv_path)
+    date_col = _date_column(table.column_names)
+    if date_col is not None:
+        values = table.column(date_col).to_pandas(date_as_object=False)
+        fmt = infer_date_format(values)
+        dates = fmt.parse(values)
+        table = table.append_column(
+            DATE_KEY, pa.array(dates.to_numpy().astype("datetime64[D]"), type=pa.date32(), mask=dates.isna().to_numpy())
+        )
+        if fmt.mixed:
+            table = table.append_column(DATE_FORMAT_KEY, pa.array(fmt.row_formats(values), type=pa.string()))
+        table = table.sort_by([(DATE_KEY, "ascending")])
+    with pa.OSFile(target, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def _build_parquet(csv_path: str, target: str) -> None:
+    con = duckdb.connect(database=":memory:")
+    try:
+        con.execute(f"CREATE VIEW src AS SELECT * FROM read_csv_auto({_sql_literal(csv_path)}, SAMPLE_SIZE=-1)")
+        con.execute(f"COPY ({_normalized_select(con, 'src')}) TO {_sql_literal(target)} (FORMAT PARQUET)")
+    finally:
+        con.close()
+
+
+_BUILDERS = {"arrow": _build_arrow, "parquet": _build_parquet}
+
+
+class CacheEntry:
+    """Columnar copy of one CSV, valid while the CSV keeps its signature"""
+
+    __slots__ = ("path", "format", "checksum", "signature")
+
+    def __init__(self, path: str, fmt: str, checksum: str, signature: Tuple[float, int]):
+        self.path = path
+        self.format = fmt
+        self.checksum = checksum
+        self.signature = signature
+
+
+_entries: Dict[Tuple[str, str], CacheEntry] = {}
+# Signatures whose build failed; not retried until the CSV changes
+_failed: Dict[Tuple[str, str], Tuple[float, int]] = {}
+_entries_lock = threading.Lock()
+
+
+def _file_signature(csv_path: str) -> Tuple[float, int]:
+    st = os.stat(csv_path)
+    return st.st_mtime, st.st_size
+
+
+def ensure_cache(csv_path: str) -> Optional[CacheEntry]:
+    """
+    Columnar cache for csv_path, built on first use
+
+    Returns:
+        CacheEntry, or None if the cache is disabled, no backend is
+        installed or the cache could not be written (callers read the CSV)
+    """
+    fmt = cache_format() if cache_enabled() else None
+    if fmt is None:
+        return None
+    key = (os.path.abspath(csv_path), fmt)
+    signature = _file_signature(csv_path)
+    entry = _entries.get(key)
+    if entry is not None and entry.signature == signature and os.path.exists(entry.path):
+        COLUMNAR_CACHE_TOTAL.inc(format=fmt, result="hit")
+        return entry
+
+    with _entries_lock:
+        entry = _entries.get(key)
+        if entry is not None and entry.signature == signature and os.path.exists(entry.path):
+            COLUMNAR_CACHE_TOTAL.inc(format=fmt, result="hit")
+            return entry
+        if _failed.get(key) == signature:
+            COLUMNAR_CACHE_TOTAL.inc(format=fmt, result="csv")
+            return None
+        try:
+            checksum = source_checksum(csv_path)
+            directory = _cache_dir(csv_path)
+            stem = _cache_stem(csv_path)
+            target = os.path.join(directory, f"{stem}.{checksum}.v{STORE_VERSION}.{_EXTENSIONS[fmt]}")
+            if os.path.exists(target):
+                # Built by an earlier run or another worker
+                COLUMNAR_CACHE_TOTAL.inc(format=fmt, result="hit")
+            else:
+                os.makedirs(directory, exist_ok=True)
+                tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+                try:
+                    _BUILDERS[fmt](csv_path, tmp)
+                    os.replace(tmp, target)
+                finally:
+                    if os.path.exists(tmp):
+                        os.remove(tmp)
+                COLUMNAR_CACHE_TOTAL.inc(format=fmt, result="build")
+                _remove_stale(directory, stem, keep=target)
+        except Exception as e:
+            print(f"Columnar cache unavailable for {csv_path}, reading CSV: {e}")
+            COLUMNAR_CACHE_TOTAL.inc(format=fmt, result="csv")
+            _failed[key] = signature
+            return None
+        entry = _entries[key] = CacheEntry(target, fmt, checksum, signature)
+    return entry
+
+
+def source_path(csv_path: str) -> str:
+    """File a DuckDB scan of csv_path reads: its current columnar copy if built, else the CSV itself"""
+    fmt = cache_format() if cache_enabled() else None
+    entry = _entries.get((os.path.abspath(csv_path), fmt)) if fmt else None
+    try:
+        if entry is not None and entry.signature == _file_signature(csv_path) and os.path.exists(entry.path):
+            return entry.path
+    except OSError:
+        pass
+    return csv_path
+
+
+def _remove_stale(directory: str, stem: str, keep: str) -> None:
+    # Older versions of the same CSV; a worker still mapping one keeps its pages until it closes
+    for path in glob.glob(os.path.join(glob.escape(directory), glob.escape(stem) + ".*")):
+        if path != keep and not path.endswith(".tmp"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _open_arrow(entry: CacheEntry) -> Any:
+    # Buffers point into the mapping, so no column data is copied
+    with pa.memory_map(entry.path, "r") as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def arrow_table(csv_path: str) -> Optional[Any]:
+    """Memory-mapped, zero-copy pyarrow Table of csv_path (None without an Arrow cache)"""
+    entry = ensure_cache(csv_path)
+    if entry is None or entry.format != "arrow":
+        return None
+    return _open_arrow(entry)
+
+
+def register_duckdb(con: Any, csv_path: str, name: str = "t", internal: bool = False) -> None:
+    """
+    Expose csv_path to a DuckDB connection as relation `name`
+
+    Args:
+        con: DuckDB connection
+        csv_path: Transactions CSV
+        name: Relation name
+        internal: Also expose the typed DATE_KEY (and DATE_FORMAT_KEY) columns
+    """
+    entry = ensure_cache(csv_path)
+    if entry is None:
+        source = f"read_csv_auto({_sql_literal(csv_path)}, SAMPLE_SIZE=20000)"
+        if internal:
+            con.execute(f"CREATE VIEW {name}_src AS SELECT * FROM {source}")
+            con.execute(f"CREATE TABLE {name} AS {_normalized_select(con, name + '_src')}")
+        else:
+            con.execute(f"CREATE TABLE {name} AS SELECT * FROM {source}")
+        return
+
+    if entry.format == "arrow":
+        table = _open_arrow(entry)
+        store, columns = f"{name}_store", table.column_names
+        con.register(store, table)
+    else:
+        store = f"read_parquet({_sql_literal(entry.path)})"
+        columns = [row[0] for row in con.execute(f"DESCRIBE SELECT * FROM {store}").fetchall()]
+    hidden = [c for c in INTERNAL_COLUMNS if c in columns and not internal]
+    projection = f"* EXCLUDE ({', '.join(hidden)})" if hidden else "*"
+    con.execute(f"CREATE VIEW {name} AS SELECT {projection} FROM {store}")
+
+
+def read_frame(csv_path: str) -> pd.DataFrame:
+    """Whole file as a pandas DataFrame plus DATE_KEY, from the columnar cache when available"""
+    entry = ensure_cache(csv_path)
+    if entry is None:
+        return _with_date_key(pd.read_csv(csv_path))
+    if entry.format == "arrow":
+        # self_destruct releases each column's Arrow buffers as it is converted
+        return _open_arrow(entry).to_pandas(self_destruct=True, split_blocks=True, date_as_object=False)
+    con = duckdb.connect(database=":memory:")
+    try:
+        return con.execute(f"SELECT * FROM read_parquet({_sql_literal(entry.path)})").df()
+    finally:
+        con.close()
+
+
+def cache_report() -> Dict[str, Any]:
+    """Cache files known to this process"""
+    with _entries_lock:
+        entries = list(_entries.items())
+    return {
+        "format": cache_format() if cache_enabled() else None,
+        "files": {
+            path: {"format": e.format, "cache_path": e.path, "checksum": e.checksum,
+                   "bytes": os.path.getsize(e.path) if os.path.exists(e.path) else 0}
+            for (path, _), e in entries
+        },
+    }
@@ -2,6 +2,13 @@ import os
 import csv
 from typing import Any, Dict, List, Optional
 import pandas as pd
+from app.deadline import check as check_deadline
+from app.metrics import record_duckdb_scan
+from app.singleflight import coalesce
+from app.tools import columnar_cache
+from app.tools import streaming_agg as streaming
+from app.tools.transactions_frame import AMOUNT_COLUMNS, DATE_COLUMNS, load_transactions, to_rupees
+from app.tracing import traced
 
 try:
 	import duckdb  # type: ignore
@@ -26,11 +33,13 @@ def _ensure_csv_exists(path: str = DATA_PATH) -> None:
 		raise FileNotFoundError(f"CSV not found at {path}")
 
 
+@traced("csv.query_csv")
 def query_csv(sql: str, limit: int = 1000, csv_path: str = DATA_PATH) -> Dict[str, Any]:
 	"""
 	Run safe SELECT over the transactions CSV. If duckdb unavailable, return head().
 	"""
 	_ensure_csv_exists(csv_path)
+	check_deadline("csv.query_csv")
 	limit = int(limit or 1000)
 	if limit <= 0 or limit > 10000:
 		limit = 1000
@@ -44,7 +53,8 @@ def query_csv(sql: str, limit: int = 1000, csv_path: str = DATA_PATH) -> Dict[st
 			if sql.strip().lower().split()[0] != "select":
 				raise ValueError("Only SELECT queries are allowed")
 			# register CSV as table t
-			con.execute(f"CREATE TABLE t AS SELECT * FROM read_csv_auto('{csv_path}', SAMPLE_SIZE=20000)")
+			columnar_cache.register_duckdb(con, csv_path)
+			record_duckdb_scan("query_csv", columnar_cache.source_path(csv_path))
 			q = sql
 			if " limit " not in sql.lower():
 				q = sql.rstrip("; ") + f" LIMIT {limit}"
@@ -62,8 +72,8 @@ def query_csv(sql: str, limit: int = 1000, csv_path: str = DATA_PATH) -> Dict[st
 			except Exception:
 				pass
 
-	# Fallback: no duckdb → return first N rows via pandas
-	df = pd.read_csv(csv_path)
+	# Fallback: no duckdb → return first N rows via pandas (one extra row tells truncation)
+	df = pd.read_csv(csv_path, nrows=limit + 1)
 	rows = df.head(limit).to_dict(orient='records')
 	return {
 		"rows": rows,
@@ -74,21 +84,63 @@ def query_csv(sql: str, limit: int = 1000, csv_path: str = DATA_PATH) -> Dict[st
 	}
 
 
+def _month_rows(month: Optional[str], csv_path: str) -> pd.DataFrame:
+	"""Rows of the cached compact frame, limited to month ("YYYY-MM") when given"""
+	frame = load_transactions(csv_path)
+	if not month:
+		return frame.df
+	if frame.date_col is None:
+		return frame.df.iloc[0:0]
+	period = _parse_month(month)
+	if period is None:
+		return frame.df.iloc[0:0]
+	return frame.month(period.year, period.month)
+
+
+def _parse_month(month: str) -> Optional[pd.Period]:
+	"""Period for a "YYYY-MM" string, None if it is not one"""
+	try:
+		period = pd.Period(month, freq="M")
+	except ValueError:
+		return None
+	return period if str(period) == month else None
+
+
+def _first_present(columns: List[str], candidates: List[str]) -> Optional[str]:
+	return next((c for c in candidates if c in columns), None)
+
+
+def _stream_month(month: Optional[str], csv_path: str, amt_col: str, dims: List[str], topk_dims: List[str] = ()) -> "streaming.ScanResult":
+	"""Bounded-memory scan of csv_path (limited to month when given) for files too large to load"""
+	columns = list(pd.read_csv(csv_path, nrows=0).columns)
+	date_col = _first_present(columns, list(DATE_COLUMNS))
+	if not month:
+		return streaming.scan_transactions(csv_path, amt_col, date_col, dims=dims, topk_dims=topk_dims)
+	period = _parse_month(month)
+	if period is None or date_col is None:
+		return streaming.ScanResult(dims, topk_dims)
+	return streaming.scan_transactions(csv_path, amt_col, date_col, dims=dims, topk_dims=topk_dims,
+		year=period.year, month=period.month)
+
+
+@traced("csv.spend_aggregate")
+@coalesce("csv")
 def spend_aggregate(month: Optional[str] = None, group_by: str = "category", csv_path: str = DATA_PATH) -> Dict[str, Any]:
 	_ensure_csv_exists(csv_path)
-	df = pd.read_csv(csv_path)
-	# normalize columns
-	date_col = None
-	for c in ["ts","date","Date","DATE"]:
-		if c in df.columns:
-			date_col = c
-			break
-	if date_col is None:
-		df["__month"] = None
-	else:
-		df["__month"] = pd.to_datetime(df[date_col], errors='coerce').dt.to_period("M").astype(str)
-	if month:
-		df = df[df["__month"] == month]
+	check_deadline("csv.spend_aggregate")
+	if streaming.use_streaming(csv_path):
+		columns = list(pd.read_csv(csv_path, nrows=0).columns)
+		amt_col = _first_present(columns, ["amount","Amount","AMOUNT","monthly_expense_total"])
+		if amt_col is None:
+			return {"totals": [], "notes": "amount column not found"}
+		key = group_by if group_by in columns else ("category" if "category" in columns else None)
+		if key is None:
+			return {"totals": [], "notes": "group_by column not found"}
+		res = _stream_month(month, csv_path, amt_col, [key])
+		totals = [{"key": k, "spent": round(v, 2)} for k, v in res.groups[key].top()]
+		return {"month": month or "all", "totals": totals, "top": totals[:5]}
+
+	df = _month_rows(month, csv_path)
 
 	amt_col = None
 	for c in ["amount","Amount","AMOUNT","monthly_expense_total"]:
@@ -102,25 +154,43 @@ def spend_aggregate(month: Optional[str] = None, group_by: str = "category", csv
 	if key is None:
 		return {"totals": [], "notes": "group_by column not found"}
 
-	grp = df.groupby(key, dropna=False)[amt_col].sum().reset_index().rename(columns={key: "key", amt_col: "spent"})
-	grp["spent"] = grp["spent"].astype(float).round(2)
+	grp = df.groupby(key, dropna=False, observed=True)[amt_col].sum().reset_index().rename(columns={key: "key", amt_col: "spent"})
+	grp["spent"] = to_rupees(grp["spent"]).round(2)
+	# Keys come back in the source's form (date strings, rupee amounts)
+	if pd.api.types.is_datetime64_any_dtype(grp["key"]):
+		grp["key"] = grp["key"].astype(str)
+	elif key in AMOUNT_COLUMNS and pd.api.types.is_integer_dtype(df[key]):
+		grp["key"] = to_rupees(grp["key"])
 	totals = grp.sort_values("spent", ascending=False).to_dict(orient='records')
 	return {"month": month or "all", "totals": totals, "top": totals[:5]}
 
 
+@traced("csv.top_merchants")
+@coalesce("csv")
 def top_merchants(month: Optional[str] = None, n: int = 10, csv_path: str = DATA_PATH) -> Dict[str, Any]:
 	_ensure_csv_exists(csv_path)
-	df = pd.read_csv(csv_path)
-	# month filter
-	date_col = None
-	for c in ["ts","date","Date","DATE"]:
-		if c in df.columns:
-			date_col = c
-			break
-	if date_col is not None:
-		df["__month"] = pd.to_datetime(df[date_col], errors='coerce').dt.to_period("M").astype(str)
-		if month:
-			df = df[df["__month"] == month]
+	check_deadline("csv.top_merchants")
+	if streaming.use_streaming(csv_path):
+		columns = list(pd.read_csv(csv_path, nrows=0).columns)
+		merchant_col = _first_present(columns, ["merchant","description","narration","Merchant","Description"])
+		amt_col = _first_present(columns, ["amount","Amount","AMOUNT","monthly_expense_total"])
+		if merchant_col is None or amt_col is None:
+			return {"items": [], "notes": "merchant/amount column missing"}
+		# Heavy-hitter sketch keeps memory bounded with many distinct merchants
+		res = _stream_month(month, csv_path, amt_col, [merchant_col], [merchant_col])
+		sketch = res.groups[merchant_col]
+		total_spent = res.total or 1.0
+		items = [
+			{"merchant": k, "spent": round(v, 2), "share": round(v / total_spent, 4)}
+			for k, v in sketch.top(int(n or 10))
+		]
+		out = {"month": month or "all", "items": items}
+		if sketch.approximate:
+			out["approximate"] = True
+			out["max_error"] = round(sketch.max_error, 2)
+		return out
+
+	df = _month_rows(month, csv_path)
 	merchant_col = None
 	for c in ["merchant","description","narration","Merchant","Description"]:
 		if c in df.columns:
@@ -133,8 +203,8 @@ def top_merchants(month: Optional[str] = None, n: int = 10, csv_path: str = DATA
 			break
 	if merchant_col is None or amt_col is None:
 		return {"items": [], "notes": "merchant/amount column missing"}
-	grp = df.groupby(merchant_col, dropna=False)[amt_col].sum().reset_index().rename(columns={merchant_col: "merchant", amt_col: "spent"})
-	grp["spent"] = grp["spent"].astype(float)
+	grp = df.groupby(merchant_col, dropna=False, observed=True)[amt_col].sum().reset_index().rename(columns={merchant_col: "merchant", amt_col: "spent"})
+	grp["spent"] = to_rupees(grp["spent"])
 	total_spent = float(grp["spent"].sum() or 0.0) or 1.0
 	grp["share"] = (grp["spent"] / total_spent).round(4)
 	items = grp.sort_values("spent", ascending=False).head(int(n or 10))
@@ -142,6 +212,8 @@ def top_merchants(month: Optional[str] = None, n: int = 10, csv_path: str = DATA
 	return {"month": month or "all", "items": items.to_dict(orient='records')}
 
 
+@traced("csv.describe_csv")
+@coalesce("csv")
 def describe_csv(csv_path: str = DATA_PATH, sample_rows: int = 20) -> Dict[str, Any]:
 	_ensure_csv_exists(csv_path)
 	df = pd.read_csv(csv_path, nrows=max(1000, sample_rows))
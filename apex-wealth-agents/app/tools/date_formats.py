@@ -0,0 +1,152 @@
+"""
+Date-format inference for transaction date columns.
+
+Exports use one of a handful of layouts (ISO, dd-mm-yyyy, dd/mm/yyyy, ...).
+Rather than trying every layout on every row of every query, a sample of
+the column is checked once against the candidates in priority order:
+
+  - if one format parses the whole sample, every row is parsed with it
+  - otherwise the column is mixed: each row is parsed with the first of the
+    sampled formats that matches it, and ``row_formats`` labels the rows
+
+Rows that none of the chosen formats parse (layouts missing from the
+sample) are retried with the remaining candidates, so nothing the old
+try-everything parsing accepted is lost. The same DateFormat renders the
+equivalent DuckDB expression (``sql``), so the columnar store and the pandas
+paths agree.
+"""
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+DATE_COLUMNS = ("ts", "date", "Date", "DATE", "timestamp")
+
+# Candidates in priority order; ambiguous values (03/04/2022) take the earlier one
+ISO = "ISO8601"
+DATE_FORMATS = (ISO, "%d-%m-%Y", "%d/%m/%Y", "%m/%d/%Y", "%d.%m.%Y")
+SAMPLE_SIZE = 2000
+
+
+def _parse_one(values: pd.Series, fmt: str) -> pd.Series:
+    try:
+        parsed = pd.to_datetime(values, format=fmt, errors="coerce")
+    except (ValueError, TypeError):  # e.g. offsets that differ between rows
+        parsed = pd.to_datetime(values, format=fmt, errors="coerce", utc=True)
+    if getattr(parsed.dt, "tz", None) is not None:
+        parsed = parsed.dt.tz_localize(None)
+    return parsed.astype("datetime64[ns]")
+
+
+def _sql_one(column: str, fmt: str) -> str:
+    text = f"CAST({column} AS VARCHAR)"
+    if fmt == ISO:
+        return f"CAST(TRY_CAST({text} AS TIMESTAMP) AS DATE)"
+    return f"CAST(TRY_STRPTIME({text}, '{fmt}') AS DATE)"
+
+
+def _as_text(values: pd.Series) -> pd.Series:
+    if values.dtype == object or pd.api.types.is_string_dtype(values):
+        return values
+    return values.astype(str).where(values.notna())
+
+
+class DateFormat:
+    """Layout(s) chosen for one date column"""
+
+    def __init__(self, formats: Sequence[str], typed: bool = False):
+        self.formats = tuple(formats)
+        self.typed = typed  # column already holds dates; nothing to parse
+
+    @property
+    def mixed(self) -> bool:
+        return len(self.formats) > 1
+
+    @property
+    def _candidates(self) -> tuple:
+        return self.formats + tuple(f for f in DATE_FORMATS if f not in self.formats)
+
+    def parse(self, values: pd.Series) -> pd.Series:
+        """datetime64[ns] Series; unparseable values become NaT"""
+        if self.typed or pd.api.types.is_datetime64_any_dtype(values):
+            return pd.to_datetime(values, errors="coerce").astype("datetime64[ns]")
+        text = _as_text(values)
+        out = np.full(len(text), np.datetime64("NaT"), dtype="datetime64[ns]")
+        pending = text.notna().to_numpy()
+        for fmt in self._candidates:
+            if not pending.any():
+                break
+            out[pending] = _parse_one(text[pending], fmt).to_numpy()
+            pending &= np.isnat(out)
+        return pd.Series(out, index=values.index, name=values.name)
+
+    def row_formats(self, values: pd.Series) -> pd.Series:
+        """Format that parsed each row (None where no candidate did)"""
+        labels = np.full(len(values), None, dtype=object)
+        if not (self.typed or pd.api.types.is_datetime64_any_dtype(values)):
+            text = _as_text(values)
+            pending = text.notna().to_numpy()
+            for fmt in self._candidates:
+                if not pending.any():
+                    break
+                rows = np.flatnonzero(pending)
+                hit = rows[_parse_one(text[pending], fmt).notna().to_numpy()]
+                labels[hit] = fmt
+                pending[hit] = False
+        return pd.Series(labels, index=values.index, name=values.name)
+
+    def sql(self, column: str) -> str:
+        """DuckDB DATE expression equivalent to parse()"""
+        if self.typed:
+            return f"CAST({column} AS DATE)"
+        parts = [_sql_one(column, fmt) for fmt in self._candidates]
+        return f"COALESCE({', '.join(parts)})"
+
+    def sql_row_format(self, column: str) -> str:
+        """DuckDB expression equivalent to row_formats()"""
+        if self.typed:
+            return "CAST(NULL AS VARCHAR)"
+        cases = " ".join(f"WHEN {_sql_one(column, fmt)} IS NOT NULL THEN '{fmt}'" for fmt in self._candidates)
+        return f"CASE {cases} END"
+
+    def __repr__(self) -> str:
+        kind = "typed" if self.typed else ("mixed" if self.mixed else "single")
+        return f"DateFormat({kind}, {list(self.formats)})"
+
+
+def infer_date_format(values: pd.Series, sample_size: int = SAMPLE_SIZE) -> DateFormat:
+    """
+    Pick the format(s) of a date column from an evenly spaced sample
+
+    Args:
+        values: Raw column (strings, or already-parsed datetimes)
+        sample_size: Non-empty values checked
+
+    Returns:
+        DateFormat with one format, or several (priority order) if the sample is mixed
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return DateFormat((), typed=True)
+    sample = _as_text(values).dropna().astype(str).str.strip()
+    sample = sample[sample != ""].reset_index(drop=True)
+    if len(sample) > sample_size:
+        sample = sample.iloc[np.linspace(0, len(sample) - 1, sample_size).astype(int)]
+    if sample.empty:
+        return DateFormat(DATE_FORMATS[:1])
+
+    parsed = {fmt: _parse_one(sample, fmt).notna() for fmt in DATE_FORMATS}
+    for fmt in DATE_FORMATS:
+        if parsed[fmt].all():
+            return DateFormat((fmt,))
+    # Mixed: the fewest formats (greedy, in priority order) that cover the sample
+    chosen, covered = [], pd.Series(False, index=sample.index)
+    for fmt in DATE_FORMATS:
+        if (parsed[fmt] & ~covered).any():
+            chosen.append(fmt)
+            covered |= parsed[fmt]
+    return DateFormat(chosen or DATE_FORMATS[:1])
+
+
+def parse_dates(values: pd.Series, fmt: Optional[DateFormat] = None) -> pd.Series:
+    """Parse a date column with fmt, inferring it from the column when not given"""
+    return (fmt or infer_date_format(values)).parse(values)
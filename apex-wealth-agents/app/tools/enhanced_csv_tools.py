@@ -2,6 +2,12 @@ import os
 from typing import Any, Dict, List, Optional, Tuple
 
 import pandas as pd
+from app.metrics import record_duckdb_scan
+from app.singleflight import coalesce
+from app.tools import columnar_cache, sql_layer
+from app.tools import streaming_agg as streaming
+from app.tools.date_formats import parse_dates
+from app.tracing import traced
 
 try:
     import duckdb  # type: ignore
@@ -36,47 +42,60 @@ def _merchant_column(df: pd.DataFrame) -> Optional[str]:
     return next((c for c in ["merchant", "description", "narration", "Merchant", "Description"] if c in df.columns), None)
 
 
-def _run_duckdb(sql: str, csv_path: str = DATA_PATH) -> pd.DataFrame:
-    if sql.strip().lower().split()[0] != "select":
-        raise ValueError("Only SELECT queries are allowed")
-    con = duckdb.connect(database=":memory:")
-    try:
-        con.execute(f"CREATE TABLE t AS SELECT * FROM read_csv_auto('{csv_path}', SAMPLE_SIZE=20000)")
-        return con.execute(sql).df()
-    finally:
-        try:
-            con.close()
-        except Exception:
-            pass
+_TOTAL_SPEND = sql_layer.Statement(
+    "total_spend",
+    "SELECT COALESCE(SUM(CAST({amount} AS DOUBLE)), 0) AS total FROM t WHERE {where}",
+)
+_MONTHLY_SPEND = sql_layer.Statement(
+    "monthly_spend",
+    "SELECT STRFTIME({date}, '%Y-%m') AS month, SUM(CAST({amount} AS DOUBLE)) AS spent "
+    "FROM t WHERE {where} GROUP BY 1 ORDER BY 1",
+)
+_DAILY_SPEND = sql_layer.Statement(
+    "daily_spend",
+    "SELECT STRFTIME({date}, '%Y-%m-%d') AS day, SUM(CAST({amount} AS DOUBLE)) AS spent "
+    "FROM t WHERE {where} GROUP BY 1 ORDER BY 1",
+)
+_CATEGORY_STATS = sql_layer.Statement(
+    "category_stats",
+    "SELECT {category} AS category, SUM(CAST({amount} AS DOUBLE)) AS spent "
+    "FROM t WHERE {where} GROUP BY 1 ORDER BY spent DESC",
+)
+_MERCHANT_STATS = sql_layer.Statement(
+    "merchant_stats",
+    "SELECT {merchant} AS merchant, SUM(CAST({amount} AS DOUBLE)) AS spent "
+    "FROM t WHERE {where} GROUP BY 1 ORDER BY spent DESC LIMIT ?",
+)
+_RECENT_ROWS = sql_layer.Statement(
+    "recent_rows",
+    "SELECT {columns} FROM t WHERE {where} ORDER BY {date} NULLS LAST, {columns} NULLS LAST LIMIT ?",
+)
+
+
+@traced("duckdb.query")
+def _run_duckdb(statement: sql_layer.Statement, csv_path: str = DATA_PATH, params: Tuple = (),
+                where: str = "TRUE", **identifiers: sql_layer.Identifier) -> pd.DataFrame:
+    df = sql_layer.run(statement, csv_path, params, where, **identifiers)
+    # After the run: the first query builds the columnar cache it reads
+    record_duckdb_scan("run_duckdb", columnar_cache.source_path(csv_path))
+    return df
 
 
-def _ym_filter_clause(year: Optional[int], month: Optional[int], date_expr: str = "d") -> str:
-    clauses: List[str] = []
-    if year is not None:
-        clauses.append(f"YEAR({date_expr}) = {int(year)}")
-    if month is not None:
-        clauses.append(f"MONTH({date_expr}) = {int(month)}")
-    return (" AND ".join(clauses)) or "TRUE"
-
-
-def _normalize_date_sql(date_col: str) -> str:
-    """DuckDB-safe conversion of a raw string column to DATE, with fallback parsing."""
-    # TRY_CAST handles already-date-like strings; strptime is robust for dd/mm/yy variants
-    return (
-        f"COALESCE(TRY_CAST({date_col} AS DATE), "
-        f"TRY_STRPTIME(CAST({date_col} AS VARCHAR), '%Y-%m-%d'), "
-        f"TRY_STRPTIME(CAST({date_col} AS VARCHAR), '%d-%m-%Y'), "
-        f"TRY_STRPTIME(CAST({date_col} AS VARCHAR), '%d/%m/%Y'), "
-        f"TRY_STRPTIME(CAST({date_col} AS VARCHAR), '%m/%d/%Y'), "
-        f"TRY_STRPTIME(CAST({date_col} AS VARCHAR), '%d.%m.%Y')"  # extra common format
-        ")"
-    )
+def _date_filter(year: Optional[int], month: Optional[int], date_col: Optional[str]) -> Tuple[str, List[Any]]:
+    """Bound year/month filter on the store's typed date column ("TRUE" without a date column)"""
+    if not date_col:
+        return "TRUE", []
+    return sql_layer.date_filter(year, month)
 
 
 def _pandas_date_series(df: pd.DataFrame, date_col: str) -> pd.Series:
-    return pd.to_datetime(df[date_col], errors="coerce", infer_datetime_format=True)
+    if columnar_cache.DATE_KEY in df.columns:
+        return df[columnar_cache.DATE_KEY]
+    return parse_dates(df[date_col])
 
 
+@traced("csv.total_spend")
+@coalesce("csv")
 def total_spend(year: Optional[int] = None, month: Optional[int] = None, csv_path: str = DATA_PATH) -> Dict[str, Any]:
     """Return total amount spent for optional year and/or month filters."""
     _ensure_csv_exists(csv_path)
@@ -85,18 +104,18 @@ def total_spend(year: Optional[int] = None, month: Optional[int] = None, csv_pat
         date_col, amount_col, _ = _detect_columns(df_head)
         if not amount_col:
             return {"total": 0.0, "notes": "amount column not found"}
-        d_expr = _normalize_date_sql(date_col) if date_col else "NULL"
-        where = _ym_filter_clause(year, month, date_expr="d") if date_col else "TRUE"
-        sql = f"""
-            WITH s AS (
-                SELECT {d_expr} AS d, CAST({amount_col} AS DOUBLE) AS amt FROM t
-            )
-            SELECT COALESCE(SUM(amt), 0) AS total FROM s WHERE {where}
-        """
-        df = _run_duckdb(sql, csv_path)
+        where, params = _date_filter(year, month, date_col)
+        df = _run_duckdb(_TOTAL_SPEND, csv_path, params, where, amount=amount_col)
         return {"year": year, "month": month, "total": round(float(df.iloc[0]["total"] or 0.0), 2)}
 
-    df = pd.read_csv(csv_path)
+    if streaming.use_streaming(csv_path):
+        date_col, amount_col, _ = _detect_columns(pd.read_csv(csv_path, nrows=1000))
+        if not amount_col:
+            return {"total": 0.0, "notes": "amount column not found"}
+        res = streaming.scan_transactions(csv_path, amount_col, date_col, year=year, month=month)
+        return {"year": year, "month": month, "total": round(res.total, 2)}
+
+    df = columnar_cache.read_frame(csv_path)
     date_col, amount_col, _ = _detect_columns(df)
     if not amount_col:
         return {"total": 0.0, "notes": "amount column not found"}
@@ -110,6 +129,8 @@ def total_spend(year: Optional[int] = None, month: Optional[int] = None, csv_pat
     return {"year": year, "month": month, "total": round(total_val, 2)}
 
 
+@traced("csv.monthly_spend")
+@coalesce("csv")
 def monthly_spend(year: Optional[int] = None, csv_path: str = DATA_PATH) -> Dict[str, Any]:
     """Return spend aggregated by month. If year provided, filter to that year."""
     _ensure_csv_exists(csv_path)
@@ -118,23 +139,22 @@ def monthly_spend(year: Optional[int] = None, csv_path: str = DATA_PATH) -> Dict
         date_col, amount_col, _ = _detect_columns(df_head)
         if not (date_col and amount_col):
             return {"items": [], "notes": "date/amount columns not found"}
-        d_expr = _normalize_date_sql(date_col)
-        where = _ym_filter_clause(year, None, date_expr="d") if year is not None else "TRUE"
-        sql = f"""
-            WITH s AS (
-                SELECT DATE_TRUNC('month', {d_expr}) AS m, CAST({amount_col} AS DOUBLE) AS amt FROM t
-            )
-            SELECT CAST(m AS DATE) AS month, SUM(amt) AS spent
-            FROM s
-            WHERE {where}
-            GROUP BY 1
-            ORDER BY 1
-        """
-        df = _run_duckdb(sql, csv_path)
+        where, params = _date_filter(year, None, date_col)
+        df = _run_duckdb(_MONTHLY_SPEND, csv_path, params, where,
+                         date=columnar_cache.DATE_KEY, amount=amount_col)
         items = [{"month": str(r["month"]), "spent": round(float(r["spent"] or 0.0), 2)} for _, r in df.iterrows()]
         return {"year": year, "items": items}
 
-    df = pd.read_csv(csv_path)
+    if streaming.use_streaming(csv_path):
+        date_col, amount_col, _ = _detect_columns(pd.read_csv(csv_path, nrows=1000))
+        if not (date_col and amount_col):
+            return {"items": [], "notes": "date/amount columns not found"}
+        res = streaming.scan_transactions(csv_path, amount_col, date_col, dims=[streaming.MONTH], year=year)
+        totals = res.groups[streaming.MONTH].rupees()
+        items = [{"month": m, "spent": round(totals[m], 2)} for m in sorted(totals)]
+        return {"year": year, "items": items}
+
+    df = columnar_cache.read_frame(csv_path)
     date_col, amount_col, _ = _detect_columns(df)
     if not (date_col and amount_col):
         return {"items": [], "notes": "date/amount columns not found"}
@@ -153,6 +173,8 @@ def monthly_spend(year: Optional[int] = None, csv_path: str = DATA_PATH) -> Dict
     return {"year": year, "items": items}
 
 
+@traced("csv.daily_spend")
+@coalesce("csv")
 def daily_spend(year: Optional[int] = None, month: Optional[int] = None, csv_path: str = DATA_PATH) -> Dict[str, Any]:
     """Return spend aggregated by day with optional year/month filters."""
     _ensure_csv_exists(csv_path)
@@ -161,23 +183,22 @@ def daily_spend(year: Optional[int] = None, month: Optional[int] = None, csv_pat
         date_col, amount_col, _ = _detect_columns(df_head)
         if not (date_col and amount_col):
             return {"items": [], "notes": "date/amount columns not found"}
-        d_expr = _normalize_date_sql(date_col)
-        where = _ym_filter_clause(year, month, date_expr="d")
-        sql = f"""
-            WITH s AS (
-                SELECT {d_expr} AS d, CAST({amount_col} AS DOUBLE) AS amt FROM t
-            )
-            SELECT CAST(d AS DATE) AS day, SUM(amt) AS spent
-            FROM s
-            WHERE {where}
-            GROUP BY 1
-            ORDER BY 1
-        """
-        df = _run_duckdb(sql, csv_path)
+        where, params = _date_filter(year, month, date_col)
+        df = _run_duckdb(_DAILY_SPEND, csv_path, params, where,
+                         date=columnar_cache.DATE_KEY, amount=amount_col)
         items = [{"day": str(r["day"]), "spent": round(float(r["spent"] or 0.0), 2)} for _, r in df.iterrows()]
         return {"year": year, "month": month, "items": items}
 
-    df = pd.read_csv(csv_path)
+    if streaming.use_streaming(csv_path):
+        date_col, amount_col, _ = _detect_columns(pd.read_csv(csv_path, nrows=1000))
+        if not (date_col and amount_col):
+            return {"items": [], "notes": "date/amount columns not found"}
+        res = streaming.scan_transactions(csv_path, amount_col, date_col, dims=[streaming.DAY], year=year, month=month)
+        totals = res.groups[streaming.DAY].rupees()
+        items = [{"day": d, "spent": round(totals[d], 2)} for d in sorted(totals)]
+        return {"year": year, "month": month, "items": items}
+
+    df = columnar_cache.read_frame(csv_path)
     date_col, amount_col, _ = _detect_columns(df)
     if not (date_col and amount_col):
         return {"items": [], "notes": "date/amount columns not found"}
@@ -199,6 +220,8 @@ def daily_spend(year: Optional[int] = None, month: Optional[int] = None, csv_pat
     return {"year": year, "month": month, "items": items}
 
 
+@traced("csv.category_stats")
+@coalesce("csv")
 def category_stats(year: Optional[int] = None, month: Optional[int] = None, csv_path: str = DATA_PATH) -> Dict[str, Any]:
     """Return sum by category with optional year/month filters."""
     _ensure_csv_exists(csv_path)
@@ -207,23 +230,21 @@ def category_stats(year: Optional[int] = None, month: Optional[int] = None, csv_
         date_col, amount_col, category_col = _detect_columns(df_head)
         if not (amount_col and category_col):
             return {"items": [], "notes": "amount/category columns not found"}
-        d_expr = _normalize_date_sql(date_col) if date_col else "NULL"
-        where = _ym_filter_clause(year, month, date_expr="d") if date_col else "TRUE"
-        sql = f"""
-            WITH s AS (
-                SELECT {d_expr} AS d, CAST({amount_col} AS DOUBLE) AS amt, {category_col} AS category FROM t
-            )
-            SELECT category, SUM(amt) AS spent
-            FROM s
-            WHERE {where}
-            GROUP BY 1
-            ORDER BY spent DESC
-        """
-        df = _run_duckdb(sql, csv_path)
+        where, params = _date_filter(year, month, date_col)
+        df = _run_duckdb(_CATEGORY_STATS, csv_path, params, where,
+                         category=category_col, amount=amount_col)
         items = [{"category": str(r["category"]), "spent": round(float(r["spent"] or 0.0), 2)} for _, r in df.iterrows()]
         return {"year": year, "month": month, "items": items}
 
-    df = pd.read_csv(csv_path)
+    if streaming.use_streaming(csv_path):
+        date_col, amount_col, category_col = _detect_columns(pd.read_csv(csv_path, nrows=1000))
+        if not (amount_col and category_col):
+            return {"items": [], "notes": "amount/category columns not found"}
+        res = streaming.scan_transactions(csv_path, amount_col, date_col, dims=[category_col], year=year, month=month)
+        items = [{"category": str(k), "spent": round(v, 2)} for k, v in res.groups[category_col].top()]
+        return {"year": year, "month": month, "items": items}
+
+    df = columnar_cache.read_frame(csv_path)
     date_col, amount_col, category_col = _detect_columns(df)
     if not (amount_col and category_col):
         return {"items": [], "notes": "amount/category columns not found"}
@@ -239,6 +260,8 @@ def category_stats(year: Optional[int] = None, month: Optional[int] = None, csv_
     return {"year": year, "month": month, "items": items}
 
 
+@traced("csv.merchant_stats")
+@coalesce("csv")
 def merchant_stats(year: Optional[int] = None, month: Optional[int] = None, top_n: int = 10, csv_path: str = DATA_PATH) -> Dict[str, Any]:
     """Return top merchants by spend with optional filters."""
     _ensure_csv_exists(csv_path)
@@ -248,24 +271,29 @@ def merchant_stats(year: Optional[int] = None, month: Optional[int] = None, top_
         merchant_col = _merchant_column(df_head)
         if not (merchant_col and amount_col):
             return {"items": [], "notes": "merchant/amount columns not found"}
-        d_expr = _normalize_date_sql(date_col) if date_col else "NULL"
-        where = _ym_filter_clause(year, month, date_expr="d") if date_col else "TRUE"
-        sql = f"""
-            WITH s AS (
-                SELECT {d_expr} AS d, CAST({amount_col} AS DOUBLE) AS amt, {merchant_col} AS merchant FROM t
-            )
-            SELECT merchant, SUM(amt) AS spent
-            FROM s
-            WHERE {where}
-            GROUP BY 1
-            ORDER BY spent DESC
-            LIMIT {int(top_n or 10)}
-        """
-        df = _run_duckdb(sql, csv_path)
+        where, params = _date_filter(year, month, date_col)
+        df = _run_duckdb(_MERCHANT_STATS, csv_path, [*params, int(top_n or 10)], where,
+                         merchant=merchant_col, amount=amount_col)
         items = [{"merchant": str(r["merchant"]), "spent": round(float(r["spent"] or 0.0), 2)} for _, r in df.iterrows()]
         return {"year": year, "month": month, "items": items}
 
-    df = pd.read_csv(csv_path)
+    if streaming.use_streaming(csv_path):
+        df_head = pd.read_csv(csv_path, nrows=1000)
+        date_col, amount_col, _ = _detect_columns(df_head)
+        merchant_col = _merchant_column(df_head)
+        if not (merchant_col and amount_col):
+            return {"items": [], "notes": "merchant/amount columns not found"}
+        res = streaming.scan_transactions(csv_path, amount_col, date_col, dims=[merchant_col],
+                                          topk_dims=[merchant_col], year=year, month=month)
+        sketch = res.groups[merchant_col]
+        items = [{"merchant": str(k), "spent": round(v, 2)} for k, v in sketch.top(int(top_n or 10))]
+        out = {"year": year, "month": month, "items": items}
+        if sketch.approximate:
+            out["approximate"] = True
+            out["max_error"] = round(sketch.max_error, 2)
+        return out
+
+    df = columnar_cache.read_frame(csv_path)
     date_col, amount_col, _ = _detect_columns(df)
     merchant_col = _merchant_column(df)
     if not (merchant_col and amount_col):
@@ -282,9 +310,62 @@ def merchant_stats(year: Optional[int] = None, month: Optional[int] = None, top_
     return {"year": year, "month": month, "items": items}
 
 
+@traced("csv.recent_rows")
+@coalesce("csv")
+def recent_rows(year: Optional[int] = None, month: Optional[int] = None,
+                columns: Tuple[str, ...] = ("date", "monthly_expense_total", "monthly_income"),
+                limit: int = 5000, csv_path: str = DATA_PATH) -> Dict[str, Any]:
+    """Return rows in date order with optional year/month filters (query_csv result shape)."""
+    _ensure_csv_exists(csv_path)
+    limit = int(limit or 1000)
+    if _HAS_DUCKDB:
+        df_head = pd.read_csv(csv_path, nrows=1000)
+        date_col, _, _ = _detect_columns(df_head)
+        if not date_col:
+            return {"rows": [], "columns": [], "row_count": 0, "truncated": False, "notes": "date column not found"}
+        selected = [c for c in columns if c in df_head.columns]
+        where, params = _date_filter(year, month, date_col)
+        # One extra row tells truncation
+        df = _run_duckdb(_RECENT_ROWS, csv_path, [*params, limit + 1], where,
+                         columns=selected, date=columnar_cache.DATE_KEY)
+    else:
+        df = columnar_cache.read_frame(csv_path)
+        date_col, _, _ = _detect_columns(df)
+        if not date_col:
+            return {"rows": [], "columns": [], "row_count": 0, "truncated": False, "notes": "date column not found"}
+        selected = [c for c in columns if c in df.columns]
+        ds = _pandas_date_series(df, date_col)
+        mask = pd.Series(True, index=df.index)
+        if year is not None:
+            mask &= ds.dt.year == int(year)
+        if month is not None:
+            mask &= ds.dt.month == int(month)
+        # Same order as the SQL statement: date, then the selected columns
+        df = (df.loc[mask, selected].assign(__order=ds[mask])
+                .sort_values(["__order", *selected], na_position="last", kind="stable")
+                .head(limit + 1)[selected])
+    rows = df.head(limit).to_dict(orient="records")
+    return {
+        "rows": rows,
+        "columns": selected,
+        "row_count": len(rows),
+        "truncated": len(df) > len(rows),
+    }
+
+
+@traced("csv.time_coverage")
+@coalesce("csv")
 def time_coverage(csv_path: str = DATA_PATH) -> Dict[str, Any]:
     """Return min/max dates found in the dataset."""
     _ensure_csv_exists(csv_path)
+    if streaming.use_streaming(csv_path):
+        date_col, amount_col, _ = _detect_columns(pd.read_csv(csv_path, nrows=1000))
+        if not date_col:
+            return {"min": None, "max": None}
+        res = streaming.scan_transactions(csv_path, amount_col, date_col)
+        if res.min_date is None:
+            return {"min": None, "max": None}
+        return {"min": str(res.min_date.date()), "max": str(res.max_date.date())}
     df = pd.read_csv(csv_path, nrows=50000)
     date_col, _, _ = _detect_columns(df)
     if not date_col:
@@ -301,6 +382,7 @@ __all__ = [
     "daily_spend",
     "category_stats",
     "merchant_stats",
+    "recent_rows",
     "time_coverage",
 ]
 
@@ -310,6 +392,8 @@ from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
 import re
 
+from app.tools.transactions_frame import TransactionFrame, load_transactions, to_rupees
+
 # Resolve CSV path relative to the repo root (apex-wealth-agents)
 _BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
 _DATA_PATH = os.path.join(_BASE_DIR, "data", "transactions.csv")
@@ -319,61 +403,90 @@ def _ensure_csv_exists(path: str = _DATA_PATH) -> None:
     if not os.path.exists(path):
         raise FileNotFoundError(f"CSV not found at {path}")
 
+def _load_frame(csv_path: str = _DATA_PATH) -> TransactionFrame:
+    """Compact, date-sorted frame shared across calls (cached until the file changes)"""
+    _ensure_csv_exists(csv_path)
+    return load_transactions(csv_path)
+
 def _load_data(csv_path: str = _DATA_PATH) -> pd.DataFrame:
-    """Load and preprocess the transaction data"""
+    """Load and preprocess the transaction data (amounts in the compact dtype, see to_rupees)"""
+    return _load_frame(csv_path).df
+
+def _spend_by(df: pd.DataFrame, key: str, amount_col: str = 'monthly_expense_total') -> pd.DataFrame:
+    """Sum amount_col per key as a two-column frame, in rupees"""
+    out = df.groupby(key, observed=True)[amount_col].sum().reset_index()
+    out[amount_col] = to_rupees(out[amount_col])
+    return out
+
+def _stream_period(csv_path: str, dims: List[str], **window) -> "streaming.ScanResult":
+    """Bounded-memory pass over a date window for files too large to load (see streaming_agg)"""
     _ensure_csv_exists(csv_path)
-    df = pd.read_csv(csv_path)
-    
-    # Convert date column to datetime
-    if 'date' in df.columns:
-        df['date'] = pd.to_datetime(df['date'], errors='coerce')
-    
-    # Ensure amount columns are numeric
-    amount_columns = ['monthly_expense_total', 'amount', 'Amount', 'AMOUNT']
-    for col in amount_columns:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-    
-    return df
+    return streaming.scan_transactions(
+        csv_path, 'monthly_expense_total', 'date', dims=dims,
+        topk_dims=[d for d in dims if d == 'merchant'], **window
+    )
+
+def _stream_records(res: "streaming.ScanResult", dim: str, key: str, n: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Per-key spend from a scan, largest first, shaped like _spend_by records"""
+    return [{key: k, 'monthly_expense_total': v} for k, v in res.groups[dim].top(n)]
 
+@traced("csv.extract_year_data")
+@coalesce("csv")
 def extract_year_data(year: int, csv_path: str = _DATA_PATH) -> Dict[str, Any]:
     """Extract all data for a specific year"""
     try:
-        df = _load_data(csv_path)
-        
-        # Filter by year
-        year_data = df[df['date'].dt.year == year].copy()
-        
-        if year_data.empty:
+        empty = {
+            "year": year,
+            "total_transactions": 0,
+            "total_spent": 0,
+            "categories": [],
+            "monthly_breakdown": [],
+            "top_merchants": [],
+            "data_available": False
+        }
+        if streaming.use_streaming(csv_path):
+            res = _stream_period(csv_path, ['category', streaming.MONTH_NUM, 'merchant'], year=year)
+            if res.rows == 0:
+                return empty
+            monthly = sorted(res.groups[streaming.MONTH_NUM].rupees().items())
             return {
                 "year": year,
-                "total_transactions": 0,
-                "total_spent": 0,
-                "categories": [],
-                "monthly_breakdown": [],
-                "top_merchants": [],
-                "data_available": False
+                "total_transactions": res.rows,
+                "total_spent": res.total,
+                "categories": _stream_records(res, 'category', 'category'),
+                "monthly_breakdown": [
+                    {"month": m, "monthly_expense_total": v, "month_name": datetime(2000, m, 1).strftime('%B')}
+                    for m, v in monthly
+                ],
+                "top_merchants": _stream_records(res, 'merchant', 'merchant', 10),
+                "data_available": True
             }
+
+        # Year partition of the cached frame
+        year_data = _load_frame(csv_path).year(year).copy()
+        
+        if year_data.empty:
+            return empty
         
         # Calculate totals
-        total_spent = year_data['monthly_expense_total'].sum()
+        total_spent = to_rupees(year_data['monthly_expense_total'].sum())
         total_transactions = len(year_data)
         
         # Category breakdown
-        category_breakdown = year_data.groupby('category')['monthly_expense_total'].sum().reset_index()
+        category_breakdown = _spend_by(year_data, 'category')
         category_breakdown = category_breakdown.sort_values('monthly_expense_total', ascending=False)
         categories = category_breakdown.to_dict('records')
         
         # Monthly breakdown
         year_data['month'] = year_data['date'].dt.month
-        monthly_breakdown = year_data.groupby('month')['monthly_expense_total'].sum().reset_index()
+        monthly_breakdown = _spend_by(year_data, 'month')
         monthly_breakdown['month_name'] = monthly_breakdown['month'].apply(lambda x: datetime(2000, x, 1).strftime('%B'))
         monthly_data = monthly_breakdown.to_dict('records')
         
         # Top merchants (if merchant column exists)
         top_merchants = []
         if 'merchant' in year_data.columns:
-            merchant_breakdown = year_data.groupby('merchant')['monthly_expense_total'].sum().reset_index()
+            merchant_breakdown = _spend_by(year_data, 'merchant')
             merchant_breakdown = merchant_breakdown.sort_values('monthly_expense_total', ascending=False).head(10)
             top_merchants = merchant_breakdown.to_dict('records')
         
@@ -394,37 +507,56 @@ def extract_year_data(year: int, csv_path: str = _DATA_PATH) -> Dict[str, Any]:
             "data_available": False
         }
 
+@traced("csv.extract_year_range_data")
+@coalesce("csv")
 def extract_year_range_data(start_year: int, end_year: int, csv_path: str = _DATA_PATH) -> Dict[str, Any]:
     """Extract data for a range of years"""
     try:
-        df = _load_data(csv_path)
-        
-        # Filter by year range
-        range_data = df[(df['date'].dt.year >= start_year) & (df['date'].dt.year <= end_year)].copy()
-        
-        if range_data.empty:
+        empty = {
+            "start_year": start_year,
+            "end_year": end_year,
+            "total_transactions": 0,
+            "total_spent": 0,
+            "yearly_breakdown": [],
+            "categories": [],
+            "data_available": False
+        }
+        start, end = pd.Timestamp(start_year, 1, 1), pd.Timestamp(end_year + 1, 1, 1)
+        if streaming.use_streaming(csv_path):
+            res = _stream_period(csv_path, [streaming.YEAR, 'category'], start=start, end=end)
+            if res.rows == 0:
+                return empty
             return {
                 "start_year": start_year,
                 "end_year": end_year,
-                "total_transactions": 0,
-                "total_spent": 0,
-                "yearly_breakdown": [],
-                "categories": [],
-                "data_available": False
+                "total_transactions": res.rows,
+                "total_spent": res.total,
+                "yearly_breakdown": [
+                    {"year": y, "monthly_expense_total": v}
+                    for y, v in sorted(res.groups[streaming.YEAR].rupees().items())
+                ],
+                "categories": _stream_records(res, 'category', 'category'),
+                "data_available": True
             }
+
+        # Filter by year range (index slice)
+        range_data = _load_frame(csv_path).between(start, end).copy()
+        
+        if range_data.empty:
+            return empty
         
         # Calculate totals
-        total_spent = range_data['monthly_expense_total'].sum()
+        total_spent = to_rupees(range_data['monthly_expense_total'].sum())
         total_transactions = len(range_data)
         
         # Yearly breakdown
         range_data['year'] = range_data['date'].dt.year
-        yearly_breakdown = range_data.groupby('year')['monthly_expense_total'].sum().reset_index()
+        yearly_breakdown = _spend_by(range_data, 'year')
         yearly_breakdown = yearly_breakdown.sort_values('year')
         yearly_data = yearly_breakdown.to_dict('records')
         
         # Category breakdown
-        category_breakdown = range_data.groupby('category')['monthly_expense_total'].sum().reset_index()
+        category_breakdown = _spend_by(range_data, 'category')
         category_breakdown = category_breakdown.sort_values('monthly_expense_total', ascending=False)
         categories = category_breakdown.to_dict('records')
         
@@ -446,31 +578,44 @@ def extract_year_range_data(start_year: int, end_year: int, csv_path: str = _DAT
             "data_available": False
         }
 
+@traced("csv.extract_month_data")
+@coalesce("csv")
 def extract_month_data(year: int, month: int, csv_path: str = _DATA_PATH) -> Dict[str, Any]:
     """Extract data for a specific month"""
     try:
-        df = _load_data(csv_path)
-        
-        # Filter by year and month
-        month_data = df[(df['date'].dt.year == year) & (df['date'].dt.month == month)].copy()
-        
-        if month_data.empty:
+        empty = {
+            "year": year,
+            "month": month,
+            "month_name": datetime(year, month, 1).strftime('%B'),
+            "total_transactions": 0,
+            "total_spent": 0,
+            "categories": [],
+            "data_available": False
+        }
+        if streaming.use_streaming(csv_path):
+            res = _stream_period(csv_path, ['category'], year=year, month=month)
+            if res.rows == 0:
+                return empty
             return {
-                "year": year,
-                "month": month,
-                "month_name": datetime(year, month, 1).strftime('%B'),
-                "total_transactions": 0,
-                "total_spent": 0,
-                "categories": [],
-                "data_available": False
+                **empty,
+                "total_transactions": res.rows,
+                "total_spent": res.total,
+                "categories": _stream_records(res, 'category', 'category'),
+                "data_available": True
             }
+
+        # Filter by year and month (index slice)
+        month_data = _load_frame(csv_path).month(year, month).copy()
+        
+        if month_data.empty:
+            return empty
         
         # Calculate totals
-        total_spent = month_data['monthly_expense_total'].sum()
+        total_spent = to_rupees(month_data['monthly_expense_total'].sum())
         total_transactions = len(month_data)
         
         # Category breakdown
-        category_breakdown = month_data.groupby('category')['monthly_expense_total'].sum().reset_index()
+        category_breakdown = _spend_by(month_data, 'category')
         category_breakdown = category_breakdown.sort_values('monthly_expense_total', ascending=False)
         categories = category_breakdown.to_dict('records')
         
@@ -493,34 +638,46 @@ def extract_month_data(year: int, month: int, csv_path: str = _DATA_PATH) -> Dic
             "data_available": False
         }
 
+@traced("csv.extract_date_range_data")
+@coalesce("csv")
 def extract_date_range_data(start_date: str, end_date: str, csv_path: str = _DATA_PATH) -> Dict[str, Any]:
     """Extract data for a specific date range (format: YYYY-MM-DD)"""
     try:
-        df = _load_data(csv_path)
-        
         # Convert date strings to datetime
         start_dt = pd.to_datetime(start_date)
         end_dt = pd.to_datetime(end_date)
+        empty = {
+            "start_date": start_date,
+            "end_date": end_date,
+            "total_transactions": 0,
+            "total_spent": 0,
+            "categories": [],
+            "data_available": False
+        }
+        if streaming.use_streaming(csv_path):
+            res = _stream_period(csv_path, ['category'], start=start_dt, end=end_dt, inclusive_end=True)
+            if res.rows == 0:
+                return empty
+            return {
+                **empty,
+                "total_transactions": res.rows,
+                "total_spent": res.total,
+                "categories": _stream_records(res, 'category', 'category'),
+                "data_available": True
+            }
         
-        # Filter by date range
-        range_data = df[(df['date'] >= start_dt) & (df['date'] <= end_dt)].copy()
+        # Filter by date range (index slice, end inclusive)
+        range_data = _load_frame(csv_path).between(start_dt, end_dt, inclusive_end=True).copy()
         
         if range_data.empty:
-            return {
-                "start_date": start_date,
-                "end_date": end_date,
-                "total_transactions": 0,
-                "total_spent": 0,
-                "categories": [],
-                "data_available": False
-            }
+            return empty
         
         # Calculate totals
-        total_spent = range_data['monthly_expense_total'].sum()
+        total_spent = to_rupees(range_data['monthly_expense_total'].sum())
         total_transactions = len(range_data)
         
         # Category breakdown
-        category_breakdown = range_data.groupby('category')['monthly_expense_total'].sum().reset_index()
+        category_breakdown = _spend_by(range_data, 'category')
         category_breakdown = category_breakdown.sort_values('monthly_expense_total', ascending=False)
         categories = category_breakdown.to_dict('records')
         
@@ -577,11 +734,16 @@ def parse_historical_query(query: str) -> Dict[str, Any]:
         "query_type": "year" if years else "month" if months else "date_range" if date_range else "general"
     }
 
+@traced("csv.get_available_years")
+@coalesce("csv")
 def get_available_years(csv_path: str = _DATA_PATH) -> List[int]:
     """Get list of available years in the dataset"""
     try:
-        df = _load_data(csv_path)
-        years = sorted(df['date'].dt.year.dropna().unique().tolist())
+        if streaming.use_streaming(csv_path):
+            _ensure_csv_exists(csv_path)
+            res = streaming.scan_transactions(csv_path, None, 'date', dims=[streaming.YEAR])
+            return sorted(int(y) for y in res.groups[streaming.YEAR].sums if pd.notna(y))
+        years = _load_frame(csv_path).years()
         return years
     except Exception as e:
         return []
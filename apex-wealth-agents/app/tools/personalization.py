@@ -12,6 +12,8 @@ import joblib
 from datetime import datetime
 import json
 
+from app.tools.transactions_frame import read_transactions
+
 # Try to import MongoDB service (optional)
 try:
     import sys
@@ -28,12 +30,14 @@ class PersonalizationEngine:
     Handles user-specific model training and personalization
     """
     
-    def __init__(self, base_dir: Optional[str] = None):
+    def __init__(self, base_dir: Optional[str] = None, mongodb: Any = None):
         """
         Initialize Personalization Engine
         
         Args:
             base_dir: Base directory for storing user models (default: state/models/users/)
+            mongodb: MongoDB service to reuse; used whenever its is_connected() is true
+                (checked on each call, skips the legacy connection check)
         """
         if base_dir is None:
             # Get base directory relative to this file
@@ -48,8 +52,8 @@ class PersonalizationEngine:
         os.makedirs(self.user_data_dir, exist_ok=True)
         
         # Initialize MongoDB service if available
-        self.mongodb = None
-        if MONGODB_AVAILABLE:
+        self.mongodb = mongodb
+        if self.mongodb is None and MONGODB_AVAILABLE:
             try:
                 self.mongodb = get_mongodb_service()
                 if not self.mongodb.is_connected():
@@ -176,8 +180,8 @@ class PersonalizationEngine:
             import shutil
             shutil.copy2(csv_path, user_csv_path)
             
-            # Load and process data
-            df = pd.read_csv(user_csv_path)
+            # Load and process data (compact dtypes; amounts stay float64 rupees)
+            df = read_transactions(user_csv_path, amount_dtype="float64")
             date_col = validation["date_column"]
             amount_col = validation["amount_column"]
             category_col = validation.get("category_column")
@@ -197,7 +201,7 @@ class PersonalizationEngine:
             # Category breakdown if available
             categories = {}
             if category_col:
-                category_breakdown = df.groupby(category_col)[amount_col].sum().to_dict()
+                category_breakdown = df.groupby(category_col, observed=True)[amount_col].sum().to_dict()
                 categories = {str(k): float(v) for k, v in category_breakdown.items()}
             
             # Save metadata
@@ -280,7 +284,8 @@ class PersonalizationEngine:
         # Category encoding if available
         if category_col and category_col in df.columns:
             # One-hot encode top categories
-            top_categories = df[category_col].value_counts().head(10).index.tolist()
+            counts = df[category_col].value_counts()
+            top_categories = counts[counts > 0].head(10).index.tolist()
             for cat in top_categories:
                 features[f'category_{cat}'] = (df[category_col] == cat).astype(int)
         
@@ -361,7 +366,7 @@ class PersonalizationEngine:
                 }
             
             # Load user data
-            df = pd.read_csv(user_csv_path)
+            df = read_transactions(user_csv_path, amount_dtype="float64")
             
             # Load metadata to get column names
             metadata_path = os.path.join(user_dir, "metadata.json")
@@ -558,4 +563,107 @@ class PersonalizationEngine:
                 users.append(item)
         
         return users
-
+    
+    def _scan_user_index(self) -> Dict[str, Dict[str, bool]]:
+        """
+        Build a directory index of users in one pass
+        
+        Uses one scandir of the user data directory (plus one per user directory)
+        and one scandir of the model directory, instead of separate stat calls
+        per user and per file.
+        
+        Returns:
+            Dict of user_id -> {has_data, has_metadata_file, has_model}
+        """
+        index: Dict[str, Dict[str, bool]] = {}
+        if not os.path.isdir(self.user_data_dir):
+            return index
+        
+        model_suffix = "_model.pkl"
+        models = set()
+        if os.path.isdir(self.base_dir):
+            with os.scandir(self.base_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith(model_suffix) and entry.is_file():
+                        models.add(entry.name[:-len(model_suffix)])
+        
+        with os.scandir(self.user_data_dir) as entries:
+            for entry in entries:
+                if not entry.is_dir():
+                    continue
+                with os.scandir(entry.path) as user_entries:
+                    files = {e.name for e in user_entries}
+                if "transactions.csv" not in files:
+                    continue
+                index[entry.name] = {
+                    "has_data": True,
+                    "has_metadata_file": "metadata.json" in files,
+                    "has_model": entry.name in models
+                }
+        return index
+    
+    def get_users_metadata(
+        self,
+        user_ids: List[str],
+        index: Optional[Dict[str, Dict[str, bool]]] = None
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Bulk version of get_user_metadata
+        
+        Fetches metadata for all users with a single MongoDB query when the
+        service supports it, then fills gaps from metadata.json files.
+        
+        Args:
+            user_ids: User identifiers to look up
+            index: Optional directory index from _scan_user_index
+            
+        Returns:
+            Dict of user_id -> metadata (None if not found)
+        """
+        found: Dict[str, Optional[Dict[str, Any]]] = {}
+        if self.mongodb and self.mongodb.is_connected() and user_ids:
+            bulk = getattr(self.mongodb, "get_users_csv_metadata", None)
+            try:
+                if bulk is not None:
+                    found.update(bulk(user_ids) or {})
+                else:
+                    for user_id in user_ids:
+                        found[user_id] = self.mongodb.get_user_csv_metadata(user_id)
+            except Exception as e:
+                print(f"Bulk metadata lookup failed, using file-based metadata: {e}")
+        
+        for user_id in user_ids:
+            if found.get(user_id):
+                continue
+            found[user_id] = None
+            if index is not None and not index.get(user_id, {}).get("has_metadata_file"):
+                continue
+            metadata_path = os.path.join(self.user_data_dir, user_id, "metadata.json")
+            try:
+                with open(metadata_path, 'r') as f:
+                    found[user_id] = json.load(f)
+            except (OSError, ValueError):
+                pass
+        return found
+    
+    def list_users_with_status(self) -> List[Dict[str, Any]]:
+        """
+        List all users with model and metadata status
+        
+        Answers from one directory index plus one bulk metadata lookup,
+        rather than per-user metadata queries and model path checks.
+        
+        Returns:
+            List of {user_id, has_model, metadata}
+        """
+        index = self._scan_user_index()
+        user_ids = sorted(index)
+        metadata = self.get_users_metadata(user_ids, index=index)
+        return [
+            {
+                "user_id": user_id,
+                "has_model": index[user_id]["has_model"],
+                "metadata": metadata.get(user_id)
+            }
+            for user_id in user_ids
+        ]
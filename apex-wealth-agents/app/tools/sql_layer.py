@@ -0,0 +1,216 @@
+"""
+Parameterized queries over the transaction store.
+
+The CSV tools used to build SQL with f-strings (values spliced into the
+text) and open a fresh DuckDB connection, re-registering the store, on
+every call. Here:
+
+  - statements are named templates; values such as date bounds, month
+    numbers and limits are ``?`` placeholders bound at execution
+  - column names, which cannot be bound, are checked against the store's
+    schema and quoted
+  - year/month filters are half-open ranges on the typed ``__date`` column
+    (see columnar_cache), which DuckDB prunes with row-group statistics
+  - each worker thread keeps one connection per store version, with the
+    store registered once and rendered statements cached on it
+
+DuckDB's Python API prepares on each ``execute`` (there is no reusable
+prepared-statement handle); planning these statements takes well under a
+millisecond, whereas connection setup and store registration cost tens, so
+the connection is what is cached.
+
+Environment overrides:
+  - APEX_SQL_PERSISTENT=0 opens a one-off connection per query
+"""
+import os
+import threading
+import time
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+
+from app.deadline import check as check_deadline
+from app.metrics import SQL_CONNECTIONS_TOTAL, SQL_QUERY_SECONDS
+from app.tools import columnar_cache
+from app.tracing import span
+
+try:
+    import duckdb  # type: ignore
+    _HAS_DUCKDB = True
+except Exception:
+    _HAS_DUCKDB = False
+
+RELATION = "t"
+
+Identifier = Union[str, Sequence[str]]
+
+
+def persistent_enabled() -> bool:
+    return os.getenv("APEX_SQL_PERSISTENT", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def quote_identifier(name: str, columns: Sequence[str]) -> str:
+    """Quoted column name; raises ValueError for names the store does not have"""
+    if name not in columns:
+        raise ValueError(f"Unknown column: {name}")
+    return '"' + name.replace('"', '""') + '"'
+
+
+def month_bounds(year: int, month: Optional[int] = None) -> Tuple[date, date]:
+    """[start, end) dates of a year, or of one month of it"""
+    if month is None:
+        return date(int(year), 1, 1), date(int(year) + 1, 1, 1)
+    start = date(int(year), int(month), 1)
+    return start, date(start.year + start.month // 12, start.month % 12 + 1, 1)
+
+
+def date_filter(year: Optional[int], month: Optional[int],
+                column: str = columnar_cache.DATE_KEY) -> Tuple[str, List[Any]]:
+    """
+    WHERE clause and parameters for optional year/month filters
+
+    Returns:
+        (clause, params): a range on column when the year is known, a
+        month-number test for a month alone, "TRUE" otherwise
+    """
+    if year is None:
+        if month is None:
+            return "TRUE", []
+        return f"MONTH({column}) = ?", [int(month)]
+    start, end = month_bounds(year, month)
+    return f"{column} >= ? AND {column} < ?", [start, end]
+
+
+class Statement:
+    """
+    Named SQL template over relation ``t``
+
+    ``{slot}`` fields take a column name, or a sequence of them rendered as
+    a select list (validated and quoted), except ``{where}``, which takes a
+    clause from date_filter; every value is a ``?`` placeholder.
+    """
+
+    def __init__(self, name: str, template: str):
+        self.name = name
+        self.template = template
+
+    def render(self, schema: Sequence[str], where: str = "TRUE", **identifiers: Identifier) -> str:
+        quoted = {}
+        for slot, col in identifiers.items():
+            names = [col] if isinstance(col, str) else list(col)
+            quoted[slot] = ", ".join(quote_identifier(n, schema) for n in names)
+        return self.template.format(where=where, **quoted)
+
+
+class StoreConnection:
+    """DuckDB connection with the store registered as ``t`` and rendered statements cached"""
+
+    def __init__(self, csv_path: str, token: Optional[str]):
+        self.token = token
+        self.con = duckdb.connect(database=":memory:")
+        columnar_cache.register_duckdb(self.con, csv_path, RELATION, internal=True)
+        self.columns = [row[0] for row in self.con.execute(f"DESCRIBE {RELATION}").fetchall()]
+        self._rendered: Dict[Tuple, str] = {}
+        self.executions = 0
+
+    def sql(self, statement: Statement, where: str, identifiers: Dict[str, Identifier]) -> str:
+        slots = tuple(sorted((k, v if isinstance(v, str) else tuple(v)) for k, v in identifiers.items()))
+        key = (statement.name, statement.template, where, slots)
+        text = self._rendered.get(key)
+        if text is None:
+            text = self._rendered[key] = statement.render(self.columns, where, **identifiers)
+        return text
+
+    def execute(self, statement: Statement, params: Sequence[Any] = (), where: str = "TRUE",
+                **identifiers: Identifier) -> pd.DataFrame:
+        text = self.sql(statement, where, identifiers)
+        self.executions += 1
+        return self.con.execute(text, list(params)).df()
+
+    def close(self) -> None:
+        try:
+            self.con.close()
+        except Exception:
+            pass
+
+
+_local = threading.local()
+
+
+def _thread_connections() -> Dict[str, StoreConnection]:
+    conns = getattr(_local, "connections", None)
+    if conns is None:
+        conns = _local.connections = {}
+    return conns
+
+
+def connection(csv_path: str) -> Tuple[StoreConnection, bool]:
+    """
+    Connection for csv_path and whether it is persistent
+
+    Persistent connections are per thread (DuckDB connections are not
+    shared across threads) and replaced when the store is rebuilt. Without
+    a columnar store the data would be materialized per connection, so a
+    one-off connection is returned and the caller closes it.
+    """
+    entry = columnar_cache.ensure_cache(csv_path)
+    if entry is None or not persistent_enabled():
+        SQL_CONNECTIONS_TOTAL.inc(kind="oneoff")
+        return StoreConnection(csv_path, None), False
+    conns = _thread_connections()
+    key = os.path.abspath(csv_path)
+    conn = conns.get(key)
+    if conn is None or conn.token != entry.path:
+        if conn is not None:
+            conn.close()
+        conn = conns[key] = StoreConnection(csv_path, entry.path)
+        SQL_CONNECTIONS_TOTAL.inc(kind="persistent")
+    return conn, True
+
+
+def columns(csv_path: str) -> List[str]:
+    """Columns of the store relation (including the internal date columns)"""
+    conn, persistent = connection(csv_path)
+    try:
+        return list(conn.columns)
+    finally:
+        if not persistent:
+            conn.close()
+
+
+def run(statement: Statement, csv_path: str, params: Sequence[Any] = (), where: str = "TRUE",
+        **identifiers: Identifier) -> pd.DataFrame:
+    """
+    Execute statement against csv_path's store
+
+    Args:
+        statement: Statement to run
+        csv_path: Transactions CSV
+        params: Values for the ``?`` placeholders, in order
+        where: Clause from date_filter (its params come first in params)
+        **identifiers: Column names for the template's slots
+
+    Returns:
+        Result as a DataFrame
+    """
+    if not _HAS_DUCKDB:
+        raise RuntimeError("duckdb is not installed")
+    check_deadline("sql." + statement.name)
+    start = time.perf_counter()
+    with span("sql." + statement.name):
+        conn, persistent = connection(csv_path)
+        try:
+            return conn.execute(statement, params, where, **identifiers)
+        finally:
+            if not persistent:
+                conn.close()
+            SQL_QUERY_SECONDS.observe(time.perf_counter() - start, statement=statement.name)
+
+
+def close_thread_connections() -> None:
+    """Close this thread's persistent connections"""
+    conns = _thread_connections()
+    for conn in conns.values():
+        conn.close()
+    conns.clear()
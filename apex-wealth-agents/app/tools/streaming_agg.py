@@ -0,0 +1,304 @@
+"""
+Out-of-core aggregation over transaction CSVs.
+
+For files too large to load (and no DuckDB), the CSV is read in fixed-size
+chunks and each chunk is reduced to mergeable partial aggregates:
+
+  - GroupTotals: exact per-key spend (paise) and row counts
+  - TopKSketch: weighted Misra-Gries heavy hitters for high-cardinality keys
+    such as merchants; exact while the distinct keys fit its capacity and
+    within a reported error bound otherwise
+
+so memory is bounded by the chunk size plus the number of groups, not by
+the file. ``scan_transactions`` runs one pass and returns a ScanResult that
+the tool functions format like their in-memory counterparts.
+
+Environment overrides:
+  - APEX_STREAMING: auto (default; stream files >= APEX_STREAMING_MIN_MB), 1 or 0
+  - APEX_STREAMING_MIN_MB: size threshold for auto mode (default 1024)
+  - APEX_STREAMING_CHUNK_ROWS: rows per chunk (default 250000)
+  - APEX_TOPK_CAPACITY: counters kept by top-k sketches (default 10000)
+"""
+import os
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from app.tools.date_formats import DateFormat, infer_date_format
+from app.tools.transactions_frame import AMOUNT_COLUMNS, PAISE_PER_RUPEE, encode_amounts
+
+try:
+    import pyarrow.csv as pa_csv  # type: ignore
+    _HAS_PYARROW = True
+except ImportError:
+    _HAS_PYARROW = False
+
+DEFAULT_CHUNK_ROWS = 250_000
+DEFAULT_TOPK_CAPACITY = 10_000
+
+# Derived grouping keys (anything else is a column name)
+YEAR, MONTH, MONTH_NUM, DAY = "__year", "__month", "__month_num", "__day"
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name, default)))
+    except ValueError:
+        return default
+
+
+def use_streaming(csv_path: str) -> bool:
+    """Whether aggregates over csv_path should stream instead of loading the file"""
+    mode = os.getenv("APEX_STREAMING", "auto").strip().lower()
+    if mode in ("1", "true", "yes", "on"):
+        return True
+    if mode in ("0", "false", "no", "off"):
+        return False
+    try:
+        return os.path.getsize(csv_path) >= _env_int("APEX_STREAMING_MIN_MB", 1024) * 1024 * 1024
+    except OSError:
+        return False
+
+
+class GroupTotals:
+    """Exact spend (paise) and row count per key; merge() combines partials"""
+
+    def __init__(self):
+        self.sums: Dict[Hashable, int] = {}
+        self.counts: Dict[Hashable, int] = {}
+
+    def update(self, sums: Dict[Hashable, int], counts: Dict[Hashable, int]) -> None:
+        for key, value in sums.items():
+            self.sums[key] = self.sums.get(key, 0) + int(value)
+        for key, value in counts.items():
+            self.counts[key] = self.counts.get(key, 0) + int(value)
+
+    def merge(self, other: "GroupTotals") -> "GroupTotals":
+        self.update(other.sums, other.counts)
+        return self
+
+    def rupees(self) -> Dict[Hashable, float]:
+        return {k: v / PAISE_PER_RUPEE for k, v in self.sums.items()}
+
+    def top(self, n: Optional[int] = None) -> List[Tuple[Hashable, float]]:
+        """(key, rupees) by spend, largest first"""
+        items = sorted(self.rupees().items(), key=lambda kv: kv[1], reverse=True)
+        return items if n is None else items[:n]
+
+
+class TopKSketch:
+    """
+    Weighted Misra-Gries summary of spend per key (paise).
+
+    Keeps at most ``capacity`` counters. When a merge overflows, the
+    (capacity+1)-th largest weight is subtracted from every counter and
+    non-positive ones are dropped; each reported sum then undercounts by at
+    most ``error`` (exact while error == 0). Weights are assumed
+    non-negative (spends, not refunds).
+    """
+
+    def __init__(self, capacity: Optional[int] = None):
+        self.capacity = capacity or _env_int("APEX_TOPK_CAPACITY", DEFAULT_TOPK_CAPACITY)
+        self.counters: Dict[Hashable, int] = {}
+        self.error = 0
+
+    def update(self, sums: Dict[Hashable, int], counts: Optional[Dict[Hashable, int]] = None) -> None:
+        for key, value in sums.items():
+            self.counters[key] = self.counters.get(key, 0) + int(value)
+        self._compress()
+
+    def merge(self, other: "TopKSketch") -> "TopKSketch":
+        self.error += other.error
+        self.update(other.counters)
+        return self
+
+    def _compress(self) -> None:
+        if len(self.counters) <= self.capacity:
+            return
+        weights = sorted(self.counters.values(), reverse=True)
+        cut = weights[self.capacity]
+        self.counters = {k: v - cut for k, v in self.counters.items() if v > cut}
+        self.error += cut
+
+    @property
+    def approximate(self) -> bool:
+        return self.error > 0
+
+    @property
+    def max_error(self) -> float:
+        """Largest possible undercount of any reported sum, in rupees"""
+        return self.error / PAISE_PER_RUPEE
+
+    def top(self, n: Optional[int] = None) -> List[Tuple[Hashable, float]]:
+        items = sorted(self.counters.items(), key=lambda kv: kv[1], reverse=True)
+        items = items if n is None else items[:n]
+        return [(k, v / PAISE_PER_RUPEE) for k, v in items]
+
+
+class ScanResult:
+    """Mergeable result of one pass: totals, date coverage and per-dimension groups"""
+
+    def __init__(self, dims: Sequence[str], topk_dims: Sequence[str] = (), capacity: Optional[int] = None):
+        self.total_paise = 0
+        self.rows = 0
+        self.min_date: Optional[pd.Timestamp] = None
+        self.max_date: Optional[pd.Timestamp] = None
+        self.chunks = 0
+        self.groups: Dict[str, Any] = {
+            d: TopKSketch(capacity) if d in topk_dims else GroupTotals() for d in dims
+        }
+
+    @property
+    def total(self) -> float:
+        return self.total_paise / PAISE_PER_RUPEE
+
+    def merge(self, other: "ScanResult") -> "ScanResult":
+        self.total_paise += other.total_paise
+        self.rows += other.rows
+        self.chunks += other.chunks
+        for bound in (other.min_date, other.max_date):
+            if bound is not None:
+                self.min_date = bound if self.min_date is None else min(self.min_date, bound)
+                self.max_date = bound if self.max_date is None else max(self.max_date, bound)
+        for dim, group in other.groups.items():
+            self.groups[dim].merge(group)
+        return self
+
+
+def iter_chunks(csv_path: str, usecols: Optional[Iterable[str]] = None, numeric: Iterable[str] = (),
+                chunk_rows: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """
+    Yield the CSV in chunks of at most chunk_rows rows
+
+    Columns in ``numeric`` are parsed as float64 (unparseable values become
+    NaN); all others are read as strings.
+    """
+    chunk_rows = chunk_rows or _env_int("APEX_STREAMING_CHUNK_ROWS", DEFAULT_CHUNK_ROWS)
+    names = list(usecols) if usecols is not None else list(pd.read_csv(csv_path, nrows=0).columns)
+    numeric = set(numeric)
+    if _HAS_PYARROW:
+        # Streaming reader: one record batch (~block_size bytes) at a time
+        reader = pa_csv.open_csv(
+            csv_path,
+            read_options=pa_csv.ReadOptions(block_size=max(1 << 20, chunk_rows * 64)),
+            convert_options=pa_csv.ConvertOptions(
+                # Typed as strings so a stray value cannot break type inference mid-file
+                include_columns=names, column_types={c: "string" for c in names}, strings_can_be_null=True,
+            ),
+        )
+        for batch in reader:
+            chunk = batch.to_pandas()
+            for col in numeric & set(chunk.columns):
+                chunk[col] = pd.to_numeric(chunk[col], errors="coerce").astype("float64")
+            yield chunk
+        return
+    dtypes = {c: str for c in names if c not in numeric}
+    for chunk in pd.read_csv(csv_path, usecols=names, dtype=dtypes, chunksize=chunk_rows, low_memory=False):
+        for col in numeric & set(chunk.columns):
+            # Stray text in an amount column becomes NaN; whole numbers stay float64 too
+            chunk[col] = pd.to_numeric(chunk[col], errors="coerce").astype("float64")
+        yield chunk
+
+
+def _group_keys(chunk: pd.DataFrame, dim: str, dates: Optional[pd.Series]) -> Optional[pd.Series]:
+    if dim in (YEAR, MONTH, MONTH_NUM, DAY):
+        if dates is None:
+            return None
+        if dim == YEAR:
+            return dates.dt.year
+        if dim == MONTH_NUM:
+            return dates.dt.month
+        if dim == MONTH:
+            return dates.dt.to_period("M").astype(str)
+        return dates.dt.date.astype(str)
+    return chunk[dim] if dim in chunk.columns else None
+
+
+def _missing_as_none(values: Dict[Hashable, int]) -> Dict[Hashable, int]:
+    # NaN keys of different chunks are distinct dict keys; None merges
+    return {(None if isinstance(k, float) and k != k else k): v for k, v in values.items()}
+
+
+def scan_transactions(
+    csv_path: str,
+    amount_col: Optional[str],
+    date_col: Optional[str] = None,
+    dims: Sequence[str] = (),
+    topk_dims: Sequence[str] = (),
+    year: Optional[int] = None,
+    month: Optional[int] = None,
+    start: Optional[pd.Timestamp] = None,
+    end: Optional[pd.Timestamp] = None,
+    inclusive_end: bool = False,
+    capacity: Optional[int] = None,
+    chunk_rows: Optional[int] = None,
+) -> ScanResult:
+    """
+    One bounded-memory pass over csv_path
+
+    Args:
+        csv_path: Transactions CSV
+        amount_col: Column summed (missing/non-numeric amounts count as 0; None: rows only)
+        date_col: Date column used for filters and date dimensions
+        dims: Grouping keys: column names or YEAR/MONTH/MONTH_NUM/DAY (amount columns
+            group by their float value, blank keys by None)
+        topk_dims: Subset of dims summarized with a TopKSketch
+        year, month: Keep rows whose date has this year / month number
+        start, end: Keep rows with start <= date < end (<= if inclusive_end)
+        capacity: Counters per top-k sketch
+
+    Returns:
+        ScanResult (undated rows are only counted when no date filter is set)
+    """
+    filtered = any(v is not None for v in (year, month, start, end))
+    columns = {*[d for d in dims if d not in (YEAR, MONTH, MONTH_NUM, DAY)]}
+    if amount_col:
+        columns.add(amount_col)
+    if date_col:
+        columns.add(date_col)
+    header = set(pd.read_csv(csv_path, nrows=0).columns)
+    usecols = [c for c in columns if c in header]
+
+    result = ScanResult(dims, topk_dims, capacity)
+    date_format: Optional[DateFormat] = None  # inferred from the first chunk, reused after
+    # Amount columns used as dimensions are numeric too, so keys match the in-memory path
+    # (e.g. group_by="monthly_income" gives 80000.0, not "80000")
+    numeric = [c for c in usecols if c == amount_col or c in AMOUNT_COLUMNS]
+    for chunk in iter_chunks(csv_path, usecols=usecols, numeric=numeric, chunk_rows=chunk_rows):
+        part = ScanResult(dims, topk_dims, capacity)
+        part.chunks = 1
+        dates = None
+        if date_col and date_col in chunk.columns:
+            date_format = date_format or infer_date_format(chunk[date_col])
+            dates = date_format.parse(chunk[date_col])
+        if filtered:
+            if dates is None:
+                continue
+            mask = dates.notna()
+            if year is not None:
+                mask &= dates.dt.year == int(year)
+            if month is not None:
+                mask &= dates.dt.month == int(month)
+            if start is not None:
+                mask &= dates >= start
+            if end is not None:
+                mask &= (dates <= end) if inclusive_end else (dates < end)
+            chunk, dates = chunk[mask], dates[mask]
+        if chunk.empty:
+            continue
+
+        paise = encode_amounts(chunk[amount_col], "paise") if amount_col in chunk.columns \
+            else pd.Series(0, index=chunk.index, dtype="int64")
+        part.total_paise = int(paise.sum())
+        part.rows = len(chunk)
+        if dates is not None and dates.notna().any():
+            part.min_date, part.max_date = dates.min(), dates.max()
+        for dim in dims:
+            keys = _group_keys(chunk, dim, dates)
+            if keys is None:
+                continue
+            grouped = paise.groupby(keys.values, dropna=False)
+            part.groups[dim].update(_missing_as_none(grouped.sum().to_dict()),
+                                    _missing_as_none(grouped.size().to_dict()))
+        result.merge(part)
+    return result
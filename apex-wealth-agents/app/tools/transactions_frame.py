@@ -0,0 +1,264 @@
+"""
+Compact in-memory representation of transaction CSVs.
+
+Shared loader for csv_tools, enhanced_csv_tools and personalization. A plain
+``pd.read_csv`` keeps labels as Python string objects and amounts as
+float64; here the frame is narrowed to:
+
+  - date columns as datetime64
+  - amount columns as int64 paise (exact sums) or float32; profile columns
+    (monthly_income, budget_goal) as nullable Int64 paise, so a blank cell
+    stays missing instead of reading as a zero income or goal
+  - low-cardinality text (category, merchant, ...) as categoricals; frames
+    cached by ``load_transactions`` take their labels from one shared string
+    pool, so frames of different files share the same label objects (labels
+    only used by a replaced frame are dropped from it), while one-off reads
+    (e.g. personalization uploads) use a pool of their own
+
+Amounts in paise are converted back with ``to_rupees`` after aggregating.
+``load_transactions`` caches the compact frame per path until the file's
+mtime or size changes; the cached frame is sorted by date so year/month
+filters are index slices and the CSV is parsed through the columnar cache.
+
+Environment overrides:
+  - APEX_AMOUNT_DTYPE: paise (default), float32 or float64
+"""
+import os
+import sys
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from app.tools import columnar_cache
+from app.tools.date_formats import DATE_COLUMNS, parse_dates
+
+AMOUNT_COLUMNS = ("amount", "Amount", "AMOUNT", "monthly_expense_total", "expense", "monthly_income", "budget_goal")
+AMOUNT_DTYPES = ("paise", "float32", "float64")
+# Blank means "not recorded" rather than zero; kept as <NA> in paise mode
+NULLABLE_AMOUNT_COLUMNS = ("monthly_income", "budget_goal")
+PAISE_PER_RUPEE = 100
+
+# Text columns with at most this share of distinct values become categoricals
+LABEL_CARDINALITY_RATIO = 0.5
+
+
+def default_amount_dtype() -> str:
+    value = os.getenv("APEX_AMOUNT_DTYPE", "paise").strip().lower()
+    return value if value in AMOUNT_DTYPES else "paise"
+
+
+class StringPool:
+    """Dictionary of label strings (one object per distinct value)"""
+
+    def __init__(self):
+        self._values: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def intern(self, values: Iterable[Any]) -> list:
+        with self._lock:
+            return [self._values.setdefault(v, v) for v in values]
+
+    def encode(self, series: pd.Series) -> pd.Series:
+        """Dictionary-encode a text column as a categorical backed by the pool"""
+        encoded = series.astype("category")
+        return encoded.cat.rename_categories(self.intern(encoded.cat.categories))
+
+    def retain(self, values: Iterable[Any]) -> None:
+        """Drop every label not in values"""
+        keep = set(values)
+        with self._lock:
+            self._values = {k: v for k, v in self._values.items() if k in keep}
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def nbytes(self) -> int:
+        with self._lock:
+            return sum(sys.getsizeof(v) for v in self._values.values())
+
+
+# Shared by the frames in load_transactions' cache only
+STRING_POOL = StringPool()
+
+
+def encode_amounts(values: pd.Series, amount_dtype: str = "paise", nullable: bool = False) -> pd.Series:
+    """Numeric amounts in the compact dtype (paise: int64 with missing -> 0, or Int64 keeping <NA> if nullable)"""
+    numeric = pd.to_numeric(values, errors="coerce")
+    if amount_dtype == "paise":
+        if nullable:
+            return (numeric * PAISE_PER_RUPEE).round().astype("Int64")
+        return (numeric.fillna(0) * PAISE_PER_RUPEE).round().astype(np.int64)
+    if amount_dtype == "float32":
+        return numeric.astype(np.float32)
+    return numeric.astype(np.float64)
+
+
+def to_rupees(values: Any) -> Any:
+    """Amounts (or sums of amounts) from a compact frame as float rupees"""
+    if isinstance(values, (pd.Series, pd.DataFrame, pd.Index)):
+        if pd.api.types.is_integer_dtype(getattr(values, "dtype", None)):
+            # float64 first: nullable Int64 paise come back with NaN for <NA>
+            return values.astype(np.float64) / PAISE_PER_RUPEE
+        return values.astype(np.float64)
+    if values is pd.NA:
+        return float("nan")
+    if isinstance(values, (int, np.integer)):
+        return float(values) / PAISE_PER_RUPEE
+    return float(values)
+
+
+def read_transactions(csv_path: str, amount_dtype: Optional[str] = None,
+                      pool: Optional[StringPool] = None, columnar: bool = False) -> pd.DataFrame:
+    """
+    Read a transactions CSV into the compact schema (uncached)
+
+    Args:
+        csv_path: CSV file path
+        amount_dtype: "paise", "float32" or "float64" (default APEX_AMOUNT_DTYPE)
+        pool: String pool for label columns (default: a new pool for this frame only)
+        columnar: Parse through the shared columnar cache (see columnar_cache)
+
+    Returns:
+        DataFrame with datetime64 dates, compact amounts and categorical labels
+    """
+    amount_dtype = amount_dtype or default_amount_dtype()
+    pool = pool if pool is not None else StringPool()
+    df = columnar_cache.read_frame(csv_path) if columnar else pd.read_csv(csv_path)
+    if columnar_cache.DATE_KEY in df.columns:
+        # Dates normalized once when the store was built
+        date_col = next(c for c in DATE_COLUMNS if c in df.columns)
+        df[date_col] = df[columnar_cache.DATE_KEY]
+        df = df.drop(columns=[c for c in columnar_cache.INTERNAL_COLUMNS if c in df.columns])
+    for col in df.columns:
+        if col in DATE_COLUMNS:
+            df[col] = parse_dates(df[col])
+        elif col in AMOUNT_COLUMNS:
+            df[col] = encode_amounts(df[col], amount_dtype, nullable=col in NULLABLE_AMOUNT_COLUMNS)
+        elif df[col].dtype == object:
+            try:
+                encoded = df[col].astype("category")
+            except TypeError:  # mixed value types that cannot be ordered
+                continue
+            # Only labels of columns kept as categoricals go into the pool
+            if len(encoded.cat.categories) <= max(1, LABEL_CARDINALITY_RATIO * len(df)):
+                df[col] = pool.encode(encoded)
+    df.attrs["amount_dtype"] = amount_dtype
+    return df
+
+
+def memory_report(df: pd.DataFrame) -> Dict[str, Any]:
+    """Per-column and total memory of a frame (deep, i.e. including strings)"""
+    usage = df.memory_usage(deep=True)
+    return {
+        "rows": int(len(df)),
+        "total_bytes": int(usage.sum()),
+        "index_bytes": int(usage.get("Index", 0)),
+        "columns": {c: {"dtype": str(df[c].dtype), "bytes": int(usage[c])} for c in df.columns},
+    }
+
+
+class TransactionFrame:
+    """
+    Compact frame sorted by date with a DatetimeIndex
+
+    Dated rows come first in date order; undated rows (if any) follow, so
+    ``df`` still holds every row while ``between`` slices only dated ones.
+    Year partitions are built lazily and memoized.
+    """
+
+    def __init__(self, df: pd.DataFrame, signature: Tuple[float, int], date_col: Optional[str]):
+        self.signature = signature
+        self.date_col = date_col
+        self.amount_dtype = df.attrs.get("amount_dtype", "float64")
+        self._years: Dict[int, pd.DataFrame] = {}
+        if date_col is None:
+            self.df = df
+            self._dated = 0
+            return
+        dated = df[date_col].notna()
+        df = pd.concat([df[dated].sort_values(date_col, kind="stable"), df[~dated]]) if not dated.all() \
+            else df.sort_values(date_col, kind="stable")
+        df.index = pd.DatetimeIndex(df[date_col])
+        df.index.name = None
+        self.df = df
+        self._dated = int(dated.sum())
+
+    def between(self, start: pd.Timestamp, end: pd.Timestamp, inclusive_end: bool = False) -> pd.DataFrame:
+        """Rows with start <= date < end (<= end if inclusive_end), as an index slice"""
+        if self.date_col is None:
+            return self.df.iloc[0:0]
+        index = self.df.index[:self._dated]
+        lo = index.searchsorted(start, side="left")
+        hi = index.searchsorted(end, side="right" if inclusive_end else "left")
+        return self.df.iloc[lo:hi]
+
+    def year(self, year: int) -> pd.DataFrame:
+        part = self._years.get(year)
+        if part is None:
+            part = self._years[year] = self.between(pd.Timestamp(year, 1, 1), pd.Timestamp(year + 1, 1, 1))
+        return part
+
+    def month(self, year: int, month: int) -> pd.DataFrame:
+        start = pd.Timestamp(year, month, 1)
+        return self.between(start, start + pd.offsets.MonthBegin(1))
+
+    def years(self) -> list:
+        if self.date_col is None:
+            return []
+        return self.df.index[:self._dated].year.unique().tolist()
+
+    def memory_report(self) -> Dict[str, Any]:
+        return {**memory_report(self.df), "amount_dtype": self.amount_dtype}
+
+
+# Compact frames keyed by path; reloaded when the file's mtime or size changes
+_frame_cache: Dict[str, TransactionFrame] = {}
+_frame_cache_lock = threading.Lock()
+
+
+def _file_signature(csv_path: str) -> Tuple[float, int]:
+    st = os.stat(csv_path)
+    return st.st_mtime, st.st_size
+
+
+def load_transactions(csv_path: str) -> TransactionFrame:
+    """Cached compact frame for csv_path (shared between callers; treat as read-only)"""
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"CSV not found at {csv_path}")
+    signature = _file_signature(csv_path)
+    cached = _frame_cache.get(csv_path)
+    if cached is not None and cached.signature == signature:
+        return cached
+    with _frame_cache_lock:
+        cached = _frame_cache.get(csv_path)
+        if cached is None or cached.signature != signature:
+            df = read_transactions(csv_path, pool=STRING_POOL, columnar=True)
+            date_col = next((c for c in DATE_COLUMNS if c in df.columns), None)
+            replaced = cached is not None
+            cached = _frame_cache[csv_path] = TransactionFrame(df, signature, date_col)
+            if replaced:
+                STRING_POOL.retain(_cached_labels())
+    return cached
+
+
+def _cached_labels() -> Iterable[Any]:
+    # Called with _frame_cache_lock held: labels of every cached frame
+    for frame in _frame_cache.values():
+        for col in frame.df.columns:
+            if isinstance(frame.df[col].dtype, pd.CategoricalDtype):
+                yield from frame.df[col].cat.categories
+
+
+def cache_report() -> Dict[str, Union[int, Dict[str, Any]]]:
+    """Memory held by cached frames and the string pool"""
+    with _frame_cache_lock:
+        frames = dict(_frame_cache)
+    reports = {path: frame.memory_report() for path, frame in frames.items()}
+    return {
+        "frames": reports,
+        "total_bytes": sum(r["total_bytes"] for r in reports.values()),
+        "string_pool_entries": len(STRING_POOL),
+        "string_pool_bytes": STRING_POOL.nbytes(),
+    }
@@ -8,11 +8,17 @@ import io
 from typing import Dict, List, Any, Optional
 import os
 from datetime import datetime, timedelta
+from app.deadline import drop_if_cancelled
+from app.metrics import CHART_RENDER_SECONDS, timed
+from app.tracing import traced
 
 # Set style for better looking plots
 plt.style.use('seaborn-v0_8')
 sns.set_palette("husl")
 
+@traced("chart.spending_pie_chart")
+@drop_if_cancelled("chart", "")
+@timed(CHART_RENDER_SECONDS, chart="spending_pie_chart")
 def create_spending_pie_chart(data: Dict[str, Any]) -> str:
     """Create a pie chart for spending by category"""
     try:
@@ -55,6 +61,9 @@ def create_spending_pie_chart(data: Dict[str, Any]) -> str:
     except Exception as e:
         return f"Error creating pie chart: {str(e)}"
 
+@traced("chart.spending_trend_chart")
+@drop_if_cancelled("chart", "")
+@timed(CHART_RENDER_SECONDS, chart="spending_trend_chart")
 def create_spending_trend_chart(csv_data: Dict[str, Any]) -> str:
     """Create a line chart showing spending trends over time"""
     try:
@@ -104,6 +113,9 @@ def create_spending_trend_chart(csv_data: Dict[str, Any]) -> str:
     except Exception as e:
         return f"Error creating trend chart: {str(e)}"
 
+@traced("chart.income_trend_chart")
+@drop_if_cancelled("chart", "")
+@timed(CHART_RENDER_SECONDS, chart="income_trend_chart")
 def create_income_trend_chart(csv_data: Dict[str, Any]) -> str:
     """Create a line chart showing salary/income over time"""
     try:
@@ -139,6 +151,9 @@ def create_income_trend_chart(csv_data: Dict[str, Any]) -> str:
     except Exception as e:
         return f"Error creating income trend chart: {str(e)}"
 
+@traced("chart.category_bar_chart")
+@drop_if_cancelled("chart", "")
+@timed(CHART_RENDER_SECONDS, chart="category_bar_chart")
 def create_category_bar_chart(data: Dict[str, Any]) -> str:
     """Create a bar chart for spending by category"""
     try:
@@ -187,6 +202,9 @@ def create_category_bar_chart(data: Dict[str, Any]) -> str:
     except Exception as e:
         return f"Error creating bar chart: {str(e)}"
 
+@traced("chart.merchant_chart")
+@drop_if_cancelled("chart", "")
+@timed(CHART_RENDER_SECONDS, chart="merchant_chart")
 def create_merchant_chart(merchant_data: Dict[str, Any]) -> str:
     """Create a horizontal bar chart for top merchants"""
     try:
@@ -232,6 +250,7 @@ def create_merchant_chart(merchant_data: Dict[str, Any]) -> str:
     except Exception as e:
         return f"Error creating merchant chart: {str(e)}"
 
+@traced("charts.visualizations")
 def generate_visualizations(spending_data: Dict[str, Any], csv_data: Dict[str, Any], merchant_data: Dict[str, Any]) -> Dict[str, str]:
     """Generate all relevant visualizations based on available data"""
     visualizations = {}
@@ -262,6 +281,9 @@ def generate_visualizations(spending_data: Dict[str, Any], csv_data: Dict[str, A
     
     return visualizations
 
+@traced("chart.monthly_spending_chart")
+@drop_if_cancelled("chart", "")
+@timed(CHART_RENDER_SECONDS, chart="monthly_spending_chart")
 def create_monthly_spending_chart(csv_data: Dict[str, Any]) -> str:
     """Create a monthly spending chart"""
     try:
@@ -317,6 +339,9 @@ def create_monthly_spending_chart(csv_data: Dict[str, Any]) -> str:
     except Exception as e:
         return f"Error creating monthly chart: {str(e)}"
 
+@traced("chart.daily_spending_chart")
+@drop_if_cancelled("chart", "")
+@timed(CHART_RENDER_SECONDS, chart="daily_spending_chart")
 def create_daily_spending_chart(csv_data: Dict[str, Any]) -> str:
     """Create a daily spending chart for the last 30 days"""
     try:
@@ -366,6 +391,9 @@ def create_daily_spending_chart(csv_data: Dict[str, Any]) -> str:
     except Exception as e:
         return f"Error creating daily chart: {str(e)}"
 
+@traced("chart.amount_distribution_chart")
+@drop_if_cancelled("chart", "")
+@timed(CHART_RENDER_SECONDS, chart="amount_distribution_chart")
 def create_amount_distribution_chart(csv_data: Dict[str, Any]) -> str:
     """Create a histogram of transaction amounts"""
     try:
@@ -417,6 +445,9 @@ def create_amount_distribution_chart(csv_data: Dict[str, Any]) -> str:
     except Exception as e:
         return f"Error creating amount distribution chart: {str(e)}"
 
+@traced("chart.category_comparison_chart")
+@drop_if_cancelled("chart", "")
+@timed(CHART_RENDER_SECONDS, chart="category_comparison_chart")
 def create_category_comparison_chart(spending_data: Dict[str, Any]) -> str:
     """Create a comparison chart between categories"""
     try:
@@ -460,6 +491,7 @@ def create_category_comparison_chart(spending_data: Dict[str, Any]) -> str:
     except Exception as e:
         return f"Error creating comparison chart: {str(e)}"
 
+@traced("charts.dynamic_visualizations")
 def generate_dynamic_visualizations(user_message: str, spending_data: Dict[str, Any], recent_data: Dict[str, Any], merchants_data: Dict[str, Any]) -> Dict[str, str]:
     """Generate visualizations based on user's specific request"""
     visualizations = {}
@@ -527,6 +559,9 @@ def generate_dynamic_visualizations(user_message: str, spending_data: Dict[str,
     
     return visualizations
 
+@traced("chart.historical_yearly_trend_chart")
+@drop_if_cancelled("chart", "")
+@timed(CHART_RENDER_SECONDS, chart="historical_yearly_trend_chart")
 def create_historical_yearly_trend_chart(yearly_data: List[Dict[str, Any]], title: str = "Yearly Spending Trend") -> str:
     """Create a yearly trend chart for historical analysis"""
     try:
@@ -561,6 +596,9 @@ def create_historical_yearly_trend_chart(yearly_data: List[Dict[str, Any]], titl
     except Exception as e:
         return f"Error creating yearly trend chart: {str(e)}"
 
+@traced("chart.historical_monthly_breakdown_chart")
+@drop_if_cancelled("chart", "")
+@timed(CHART_RENDER_SECONDS, chart="historical_monthly_breakdown_chart")
 def create_historical_monthly_breakdown_chart(monthly_data: List[Dict[str, Any]], title: str = "Monthly Spending Breakdown") -> str:
     """Create a monthly breakdown chart for historical analysis"""
     try:
@@ -595,6 +633,9 @@ def create_historical_monthly_breakdown_chart(monthly_data: List[Dict[str, Any]]
     except Exception as e:
         return f"Error creating monthly breakdown chart: {str(e)}"
 
+@traced("chart.historical_category_breakdown_chart")
+@drop_if_cancelled("chart", "")
+@timed(CHART_RENDER_SECONDS, chart="historical_category_breakdown_chart")
 def create_historical_category_breakdown_chart(categories: List[Dict[str, Any]], title: str = "Spending by Category") -> str:
     """Create a category breakdown chart for historical analysis"""
     try:
@@ -630,6 +671,9 @@ def create_historical_category_breakdown_chart(categories: List[Dict[str, Any]],
     except Exception as e:
         return f"Error creating category breakdown chart: {str(e)}"
 
+@traced("chart.historical_top_merchants_chart")
+@drop_if_cancelled("chart", "")
+@timed(CHART_RENDER_SECONDS, chart="historical_top_merchants_chart")
 def create_historical_top_merchants_chart(merchants: List[Dict[str, Any]], title: str = "Top Merchants by Spending") -> str:
     """Create a top merchants chart for historical analysis"""
     try:
@@ -665,6 +709,7 @@ def create_historical_top_merchants_chart(merchants: List[Dict[str, Any]], title
     except Exception as e:
         return f"Error creating top merchants chart: {str(e)}"
 
+@traced("charts.historical_visualizations")
 def generate_historical_visualizations(historical_data: Dict[str, Any], message: str = "") -> Dict[str, str]:
     """Generate visualizations for historical data analysis"""
     visualizations = {}
@@ -0,0 +1,254 @@
+"""
+Lightweight per-request tracing.
+
+A trace is a tree of timed spans for one request (chat turn, historical
+query, tool call). Spans are opened with a context manager or decorator:
+
+    with span("csv.spend_aggregate", month=month):
+        ...
+
+    @traced("agent.parse_query")
+    def parse_query(...): ...
+
+Spans are only recorded while a trace is active (``start_trace``), which
+happens when APEX_TRACING=1 or when a request asks for a ``timings`` block.
+Otherwise ``span`` costs one ContextVar lookup and ``traced`` one extra
+function call. The active trace lives in a ContextVar, so it follows work
+offloaded with app.concurrency (which copies the context into the pool).
+
+Finished traces can be exported as OpenTelemetry (OTLP/JSON) documents:
+APEX_TRACE_FILE appends one document per line, and the most recent traces
+are kept in memory (see ``recent_traces``).
+"""
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+SERVICE_NAME = "apex-wealth-agents"
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("apex_trace", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("apex_span", default=None)
+
+_recent: Deque["Trace"] = deque(maxlen=int(os.getenv("APEX_TRACE_BUFFER", 50)))
+_export_lock = threading.Lock()
+
+
+def tracing_enabled() -> bool:
+    """Whether every request is traced (APEX_TRACING=1)"""
+    return os.getenv("APEX_TRACING", "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+class Span:
+    """One timed operation within a trace"""
+
+    __slots__ = ("trace", "name", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace: "Trace", name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def to_otel(self) -> Dict[str, Any]:
+        out = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": [_otel_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            out["parentSpanId"] = self.parent_id
+        return out
+
+
+class _NoopSpan:
+    """Returned when no trace is active; accepts and drops attributes"""
+
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """Spans recorded for one request"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.trace_id = secrets.token_hex(16)
+        self.spans: List[Span] = []
+        self.root: Any = NOOP_SPAN
+        self._lock = threading.Lock()
+
+    def _add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def timings(self) -> Dict[str, Any]:
+        """Compact per-stage summary for API responses"""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start_ns)
+        if not spans:
+            return {"trace_id": self.trace_id, "total_ms": 0.0, "stages": []}
+        depth: Dict[str, int] = {}
+        stages = []
+        for s in spans:
+            depth[s.span_id] = depth.get(s.parent_id, -1) + 1 if s.parent_id else 0
+            stage = {
+                "name": s.name,
+                "ms": round(s.duration_ms, 2),
+                "offset_ms": round((s.start_ns - spans[0].start_ns) / 1e6, 2),
+                "depth": depth[s.span_id],
+            }
+            if s.error:
+                stage["error"] = s.error
+            stages.append(stage)
+        return {"trace_id": self.trace_id, "total_ms": round(spans[0].duration_ms, 2), "stages": stages}
+
+    def to_otel(self) -> Dict[str, Any]:
+        """OTLP/JSON ExportTraceServiceRequest document"""
+        with self._lock:
+            spans = [s.to_otel() for s in self.spans]
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otel_attribute("service.name", SERVICE_NAME)]},
+                "scopeSpans": [{"scope": {"name": "app.tracing"}, "spans": spans}],
+            }]
+        }
+
+
+def _otel_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def span(name: str, **attributes: Any):
+    """Time a block as a child of the current span (no-op without an active trace)"""
+    trace = _current_trace.get()
+    if trace is None:
+        return NOOP_SPAN
+    return _recording_span(trace, name, attributes)
+
+
+@contextmanager
+def _recording_span(trace: Trace, name: str, attributes: Dict[str, Any]) -> Iterator[Span]:
+    s = Span(trace, name, _current_span.get(), attributes)
+    token = _current_span.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {e}"[:300]
+        raise
+    finally:
+        s.end_ns = time.time_ns()
+        _current_span.reset(token)
+        trace._add(s)
+
+
+def traced(name: Optional[str] = None) -> Callable[[Callable], Callable]:
+    """Decorator form of span(); the span name defaults to module.qualname"""
+    def decorator(fn: Callable) -> Callable:
+        span_name = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return fn(*args, **kwargs)
+            with _recording_span(_current_trace.get(), span_name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def start_trace(name: str, force: bool = False, **attributes: Any) -> Iterator[Optional[Trace]]:
+    """
+    Start a trace with a root span, unless one is already active (then a
+    child span is opened and the existing trace is yielded)
+
+    Args:
+        name: Root span name (e.g. "POST /chat")
+        force: Trace even when APEX_TRACING is off (per-request timings)
+
+    Yields:
+        The active Trace, or None when tracing is off
+    """
+    existing = _current_trace.get()
+    if existing is not None:
+        with span(name, **attributes):
+            yield existing
+        return
+    if not (force or tracing_enabled()):
+        yield None
+        return
+
+    trace = Trace(name)
+    token = _current_trace.set(trace)
+    try:
+        with span(name, **attributes) as root:
+            trace.root = root
+            yield trace
+    finally:
+        _current_trace.reset(token)
+        _finish(trace)
+
+
+def _finish(trace: Trace) -> None:
+    _recent.append(trace)
+    path = os.getenv("APEX_TRACE_FILE")
+    if not path:
+        return
+    try:
+        line = json.dumps(trace.to_otel())
+        with _export_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except Exception as e:
+        print(f"Trace export failed: {e}")
+
+
+def recent_traces(limit: int = 20) -> List[Dict[str, Any]]:
+    """Timings of the most recent finished traces (newest first)"""
+    return [{"name": t.name, **t.timings()} for t in list(_recent)[-limit:][::-1]]
@@ -0,0 +1,130 @@
+"""
+Startup warm-up for heavy subsystems and readiness reporting.
+
+Heavy modules (matplotlib/seaborn, chromadb, sentence-transformers) are no
+longer imported when app.main loads. Instead the API lifespan hook warms the
+targets selected by APEX_WARMUP in a background thread, so the server starts
+accepting liveness probes immediately and /health/ready flips once the
+selected targets are built.
+
+APEX_WARMUP: comma-separated target names, "all", or "none"
+(default: "orchestrator,historical").
+"""
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+def _warm_orchestrator() -> None:
+    from orchestrator import get_enhanced_orchestrator
+    get_enhanced_orchestrator()
+
+
+def _warm_historical() -> None:
+    from enhanced_orchestrator import get_historical_orchestrator
+    get_historical_orchestrator()
+
+
+def _warm_vectordb() -> None:
+    from vectordb.knowledge_store import get_knowledge_store
+    get_knowledge_store()
+
+
+def _warm_embeddings() -> None:
+    from vectordb.embedding_service import get_embedding_service
+    # Run one encode so the first real query doesn't pay for lazy kernel init
+    get_embedding_service().embed_single("warm up")
+
+
+def _warm_charts() -> None:
+    import app.tools.visualization  # noqa: F401  (imports matplotlib + seaborn, sets style)
+
+
+def _warm_data() -> None:
+    from app.tools.csv_tools import describe_csv
+    from app.tools.enhanced_csv_tools import get_available_years
+    describe_csv()
+    get_available_years()  # fills the preprocessed frame cache for historical queries
+
+
+# Order matters: the orchestrator builds the knowledge store, which loads embeddings
+WARMUP_TARGETS: Dict[str, Callable[[], None]] = {
+    "charts": _warm_charts,
+    "embeddings": _warm_embeddings,
+    "vectordb": _warm_vectordb,
+    "orchestrator": _warm_orchestrator,
+    "historical": _warm_historical,
+    "data": _warm_data,
+}
+
+DEFAULT_WARMUP = "orchestrator,historical"
+
+_status: Dict[str, Dict[str, Any]] = {}
+_status_lock = threading.Lock()
+_started_at = time.time()
+
+
+def selected_targets(spec: Optional[str] = None) -> List[str]:
+    """Resolve APEX_WARMUP (or an explicit spec) into known target names, in warm-up order"""
+    spec = (spec if spec is not None else os.getenv("APEX_WARMUP", DEFAULT_WARMUP)).strip().lower()
+    if spec in ("", "none", "0", "false"):
+        return []
+    if spec == "all":
+        return list(WARMUP_TARGETS)
+    requested = {name.strip() for name in spec.split(",") if name.strip()}
+    unknown = requested - set(WARMUP_TARGETS)
+    if unknown:
+        print(f"Warning: unknown warm-up targets ignored: {', '.join(sorted(unknown))}")
+    return [name for name in WARMUP_TARGETS if name in requested]
+
+
+def _set_status(name: str, **fields) -> None:
+    with _status_lock:
+        _status.setdefault(name, {}).update(fields)
+
+
+def warm_up(targets: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Build each target in order, recording state and duration; never raises"""
+    for name in targets:
+        _set_status(name, state="pending")
+    for name in targets:
+        _set_status(name, state="warming")
+        start = time.perf_counter()
+        try:
+            WARMUP_TARGETS[name]()
+            _set_status(name, state="ready", seconds=round(time.perf_counter() - start, 3))
+        except Exception as e:
+            _set_status(name, state="failed", seconds=round(time.perf_counter() - start, 3), error=str(e))
+            print(f"Warm-up of '{name}' failed: {e}")
+    return readiness()["targets"]
+
+
+def start_background_warmup(targets: List[str]) -> Optional[threading.Thread]:
+    """Warm targets in a daemon thread so startup isn't blocked"""
+    if not targets:
+        return None
+    for name in targets:
+        _set_status(name, state="pending")
+    thread = threading.Thread(target=warm_up, args=(targets,), name="apex-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def readiness() -> Dict[str, Any]:
+    """
+    Ready once every selected target has finished warming.
+    Failed targets don't block readiness (the app degrades, e.g. no VectorDB)
+    but are listed under "degraded".
+    """
+    with _status_lock:
+        targets = {name: dict(state) for name, state in _status.items()}
+    pending = [n for n, st in targets.items() if st.get("state") in ("pending", "warming")]
+    degraded = [n for n, st in targets.items() if st.get("state") == "failed"]
+    return {
+        "ready": not pending,
+        "pending": pending,
+        "degraded": degraded,
+        "targets": targets,
+        "uptime_seconds": round(time.time() - _started_at, 1),
+    }
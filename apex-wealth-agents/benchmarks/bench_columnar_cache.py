@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Read and query time from the columnar cache versus parsing the CSV.
+
+"csv" is what the tools did before: pd.read_csv for pandas paths and a
+DuckDB table created with read_csv_auto for SQL paths. "cache" goes through
+app.tools.columnar_cache (Arrow IPC when pyarrow is importable, otherwise
+Parquet written by DuckDB). The one-off cost of building the cache is
+reported separately.
+
+Usage (from apex-wealth-agents/):
+    python benchmarks/bench_columnar_cache.py --rows 100000 1000000
+    APEX_COLUMNAR_FORMAT=parquet python benchmarks/bench_columnar_cache.py --rows 1000000
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import pandas as pd
+
+from benchmarks.synth_data import ensure_dataset
+
+QUERY = "SELECT category, SUM(amount) AS spent FROM t GROUP BY 1 ORDER BY 2 DESC"
+
+
+def best_ms(fn: Callable[[], Any], repeat: int) -> float:
+    """Fastest of `repeat` runs, in milliseconds"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return round(min(times), 2)
+
+
+def bench_rows(rows: int, repeat: int) -> Dict[str, Any]:
+    import duckdb
+
+    from app.tools import columnar_cache
+
+    path = ensure_dataset(rows)
+
+    start = time.perf_counter()
+    entry = columnar_cache.ensure_cache(path)
+    build_ms = (time.perf_counter() - start) * 1000
+    if entry is None:
+        raise SystemExit("columnar cache unavailable (needs pyarrow or duckdb)")
+
+    def csv_query():
+        con = duckdb.connect(database=":memory:")
+        con.execute(f"CREATE TABLE t AS SELECT * FROM read_csv_auto('{path}', SAMPLE_SIZE=20000)")
+        con.execute(QUERY).df()
+        con.close()
+
+    def cache_query():
+        con = duckdb.connect(database=":memory:")
+        columnar_cache.register_duckdb(con, path)
+        con.execute(QUERY).df()
+        con.close()
+
+    ops = {
+        "pandas_frame": (lambda: pd.read_csv(path), lambda: columnar_cache.read_frame(path)),
+        "duckdb_query": (csv_query, cache_query),
+    }
+    timings = {name: {"csv_ms": best_ms(b, repeat), "cache_ms": best_ms(a, repeat)} for name, (b, a) in ops.items()}
+    return {
+        "rows": rows,
+        "format": entry.format,
+        "csv_mb": round(os.path.getsize(path) / 1e6, 1),
+        "cache_mb": round(os.path.getsize(entry.path) / 1e6, 1),
+        "build_ms": round(build_ms, 1),
+        "ops": timings,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar cache benchmark")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # Fresh cache dir so the build is measured rather than reused
+    cache_dir = tempfile.mkdtemp(prefix="apex_columnar_")
+    os.environ["APEX_COLUMNAR_CACHE_DIR"] = cache_dir
+    try:
+        results: List[Dict[str, Any]] = [bench_rows(r, args.repeat) for r in args.rows]
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print(f"\n{'rows':>10}  {'metric':<20}{'csv':>12}{'cache':>12}{'speedup':>9}")
+    for r in results:
+        print(f"{r['rows']:>10,}  {'size MB':<20}{r['csv_mb']:>12.1f}{r['cache_mb']:>12.1f}   ({r['format']})")
+        print(f"{'':>10}  {'build ms (once)':<20}{'':>12}{r['build_ms']:>12.1f}")
+        for name, t in r["ops"].items():
+            print(f"{'':>10}  {name + ' ms':<20}{t['csv_ms']:>12.2f}{t['cache_ms']:>12.2f}"
+                  f"{t['csv_ms'] / max(t['cache_ms'], 1e-9):>8.1f}x")
+    print("RESULT " + json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Memory and groupby speed of the compact transactions frame versus plain pandas.
+
+"before" is pd.read_csv with default dtypes (object labels, float64 amounts,
+date strings parsed per query, as the tools did); "after" is
+app.tools.transactions_frame.read_transactions (categoricals from the string
+pool, int64 paise or float32 amounts, datetime64 dates, date-sorted index).
+
+Usage (from apex-wealth-agents/):
+    python benchmarks/bench_compact_frame.py --rows 100000 1000000
+    python benchmarks/bench_compact_frame.py --rows 1000000 --amount-dtype float32
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import pandas as pd
+
+from benchmarks.synth_data import ensure_dataset
+
+
+def best_ms(fn: Callable[[], Any], repeat: int) -> float:
+    """Fastest of `repeat` runs, in milliseconds"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return round(min(times), 2)
+
+
+def bench_rows(rows: int, amount_dtype: str, repeat: int) -> Dict[str, Any]:
+    from app.tools.transactions_frame import TransactionFrame, memory_report, read_transactions
+
+    path = ensure_dataset(rows)
+
+    start = time.perf_counter()
+    raw = pd.read_csv(path)
+    raw_load_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    compact = read_transactions(path, amount_dtype=amount_dtype)
+    frame = TransactionFrame(compact, (0.0, 0), "date")
+    compact_load_ms = (time.perf_counter() - start) * 1000
+
+    def raw_month():
+        months = pd.to_datetime(raw["date"], errors="coerce").dt.to_period("M").astype(str)
+        return raw[months == "2022-03"].groupby("category")["amount"].sum()
+
+    ops = {
+        "groupby_category": (
+            lambda: raw.groupby("category")["amount"].sum(),
+            lambda: frame.df.groupby("category", observed=True)["amount"].sum(),
+        ),
+        "groupby_merchant": (
+            lambda: raw.groupby("merchant")["amount"].sum(),
+            lambda: frame.df.groupby("merchant", observed=True)["amount"].sum(),
+        ),
+        "month_category": (
+            raw_month,
+            lambda: frame.month(2022, 3).groupby("category", observed=True)["amount"].sum(),
+        ),
+    }
+    timings = {name: {"before_ms": best_ms(b, repeat), "after_ms": best_ms(a, repeat)} for name, (b, a) in ops.items()}
+
+    raw_bytes = memory_report(raw)["total_bytes"]
+    compact_report = memory_report(frame.df)
+    return {
+        "rows": rows,
+        "amount_dtype": amount_dtype,
+        "load_ms": {"before": round(raw_load_ms, 1), "after": round(compact_load_ms, 1)},
+        "memory_mb": {"before": round(raw_bytes / 1e6, 2), "after": round(compact_report["total_bytes"] / 1e6, 2)},
+        "memory_ratio": round(raw_bytes / max(1, compact_report["total_bytes"]), 2),
+        "columns_after": compact_report["columns"],
+        "ops": timings,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact frame memory/groupby benchmark")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--amount-dtype", default="paise", choices=["paise", "float32", "float64"])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results: List[Dict[str, Any]] = [bench_rows(r, args.amount_dtype, args.repeat) for r in args.rows]
+
+    print(f"\n{'rows':>10}  {'metric':<20}{'before':>12}{'after':>12}{'speedup':>9}")
+    for r in results:
+        mem = r["memory_mb"]
+        print(f"{r['rows']:>10,}  {'memory MB':<20}{mem['before']:>12.1f}{mem['after']:>12.1f}{r['memory_ratio']:>8.1f}x")
+        load = r["load_ms"]
+        print(f"{'':>10}  {'load ms':<20}{load['before']:>12.1f}{load['after']:>12.1f}"
+              f"{load['before'] / max(load['after'], 1e-9):>8.1f}x")
+        for name, t in r["ops"].items():
+            print(f"{'':>10}  {name + ' ms':<20}{t['before_ms']:>12.2f}{t['after_ms']:>12.2f}"
+                  f"{t['before_ms'] / max(t['after_ms'], 1e-9):>8.1f}x")
+    print("RESULT " + json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Local embedding backends: sentence-transformers (PyTorch) versus the int8
+ONNX export (APEX_EMBED_BACKEND=onnx, vectordb/onnx_embedder.py).
+
+Each backend is measured in a fresh interpreter (this script re-runs itself
+with --worker), so the numbers include its imports:
+  - load_s: importing the runtime and loading the model (the ONNX export
+    is built first, untimed, if it is not cached yet)
+  - query p50/p95: one short text per encode call, as a chat query is embedded
+  - batch throughput: texts per second encoding --batch texts per call, as
+    documents are embedded when the knowledge base is populated
+  - peak RSS of the process
+
+Usage (from apex-wealth-agents/):
+    python benchmarks/bench_embed_backends.py
+    python benchmarks/bench_embed_backends.py --backends onnx --queries 500 --batch 64
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import types
+from typing import Any, Dict, List
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+QUERIES = [
+    "How much did I spend on groceries last month?",
+    "Should I start a SIP in an index fund?",
+    "What is my emergency fund target?",
+    "compare my spending between 2020 and 2022",
+]
+DOCUMENT = ("Diversification spreads money across asset classes such as equities, bonds and cash, "
+            "so that a fall in one market does not wipe out the whole portfolio. ")
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def load_model(backend: str):
+    if backend == "onnx":
+        # Bare package: vectordb/__init__ would import chromadb into the measured load and RSS
+        package = types.ModuleType("vectordb")
+        package.__path__ = [os.path.join(BASE_DIR, "vectordb")]
+        sys.modules["vectordb"] = package
+        from vectordb.onnx_embedder import load_onnx_encoder
+        return load_onnx_encoder()
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer("all-MiniLM-L6-v2")
+
+
+def worker(backend: str, queries: int, batch: int, batches: int) -> Dict[str, Any]:
+    if backend == "onnx":
+        # Build the export outside the timed load (it is a one-off per machine)
+        subprocess.run([sys.executable, os.path.join(BASE_DIR, "vectordb", "onnx_embedder.py")], cwd=BASE_DIR,
+                       check=True, stdout=subprocess.DEVNULL)
+    start = time.perf_counter()
+    model = load_model(backend)
+    load_s = time.perf_counter() - start
+
+    model.encode([QUERIES[0]])
+    latencies = []
+    for i in range(queries):
+        start = time.perf_counter()
+        model.encode([f"{QUERIES[i % len(QUERIES)]} ({i})"])
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    docs = [f"{DOCUMENT}#{i}" for i in range(batch)]
+    start = time.perf_counter()
+    for _ in range(batches):
+        model.encode(docs)
+    batch_s = time.perf_counter() - start
+
+    return {
+        "backend": backend,
+        "load_s": round(load_s, 2),
+        "query_p50_ms": round(percentile(latencies, 50), 2),
+        "query_p95_ms": round(percentile(latencies, 95), 2),
+        "batch_texts_per_s": round(batch * batches / batch_s, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PyTorch vs int8 ONNX embedding benchmark")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx"], choices=["torch", "onnx"])
+    parser.add_argument("--queries", type=int, default=200, help="single-text encode calls")
+    parser.add_argument("--batch", type=int, default=32, help="texts per batch encode call")
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument("--worker", choices=["torch", "onnx"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print("RESULT " + json.dumps(worker(args.worker, args.queries, args.batch, args.batches)))
+        return
+
+    results = []
+    for backend in args.backends:
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", backend, "--queries", str(args.queries),
+             "--batch", str(args.batch), "--batches", str(args.batches)],
+            cwd=BASE_DIR, capture_output=True, text=True)
+        lines = [l for l in proc.stdout.splitlines() if l.startswith("RESULT ")]
+        if proc.returncode != 0 or not lines:
+            print(f"{backend}: failed\n{proc.stderr.strip()[-2000:]}")
+            continue
+        results.append(json.loads(lines[-1][len("RESULT "):]))
+
+    print(f"\n{'backend':<8}{'load s':>8}{'query p50':>11}{'query p95':>11}{'batch txt/s':>13}{'RSS MB':>9}")
+    for r in results:
+        print(f"{r['backend']:<8}{r['load_s']:>8}{r['query_p50_ms']:>11}{r['query_p95_ms']:>11}"
+              f"{r['batch_texts_per_s']:>13}{r['peak_rss_mb']:>9}")
+    print("RESULT " + json.dumps({"runs": results}))
+    if len(results) != len(args.backends):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Query-embedding throughput under concurrency: one encode per call versus
+micro-batching (EmbeddingService.embed_single through app.batching).
+
+Threads call embed_single as chat requests do. "unbatched" sets
+APEX_EMBED_BATCH=0 so every call runs its own encode on a batch of one;
+"batched" lets the worker encode whatever arrived within
+APEX_EMBED_BATCH_WAIT_MS in one call.
+
+With sentence-transformers installed the real all-MiniLM-L6-v2 model is
+used. Otherwise (or with --simulate) a stand-in model is used. Like one
+PyTorch model on a CPU, it runs one encode at a time, and each encode costs
+a fixed overhead plus a per-text cost.
+
+Usage (from apex-wealth-agents/):
+    python benchmarks/bench_embed_batching.py
+    python benchmarks/bench_embed_batching.py --simulate --concurrency 1 8 32 --overhead-ms 8 --per-text-ms 0.4
+"""
+import argparse
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import numpy as np  # noqa: E402
+
+from app.metrics import MICROBATCH_SIZE  # noqa: E402
+
+try:
+    import vectordb  # noqa: F401
+except ImportError:
+    # vectordb/__init__ needs chromadb; load the package's own modules without it
+    package = types.ModuleType("vectordb")
+    package.__path__ = [os.path.join(BASE_DIR, "vectordb")]
+    sys.modules["vectordb"] = package
+
+EmbeddingService = importlib.import_module("vectordb.embedding_service").EmbeddingService
+
+QUERIES = [
+    "How much did I spend on groceries last month?",
+    "What is an index fund?",
+    "Should I pay off my credit card or invest?",
+    "Explain the difference between a Roth and a traditional IRA",
+    "top merchants in 2023",
+    "How do I build an emergency fund?",
+]
+
+
+class SimulatedModel:
+    """Stand-in for SentenceTransformer: one encode at a time, overhead + per-text cost"""
+
+    def __init__(self, overhead_ms: float, per_text_ms: float, dim: int = 384):
+        self.overhead = overhead_ms / 1000.0
+        self.per_text = per_text_ms / 1000.0
+        self.dim = dim
+        self._lock = threading.Lock()
+
+    def encode(self, texts: List[str], convert_to_numpy: bool = True) -> np.ndarray:
+        with self._lock:
+            time.sleep(self.overhead + self.per_text * len(texts))
+        return np.ones((len(texts), self.dim), dtype=np.float32)
+
+
+def make_service(batched: bool, simulated: Any) -> EmbeddingService:
+    os.environ["APEX_EMBED_BATCH"] = "1" if batched else "0"
+    if simulated is None:
+        return EmbeddingService(model="local")
+    service = EmbeddingService(model="simulated", api_key="unused")
+    service.model, service.local_model = "local", simulated
+    return service
+
+
+def batch_stats() -> Dict[str, float]:
+    key = ("embedding",)
+    return {"count": sum(MICROBATCH_SIZE._counts.get(key, [])), "sum": MICROBATCH_SIZE._sums.get(key, 0.0)}
+
+
+def run(mode: str, service: EmbeddingService, concurrency: int, calls: int) -> Dict[str, Any]:
+    def timed(i: int) -> float:
+        start = time.perf_counter()
+        service.embed_single(f"{QUERIES[i % len(QUERIES)]} #{i}")
+        return (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(timed, range(concurrency)))
+        before = batch_stats()
+        start = time.perf_counter()
+        latencies = sorted(pool.map(timed, range(calls)))
+        elapsed = time.perf_counter() - start
+    after = batch_stats()
+    batches = after["count"] - before["count"]
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "embeddings_per_s": round(calls / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2], 2),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))], 2),
+        "mean_batch": round((after["sum"] - before["sum"]) / batches, 1) if batches else 1.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Unbatched vs micro-batched query embeddings")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--calls", type=int, default=400, help="embed_single calls per run")
+    parser.add_argument("--simulate", action="store_true", help="use the stand-in model even if sentence-transformers is installed")
+    parser.add_argument("--overhead-ms", type=float, default=8.0, help="stand-in cost per encode call")
+    parser.add_argument("--per-text-ms", type=float, default=0.4, help="stand-in cost per text")
+    args = parser.parse_args()
+
+    simulated = None
+    if args.simulate:
+        simulated = SimulatedModel(args.overhead_ms, args.per_text_ms)
+    else:
+        try:
+            import sentence_transformers  # noqa: F401
+        except ImportError:
+            print("sentence-transformers not installed; using the simulated model")
+            simulated = SimulatedModel(args.overhead_ms, args.per_text_ms)
+
+    services = {"unbatched": make_service(False, simulated), "batched": make_service(True, simulated)}
+    results = []
+    for concurrency in args.concurrency:
+        for mode, service in services.items():
+            results.append(run(mode, service, concurrency, args.calls))
+
+    print(f"\n{'mode':<11}{'threads':>8}{'emb/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'batch':>7}")
+    for r in results:
+        print(f"{r['mode']:<11}{r['concurrency']:>8}{r['embeddings_per_s']:>10}{r['p50_ms']:>9}"
+              f"{r['p99_ms']:>9}{r['mean_batch']:>7}")
+    print("RESULT " + json.dumps({"model": "simulated" if simulated else "all-MiniLM-L6-v2", "runs": results}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+LLM completion latency and spend: one provider versus the hedging router.
+
+Two stub servers stand in for the providers (scripts/stub_llm_server.py):
+"free" is fast but has a heavy tail (--slow-rate of its calls take
+--slow-ms), "gemini" is slower but steady. "single" sends every completion
+to free; "routed" sets LLM_PROVIDERS=free,gemini so llm.router hedges on
+gemini once a free call outlives free's rolling p90. Spend is provider
+calls per completion (the hedged calls are the extra cost).
+
+After the latency runs, the script checks that a loser's HTTP wait is
+cancelled, and that with free failing every call completions fail over to
+gemini and free's circuit opens. It exits 1 if routing does not lower p99,
+costs 1.5x the calls or more, or a check fails.
+
+Usage (from apex-wealth-agents/):
+    python benchmarks/bench_llm_hedging.py
+    python benchmarks/bench_llm_hedging.py --calls 400 --slow-rate 0.05 --slow-ms 4000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+os.environ["APEX_COALESCE"] = "0"
+os.environ["GEMINI_API_KEY"] = "stub"
+
+from app.metrics import CANCELLED_WORK_TOTAL, LLM_HEDGE_OUTCOMES_TOTAL  # noqa: E402
+from llm import resilience, router  # noqa: E402
+from llm.llm_client import LLMClient, LLMError  # noqa: E402
+from scripts.stub_llm_server import Faults, start_stub_server  # noqa: E402
+
+# Untimed calls per run, so the router has its LLM_HEDGE_MIN_SAMPLES before timing starts
+WARMUP_CALLS = 30
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def fresh(providers: str) -> None:
+    """Reset router/breaker state and point LLMClient at these providers"""
+    if providers:
+        os.environ["LLM_PROVIDERS"] = providers
+    else:
+        os.environ.pop("LLM_PROVIDERS", None)
+    router.reset_routers()
+    resilience.reset_providers()
+
+
+def run_mode(mode: str, servers: Dict[str, Any], calls: int, concurrency: int) -> Dict[str, Any]:
+    fresh("free,gemini" if mode == "routed" else "")
+    client = LLMClient(base_url=f"http://127.0.0.1:{servers['free'].server_port}/api/chat", timeout=15)
+
+    def timed(i: int) -> float:
+        start = time.perf_counter()
+        client.complete(f"{mode} prompt #{i}")
+        return (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(timed, range(-WARMUP_CALLS, 0)))
+        hits = {name: server.hits for name, server in servers.items()}
+        latencies = list(pool.map(timed, range(calls)))
+    provider_calls = {name: server.hits - hits[name] for name, server in servers.items()}
+    result = {
+        "mode": mode,
+        "calls": calls,
+        "provider_calls_per_completion": round(sum(provider_calls.values()) / calls, 3),
+        "provider_calls": provider_calls,
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p90_ms": round(percentile(latencies, 90), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "mean_ms": round(sum(latencies) / calls, 1),
+    }
+    if mode == "routed":
+        result["router"] = router.get_router(["free", "gemini"]).snapshot()
+    return result
+
+
+def check_loser_cancelled(servers: Dict[str, Any], failures: List[str]) -> None:
+    """A hedge that wins cancels the slow primary's HTTP wait"""
+    fresh("free,gemini")
+    os.environ["LLM_HEDGE_DELAY_MS"] = "100"
+    client = LLMClient(base_url=f"http://127.0.0.1:{servers['free'].server_port}/api/chat", timeout=15)
+    servers["free"].faults.slow_rate, saved = 1.0, servers["free"].faults.slow_rate
+    before = CANCELLED_WORK_TOTAL.value(stage="llm_primary")
+    won = LLM_HEDGE_OUTCOMES_TOTAL.value(winner="hedge")
+    start = time.perf_counter()
+    try:
+        client.complete("loser check")
+    finally:
+        servers["free"].faults.slow_rate = saved
+        os.environ.pop("LLM_HEDGE_DELAY_MS")
+    elapsed = time.perf_counter() - start
+    if LLM_HEDGE_OUTCOMES_TOTAL.value(winner="hedge") != won + 1:
+        failures.append("the hedge did not win against a stalled primary")
+    if CANCELLED_WORK_TOTAL.value(stage="llm_primary") != before + 1:
+        failures.append("the losing primary was not cancelled")
+    if elapsed > servers["free"].faults.slow_ms / 1000 / 2:
+        failures.append(f"hedged call waited {elapsed:.2f} s on the stalled primary")
+    print(f"loser: primary stalled, hedge answered in {elapsed * 1000:.0f} ms and the primary was cancelled")
+
+
+def check_failover(servers: Dict[str, Any], failures: List[str]) -> None:
+    """With free failing every call, completions still succeed on gemini and free's circuit opens"""
+    fresh("free,gemini")
+    client = LLMClient(base_url=f"http://127.0.0.1:{servers['free'].server_port}/api/chat", timeout=15, retries=0)
+    servers["free"].faults.error_rate = 1.0
+    ok = 0
+    try:
+        for i in range(20):
+            try:
+                client.complete(f"failover #{i}")
+                ok += 1
+            except LLMError:
+                pass
+    finally:
+        servers["free"].faults.error_rate = 0.0
+    state = resilience.get_breaker("free").state
+    if ok != 20:
+        failures.append(f"only {ok}/20 completions succeeded with the primary down")
+    if state != resilience.OPEN:
+        failures.append(f"free circuit is {state} after 20 failures")
+    print(f"failover: {ok}/20 completions succeeded with free down; free circuit {state}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Single provider vs hedged routing benchmark")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--free-ms", type=float, default=150.0, help="free stub latency")
+    parser.add_argument("--slow-rate", type=float, default=0.08, help="share of free calls in the slow tail")
+    parser.add_argument("--slow-ms", type=float, default=2500.0, help="latency of the slow tail")
+    parser.add_argument("--gemini-ms", type=float, default=350.0, help="gemini stub latency")
+    args = parser.parse_args()
+
+    servers = {
+        "free": start_stub_server(latency_ms=args.free_ms, jitter_ms=args.free_ms / 5,
+                                  faults=Faults(slow_rate=args.slow_rate, slow_ms=args.slow_ms)),
+        "gemini": start_stub_server(latency_ms=args.gemini_ms, jitter_ms=args.gemini_ms / 5, shape="gemini"),
+    }
+    os.environ["GEMINI_BASE_URL"] = f"http://127.0.0.1:{servers['gemini'].server_port}/v1beta"
+    failures: List[str] = []
+    try:
+        results = [run_mode(mode, servers, args.calls, args.concurrency) for mode in ("single", "routed")]
+        check_loser_cancelled(servers, failures)
+        check_failover(servers, failures)
+    finally:
+        for server in servers.values():
+            server.shutdown()
+
+    single, routed = results
+    summary = {
+        "p99_saved_pct": round(100 * (1 - routed["p99_ms"] / single["p99_ms"]), 1),
+        "extra_calls_pct": round(100 * (routed["provider_calls_per_completion"]
+                                        / single["provider_calls_per_completion"] - 1), 1),
+    }
+    print(f"\n{'mode':<8}{'calls/completion':>18}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'mean ms':>9}")
+    for r in results:
+        print(f"{r['mode']:<8}{r['provider_calls_per_completion']:>18}{r['p50_ms']:>9.0f}{r['p90_ms']:>9.0f}"
+              f"{r['p99_ms']:>9.0f}{r['mean_ms']:>9.0f}")
+    print(f"routing cuts p99 by {summary['p99_saved_pct']}% for {summary['extra_calls_pct']}% more provider calls")
+    print("RESULT " + json.dumps({"runs": results, "summary": summary}))
+
+    if routed["p99_ms"] >= single["p99_ms"]:
+        failures.append("routing did not lower p99")
+    if routed["provider_calls_per_completion"] >= 1.5 * single["provider_calls_per_completion"]:
+        failures.append("routing cost 1.5x the provider calls or more")
+    for failure in failures:
+        print("   FAIL", failure)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
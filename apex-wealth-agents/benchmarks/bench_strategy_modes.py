@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+LLM latency and tokens of the investment path: two-call versus fused mode.
+
+"two_call" is StrategyAgent.generate_strategy followed by RiskAgent.assess_risk;
+"fused" is StrategyRiskAgent.generate_strategy_with_risk (one call plus the
+local risk validator). The LLM is simulated below LLMClient.complete so the
+prompts are the real ones: each call returns a canned reply of realistic size
+and sleeps overhead + prompt prefill + per-output-token decode time. Tokens
+are estimated at 4 characters each (as KnowledgeStore chunking does).
+
+The local validator is also timed on its own, and the script checks that
+fused results never exceed the allocation limits of the user's profile (the
+two-call flow has no such guarantee; its column is informational).
+
+Usage (from apex-wealth-agents/):
+    python benchmarks/bench_strategy_modes.py
+    python benchmarks/bench_strategy_modes.py --queries 30 --overhead-ms 400 --decode-ms 15
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+os.environ.setdefault("APEX_WARMUP", "none")
+
+from agents.risk_agent import RiskAgent, asset_bucket, parse_percent, risk_limits  # noqa: E402
+from agents.strategy_agent import StrategyAgent  # noqa: E402
+from agents.strategy_risk_agent import StrategyRiskAgent  # noqa: E402
+from llm.llm_client import LLMClient  # noqa: E402
+
+CHARS_PER_TOKEN = 4
+
+QUERIES = [
+    "How should I invest 20,000 a month for retirement?",
+    "Should I start a SIP in mid-cap funds?",
+    "What is a good asset allocation for me right now?",
+    "Is it a good time to add gold and international funds?",
+    "How do I rebalance my portfolio this year?",
+]
+PROFILES = [
+    {"risk_tolerance": "conservative", "goals": ["retirement"], "time_horizon": "short"},
+    {"risk_tolerance": "moderate", "goals": ["wealth_creation", "retirement"], "time_horizon": "medium"},
+    {"risk_tolerance": "aggressive", "goals": ["wealth_creation"], "time_horizon": "long"},
+]
+KNOWLEDGE = [
+    {"content": "SIP (Systematic Investment Plan) spreads purchases over time. Rupee cost averaging buys more units "
+                "when prices are low. For moderate investors: 40% Large-cap, 30% Mid-cap, 20% Small-cap, 10% Debt. "
+                "Invest for at least 5-7 years and increase the SIP amount by 10% annually." * 2,
+     "metadata": {"title": "SIP Strategy", "type": "strategy"}},
+    {"content": "Asset allocation should change with age: 80/20 equity/debt in early career, 70/30 in mid career, "
+                "60/40 before retirement and 40/60 near retirement. Review and rebalance annually." * 2,
+     "metadata": {"title": "Asset Allocation by Age", "type": "strategy"}},
+    {"content": "Conservative investors: 60-70% debt (FDs, debt funds, government bonds), 20-30% large-cap equity, "
+                "10% gold. Avoid small-cap, mid-cap, derivatives and cryptocurrency." * 2,
+     "metadata": {"title": "Conservative Risk Profile Investment Guide", "type": "risk_guidance"}},
+    {"content": "Moderate investors: 50-60% equity across large, mid and small caps, 30-40% debt, 10% hybrid. "
+                "Consider balanced advantage funds, multi-cap funds, ELSS and gold ETFs." * 2,
+     "metadata": {"title": "Moderate Risk Profile Investment Guide", "type": "risk_guidance"}},
+    {"content": "Aggressive investors: 70-80% equity focused on mid and small caps, 10-20% debt, 10% alternatives. "
+                "Diversify across sectors and keep an emergency fund." * 2,
+     "metadata": {"title": "Aggressive Risk Profile Investment Guide", "type": "risk_guidance"}},
+]
+RECOMMENDATIONS = [
+    {"category": "Large-cap Equity", "allocation_percentage": 35, "rationale": "Stable core holding of blue-chip companies",
+     "specific_products": ["Nifty 50 Index Fund", "Large-cap Fund"]},
+    {"category": "Mid-cap Equity", "allocation_percentage": 25, "rationale": "Higher growth over a long horizon",
+     "specific_products": ["Mid-cap Fund"]},
+    {"category": "Debt Funds", "allocation_percentage": 30, "rationale": "Stability and liquidity",
+     "specific_products": ["Short Duration Debt Fund", "PPF"]},
+    {"category": "Gold", "allocation_percentage": 10, "rationale": "Hedge against inflation and equity drawdowns",
+     "specific_products": ["Gold ETF"]},
+]
+STRATEGY_REPLY = {
+    "strategy_summary": "Build a diversified core through monthly SIPs in index and large-cap funds, add mid-cap "
+                        "exposure for growth, and keep debt and gold for stability. Rebalance once a year.",
+    "recommendations": RECOMMENDATIONS,
+    "action_items": ["Start SIPs on the 5th of each month", "Keep six months of expenses in a liquid fund",
+                     "Increase SIPs by 10% every year", "Rebalance when an asset class drifts by 5%"],
+    "risk_notes": "Equity returns are volatile over short periods; mid-caps can fall 30% or more in a downturn.",
+    "time_horizon": "long term focus",
+}
+RISK_REPLY = {
+    "risk_alignment": "medium",
+    "risk_score": 6,
+    "adjustments_needed": True,
+    "adjusted_recommendations": [
+        {"category": "Large-cap Equity", "original_allocation": 35, "adjusted_allocation": 35, "reason": "Within profile"},
+        {"category": "Mid-cap Equity", "original_allocation": 25, "adjusted_allocation": 15, "reason": "Reduce volatility"},
+        {"category": "Debt Funds", "original_allocation": 30, "adjusted_allocation": 40, "reason": "Raise stability"},
+        {"category": "Gold", "original_allocation": 10, "adjusted_allocation": 10, "reason": "Within profile"},
+    ],
+    "risk_warnings": ["Mid-cap funds can be volatile over short horizons", "Keep an emergency fund before investing"],
+    "suitability": "moderately_suitable",
+}
+# Fused replies carry allocations that already respect the limits, so no adjusted rows
+FUSED_REPLY = dict(STRATEGY_REPLY, risk_assessment={k: v for k, v in RISK_REPLY.items()
+                                                    if k not in ("adjustments_needed", "adjusted_recommendations")})
+
+
+class SimulatedLLM:
+    """Canned replies with latency = overhead + prefill per 1k prompt tokens + decode per output token"""
+
+    def __init__(self, overhead_ms: float, prefill_ms_per_1k: float, decode_ms: float):
+        self.overhead_ms = overhead_ms
+        self.prefill_ms_per_1k = prefill_ms_per_1k
+        self.decode_ms = decode_ms
+        self.calls: List[Dict[str, int]] = []
+
+    def reply(self, prompt: str) -> str:
+        if "ALLOCATION LIMITS" in prompt:
+            return json.dumps(FUSED_REPLY)
+        if "risk assessment specialist" in prompt:
+            return json.dumps(RISK_REPLY)
+        return json.dumps(STRATEGY_REPLY)
+
+    def __call__(self, client: LLMClient, prompt: str, system=None) -> str:
+        text = self.reply(prompt)
+        prompt_tokens = (len(prompt) + len(system or "")) // CHARS_PER_TOKEN
+        completion_tokens = len(text) // CHARS_PER_TOKEN
+        delay_ms = self.overhead_ms + prompt_tokens * self.prefill_ms_per_1k / 1000 + completion_tokens * self.decode_ms
+        time.sleep(delay_ms / 1000)
+        self.calls.append({"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens})
+        return text
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def within_limits(assessment: Dict[str, Any], strategy: Dict[str, Any], profile: Dict[str, Any]) -> bool:
+    rows = assessment.get("adjusted_recommendations") or strategy.get("recommendations") or []
+    pct = {}
+    for row in rows:
+        bucket = asset_bucket(row.get("category", ""))
+        pct[bucket] = pct.get(bucket, 0.0) + parse_percent(row.get("adjusted_allocation", row.get("allocation_percentage")))
+    limits = risk_limits(profile["risk_tolerance"])
+    equity = pct.get("equity", 0) + pct.get("small_mid_cap", 0) + pct.get("speculative", 0) + pct.get("hybrid", 0) / 2
+    return (equity <= limits["max_equity"] + 0.1 and pct.get("small_mid_cap", 0) <= limits["max_small_mid_cap"] + 0.1
+            and pct.get("speculative", 0) <= limits["max_speculative"] + 0.1
+            and pct.get("debt", 0) + pct.get("hybrid", 0) / 2 >= limits["min_debt"] - 0.1)
+
+
+def run_mode(mode: str, llm: SimulatedLLM, queries: int) -> Dict[str, Any]:
+    client = LLMClient()
+    strategy_agent = StrategyAgent(client)
+    risk_agent = RiskAgent(client)
+    fused_agent = StrategyRiskAgent(client, risk_agent)
+    llm.calls.clear()
+    latencies, compliant = [], 0
+    for i in range(queries):
+        # Distinct prompts so the LLM singleflight never merges calls
+        query = f"{QUERIES[i % len(QUERIES)]} (#{i})"
+        profile = PROFILES[i % len(PROFILES)]
+        start = time.perf_counter()
+        if mode == "fused":
+            strategy, assessment = fused_agent.generate_strategy_with_risk(query, KNOWLEDGE, profile)
+        else:
+            strategy = strategy_agent.generate_strategy(query, KNOWLEDGE, profile)
+            assessment = risk_agent.assess_risk(strategy, profile, KNOWLEDGE)
+        latencies.append((time.perf_counter() - start) * 1000)
+        compliant += within_limits(assessment, strategy, profile)
+    return {
+        "mode": mode,
+        "queries": queries,
+        "llm_calls_per_query": round(len(llm.calls) / queries, 2),
+        "prompt_tokens_per_query": round(sum(c["prompt_tokens"] for c in llm.calls) / queries),
+        "completion_tokens_per_query": round(sum(c["completion_tokens"] for c in llm.calls) / queries),
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "within_limits": compliant,
+    }
+
+
+def time_validator(repeat: int) -> float:
+    agent = RiskAgent.__new__(RiskAgent)
+    start = time.perf_counter()
+    for i in range(repeat):
+        agent.validate_allocation(RECOMMENDATIONS, PROFILES[i % len(PROFILES)])
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Two-call vs fused strategy+risk benchmark")
+    parser.add_argument("--queries", type=int, default=15)
+    parser.add_argument("--overhead-ms", type=float, default=300.0, help="Per-call network/queue overhead")
+    parser.add_argument("--prefill-ms", type=float, default=50.0, help="Prompt processing per 1k tokens")
+    parser.add_argument("--decode-ms", type=float, default=10.0, help="Generation per output token")
+    args = parser.parse_args()
+
+    llm = SimulatedLLM(args.overhead_ms, args.prefill_ms, args.decode_ms)
+    LLMClient._complete_provider = lambda client, prompt, system=None: llm(client, prompt, system)
+
+    results = [run_mode(mode, llm, args.queries) for mode in ("two_call", "fused")]
+    validator_us = time_validator(2000)
+    two_call, fused = results
+    summary = {
+        "latency_saved_pct": round(100 * (1 - fused["p50_ms"] / two_call["p50_ms"]), 1),
+        "tokens_saved_pct": round(100 * (1 - (fused["prompt_tokens_per_query"] + fused["completion_tokens_per_query"])
+                                         / (two_call["prompt_tokens_per_query"] + two_call["completion_tokens_per_query"])), 1),
+        "validator_us": round(validator_us, 1),
+    }
+
+    print(f"\n{'mode':<10}{'calls':>7}{'prompt tok':>12}{'output tok':>12}{'p50 ms':>9}{'p95 ms':>9}  within limits")
+    for r in results:
+        print(f"{r['mode']:<10}{r['llm_calls_per_query']:>7}{r['prompt_tokens_per_query']:>12}"
+              f"{r['completion_tokens_per_query']:>12}{r['p50_ms']:>9.0f}{r['p95_ms']:>9.0f}  {r['within_limits']}/{r['queries']}")
+    print(f"fused saves {summary['latency_saved_pct']}% latency and {summary['tokens_saved_pct']}% tokens; "
+          f"local validator {summary['validator_us']} us/call")
+    print("RESULT " + json.dumps({"runs": results, "summary": summary}))
+    if fused["within_limits"] != fused["queries"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
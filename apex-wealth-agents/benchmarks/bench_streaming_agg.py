@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Peak memory and time of streaming aggregation versus loading the whole file.
+
+"in-memory" is app.tools.transactions_frame.read_transactions followed by a
+groupby; "streaming" is app.tools.streaming_agg.scan_transactions with the
+given chunk size. Both compute total spend, spend per category and the top
+merchants; the script checks the results agree. Peak memory is measured with
+tracemalloc (numpy/pandas buffers included) in a second, untimed run, so it
+reflects the working set of the aggregation rather than the interpreter.
+
+Usage (from apex-wealth-agents/):
+    python benchmarks/bench_streaming_agg.py --rows 1000000
+    python benchmarks/bench_streaming_agg.py --rows 1000000 --chunk-rows 50000 100000 500000
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from benchmarks.synth_data import ensure_dataset
+
+
+def measure(fn: Callable[[], Any]) -> Tuple[Any, float, float]:
+    """(result, seconds, peak traced MB); timed and traced in separate runs"""
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 1e6
+
+
+def in_memory(path: str) -> Dict[str, Any]:
+    from app.tools.transactions_frame import read_transactions, to_rupees
+
+    df = read_transactions(path)
+    by_category = to_rupees(df.groupby("category", observed=True)["amount"].sum())
+    by_merchant = to_rupees(df.groupby("merchant", observed=True)["amount"].sum()).sort_values(ascending=False)
+    return {
+        "total": to_rupees(df["amount"].sum()),
+        "categories": by_category.to_dict(),
+        "top_merchants": list(by_merchant.head(10).items()),
+    }
+
+
+def streaming(path: str, chunk_rows: int) -> Dict[str, Any]:
+    from app.tools.streaming_agg import scan_transactions
+
+    res = scan_transactions(path, "amount", "date", dims=["category", "merchant"],
+                            topk_dims=["merchant"], chunk_rows=chunk_rows)
+    return {
+        "total": res.total,
+        "categories": res.groups["category"].rupees(),
+        "top_merchants": res.groups["merchant"].top(10),
+        "approximate": res.groups["merchant"].approximate,
+    }
+
+
+def agree(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    if not math.isclose(a["total"], b["total"], abs_tol=0.01):
+        return False
+    if set(a["categories"]) != set(b["categories"]):
+        return False
+    if any(not math.isclose(v, b["categories"][k], abs_tol=0.01) for k, v in a["categories"].items()):
+        return False
+    return [k for k, _ in a["top_merchants"]] == [k for k, _ in b["top_merchants"]]
+
+
+def bench_rows(rows: int, chunk_sizes: List[int]) -> Dict[str, Any]:
+    path = ensure_dataset(rows)
+    baseline, seconds, peak_mb = measure(lambda: in_memory(path))
+    runs = [{"mode": "in-memory", "chunk_rows": None, "seconds": round(seconds, 2), "peak_mb": round(peak_mb, 1), "match": True}]
+    for chunk_rows in chunk_sizes:
+        result, seconds, peak_mb = measure(lambda: streaming(path, chunk_rows))
+        runs.append({
+            "mode": "streaming",
+            "chunk_rows": chunk_rows,
+            "seconds": round(seconds, 2),
+            "peak_mb": round(peak_mb, 1),
+            "match": agree(baseline, result),
+            "approximate": result["approximate"],
+        })
+    return {"rows": rows, "file_mb": round(os.path.getsize(path) / 1e6, 1), "runs": runs}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming vs in-memory aggregation benchmark")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000])
+    parser.add_argument("--chunk-rows", type=int, nargs="+", default=[50_000, 250_000])
+    args = parser.parse_args()
+
+    results = [bench_rows(r, args.chunk_rows) for r in args.rows]
+
+    print(f"\n{'rows':>10}  {'mode':<22}{'seconds':>9}{'peak MB':>10}  match")
+    for r in results:
+        for run in r["runs"]:
+            label = run["mode"] if run["chunk_rows"] is None else f"streaming/{run['chunk_rows']:,}"
+            print(f"{r['rows']:>10,}  {label:<22}{run['seconds']:>9.2f}{run['peak_mb']:>10.1f}  {run['match']}")
+    print("RESULT " + json.dumps(results))
+    if not all(run["match"] for r in results for run in r["runs"]):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Benchmark worker: times each pipeline stage against one CSV in this process.
+
+Run by benchmarks/run_benchmarks.py in a fresh interpreter per dataset, with
+CSV_TRANSACTIONS_PATH and LLM_BASE_URL set in the environment (both are
+read at import time by the tools and LLMClient). Prints one line
+"RESULT {json}" with per-stage latency percentiles, throughput and peak RSS.
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, List, Optional
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+CHAT_MESSAGES = [
+    "What's my total spending this month?",
+    "Show me spending by category",
+    "What are my top merchants?",
+    "How much did I spend on Food in March 2022?",
+]
+HISTORICAL_MESSAGES = [
+    "expenditure analysis from 2019",
+    "compare my spending between 2020 and 2022",
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def summarize(latencies_ms: List[float], wall_s: float) -> Dict[str, float]:
+    return {
+        "count": len(latencies_ms),
+        "p50_ms": round(percentile(latencies_ms, 50), 2),
+        "p95_ms": round(percentile(latencies_ms, 95), 2),
+        "p99_ms": round(percentile(latencies_ms, 99), 2),
+        "mean_ms": round(sum(latencies_ms) / len(latencies_ms), 2) if latencies_ms else 0.0,
+        "throughput_rps": round(len(latencies_ms) / wall_s, 2) if wall_s > 0 else 0.0,
+    }
+
+
+def _rss_mb() -> float:
+    """Current resident set size (Linux /proc; falls back to peak RSS elsewhere)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+class RssSampler:
+    """Samples RSS in a background thread to record the peak during a stage"""
+
+    def __init__(self, interval_s: float = 0.01):
+        self.interval_s = interval_s
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self):
+        self.peak_mb = _rss_mb()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            self.peak_mb = max(self.peak_mb, _rss_mb())
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, _rss_mb())
+
+
+def run_stage(name: str, fn: Callable[[int], Any], iterations: int) -> Dict[str, Any]:
+    """Call fn(i) once cold, then `iterations` times; record latencies and errors"""
+    errors: List[str] = []
+
+    def call(i: int) -> float:
+        start = time.perf_counter()
+        try:
+            result = fn(i)
+            if isinstance(result, dict) and result.get("status") == "error":
+                errors.append(str(result.get("answer") or result.get("error"))[:200])
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}"[:200])
+        return (time.perf_counter() - start) * 1000
+
+    rss_before = _rss_mb()
+    with RssSampler() as sampler:
+        cold_ms = call(0)
+        latencies: List[float] = []
+        wall_start = time.perf_counter()
+        for i in range(iterations):
+            latencies.append(call(i + 1))
+        wall_s = time.perf_counter() - wall_start
+
+    out = {
+        "stage": name,
+        "cold_ms": round(cold_ms, 2),
+        **summarize(latencies, wall_s),
+        "rss_before_mb": round(rss_before, 1),
+        "peak_rss_mb": round(sampler.peak_mb, 1),
+        "errors": len(errors),
+    }
+    if errors:
+        out["first_error"] = errors[0]
+    print(f"STAGE {name:<34} p50={out['p50_ms']:>9.1f}ms p95={out['p95_ms']:>9.1f}ms "
+          f"peak_rss={out['peak_rss_mb']:>7.1f}MB errors={len(errors)}", file=sys.stderr)
+    return out
+
+
+def _tool_stages(client) -> Dict[str, Callable[[int], Any]]:
+    def get(path: str, **params):
+        def fn(_i: int):
+            resp = client.get(path, params=params or None)
+            if resp.status_code >= 400:
+                raise RuntimeError(f"HTTP {resp.status_code}")
+            return resp.json()
+        return fn
+
+    def post(path: str, payload: Dict[str, Any]):
+        def fn(_i: int):
+            resp = client.post(path, json=payload)
+            if resp.status_code >= 400:
+                raise RuntimeError(f"HTTP {resp.status_code}")
+            return resp.json()
+        return fn
+
+    return {
+        "/tools/describe_csv": get("/tools/describe_csv"),
+        "/tools/spend_aggregate": get("/tools/spend_aggregate"),
+        "/tools/spend_aggregate?month": get("/tools/spend_aggregate", month="2022-03"),
+        "/tools/top_merchants": get("/tools/top_merchants", n=10),
+        "/tools/query_csv": post("/tools/query_csv", {
+            "sql": "SELECT category, SUM(amount) AS total FROM t GROUP BY category ORDER BY total DESC",
+            "limit": 100,
+        }),
+        "/tools/categorize_txn": post("/tools/categorize_txn", {"user_id": "bench", "tx_ids": []}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time pipeline stages against the configured CSV")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--stages", default="tools,chat,historical",
+                        help="Comma-separated groups: tools, chat, historical")
+    args = parser.parse_args()
+    groups = {g.strip() for g in args.stages.split(",") if g.strip()}
+
+    import_start = time.perf_counter()
+    from fastapi.testclient import TestClient
+    import app.main
+    import_s = time.perf_counter() - import_start
+
+    results: List[Dict[str, Any]] = []
+    with TestClient(app.main.app, raise_server_exceptions=False) as client:
+        if "tools" in groups:
+            for name, fn in _tool_stages(client).items():
+                results.append(run_stage(name, fn, args.iterations))
+
+        if "chat" in groups:
+            from orchestrator import chat
+            # Full pipeline (LLM) as in earlier baselines, then the templated quick answers
+            os.environ["APEX_QUICK_ANSWERS"] = "off"
+            results.append(run_stage(
+                "orchestrator.chat",
+                lambda i: chat(CHAT_MESSAGES[i % len(CHAT_MESSAGES)], []),
+                args.iterations,
+            ))
+            os.environ["APEX_QUICK_ANSWERS"] = "template"
+            results.append(run_stage(
+                "orchestrator.chat.quick",
+                lambda i: chat(CHAT_MESSAGES[i % len(CHAT_MESSAGES)], []),
+                args.iterations,
+            ))
+
+        if "historical" in groups:
+            from enhanced_orchestrator import process_historical_query
+            results.append(run_stage(
+                "process_historical_query",
+                lambda i: process_historical_query(HISTORICAL_MESSAGES[i % len(HISTORICAL_MESSAGES)], []),
+                args.iterations,
+            ))
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    report = {
+        "csv_path": os.getenv("CSV_TRANSACTIONS_PATH"),
+        "import_s": round(import_s, 3),
+        "iterations": args.iterations,
+        "process_peak_rss_mb": round(peak / 1e6 if sys.platform == "darwin" else peak / 1e3, 1),
+        "stages": results,
+    }
+    print("RESULT " + json.dumps(report))
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception:
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark suite for the chat pipeline.
+
+For each dataset size this generates (and caches) a synthetic
+transactions CSV, starts the stub LLM server from scripts/stub_llm_server.py
+with the configured latency, and runs benchmarks/bench_worker.py in a fresh
+interpreter pointed at both. Each run reports p50/p95/p99 latency,
+throughput and peak RSS per stage and is saved as a JSON baseline, so
+regressions between commits show up with --compare.
+
+Usage (from apex-wealth-agents/):
+    python benchmarks/run_benchmarks.py --rows 10000 100000 --iterations 20
+    python benchmarks/run_benchmarks.py --rows 10000000 --stages tools --iterations 3
+    python benchmarks/run_benchmarks.py --rows 100000 --compare benchmarks/baselines/<file>.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+from benchmarks.synth_data import ensure_dataset
+from scripts.stub_llm_server import start_stub_server
+
+BASELINE_DIR = os.path.join(BASE_DIR, "benchmarks", "baselines")
+WORKER = os.path.join(BASE_DIR, "benchmarks", "bench_worker.py")
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_dataset(rows: int, llm_url: str, iterations: int, stages: str, seed: int) -> Dict[str, Any]:
+    """Benchmark one dataset size in a fresh interpreter"""
+    csv_path = ensure_dataset(rows, seed=seed)
+    env = {
+        **os.environ,
+        "CSV_TRANSACTIONS_PATH": csv_path,
+        "LLM_BASE_URL": llm_url,
+        "LLM_PROVIDER": "free",
+        "APEX_WARMUP": "none",
+    }
+    print(f"\n== {rows:,} rows ==", file=sys.stderr)
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, WORKER, "--iterations", str(iterations), "--stages", stages],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True
+    )
+    for line in proc.stderr.splitlines():
+        if line.startswith("STAGE "):
+            print("  " + line[len("STAGE "):], file=sys.stderr)
+    for line in proc.stdout.splitlines():
+        if line.startswith("RESULT "):
+            result = json.loads(line[len("RESULT "):])
+            result["rows"] = rows
+            result["wall_s"] = round(time.perf_counter() - start, 2)
+            return result
+    raise RuntimeError(f"Benchmark worker failed for {rows} rows:\n{proc.stderr[-3000:]}")
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold_pct: float) -> List[str]:
+    """List stages whose p50/p95 regressed by more than threshold_pct versus the baseline"""
+    def index(report):
+        return {(d["rows"], s["stage"]): s for d in report["datasets"] for s in d["stages"]}
+
+    old, regressions = index(baseline), []
+    for key, stage in index(current).items():
+        prev = old.get(key)
+        if not prev:
+            continue
+        for metric in ("p50_ms", "p95_ms", "peak_rss_mb"):
+            before, after = prev.get(metric) or 0, stage.get(metric) or 0
+            if before > 0 and (after - before) / before * 100 > threshold_pct:
+                regressions.append(
+                    f"{key[0]:>10,} rows  {key[1]:<34} {metric:<12} {before:>10.1f} -> {after:>10.1f} "
+                    f"(+{(after - before) / before * 100:.0f}%)"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmarks with a stub LLM")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000],
+                        help="Dataset sizes (10k to 10M)")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--stages", default="tools,chat,historical")
+    parser.add_argument("--llm-latency-ms", type=float, default=200)
+    parser.add_argument("--llm-jitter-ms", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--label", default=None, help="Baseline name (default: <commit>-<timestamp>)")
+    parser.add_argument("--out", default=None, help="Baseline JSON path (default: benchmarks/baselines/<label>.json)")
+    parser.add_argument("--compare", default=None, help="Baseline JSON to compare against")
+    parser.add_argument("--threshold-pct", type=float, default=20.0, help="Regression threshold for --compare")
+    args = parser.parse_args()
+
+    server = start_stub_server(latency_ms=args.llm_latency_ms, jitter_ms=args.llm_jitter_ms)
+    llm_url = f"http://127.0.0.1:{server.server_address[1]}/api/chat"
+    try:
+        datasets = [run_dataset(rows, llm_url, args.iterations, args.stages, args.seed) for rows in args.rows]
+    finally:
+        server.shutdown()
+
+    commit = _git_commit()
+    now = datetime.datetime.now()
+    report = {
+        "label": args.label or f"{commit or 'nocommit'}-{now:%Y%m%d-%H%M%S}",
+        "commit": commit,
+        "created_at": now.isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            "iterations": args.iterations,
+            "stages": args.stages,
+            "llm_latency_ms": args.llm_latency_ms,
+            "llm_jitter_ms": args.llm_jitter_ms,
+            "seed": args.seed,
+        },
+        "datasets": datasets,
+    }
+
+    out = args.out or os.path.join(BASELINE_DIR, f"{report['label']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{'rows':>10}  {'stage':<34}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}{'peak MB':>9}{'err':>5}")
+    for d in datasets:
+        for s in d["stages"]:
+            print(f"{d['rows']:>10,}  {s['stage']:<34}{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}"
+                  f"{s['p99_ms']:>10.1f}{s['throughput_rps']:>9.1f}{s['peak_rss_mb']:>9.1f}{s['errors']:>5}")
+    print(f"\nBaseline saved to {out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold_pct)
+        print(f"\nCompared with {baseline.get('label')} (threshold {args.threshold_pct:.0f}%):")
+        print("\n".join(regressions) if regressions else "No regressions")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
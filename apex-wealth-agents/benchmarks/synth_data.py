@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Synthetic transactions.csv generator for benchmarks.
+
+Writes the same columns as data/transactions.csv (date, category, merchant,
+amount, monthly_expense_total, monthly_income, budget_goal) in chunks, so
+10M-row files can be produced without holding them in memory. Output is
+deterministic for a given (rows, seed).
+
+Usage (from apex-wealth-agents/):
+    python benchmarks/synth_data.py --rows 1000000 --out benchmarks/.data/tx_1000000.csv
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+CATEGORIES = [
+    "Food", "Groceries", "Transport", "Shopping", "Utilities",
+    "Fuel", "Travel", "Rent", "Entertainment", "Health",
+]
+MERCHANTS = [
+    "Swiggy", "Zomato", "BigBasket", "DMart", "Uber", "Ola", "Amazon", "Flipkart",
+    "Myntra", "Airtel", "Jio", "BESCOM", "Indian Oil", "HP Petrol", "IRCTC",
+    "MakeMyTrip", "Landlord", "PVR", "Netflix", "Apollo Pharmacy",
+]
+START_DATE = np.datetime64("2018-01-01")
+DAYS = 365 * 7
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".data")
+
+
+def _chunk(rng: np.random.Generator, n: int) -> pd.DataFrame:
+    dates = START_DATE + rng.integers(0, DAYS, n).astype("timedelta64[D]")
+    amounts = np.round(rng.lognormal(mean=6.5, sigma=1.0, size=n), 2)
+    return pd.DataFrame({
+        "date": pd.to_datetime(dates).strftime("%Y-%m-%d"),
+        "category": rng.choice(CATEGORIES, n),
+        "merchant": rng.choice(MERCHANTS, n),
+        "amount": amounts,
+        "monthly_expense_total": amounts,
+        "monthly_income": 80000,
+        "budget_goal": 60000,
+    })
+
+
+def generate_transactions(rows: int, path: str, seed: int = 42, chunk_rows: int = 500_000) -> str:
+    """
+    Write a synthetic transactions CSV
+
+    Args:
+        rows: Number of data rows
+        path: Output CSV path (parent directories are created)
+        seed: RNG seed (same seed and rows give the same file)
+        chunk_rows: Rows generated and written per chunk
+
+    Returns:
+        The output path
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    rng = np.random.default_rng(seed)
+    tmp_path = path + ".tmp"
+    written = 0
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        while written < rows:
+            n = min(chunk_rows, rows - written)
+            _chunk(rng, n).to_csv(f, header=(written == 0), index=False)
+            written += n
+    os.replace(tmp_path, path)
+    return path
+
+
+def dataset_path(rows: int, seed: int = 42) -> str:
+    return os.path.join(DATA_DIR, f"tx_{rows}_{seed}.csv")
+
+
+def ensure_dataset(rows: int, seed: int = 42) -> str:
+    """Return a cached synthetic CSV of the given size, generating it if needed"""
+    path = dataset_path(rows, seed)
+    if not os.path.exists(path):
+        start = time.perf_counter()
+        generate_transactions(rows, path, seed=seed)
+        print(f"Generated {rows:,} rows -> {path} ({time.perf_counter() - start:.1f}s)")
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic transactions CSV")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default=None, help="Output path (default: benchmarks/.data/tx_<rows>_<seed>.csv)")
+    args = parser.parse_args()
+
+    path = args.out or dataset_path(args.rows, args.seed)
+    start = time.perf_counter()
+    generate_transactions(args.rows, path, seed=args.seed)
+    size_mb = os.path.getsize(path) / 1e6
+    print(f"Wrote {args.rows:,} rows ({size_mb:.1f} MB) to {path} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,17 @@
 """
 Configuration module for ApexWealth
 """
-from .mongodb_config import get_mongodb_connection_string, setup_mongodb_env
+from .mongodb_config import (
+    get_mongodb_connection_string,
+    get_mongodb_database_name,
+    get_mongodb_pool_settings,
+    setup_mongodb_env,
+)
 
-__all__ = ["get_mongodb_connection_string", "setup_mongodb_env"]
+__all__ = [
+    "get_mongodb_connection_string",
+    "get_mongodb_database_name",
+    "get_mongodb_pool_settings",
+    "setup_mongodb_env",
+]
 
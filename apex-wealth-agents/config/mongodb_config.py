@@ -2,7 +2,7 @@
 MongoDB Configuration Helper
 """
 import os
-from typing import Optional
+from typing import Any, Dict, Optional
 
 
 def get_mongodb_connection_string() -> Optional[str]:
@@ -32,6 +32,40 @@ def get_mongodb_connection_string() -> Optional[str]:
     return None
 
 
+def get_mongodb_database_name() -> str:
+    """Database name from MONGODB_DATABASE (default: apexwealth)"""
+    return os.getenv("MONGODB_DATABASE", "apexwealth")
+
+
+def get_mongodb_pool_settings() -> Dict[str, Any]:
+    """
+    Connection pool settings for the async (motor) client
+    
+    Environment overrides:
+      - MONGODB_MAX_POOL_SIZE (default: 50)
+      - MONGODB_MIN_POOL_SIZE (default: 2)
+      - MONGODB_MAX_IDLE_MS (default: 60000)
+      - MONGODB_SERVER_SELECTION_TIMEOUT_MS (default: 3000)
+      - MONGODB_CONNECT_TIMEOUT_MS (default: 5000)
+    
+    Returns:
+        Keyword arguments for AsyncIOMotorClient
+    """
+    def _int(name: str, default: int) -> int:
+        try:
+            return int(os.getenv(name, default))
+        except (TypeError, ValueError):
+            return default
+    
+    return {
+        "maxPoolSize": _int("MONGODB_MAX_POOL_SIZE", 50),
+        "minPoolSize": _int("MONGODB_MIN_POOL_SIZE", 2),
+        "maxIdleTimeMS": _int("MONGODB_MAX_IDLE_MS", 60000),
+        "serverSelectionTimeoutMS": _int("MONGODB_SERVER_SELECTION_TIMEOUT_MS", 3000),
+        "connectTimeoutMS": _int("MONGODB_CONNECT_TIMEOUT_MS", 5000),
+    }
+
+
 def setup_mongodb_env(
     username: str,
     password: str,
@@ -1,7 +1,27 @@
 """
 Database module for ApexWealth
 """
-from .mongodb_service import MongoDBService, get_mongodb_service
+from .async_mongodb_service import (
+    AsyncMongoDBService,
+    BlockingMongoAdapter,
+    get_async_mongodb_service,
+    load_file_profile,
+)
+from .profile_cache import ProfileCache, get_profile_cache
 
-__all__ = ["MongoDBService", "get_mongodb_service"]
+try:
+    from .mongodb_service import MongoDBService, get_mongodb_service
+except ImportError:  # blocking pymongo service is optional
+    MongoDBService = None
+    get_mongodb_service = None
 
+__all__ = [
+    "AsyncMongoDBService",
+    "BlockingMongoAdapter",
+    "MongoDBService",
+    "ProfileCache",
+    "get_async_mongodb_service",
+    "get_mongodb_service",
+    "get_profile_cache",
+    "load_file_profile",
+]
@@ -0,0 +1,327 @@
+"""
+Async MongoDB access layer (motor) for profiles and personalization metadata
+
+- One pooled AsyncIOMotorClient per process (pool sizes from config)
+- Connection health is checked periodically by a background task, so
+  request paths read a cached flag instead of pinging before every call
+- Bulk reads ($in queries) for profiles and CSV metadata
+
+Collections (same as the blocking service):
+  - user_profiles: {user_id, ...profile fields, created_at, updated_at}
+  - user_personalization: {user_id, metadata, upload_date, updated_at}
+  - user_models: {user_id, model_info, trained_at, updated_at}
+
+For tests, pass any motor-compatible client, e.g.
+``AsyncMongoDBService(client=mongomock_motor.AsyncMongoMockClient())`` or
+point MONGODB_URI at a local ``mongod``.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Dict, List, Optional
+
+from config.mongodb_config import (
+    get_mongodb_connection_string,
+    get_mongodb_database_name,
+    get_mongodb_pool_settings,
+)
+
+PROFILES = "user_profiles"
+PERSONALIZATION = "user_personalization"
+MODELS = "user_models"
+
+_STATE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "state"))
+PROFILE_PATH = os.path.join(_STATE_DIR, "profile.json")
+
+
+def _strip_id(doc: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if doc is not None:
+        doc.pop("_id", None)
+    return doc
+
+
+class AsyncMongoDBService:
+    """Pooled async MongoDB service with background health checks"""
+
+    def __init__(
+        self,
+        connection_string: Optional[str] = None,
+        database_name: Optional[str] = None,
+        client: Any = None,
+        health_interval: Optional[float] = None
+    ):
+        """
+        Args:
+            connection_string: MongoDB URI (default: from MONGODB_URI / credentials)
+            database_name: Database name (default: MONGODB_DATABASE or apexwealth)
+            client: Pre-built motor-compatible client (tests, mongomock)
+            health_interval: Seconds between background pings (default: MONGODB_HEALTH_INTERVAL or 30)
+        """
+        self.connection_string = connection_string or get_mongodb_connection_string()
+        self.database_name = database_name or get_mongodb_database_name()
+        self.health_interval = float(health_interval or os.getenv("MONGODB_HEALTH_INTERVAL", 30))
+        self.client = client
+        self.db = None
+        self._healthy = False
+        self._last_check: Optional[float] = None
+        self._last_error: Optional[str] = None
+        self._health_task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    # ---- lifecycle -------------------------------------------------------
+
+    @property
+    def configured(self) -> bool:
+        return self.client is not None or bool(self.connection_string)
+
+    async def start(self) -> bool:
+        """Create the client, verify connectivity, ensure indexes and start health checks"""
+        if not self.configured:
+            self._last_error = "MongoDB not configured (set MONGODB_URI)"
+            return False
+        self._loop = asyncio.get_running_loop()
+        if self.client is None:
+            try:
+                from motor.motor_asyncio import AsyncIOMotorClient
+            except ImportError:
+                self._last_error = "motor not installed. Install with: pip install motor"
+                print(f"⚠️  {self._last_error}")
+                return False
+            self.client = AsyncIOMotorClient(self.connection_string, **get_mongodb_pool_settings())
+        self.db = self.client[self.database_name]
+
+        if await self.check_health():
+            await self._ensure_indexes()
+            print(f"✅ Connected to MongoDB: {self.database_name}")
+        else:
+            print(f"⚠️  MongoDB connection failed: {self._last_error}")
+            print("⚠️  Falling back to file-based storage")
+
+        if self.health_interval > 0 and self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_loop())
+        return self._healthy
+
+    async def close(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        if self.client is not None and hasattr(self.client, "close"):
+            self.client.close()
+        self._healthy = False
+
+    async def check_health(self) -> bool:
+        """Ping the server once and update the cached connection state"""
+        try:
+            await self.client.admin.command("ping")
+            self._healthy = True
+            self._last_error = None
+        except Exception as e:
+            self._healthy = False
+            self._last_error = str(e)
+        self._last_check = time.time()
+        return self._healthy
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            was_healthy = self._healthy
+            if await self.check_health() and not was_healthy:
+                await self._ensure_indexes()
+                print(f"✅ Reconnected to MongoDB: {self.database_name}")
+
+    async def _ensure_indexes(self) -> None:
+        try:
+            for name in (PROFILES, PERSONALIZATION, MODELS):
+                await self.db[name].create_index("user_id", unique=True)
+        except Exception as e:
+            print(f"Could not create MongoDB indexes: {e}")
+
+    def is_connected(self) -> bool:
+        """Last known connection state (no network round-trip)"""
+        return self._healthy and self.db is not None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "mongodb_connected": self.is_connected(),
+            "database_name": self.database_name if self.is_connected() else None,
+            "status": "connected" if self.is_connected() else "disconnected",
+            "last_health_check": datetime.fromtimestamp(self._last_check).isoformat() if self._last_check else None,
+            "last_error": self._last_error,
+        }
+
+    def run_sync(self, coro: Awaitable[Any], timeout: Optional[float] = 10.0) -> Any:
+        """
+        Run a coroutine on the service's event loop from a worker thread
+
+        Lets blocking code (agents, PersonalizationEngine) running on the
+        thread pools reuse the same pooled client.
+        """
+        if self._loop is None or not self._loop.is_running():
+            coro.close()
+            raise RuntimeError("Async MongoDB service is not running")
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    # ---- profiles --------------------------------------------------------
+
+    async def create_user_profile(self, user_id: str, profile: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            now = datetime.utcnow()
+            doc = {k: v for k, v in profile.items() if k != "_id"}
+            doc["user_id"] = user_id
+            doc["updated_at"] = now
+            await self.db[PROFILES].update_one(
+                {"user_id": user_id},
+                {"$set": doc, "$setOnInsert": {"created_at": now}},
+                upsert=True
+            )
+            return {"success": True, "user_id": user_id}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    async def get_user_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return _strip_id(await self.db[PROFILES].find_one({"user_id": user_id}))
+
+    async def get_user_profiles(self, user_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Batched profile read: one $in query for many users"""
+        if not user_ids:
+            return {}
+        cursor = self.db[PROFILES].find({"user_id": {"$in": list(user_ids)}})
+        return {doc["user_id"]: _strip_id(doc) async for doc in cursor}
+
+    async def update_user_profile(self, user_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            fields = {k: v for k, v in updates.items() if k not in ("_id", "user_id")}
+            fields["updated_at"] = datetime.utcnow()
+            result = await self.db[PROFILES].update_one({"user_id": user_id}, {"$set": fields})
+            if result.matched_count == 0:
+                return {"success": False, "error": "Profile not found"}
+            return {"success": True, "user_id": user_id, "modified": result.modified_count}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    async def delete_user_profile(self, user_id: str) -> Dict[str, Any]:
+        try:
+            result = await self.db[PROFILES].delete_one({"user_id": user_id})
+            if result.deleted_count == 0:
+                return {"success": False, "error": "Profile not found"}
+            return {"success": True, "user_id": user_id}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    async def list_all_users(self) -> List[str]:
+        return await self.db[PROFILES].distinct("user_id")
+
+    # ---- personalization metadata ------------------------------------------
+
+    async def save_user_csv_metadata(self, user_id: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            now = datetime.utcnow()
+            await self.db[PERSONALIZATION].update_one(
+                {"user_id": user_id},
+                {"$set": {"metadata": metadata, "upload_date": now, "updated_at": now}},
+                upsert=True
+            )
+            return {"success": True, "user_id": user_id}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    async def get_user_csv_metadata(self, user_id: str) -> Optional[Dict[str, Any]]:
+        doc = await self.db[PERSONALIZATION].find_one({"user_id": user_id}, {"metadata": 1})
+        return doc.get("metadata") if doc else None
+
+    async def get_users_csv_metadata(self, user_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Batched metadata read: one $in query for many users"""
+        if not user_ids:
+            return {}
+        cursor = self.db[PERSONALIZATION].find(
+            {"user_id": {"$in": list(user_ids)}}, {"user_id": 1, "metadata": 1}
+        )
+        return {doc["user_id"]: doc.get("metadata") async for doc in cursor}
+
+    async def save_model_info(self, user_id: str, model_info: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            now = datetime.utcnow()
+            await self.db[MODELS].update_one(
+                {"user_id": user_id},
+                {"$set": {"model_info": model_info, "trained_at": now, "updated_at": now}},
+                upsert=True
+            )
+            return {"success": True, "user_id": user_id}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def blocking(self) -> "BlockingMongoAdapter":
+        """Synchronous view of this service for code running on worker threads"""
+        return BlockingMongoAdapter(self)
+
+
+class BlockingMongoAdapter:
+    """
+    Exposes the blocking service's method names on top of AsyncMongoDBService
+
+    Calls are dispatched onto the service's event loop; is_connected() reads
+    the cached health flag instead of pinging.
+    """
+
+    def __init__(self, service: AsyncMongoDBService, timeout: float = 10.0):
+        self._service = service
+        self._timeout = timeout
+        self.database_name = service.database_name
+
+    def is_connected(self) -> bool:
+        return self._service.is_connected()
+
+    def __getattr__(self, name: str):
+        method = getattr(self._service, name)
+        if not asyncio.iscoroutinefunction(method):
+            return method
+
+        def call(*args, **kwargs):
+            return self._service.run_sync(method(*args, **kwargs), timeout=self._timeout)
+        return call
+
+
+# File-based fallback profile, re-read only when the file changes
+_file_profile: Optional[Dict[str, Any]] = None
+_file_profile_mtime: Optional[float] = None
+_file_profile_lock = threading.Lock()
+
+
+def load_file_profile(path: str = PROFILE_PATH) -> Optional[Dict[str, Any]]:
+    """Return state/profile.json, cached by mtime (None if missing or invalid)"""
+    global _file_profile, _file_profile_mtime
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _file_profile_lock:
+        if _file_profile_mtime != mtime:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    _file_profile = json.load(f)
+            except (OSError, ValueError):
+                _file_profile = None
+            _file_profile_mtime = mtime
+        return dict(_file_profile) if _file_profile is not None else None
+
+
+# Default instance
+_default_async_service: Optional[AsyncMongoDBService] = None
+_default_async_service_lock = threading.Lock()
+
+
+def get_async_mongodb_service() -> AsyncMongoDBService:
+    """Get or create the process-wide async MongoDB service (call start() once on the event loop)"""
+    global _default_async_service
+    if _default_async_service is None:
+        with _default_async_service_lock:
+            if _default_async_service is None:
+                _default_async_service = AsyncMongoDBService()
+    return _default_async_service
@@ -0,0 +1,145 @@
+"""
+Read-through per-user profile cache
+
+Profiles are read on every investment query (RiskAgent) and for every advisor
+prompt. The cache keeps MongoDB results per user for APEX_PROFILE_CACHE_TTL
+seconds (default 300) and is updated by the profile endpoints on write, so a
+PUT /profile/{user_id} is visible on the next chat turn without a restart.
+
+Without a user_id, or when MongoDB is unavailable, the file profile
+(state/profile.json, mtime-cached) is used.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .async_mongodb_service import get_async_mongodb_service, load_file_profile
+
+_MISSING = object()
+
+
+class ProfileCache:
+    """TTL + LRU cache of user profiles in front of the async MongoDB service"""
+
+    def __init__(self, ttl: Optional[float] = None, max_entries: int = 1024, service: Any = None):
+        """
+        Args:
+            ttl: Seconds an entry stays fresh (default: APEX_PROFILE_CACHE_TTL or 300)
+            max_entries: Oldest entries are evicted beyond this size
+            service: AsyncMongoDBService (default: process-wide instance)
+        """
+        self.ttl = float(ttl if ttl is not None else os.getenv("APEX_PROFILE_CACHE_TTL", 300))
+        self.max_entries = max_entries
+        self._service = service
+        self._entries: "OrderedDict[str, Tuple[float, Optional[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def service(self):
+        if self._service is None:
+            self._service = get_async_mongodb_service()
+        return self._service
+
+    def _lookup(self, user_id: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+                return _MISSING
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return dict(entry[1]) if entry[1] is not None else None
+
+    def put(self, user_id: str, profile: Optional[Dict[str, Any]]) -> None:
+        """Store a profile (write-through from the profile endpoints); None caches 'not found'"""
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, dict(profile) if profile is not None else None)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: Optional[str] = None) -> None:
+        """Drop one user's entry, or all entries when user_id is None"""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+    def get(self, user_id: Optional[str] = None, fallback: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Profile for user_id (blocking; call from worker threads, not the event loop)
+
+        Args:
+            user_id: User to look up; None returns the file profile
+            fallback: Use the file profile when MongoDB has none
+
+        Returns:
+            Profile dict from MongoDB, else the file profile (if fallback), else None
+        """
+        if user_id:
+            cached = self._lookup(user_id)
+            if cached is not None and cached is not _MISSING:
+                return cached
+            if cached is None:
+                return load_file_profile() if fallback else None
+            service = self.service
+            if service.is_connected():
+                try:
+                    profile = service.run_sync(service.get_user_profile(user_id))
+                    self.put(user_id, profile)
+                    if profile is not None:
+                        return profile
+                except Exception as e:
+                    print(f"Profile lookup failed for {user_id}: {e}")
+        return load_file_profile() if fallback else None
+
+    async def aget(self, user_id: Optional[str] = None, fallback: bool = True) -> Optional[Dict[str, Any]]:
+        """Async variant of get() for request handlers on the event loop"""
+        if user_id:
+            cached = self._lookup(user_id)
+            if cached is not None and cached is not _MISSING:
+                return cached
+            if cached is None:
+                return load_file_profile() if fallback else None
+            service = self.service
+            if service.is_connected():
+                try:
+                    profile = await service.get_user_profile(user_id)
+                    self.put(user_id, profile)
+                    if profile is not None:
+                        return profile
+                except Exception as e:
+                    print(f"Profile lookup failed for {user_id}: {e}")
+        return load_file_profile() if fallback else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._entries)
+        total = self.hits + self.misses
+        return {
+            "entries": size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+# Default instance
+_default_profile_cache: Optional[ProfileCache] = None
+_default_profile_cache_lock = threading.Lock()
+
+
+def get_profile_cache() -> ProfileCache:
+    """Get or create the process-wide profile cache"""
+    global _default_profile_cache
+    if _default_profile_cache is None:
+        with _default_profile_cache_lock:
+            if _default_profile_cache is None:
+                _default_profile_cache = ProfileCache()
+    return _default_profile_cache
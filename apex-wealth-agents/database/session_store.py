@@ -0,0 +1,344 @@
+"""
+Server-side chat sessions keyed by ChatReq.session_id
+
+Clients used to resend the whole conversation as `context` on every turn and
+the orchestrator pasted the last five messages verbatim into the prompt.
+The store keeps each session's history server-side and, per session, only:
+
+  - a rolling summary: each turn leaving the "last turn" slot is folded in
+    as one line (the question and the first sentence of the answer, both
+    truncated); the oldest lines are dropped past a character budget
+  - the last turn (the answer clipped to 1000 characters)
+
+so what goes into prompts is bounded however long the conversation runs.
+The summary is extractive, so keeping it up to date costs no LLM call.
+
+Sessions live in an in-memory LRU. With APEX_SESSION_DB set they are also
+written to SQLite (summary, last turn and the full turn log), so they
+survive restarts and are shared by worker processes.
+
+Environment overrides:
+  - APEX_SESSIONS=0 disables the store (prompts use the request context)
+  - APEX_SESSION_MAX=1024 sessions kept in memory
+  - APEX_SESSION_SUMMARY_CHARS=800 summary budget
+  - APEX_SESSION_DB=path/to/sessions.sqlite3 enables persistence
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+QUESTION_CHARS = 120
+ANSWER_CHARS = 160
+LAST_ANSWER_CHARS = 1000
+
+
+def sessions_enabled() -> bool:
+    return os.getenv("APEX_SESSIONS", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(str(text or "").split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+def _first_sentence(answer: str) -> str:
+    # Drop markdown bullets/headers so the line keeps the substance
+    text = re.sub(r"[*#`>]+", "", str(answer or ""))
+    text = " ".join(text.split())
+    match = re.search(r"(.+?[.!?])(\s|$)", text)
+    return match.group(1) if match else text
+
+
+def summary_line(user: str, assistant: str) -> str:
+    """One summary line for a completed turn"""
+    return f"- Q: {_clip(user, QUESTION_CHARS)} | A: {_clip(_first_sentence(assistant), ANSWER_CHARS)}"
+
+
+class Session:
+    """Rolling summary plus the last turn of one conversation"""
+
+    def __init__(self, session_id: str, summary: str = "", last_user: str = "", last_assistant: str = "",
+                 turns: int = 0, updated_at: float = 0.0):
+        self.session_id = session_id
+        self.summary = summary
+        self.last_user = last_user
+        self.last_assistant = last_assistant
+        self.turns = turns
+        self.updated_at = updated_at or time.time()
+
+    def add_turn(self, user: str, assistant: str, summary_chars: int) -> None:
+        """Fold the previous last turn into the summary and make this one the last turn"""
+        if self.turns:
+            lines = self.summary.splitlines() if self.summary else []
+            lines.append(summary_line(self.last_user, self.last_assistant))
+            while lines and len("\n".join(lines)) > summary_chars:
+                lines.pop(0)
+            self.summary = "\n".join(lines)
+        self.last_user = str(user or "")
+        self.last_assistant = str(assistant or "")
+        self.turns += 1
+        self.updated_at = time.time()
+
+    def messages(self) -> List[Dict[str, str]]:
+        """Prompt context in the request `context` shape: summary, then the last turn"""
+        out: List[Dict[str, str]] = []
+        if self.summary:
+            out.append({"role": "summary", "content": "Earlier in this conversation:\n" + self.summary})
+        if self.turns:
+            out.append({"role": "user", "content": self.last_user})
+            out.append({"role": "assistant", "content": _clip(self.last_assistant, LAST_ANSWER_CHARS)})
+        return out
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "turns": self.turns,
+            "summary": self.summary,
+            "last_turn": {"user": self.last_user, "assistant": self.last_assistant} if self.turns else None,
+            "updated_at": self.updated_at,
+        }
+
+
+class _SQLiteSessions:
+    """Session rows and the turn log in one SQLite file (shared by worker processes)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._con = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._lock = threading.Lock()
+        with self._lock, self._con:
+            self._con.execute("PRAGMA journal_mode=WAL")
+            self._con.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, summary TEXT, "
+                "last_user TEXT, last_assistant TEXT, turns INTEGER, updated_at REAL)")
+            self._con.execute(
+                "CREATE TABLE IF NOT EXISTS turns (session_id TEXT, seq INTEGER, user TEXT, assistant TEXT, "
+                "created_at REAL, PRIMARY KEY (session_id, seq))")
+
+    def turns(self, session_id: str) -> Optional[int]:
+        with self._lock:
+            row = self._con.execute("SELECT turns FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return row[0] if row else None
+
+    def load(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            row = self._con.execute(
+                "SELECT session_id, summary, last_user, last_assistant, turns, updated_at "
+                "FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return Session(*row) if row else None
+
+    def save(self, session: Session) -> None:
+        with self._lock, self._con:
+            self._con.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?)",
+                (session.session_id, session.summary, session.last_user, session.last_assistant,
+                 session.turns, session.updated_at))
+            self._con.execute(
+                "INSERT OR REPLACE INTO turns VALUES (?, ?, ?, ?, ?)",
+                (session.session_id, session.turns, session.last_user, session.last_assistant, session.updated_at))
+
+    def delete(self, session_id: str) -> None:
+        with self._lock, self._con:
+            self._con.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._con.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+
+    def history(self, session_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._con.execute(
+                "SELECT seq, user, assistant, created_at FROM turns WHERE session_id = ? ORDER BY seq",
+                (session_id,)).fetchall()
+        return [{"turn": r[0], "user": r[1], "assistant": r[2], "created_at": r[3]} for r in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._con.close()
+
+
+class SessionStore:
+    """LRU of sessions in memory, optionally backed by SQLite"""
+
+    def __init__(self, max_sessions: Optional[int] = None, summary_chars: Optional[int] = None,
+                 db_path: Optional[str] = None):
+        """
+        Args:
+            max_sessions: Least recently used sessions are evicted beyond this (default: APEX_SESSION_MAX or 1024)
+            summary_chars: Rolling summary budget (default: APEX_SESSION_SUMMARY_CHARS or 800)
+            db_path: SQLite file for persistence (default: APEX_SESSION_DB; unset keeps sessions in memory only)
+        """
+        self.max_sessions = int(max_sessions or os.getenv("APEX_SESSION_MAX", 1024))
+        self.summary_chars = int(summary_chars or os.getenv("APEX_SESSION_SUMMARY_CHARS", 800))
+        db_path = db_path if db_path is not None else os.getenv("APEX_SESSION_DB")
+        self._db: Optional[_SQLiteSessions] = None
+        if db_path:
+            try:
+                self._db = _SQLiteSessions(db_path)
+            except Exception as e:
+                print(f"Session DB unavailable ({db_path}): {e}. Keeping sessions in memory only.")
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+
+    @property
+    def persistent(self) -> bool:
+        return self._db is not None
+
+    def _remember(self, session: Session) -> None:
+        self._sessions[session.session_id] = session
+        self._sessions.move_to_end(session.session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def _fetch(self, session_id: str) -> Tuple[Optional[Session], str]:
+        """(session, "hit" | "load" | "miss"): memory first, reloaded if another worker moved it on"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+        if self._db is not None:
+            try:
+                stored_turns = self._db.turns(session_id)
+                if stored_turns is not None and (session is None or stored_turns != session.turns):
+                    session = self._db.load(session_id)
+                    with self._lock:
+                        self._remember(session)
+                    return session, "load"
+            except Exception as e:
+                print(f"Session DB read failed: {e}")
+        return session, ("miss" if session is None else "hit")
+
+    def get(self, session_id: str) -> Optional[Session]:
+        """Session by id, or None"""
+        session, result = self._fetch(session_id)
+        with self._lock:
+            if result == "hit":
+                self.hits += 1
+            elif result == "load":
+                self.loads += 1
+            else:
+                self.misses += 1
+        return session
+
+    def record_turn(self, session_id: str, user: str, assistant: str) -> Session:
+        """Append a completed turn to the session (created on first use)"""
+        session = self._fetch(session_id)[0] or Session(session_id)
+        with self._lock:
+            session.add_turn(user, assistant, self.summary_chars)
+            self._remember(session)
+        if self._db is not None:
+            try:
+                self._db.save(session)
+            except Exception as e:
+                print(f"Session DB write failed: {e}")
+        return session
+
+    def seed(self, session_id: str, context: List[Dict[str, str]]) -> Optional[Session]:
+        """Start a session from a client-sent context list (clients that still send history)"""
+        user = None
+        for msg in context or []:
+            role, content = msg.get("role", "user"), msg.get("content", "")
+            if role == "user":
+                user = content
+            elif role == "assistant" and user is not None:
+                self.record_turn(session_id, user, content)
+                user = None
+        return self._fetch(session_id)[0]
+
+    def context(self, session_id: Optional[str], request_context: Optional[List[Dict[str, str]]] = None) -> List[Dict[str, str]]:
+        """
+        Prompt context for a turn: summary plus last turn
+
+        Args:
+            session_id: ChatReq.session_id (None: request context only)
+            request_context: ChatReq.context; seeds a new session, used as-is without a session
+
+        Returns:
+            Messages in the request `context` shape
+        """
+        if not session_id:
+            return list(request_context or [])
+        session = self.get(session_id)
+        if session is None and request_context:
+            session = self.seed(session_id, request_context)
+        return session.messages() if session is not None else []
+
+    def history(self, session_id: str) -> List[Dict[str, Any]]:
+        """Full turn log (persistent stores only; otherwise the last turn)"""
+        if self._db is not None:
+            try:
+                return self._db.history(session_id)
+            except Exception as e:
+                print(f"Session DB read failed: {e}")
+        session = self.get(session_id)
+        if session is None or not session.turns:
+            return []
+        return [{"turn": session.turns, "user": session.last_user, "assistant": session.last_assistant,
+                 "created_at": session.updated_at}]
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        if self._db is not None:
+            try:
+                self._db.delete(session_id)
+            except Exception as e:
+                print(f"Session DB delete failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._sessions)
+        total = self.hits + self.misses + self.loads
+        return {
+            "sessions": size,
+            "max_sessions": self.max_sessions,
+            "persistent": self.persistent,
+            "hits": self.hits,
+            "misses": self.misses,
+            "loads": self.loads,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+
+
+# Default instance
+_default_session_store: Optional[SessionStore] = None
+_default_session_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Get or create the process-wide session store"""
+    global _default_session_store
+    if _default_session_store is None:
+        with _default_session_store_lock:
+            if _default_session_store is None:
+                _default_session_store = SessionStore()
+    return _default_session_store
+
+
+def conversation(session_id: Optional[str], context: Optional[List[Dict[str, str]]] = None) -> List[Dict[str, str]]:
+    """Prompt context for a turn: the session's summary and last turn, or the request context"""
+    if not (session_id and sessions_enabled()):
+        return list(context or [])
+    return get_session_store().context(session_id, context)
+
+
+def remember(session_id: Optional[str], message: str, response: Dict[str, Any]) -> None:
+    """Record a successful turn in the session (no-op without a session id)"""
+    if not (session_id and sessions_enabled()) or not isinstance(response, dict):
+        return
+    if response.get("status") == "error":
+        return
+    try:
+        get_session_store().record_turn(session_id, message, response.get("answer", ""))
+    except Exception as e:
+        print(f"Session update failed: {e}")
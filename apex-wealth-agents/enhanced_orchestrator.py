@@ -1,16 +1,21 @@
 import json
 import os
+import threading
+import time
 from typing import List, Dict, Any, Optional
 from llm.llm_client import LLMClient
 from llm.prompts import system_advisor
 from llm.json_guard import validate_json_response
+from app.deadline import cancelled, drop_if_cancelled, expected, observe, stage_allowed
+from app.metrics import CHART_RENDER_SECONDS, timed
+from app.tracing import traced
 from app.tools.csv_tools import query_csv, spend_aggregate, top_merchants, describe_csv
 from app.tools.enhanced_csv_tools import (
     extract_year_data, extract_year_range_data, extract_month_data, 
     extract_date_range_data, parse_historical_query, get_available_years,
     format_currency, format_date
 )
-from app.tools.visualization import generate_visualizations, generate_dynamic_visualizations
+from database.session_store import remember
 
 class HistoricalAnalysisOrchestrator:
     def __init__(self):
@@ -37,6 +42,7 @@ class HistoricalAnalysisOrchestrator:
         message_lower = message.lower()
         return any(keyword in message_lower for keyword in historical_keywords)
     
+    @traced("historical.extract_data")
     def _extract_historical_data(self, message: str) -> Dict[str, Any]:
         """Extract historical data based on the query"""
         try:
@@ -83,6 +89,7 @@ class HistoricalAnalysisOrchestrator:
         except Exception as e:
             return {"error": str(e), "data_available": False}
     
+    @traced("historical.charts")
     def _generate_historical_charts(self, historical_data: Dict[str, Any], message: str) -> Dict[str, str]:
         """Generate charts for historical data"""
         try:
@@ -113,6 +120,8 @@ class HistoricalAnalysisOrchestrator:
             print(f"Error generating historical charts: {e}")
             return {}
     
+    @drop_if_cancelled("chart", "")
+    @timed(CHART_RENDER_SECONDS, chart="historical_yearly_trend")
     def _create_yearly_trend_chart(self, yearly_data: List[Dict]) -> str:
         """Create a yearly trend chart"""
         try:
@@ -149,6 +158,8 @@ class HistoricalAnalysisOrchestrator:
         except Exception as e:
             return f"Error creating yearly trend chart: {str(e)}"
     
+    @drop_if_cancelled("chart", "")
+    @timed(CHART_RENDER_SECONDS, chart="historical_monthly_breakdown")
     def _create_monthly_breakdown_chart(self, monthly_data: List[Dict]) -> str:
         """Create a monthly breakdown chart"""
         try:
@@ -185,6 +196,8 @@ class HistoricalAnalysisOrchestrator:
         except Exception as e:
             return f"Error creating monthly breakdown chart: {str(e)}"
     
+    @drop_if_cancelled("chart", "")
+    @timed(CHART_RENDER_SECONDS, chart="historical_category_breakdown")
     def _create_category_breakdown_chart(self, categories: List[Dict]) -> str:
         """Create a category breakdown chart"""
         try:
@@ -222,6 +235,8 @@ class HistoricalAnalysisOrchestrator:
         except Exception as e:
             return f"Error creating category breakdown chart: {str(e)}"
     
+    @drop_if_cancelled("chart", "")
+    @timed(CHART_RENDER_SECONDS, chart="historical_top_merchants")
     def _create_top_merchants_chart(self, merchants: List[Dict]) -> str:
         """Create a top merchants chart"""
         try:
@@ -299,8 +314,16 @@ class HistoricalAnalysisOrchestrator:
         
         return "\n".join(summary_parts)
     
-    def process_historical_query(self, message: str, context: List[Dict[str, str]] = None) -> Dict[str, Any]:
-        """Process a historical analysis query"""
+    @traced("historical.process_query")
+    def process_historical_query(self, message: str, context: List[Dict[str, str]] = None,
+                                 session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Process a historical analysis query (recorded in the session when session_id is given)"""
+        response = self._analyze_historical(message)
+        if not cancelled():
+            remember(session_id, message, response)
+        return response
+
+    def _analyze_historical(self, message: str) -> Dict[str, Any]:
         try:
             # Extract historical data
             historical_data = self._extract_historical_data(message)
@@ -312,8 +335,12 @@ class HistoricalAnalysisOrchestrator:
                     "type": "text"
                 }
             
-            # Generate charts
-            charts = self._generate_historical_charts(historical_data, message)
+            # Generate charts, if the answer call still fits after them
+            charts = {}
+            if stage_allowed("charts", expected("charts") + expected("llm"), fallback="answer without charts"):
+                chart_start = time.perf_counter()
+                charts = self._generate_historical_charts(historical_data, message)
+                observe("charts", time.perf_counter() - chart_start)
             
             # Format summary
             summary = self._format_historical_summary(historical_data)
@@ -338,7 +365,9 @@ Instructions:
 """
             
             # Get LLM response
-            response = self.llm_client.complete(data_context)
+            response = self.llm_client.complete_before_deadline(data_context, "answer", "data-only answer")
+            if response is None:
+                response = summary
             
             # Prepare response
             response_data = {
@@ -358,9 +387,26 @@ Instructions:
                 "type": "error"
             }
 
-# Create global instance
-historical_orchestrator = HistoricalAnalysisOrchestrator()
+# Global instance, built on first use (or by the API warm-up hook)
+_historical_orchestrator = None
+_historical_orchestrator_lock = threading.Lock()
+
+def get_historical_orchestrator() -> HistoricalAnalysisOrchestrator:
+    """Get or create the shared historical orchestrator (thread-safe)"""
+    global _historical_orchestrator
+    if _historical_orchestrator is None:
+        with _historical_orchestrator_lock:
+            if _historical_orchestrator is None:
+                _historical_orchestrator = HistoricalAnalysisOrchestrator()
+    return _historical_orchestrator
+
+def __getattr__(name: str):
+    # Backward compatibility for `from enhanced_orchestrator import historical_orchestrator`
+    if name == "historical_orchestrator":
+        return get_historical_orchestrator()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-def process_historical_query(message: str, context: List[Dict[str, str]] = None) -> Dict[str, Any]:
+def process_historical_query(message: str, context: List[Dict[str, str]] = None,
+                             session_id: Optional[str] = None) -> Dict[str, Any]:
     """Main function for processing historical queries"""
-    return historical_orchestrator.process_historical_query(message, context)
+    return get_historical_orchestrator().process_historical_query(message, context, session_id=session_id)
@@ -1,37 +1,74 @@
 # llm/llm_client.py
 import os
+import threading
 import requests
 from typing import Optional, Dict, Any, List
 import time
 
+from app.concurrency import OverloadedError, llm_http_pool
+from app.deadline import RequestCancelled, current_deadline, observe, remaining, sleep, stage_allowed
+from app.metrics import LLM_ERRORS_TOTAL, LLM_REQUEST_SECONDS, LLM_REQUESTS_TOTAL, LLM_RETRIES_TOTAL
+from app.singleflight import get_group
+from app.tracing import span
+from llm.resilience import RetryPolicy, get_breaker, get_rate_limiter, parse_retry_after
+from llm.router import configured_providers, get_router
+
+
+# Don't start an HTTP attempt with less of the request's deadline left than this
+MIN_ATTEMPT_SECONDS = 0.5
+
+
+class LLMError(RuntimeError):
+    """LLM call failure; kind is 'network', 'http', 'response', 'config', 'overloaded', 'deadline' or 'cancelled'"""
+
+    def __init__(self, message: str, kind: str = "response"):
+        super().__init__(message)
+        self.kind = kind
+        # Deadline/cancellation errors belong to the caller's request, not the prompt
+        self.request_scoped = kind in ("deadline", "cancelled")
+
+
+def _close_response(future) -> None:
+    # Abandoned call: release its connection once it finishes
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
 class LLMClient:
     def __init__(
         self,
         base_url: str = None,
         timeout: int = 60,
         retries: int = 2,
-        backoff_seconds: float = 1.5
+        backoff_seconds: Optional[float] = None
     ):
         """
         Lightweight client for multiple LLM providers (FreeLLM-compatible and Gemini).
         Supports multiple response shapes and payload formats commonly seen across providers.
         Environment overrides:
           - LLM_PROVIDER: 'free' | 'gemini' (default: 'free')
+          - LLM_PROVIDERS: e.g. 'free,gemini' to route across providers with failover and hedging (see llm.router)
           - LLM_BASE_URL: override base URL for 'free'
           - LLM_PAYLOAD_STYLE: 'message' | 'messages' (default: 'message', only for 'free')
           - GEMINI_API_KEY: required when LLM_PROVIDER=gemini
           - GEMINI_MODEL: model name (default: 'gemini-1.5-flash')
+          - GEMINI_BASE_URL: override the Generative Language API base URL
+          - LLM_RETRY_* / LLM_BREAKER_* / LLM_RATE_LIMIT_*: see llm.resilience
         """
         self.provider = (os.getenv("LLM_PROVIDER", "free") or "free").lower()
+        self.providers = configured_providers() or [self.provider]
+        self.provider = self.providers[0]
         self.base_url = base_url or os.getenv("LLM_BASE_URL", "https://apifreellm.com/api/chat")
         self.timeout = timeout
         self.retries = retries
-        self.backoff_seconds = backoff_seconds
+        self.retry_policy = RetryPolicy(base_seconds=backoff_seconds)
+        self.backoff_seconds = self.retry_policy.base_seconds
         self.headers = {"Content-Type": "application/json"}  # add auth header here if needed
         self.payload_style = os.getenv("LLM_PAYLOAD_STYLE", "message").lower().strip() or "message"
         # Gemini config
         self.gemini_api_key = os.getenv("GEMINI_API_KEY")
         self.gemini_model = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+        self.gemini_base_url = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta").rstrip("/")
 
     def complete(self, prompt: str, system: Optional[str] = None) -> str:
         """
@@ -43,9 +80,180 @@ class LLMClient:
             POST https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key=API_KEY
             Body: { "contents":[{"role":"user","parts":[{"text":"..."}]}], "systemInstruction": {"parts":[{"text":"..."}]}? }
         """
-        if self.provider == "gemini":
-            return self._complete_gemini(prompt, system)
+        with span("llm.complete", provider=",".join(self.providers), prompt_chars=len(prompt) + len(system or "")) as s:
+            # Identical concurrent prompts (same provider/model) share one HTTP call
+            key = (tuple(self.providers), self.base_url, self.gemini_model, self.payload_style, system, prompt)
+            text = get_group("llm").do(key, self._complete_provider, prompt, system)
+            s.set_attribute("response_chars", len(text))
+            return text
+
+    def complete_before_deadline(self, prompt: str, stage: str, fallback: str,
+                                 system: Optional[str] = None) -> Optional[str]:
+        """
+        complete(), or None when the request's deadline leaves no time for it
+
+        The skip is recorded as `stage` with `fallback` (see app.deadline); other
+        failures raise as in complete().
+        """
+        if not stage_allowed(stage, "llm", fallback=fallback):
+            return None
+        try:
+            return self.complete(prompt, system)
+        except LLMError as e:
+            deadline = current_deadline()
+            if deadline is None or (not e.request_scoped and deadline.remaining() >= MIN_ATTEMPT_SECONDS):
+                raise
+            deadline.skip(stage, fallback)
+            return None
+
+    def _complete_provider(self, prompt: str, system: Optional[str]) -> str:
+        """Complete on the configured provider, or through the router when several are configured"""
+        start = time.perf_counter()
+        if len(self.providers) > 1:
+            text = get_router(self.providers).complete(lambda provider: self._complete_on(provider, prompt, system))
+        else:
+            text = self._complete_on(self.provider, prompt, system)
+        observe("llm", time.perf_counter() - start)
+        return text
+
+    def _complete_on(self, provider: str, prompt: str, system: Optional[str]) -> str:
+        """Dispatch to one provider and record call metrics"""
+        start = time.perf_counter()
+        try:
+            if provider == "gemini":
+                text = self._complete_gemini(prompt, system)
+            else:
+                text = self._complete_free(prompt, system)
+        except LLMError as e:
+            LLM_REQUESTS_TOTAL.inc(provider=provider, outcome="error")
+            LLM_ERRORS_TOTAL.inc(provider=provider, kind=e.kind)
+            raise
+        finally:
+            LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, provider=provider)
+        LLM_REQUESTS_TOTAL.inc(provider=provider, outcome="success")
+        return text
+
+    def _attempt_timeout(self) -> float:
+        """HTTP timeout for the next attempt, capped by the request's deadline"""
+        deadline = current_deadline()
+        if deadline is not None and deadline.cancelled.is_set():
+            raise LLMError("Request cancelled before the LLM call", kind="cancelled")
+        left = remaining()
+        if left is None:
+            return self.timeout
+        if left < MIN_ATTEMPT_SECONDS:
+            raise LLMError("Request deadline reached before the LLM call", kind="deadline")
+        return min(self.timeout, left)
+
+    def _post(self, url: str, **kwargs) -> requests.Response:
+        """
+        requests.post that stops waiting when the request is cancelled
 
+        Inside a request the call runs on the shared llm_http pool while this
+        thread waits for it or for the cancellation; a cancelled call is
+        dropped if it has not started, otherwise abandoned (its connection is
+        closed when the response arrives or the timeout hits), and
+        LLMError(kind='cancelled') is raised.
+        """
+        deadline = current_deadline()
+        if deadline is None:
+            return requests.post(url, **kwargs)
+
+        def call() -> requests.Response:
+            # Re-capped when the job starts, in case it waited in the pool's queue
+            return requests.post(url, **{**kwargs, "timeout": min(kwargs.get("timeout") or self.timeout,
+                                                                 self._attempt_timeout())})
+
+        try:
+            future = llm_http_pool.submit(call)
+        except OverloadedError as e:
+            raise LLMError(f"LLM call not started: {e}", kind="overloaded") from e
+        done = threading.Event()
+        future.add_done_callback(lambda _: done.set())
+        unregister = deadline.on_cancel(done.set)
+        try:
+            done.wait()
+        finally:
+            unregister()
+        if future.done() and not future.cancelled():
+            error = future.exception()
+            if error is None:
+                return future.result()
+            if not isinstance(error, RequestCancelled):
+                raise error
+        future.cancel()
+        future.add_done_callback(_close_response)
+        raise LLMError("Request cancelled during the LLM call", kind="cancelled")
+
+    def _retry_fits(self, delay: float) -> bool:
+        """Whether waiting delay seconds and retrying still fits in the timeout and the request's deadline"""
+        if delay > self.timeout:
+            return False
+        left = remaining()
+        return left is None or left - delay >= MIN_ATTEMPT_SECONDS
+
+    def _send(self, provider: str, url: str, headers: Dict[str, str], body: Dict[str, Any],
+              label: str) -> requests.Response:
+        """
+        POST body with the provider's resilience policy (see llm.resilience)
+
+        Connection errors, 429 and 5xx are retried after Retry-After or a
+        jittered exponential backoff; the provider's circuit breaker and
+        rate limiter are consulted before each attempt. Returns the last
+        response (possibly an error status) or raises LLMError.
+        """
+        breaker = get_breaker(provider)
+        limiter = get_rate_limiter(provider)
+        for attempt in range(self.retries + 1):
+            if not breaker.allow():
+                raise LLMError(f"{label} circuit open after repeated failures; retry in {breaker.retry_in():.0f}s",
+                               kind="circuit_open")
+            outcome = None
+            try:
+                timeout = self._attempt_timeout()
+                if not limiter.acquire(max_wait=timeout - MIN_ATTEMPT_SECONDS):
+                    raise LLMError(f"{label} rate limit: no call slot within the time left", kind="rate_limited")
+                timeout = self._attempt_timeout()
+                with span("llm.http", attempt=attempt) as s:
+                    resp = self._post(url, headers=headers, json=body, timeout=timeout)
+                    s.set_attribute("status_code", resp.status_code)
+            except requests.RequestException as e:
+                outcome = "failure"
+                error = LLMError(f"{label} request failed: {e}", kind="network")
+                error.__cause__ = e
+                delay = self.retry_policy.backoff(attempt)
+            else:
+                if not self.retry_policy.retryable_status(resp.status_code):
+                    # Including other 4xx: the provider is up, the request is at fault
+                    outcome = "success"
+                    return resp
+                retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+                if resp.status_code == 429:
+                    # Quota, not an outage: slow everyone down instead of opening the circuit
+                    outcome = "throttled"
+                    if retry_after:
+                        limiter.pause(retry_after)
+                else:
+                    outcome = "failure"
+                error = None
+                delay = self.retry_policy.delay(attempt, retry_after)
+            finally:
+                if outcome == "success":
+                    breaker.record_success()
+                elif outcome == "failure":
+                    breaker.record_failure()
+                else:
+                    breaker.record_abandoned()
+            if attempt < self.retries and self._retry_fits(delay):
+                LLM_RETRIES_TOTAL.inc(provider=provider)
+                sleep(delay)
+                continue
+            if error is not None:
+                raise error
+            return resp
+
+    def _complete_free(self, prompt: str, system: Optional[str]) -> str:
+        """FreeLLM-compatible provider (see complete())"""
         # Build payload
         system_text = (system or "").strip()
         if self.payload_style == "messages":
@@ -59,27 +267,17 @@ class LLMClient:
             msg = f"{system_text}\n\n{prompt}" if system_text else prompt
             data = {"message": msg}
 
-        last_err = None
-        for attempt in range(self.retries + 1):
-            try:
-                resp = requests.post(self.base_url, headers=self.headers, json=data, timeout=self.timeout)
-                break
-            except requests.RequestException as e:
-                last_err = e
-                if attempt < self.retries:
-                    time.sleep(self.backoff_seconds * (attempt + 1))
-                    continue
-                raise RuntimeError(f"LLM request failed: {e}") from e
+        resp = self._send("free", self.base_url, self.headers, data, label="LLM")
 
         # Basic HTTP error surface
         if not (200 <= resp.status_code < 300):
             snippet = (resp.text or "")[:300]
-            raise RuntimeError(f"LLM HTTP {resp.status_code}: {snippet}")
+            raise LLMError(f"LLM HTTP {resp.status_code}: {snippet}", kind="http")
 
         try:
             js = resp.json()
         except ValueError:
-            raise RuntimeError(f"Non-JSON response from LLM: {resp.text[:300]}")
+            raise LLMError(f"Non-JSON response from LLM: {resp.text[:300]}", kind="response")
 
         # Normalize success detection across common shapes
         # apifreellm typical: { status: "success", response: "..." }
@@ -114,17 +312,17 @@ class LLMClient:
                 return data_block[key]
 
         # Surface error details for easier debugging
-        raise RuntimeError(f"LLM error: status={js.get('status')} error={js.get('error') or js}")
+        raise LLMError(f"LLM error: status={js.get('status')} error={js.get('error') or js}", kind="response")
 
     def _complete_gemini(self, prompt: str, system: Optional[str]) -> str:
         """
         Google Gemini (Generative Language API) text generation via REST.
         """
         if not self.gemini_api_key:
-            raise RuntimeError("GEMINI_API_KEY not set. Please export GEMINI_API_KEY or set LLM_PROVIDER=free.")
+            raise LLMError("GEMINI_API_KEY not set. Please export GEMINI_API_KEY or set LLM_PROVIDER=free.", kind="config")
 
         # Endpoint
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/{self.gemini_model}:generateContent?key={self.gemini_api_key}"
+        url = f"{self.gemini_base_url}/models/{self.gemini_model}:generateContent?key={self.gemini_api_key}"
 
         # Build body
         system_text = (system or "").strip()
@@ -142,26 +340,16 @@ class LLMClient:
                 "parts": [{"text": system_text}]
             }
 
-        last_err = None
-        for attempt in range(self.retries + 1):
-            try:
-                resp = requests.post(url, headers={"Content-Type": "application/json"}, json=body, timeout=self.timeout)
-                break
-            except requests.RequestException as e:
-                last_err = e
-                if attempt < self.retries:
-                    time.sleep(self.backoff_seconds * (attempt + 1))
-                    continue
-                raise RuntimeError(f"Gemini request failed: {e}") from e
+        resp = self._send("gemini", url, {"Content-Type": "application/json"}, body, label="Gemini")
 
         if not (200 <= resp.status_code < 300):
             snippet = (resp.text or "")[:500]
-            raise RuntimeError(f"Gemini HTTP {resp.status_code}: {snippet}")
+            raise LLMError(f"Gemini HTTP {resp.status_code}: {snippet}", kind="http")
 
         try:
             js = resp.json()
         except ValueError:
-            raise RuntimeError(f"Non-JSON response from Gemini: {resp.text[:300]}")
+            raise LLMError(f"Non-JSON response from Gemini: {resp.text[:300]}", kind="response")
 
         # Parse Gemini response
         # Expected: { "candidates":[ { "content": { "parts":[{"text":"..."}] } } ] }
@@ -176,5 +364,5 @@ class LLMClient:
         # Alternative structure
         if isinstance(js.get("text"), str):
             return js["text"]
-        raise RuntimeError(f"Gemini error: {js}")
+        raise LLMError(f"Gemini error: {js}", kind="response")
 
@@ -8,9 +8,7 @@ def _load_profile():
     except Exception:
         return {}
 
-_PROFILE = _load_profile()
-
-system_advisor = """You are Apex, a concise personal finance advisor with access to transaction data.
+_SYSTEM_ADVISOR_BASE = """You are Apex, a concise personal finance advisor with access to transaction data.
 
 Core Principles:
 • Give specific numbers and data from the provided information
@@ -31,12 +29,31 @@ Response Style:
 
 Tone: Professional, helpful, and data-driven."""
 
-if _PROFILE:
-    name = _PROFILE.get('name') or 'User'
-    currency = _PROFILE.get('currency') or 'INR'
-    goals = ", ".join(_PROFILE.get('goals') or [])
-    risk = _PROFILE.get('risk_preference') or 'moderate'
-    system_advisor += f"\nUser profile: name={name}; currency={currency}; goals=[{goals}]; risk={risk}. Personalize guidance accordingly."
+def build_system_advisor(profile: dict = None) -> str:
+    """Advisor system prompt personalized with the given profile (if any)"""
+    prompt = _SYSTEM_ADVISOR_BASE
+    if profile:
+        name = profile.get('name') or 'User'
+        currency = profile.get('currency') or 'INR'
+        goals = ", ".join(profile.get('goals') or [])
+        risk = profile.get('risk_preference') or 'moderate'
+        prompt += f"\nUser profile: name={name}; currency={currency}; goals=[{goals}]; risk={risk}. Personalize guidance accordingly."
+    return prompt
+
+def system_advisor_for(user_id: str = None) -> str:
+    """
+    Advisor system prompt for a user, built from the profile cache so profile
+    updates apply on the next turn (falls back to state/profile.json)
+    """
+    try:
+        from database.profile_cache import get_profile_cache
+        profile = get_profile_cache().get(user_id)
+    except Exception:
+        profile = _load_profile()
+    return build_system_advisor(profile)
+
+# Import-time snapshot, kept for callers that don't know the user
+system_advisor = build_system_advisor(_load_profile())
 
 def sys_expense():
     return (
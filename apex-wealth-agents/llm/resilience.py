@@ -0,0 +1,266 @@
+"""
+Resilience primitives for LLM providers: retry backoff, circuit breaker, rate limiter.
+
+LLMClient uses them around every HTTP attempt:
+
+  - RetryPolicy: which responses are worth retrying (connection errors,
+    429 and 5xx) and how long to wait: the provider's Retry-After when it
+    sends one, otherwise exponential backoff with full jitter, so clients
+    that failed together do not retry together
+  - CircuitBreaker: after LLM_BREAKER_FAILURES consecutive failures
+    (connection errors, timeouts, 5xx) the provider is considered down and
+    calls fail immediately (LLMError kind 'circuit_open') instead of
+    waiting out the timeout; after LLM_BREAKER_RESET_SECONDS one probe call
+    is let through (half-open) and its outcome closes or reopens the circuit
+  - TokenBucket: keeps calls under the provider's quota (LLM_RATE_LIMIT_RPS,
+    bursts of LLM_RATE_LIMIT_BURST); callers wait for a token, and a 429's
+    Retry-After pauses the bucket for everyone
+
+Breakers and buckets are shared per provider across all LLMClient
+instances in the process (get_breaker / get_rate_limiter). Waits use
+app.deadline.sleep, so they end early when the request is cancelled.
+
+Environment overrides:
+  - LLM_RETRY_BASE_SECONDS=0.5 / LLM_RETRY_MAX_SECONDS=20 backoff base and cap
+  - LLM_BREAKER_FAILURES=5 consecutive failures that open the circuit (0 = no breaker)
+  - LLM_BREAKER_RESET_SECONDS=30 time open before a probe call
+  - LLM_RATE_LIMIT_RPS=0 sustained calls per second per provider (0 = unlimited)
+  - LLM_RATE_LIMIT_BURST=5 calls allowed at once before the rate applies
+"""
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+from app.deadline import sleep
+from app.metrics import LLM_CIRCUIT_STATE, LLM_RATE_LIMIT_WAIT_SECONDS, LLM_REJECTED_TOTAL
+
+# Statuses worth another attempt; other 4xx will fail the same way again
+RETRY_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, overridden by Retry-After"""
+
+    def __init__(self, base_seconds: Optional[float] = None, max_seconds: Optional[float] = None):
+        self.base_seconds = base_seconds if base_seconds is not None else _env_float("LLM_RETRY_BASE_SECONDS", 0.5)
+        self.max_seconds = max_seconds if max_seconds is not None else _env_float("LLM_RETRY_MAX_SECONDS", 20.0)
+
+    @staticmethod
+    def retryable_status(status_code: int) -> bool:
+        return status_code in RETRY_STATUSES
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before retry number attempt + 1: uniform in [0, min(max, base * 2**attempt)]"""
+        return random.uniform(0.0, min(self.max_seconds, self.base_seconds * (2 ** attempt)))
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        return retry_after if retry_after is not None else self.backoff(attempt)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds or HTTP date); None if absent or invalid"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one provider"""
+
+    def __init__(self, name: str, failure_threshold: Optional[int] = None, reset_seconds: Optional[float] = None):
+        """
+        Args:
+            name: Provider name (metrics label)
+            failure_threshold: Consecutive failures that open the circuit; 0 disables it
+                (default: LLM_BREAKER_FAILURES or 5)
+            reset_seconds: Time open before a probe call (default: LLM_BREAKER_RESET_SECONDS or 30)
+        """
+        self.name = name
+        self.failure_threshold = int(failure_threshold if failure_threshold is not None
+                                     else _env_float("LLM_BREAKER_FAILURES", 5))
+        self.reset_seconds = reset_seconds if reset_seconds is not None else _env_float("LLM_BREAKER_RESET_SECONDS", 30.0)
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        LLM_CIRCUIT_STATE.set(0, provider=name)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def _set_state(self, state: str) -> None:
+        # Called with the lock held
+        self._state = state
+        LLM_CIRCUIT_STATE.set(_STATE_VALUES[state], provider=self.name)
+
+    def allow(self) -> bool:
+        """Whether a call may go out now (in half-open state, only the single probe)"""
+        if self.failure_threshold <= 0:
+            return True
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self._set_state(HALF_OPEN)
+                self._probe_in_flight = False
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+        LLM_REJECTED_TOTAL.inc(provider=self.name, reason="circuit_open")
+        return False
+
+    def retry_in(self) -> float:
+        """Seconds until an open circuit lets a probe through"""
+        with self._lock:
+            if self._state != OPEN:
+                return 0.0
+            return max(0.0, self.reset_seconds - (time.monotonic() - self._opened_at))
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._probe_in_flight = False
+            if self._state != CLOSED:
+                self._set_state(CLOSED)
+
+    def record_failure(self) -> None:
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._set_state(OPEN)
+
+    def record_abandoned(self) -> None:
+        """The allowed call ended without an outcome (cancelled); let another probe through"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def reset(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._probe_in_flight = False
+            self._set_state(CLOSED)
+
+
+class TokenBucket:
+    """Token-bucket rate limiter (thread-safe); rate <= 0 means unlimited"""
+
+    def __init__(self, name: str, rate: Optional[float] = None, burst: Optional[float] = None):
+        """
+        Args:
+            name: Provider name (metrics label)
+            rate: Tokens added per second (default: LLM_RATE_LIMIT_RPS or 0 = unlimited)
+            burst: Bucket size (default: LLM_RATE_LIMIT_BURST or 5)
+        """
+        self.name = name
+        self.rate = rate if rate is not None else _env_float("LLM_RATE_LIMIT_RPS", 0.0)
+        self.burst = max(1.0, burst if burst is not None else _env_float("LLM_RATE_LIMIT_BURST", 5.0))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token now or book the next one; returns the seconds to wait for it"""
+        with self._lock:
+            now = time.monotonic()
+            if self.rate > 0:
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            pause = max(0.0, self._paused_until - now)
+            if self.rate <= 0:
+                return pause
+            self._tokens -= 1.0
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, pause)
+
+    def _release(self) -> None:
+        with self._lock:
+            if self.rate > 0:
+                self._tokens = min(self.burst, self._tokens + 1.0)
+
+    def acquire(self, max_wait: Optional[float] = None) -> bool:
+        """
+        Wait for a token
+
+        Args:
+            max_wait: Give up (returning False, token not taken) if the wait would be longer
+
+        Returns:
+            True once a token is held
+        """
+        wait = self._reserve()
+        if wait <= 0:
+            return True
+        if max_wait is not None and wait > max_wait:
+            self._release()
+            LLM_REJECTED_TOTAL.inc(provider=self.name, reason="rate_limited")
+            return False
+        LLM_RATE_LIMIT_WAIT_SECONDS.inc(wait, provider=self.name)
+        sleep(wait)
+        return True
+
+    def pause(self, seconds: float) -> None:
+        """Hold all callers back for seconds (the provider answered 429 with Retry-After)"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_buckets: Dict[str, TokenBucket] = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(provider: str) -> CircuitBreaker:
+    """Process-wide circuit breaker for a provider"""
+    breaker = _breakers.get(provider)
+    if breaker is None:
+        with _registry_lock:
+            breaker = _breakers.setdefault(provider, CircuitBreaker(provider))
+    return breaker
+
+
+def get_rate_limiter(provider: str) -> TokenBucket:
+    """Process-wide rate limiter for a provider"""
+    bucket = _buckets.get(provider)
+    if bucket is None:
+        with _registry_lock:
+            bucket = _buckets.setdefault(provider, TokenBucket(provider))
+    return bucket
+
+
+def reset_providers() -> None:
+    """Forget breaker and limiter state (settings are re-read from the environment)"""
+    with _registry_lock:
+        _breakers.clear()
+        _buckets.clear()
@@ -0,0 +1,306 @@
+"""
+Multi-provider LLM routing with hedged requests
+
+With LLM_PROVIDERS listing more than one provider (e.g. "free,gemini"),
+LLMClient sends each completion through a ProviderRouter:
+
+  - the primary is drawn by LLM_ROUTER_WEIGHTS among providers whose
+    circuit is not open, scaled down by each one's recent error rate (by
+    default all traffic goes to the first listed provider)
+  - if the primary fails, the call fails over to the next provider at once
+  - if the primary has not answered after its rolling p90 latency
+    (LLM_HEDGE_QUANTILE), a hedged copy goes to the next provider; the
+    first successful answer wins and the other call is cancelled (its
+    HTTP wait is abandoned, see LLMClient._post)
+
+Hedges are capped at LLM_HEDGE_MAX_RATIO of recent calls, so a slow
+primary raises spend by at most that share rather than doubling it.
+Latency and error statistics are rolling windows per provider, shared by
+all clients in the process, and exported as metrics.
+
+Environment overrides:
+  - LLM_PROVIDERS=free,gemini providers in fallback order (one provider = no router)
+  - LLM_ROUTER_WEIGHTS=free:3,gemini:1 primary traffic share (default: first provider only)
+  - LLM_HEDGE=0 disables hedging (failover still applies)
+  - LLM_HEDGE_QUANTILE=0.9 latency quantile of the primary after which to hedge
+  - LLM_HEDGE_DELAY_MS=2000 hedge delay until a provider has LLM_HEDGE_MIN_SAMPLES (20) timings
+  - LLM_HEDGE_MAX_RATIO=0.15 maximum share of recent calls that may be hedged
+"""
+import contextvars
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from app.deadline import Deadline, current_deadline, use_deadline
+from app.metrics import LLM_HEDGE_OUTCOMES_TOTAL, LLM_PROVIDER_LATENCY_SECONDS, LLM_ROUTED_TOTAL
+from llm.resilience import OPEN, get_breaker
+
+# Latencies/outcomes kept per provider, and routing decisions kept for the hedge cap
+WINDOW = 200
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def configured_providers() -> List[str]:
+    """Providers from LLM_PROVIDERS (empty when unset)"""
+    return [p.strip().lower() for p in os.getenv("LLM_PROVIDERS", "").split(",") if p.strip()]
+
+
+def _parse_weights(providers: Sequence[str]) -> Dict[str, float]:
+    weights = {p: 0.0 for p in providers}
+    weights[providers[0]] = 1.0
+    spec = os.getenv("LLM_ROUTER_WEIGHTS", "")
+    if spec.strip():
+        weights = {p: 0.0 for p in providers}
+        for item in spec.split(","):
+            name, _, weight = item.partition(":")
+            name = name.strip().lower()
+            if name in weights:
+                try:
+                    weights[name] = max(0.0, float(weight))
+                except ValueError:
+                    continue
+    return weights
+
+
+class ProviderStats:
+    """Rolling latency (successful calls) and error rate of one provider"""
+
+    def __init__(self, name: str, window: int = WINDOW):
+        self.name = name
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, ok: bool) -> None:
+        with self._lock:
+            self._outcomes.append(ok)
+            if ok:
+                self._latencies.append(seconds)
+        if ok:
+            self._export()
+
+    def record_abandoned(self, seconds: float) -> None:
+        """A call cancelled after seconds (it lost a hedge): at least that slow, but not an error"""
+        with self._lock:
+            self._latencies.append(seconds)
+        self._export()
+
+    def _export(self) -> None:
+        LLM_PROVIDER_LATENCY_SECONDS.set(self.quantile(0.5) or 0.0, provider=self.name, quantile="0.5")
+        LLM_PROVIDER_LATENCY_SECONDS.set(self.quantile(0.9) or 0.0, provider=self.name, quantile="0.9")
+
+    @property
+    def samples(self) -> int:
+        with self._lock:
+            return len(self._latencies)
+
+    def quantile(self, q: float) -> Optional[float]:
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    def error_rate(self) -> float:
+        with self._lock:
+            outcomes = list(self._outcomes)
+        return outcomes.count(False) / len(outcomes) if outcomes else 0.0
+
+    def snapshot(self) -> Dict[str, object]:
+        p50, p90, p99 = self.quantile(0.5), self.quantile(0.9), self.quantile(0.99)
+        return {
+            "samples": self.samples,
+            "error_rate": round(self.error_rate(), 3),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p90_ms": round(p90 * 1000, 1) if p90 is not None else None,
+            "p99_ms": round(p99 * 1000, 1) if p99 is not None else None,
+        }
+
+
+class _Branch:
+    """One provider call of a routed completion, on its own thread and cancellable deadline"""
+
+    def __init__(self, provider: str, role: str, deadline: Deadline):
+        self.provider = provider
+        self.role = role
+        self.deadline = deadline
+        self.finished = False
+        self.lost = False
+
+
+class ProviderRouter:
+    """Chooses providers per call, fails over, and hedges slow primaries"""
+
+    def __init__(self, providers: Sequence[str], weights: Optional[Dict[str, float]] = None,
+                 hedge: Optional[bool] = None):
+        """
+        Args:
+            providers: Provider names in fallback order (at least two)
+            weights: Primary traffic share per provider (default: LLM_ROUTER_WEIGHTS, else the first only)
+            hedge: Send hedged requests (default: LLM_HEDGE, on)
+        """
+        self.providers = list(providers)
+        self.weights = weights if weights is not None else _parse_weights(self.providers)
+        if hedge is None:
+            hedge = os.getenv("LLM_HEDGE", "1").strip().lower() not in ("0", "false", "no", "off")
+        self.hedge = hedge
+        self.hedge_quantile = _env_float("LLM_HEDGE_QUANTILE", 0.9)
+        self.default_delay = _env_float("LLM_HEDGE_DELAY_MS", 2000) / 1000.0
+        self.min_samples = int(_env_float("LLM_HEDGE_MIN_SAMPLES", 20))
+        self.max_hedge_ratio = _env_float("LLM_HEDGE_MAX_RATIO", 0.15)
+        self.stats = {p: ProviderStats(p) for p in self.providers}
+        self._decisions: Deque[bool] = deque(maxlen=WINDOW)
+        self._lock = threading.Lock()
+
+    def order(self) -> List[str]:
+        """Providers for one call: weighted primary first, then the rest in fallback order"""
+        available = [p for p in self.providers if get_breaker(p).state != OPEN] or list(self.providers)
+        scores = [self.weights.get(p, 0.0) * (1.0 - self.stats[p].error_rate()) for p in available]
+        if sum(scores) > 0:
+            primary = random.choices(available, weights=scores)[0]
+        else:
+            primary = available[0]
+        return [primary] + [p for p in available if p != primary]
+
+    def hedge_delay(self, provider: str) -> float:
+        """Seconds to wait for provider before hedging"""
+        stats = self.stats[provider]
+        if stats.samples < self.min_samples:
+            return self.default_delay
+        return max(0.05, stats.quantile(self.hedge_quantile))
+
+    def _may_hedge(self) -> bool:
+        # Within the budget of recent calls (plus one, so the first slow call can hedge)
+        with self._lock:
+            return sum(self._decisions) < self.max_hedge_ratio * len(self._decisions) + 1
+
+    def _decide(self, hedged: bool) -> None:
+        with self._lock:
+            self._decisions.append(hedged)
+
+    def complete(self, call: Callable[[str], str]) -> str:
+        """
+        Run call(provider) with failover and hedging
+
+        Args:
+            call: Completes the prompt on the given provider (raises on failure)
+
+        Returns:
+            The first successful answer
+        """
+        candidates = self.order()
+        parent = current_deadline()
+        results: "queue.Queue[Tuple[_Branch, Optional[str], Optional[BaseException]]]" = queue.Queue()
+        branches: List[_Branch] = []
+
+        def launch(provider: str, role: str) -> None:
+            deadline = parent.child() if parent is not None else Deadline(None)
+            branch = _Branch(provider, role, deadline)
+            branches.append(branch)
+            LLM_ROUTED_TOTAL.inc(provider=provider, role=role)
+            ctx = contextvars.copy_context()
+            threading.Thread(target=ctx.run, args=(self._run_branch, branch, call, results),
+                             name=f"apex-llm-{role}", daemon=True).start()
+
+        launch(candidates.pop(0), "primary")
+        hedged = False
+        pending = 1
+        hedge_at = time.monotonic() + self.hedge_delay(branches[0].provider)
+        last_error: Optional[BaseException] = None
+        try:
+            while pending:
+                wait = None
+                if self.hedge and not hedged and candidates:
+                    wait = max(0.0, hedge_at - time.monotonic())
+                try:
+                    branch, text, error = results.get(timeout=wait)
+                except queue.Empty:
+                    # Primary is slower than its usual p90: hedge on the next provider
+                    if self._may_hedge():
+                        hedged = True
+                        launch(candidates.pop(0), "hedge")
+                        pending += 1
+                    else:
+                        hedge_at = float("inf")
+                    continue
+                pending -= 1
+                branch.finished = True
+                if error is None:
+                    if hedged:
+                        LLM_HEDGE_OUTCOMES_TOTAL.inc(winner=branch.role)
+                    return text
+                last_error = error
+                if getattr(error, "request_scoped", False) and parent is not None and parent.cancelled.is_set():
+                    break
+                if not pending and candidates:
+                    launch(candidates.pop(0), "failover")
+                    pending += 1
+            if hedged:
+                LLM_HEDGE_OUTCOMES_TOTAL.inc(winner="none")
+            raise last_error
+        finally:
+            self._decide(hedged)
+            for branch in branches:
+                if not branch.finished:
+                    # The loser stops waiting on its HTTP call
+                    branch.lost = True
+                    branch.deadline.cancel(stage="llm_" + branch.role)
+                branch.deadline.detach()
+
+    def _run_branch(self, branch: _Branch, call: Callable[[str], str], results: "queue.Queue") -> None:
+        start = time.perf_counter()
+        with use_deadline(branch.deadline):
+            try:
+                text = call(branch.provider)
+            except BaseException as e:
+                elapsed = time.perf_counter() - start
+                if not branch.deadline.cancelled.is_set():
+                    self.stats[branch.provider].record(elapsed, ok=False)
+                elif branch.lost:
+                    # Lost to another branch; keep its latency so the tail stays visible in the p90
+                    self.stats[branch.provider].record_abandoned(elapsed)
+                results.put((branch, None, e))
+                return
+        self.stats[branch.provider].record(time.perf_counter() - start, ok=True)
+        results.put((branch, text, None))
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            decisions = list(self._decisions)
+        return {
+            "providers": {p: dict(self.stats[p].snapshot(), weight=self.weights.get(p, 0.0),
+                                  circuit=get_breaker(p).state) for p in self.providers},
+            "hedging": self.hedge,
+            "hedge_ratio": round(sum(decisions) / len(decisions), 3) if decisions else 0.0,
+        }
+
+
+# Default instance per provider list
+_routers: Dict[Tuple[str, ...], ProviderRouter] = {}
+_routers_lock = threading.Lock()
+
+
+def get_router(providers: Sequence[str]) -> ProviderRouter:
+    """Process-wide router for a provider list (statistics are shared by all clients)"""
+    key = tuple(providers)
+    router = _routers.get(key)
+    if router is None:
+        with _routers_lock:
+            router = _routers.setdefault(key, ProviderRouter(key))
+    return router
+
+
+def reset_routers() -> None:
+    """Forget routers and their statistics (settings are re-read from the environment)"""
+    with _routers_lock:
+        _routers.clear()
@@ -108,4 +108,55 @@ describe_csv_schema = {
     },
     "required": ["columns"],
     "additionalProperties": True
-}
\ No newline at end of file
+}
+strategy_risk_schema = {
+    "type": "object",
+    "properties": {
+        "strategy_summary": {"type": "string"},
+        "recommendations": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "category": {"type": "string"},
+                    "allocation_percentage": {"type": "number", "minimum": 0, "maximum": 100},
+                    "rationale": {"type": "string"},
+                    "specific_products": {"type": "array", "items": {"type": "string"}}
+                },
+                "required": ["category","allocation_percentage"],
+                "additionalProperties": True
+            }
+        },
+        "action_items": {"type": "array", "items": {"type": "string"}},
+        "risk_notes": {"type": "string"},
+        "time_horizon": {"type": "string"},
+        "risk_assessment": {
+            "type": "object",
+            "properties": {
+                "risk_alignment": {"type": "string", "enum": ["high","medium","low"]},
+                "risk_score": {"type": "number", "minimum": 1, "maximum": 10},
+                "adjustments_needed": {"type": "boolean"},
+                "adjusted_recommendations": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "category": {"type": "string"},
+                            "original_allocation": {"type": "number"},
+                            "adjusted_allocation": {"type": "number", "minimum": 0, "maximum": 100},
+                            "reason": {"type": "string"}
+                        },
+                        "required": ["category","adjusted_allocation"],
+                        "additionalProperties": True
+                    }
+                },
+                "risk_warnings": {"type": "array", "items": {"type": "string"}},
+                "suitability": {"type": "string", "enum": ["suitable","moderately_suitable","not_suitable"]}
+            },
+            "required": ["risk_alignment","risk_score","risk_warnings","suitability"],
+            "additionalProperties": True
+        }
+    },
+    "required": ["strategy_summary","recommendations","risk_assessment"],
+    "additionalProperties": True
+}
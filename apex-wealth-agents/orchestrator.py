@@ -1,54 +1,77 @@
 import json
 import os
+import threading
+import time
 from typing import List, Dict, Any, Optional
 from llm.llm_client import LLMClient
-from llm.prompts import system_advisor
+from llm.prompts import system_advisor_for
 from llm.json_guard import validate_json_response
+from app.deadline import DeadlineExceeded, cancelled, current_deadline, expected, observe, stage_allowed
+from app.quick_answers import quick_answer
+from database.session_store import conversation, remember
+from app.tracing import traced
 from app.tools.csv_tools import query_csv, spend_aggregate, top_merchants, describe_csv
-from app.tools.visualization import generate_visualizations, generate_dynamic_visualizations
 from app.tools.enhanced_csv_tools import (
     total_spend,
     monthly_spend,
     daily_spend,
     category_stats,
     merchant_stats,
+    recent_rows,
     time_coverage,
 )
 
-# VectorDB and Agent imports
-try:
-    from vectordb.knowledge_store import get_knowledge_store
-    from agents.parsing_agent import ParsingAgent
-    from agents.strategy_agent import StrategyAgent
-    from agents.risk_agent import RiskAgent
-    from agents.output_agent import OutputAgent
-    from agents.analysis_agent import AnalysisAgent
-    from agents.implementation_agent import ImplementationAgent
+# VectorDB and agent modules pull in chromadb, sentence-transformers and
+# matplotlib, so they are imported when the orchestrator is first built
+# rather than at module import.
+VECTORDB_AVAILABLE = None
+
+
+def _import_vectordb_components() -> Optional[Dict[str, Any]]:
+    """Import VectorDB and agent classes, or return None if unavailable"""
+    global VECTORDB_AVAILABLE
+    try:
+        from vectordb.knowledge_store import get_knowledge_store
+        from agents.parsing_agent import ParsingAgent
+        from agents.strategy_agent import StrategyAgent
+        from agents.risk_agent import RiskAgent
+        from agents.strategy_risk_agent import StrategyRiskAgent, strategy_mode
+        from agents.output_agent import OutputAgent
+        from agents.analysis_agent import AnalysisAgent
+        from agents.implementation_agent import ImplementationAgent
+    except ImportError:
+        VECTORDB_AVAILABLE = False
+        return None
     VECTORDB_AVAILABLE = True
-except ImportError:
-    VECTORDB_AVAILABLE = False
-    get_knowledge_store = None
-    ParsingAgent = None
-    StrategyAgent = None
-    RiskAgent = None
-    OutputAgent = None
-    AnalysisAgent = None
-    ImplementationAgent = None
+    return {
+        "get_knowledge_store": get_knowledge_store,
+        "ParsingAgent": ParsingAgent,
+        "StrategyAgent": StrategyAgent,
+        "RiskAgent": RiskAgent,
+        "StrategyRiskAgent": StrategyRiskAgent,
+        "strategy_mode": strategy_mode,
+        "OutputAgent": OutputAgent,
+        "AnalysisAgent": AnalysisAgent,
+        "ImplementationAgent": ImplementationAgent,
+    }
 
 class EnhancedOrchestrator:
     def __init__(self):
         self.llm_client = LLMClient()
         
         # Initialize VectorDB components if available
-        if VECTORDB_AVAILABLE:
+        components = _import_vectordb_components()
+        if components:
             try:
-                self.knowledge_store = get_knowledge_store()
-                self.parsing_agent = ParsingAgent(self.llm_client)
-                self.strategy_agent = StrategyAgent(self.llm_client)
-                self.risk_agent = RiskAgent(self.llm_client)
-                self.output_agent = OutputAgent()
-                self.analysis_agent = AnalysisAgent() if AnalysisAgent else None
-                self.implementation_agent = ImplementationAgent() if ImplementationAgent else None
+                self.knowledge_store = components["get_knowledge_store"]()
+                self.parsing_agent = components["ParsingAgent"](self.llm_client)
+                self.strategy_agent = components["StrategyAgent"](self.llm_client)
+                self.risk_agent = components["RiskAgent"](self.llm_client)
+                self.strategy_risk_agent = components["StrategyRiskAgent"](self.llm_client, self.risk_agent)
+                self.strategy_mode = components["strategy_mode"]
+                self.output_agent = components["OutputAgent"]()
+                self.analysis_agent = components["AnalysisAgent"]()
+                self.implementation_agent = components["ImplementationAgent"]()
                 self.use_vectordb = True
             except Exception as e:
                 print(f"Warning: VectorDB initialization failed: {e}. Continuing without VectorDB.")
@@ -100,6 +123,7 @@ class EnhancedOrchestrator:
         ]
         return any(keyword in message.lower() for keyword in chart_keywords)
 
+    @traced("orchestrator.data_context")
     def _get_comprehensive_data_context(self, message: str) -> tuple:
         """
         Get comprehensive data context for the LLM based on the user's question
@@ -144,19 +168,16 @@ class EnhancedOrchestrator:
             if (year is not None or month is not None):
                 # If user specified a time filter, default to generating charts relevant to spend/category
                 should_chart = True
+            # Charts only if the answer call still fits after them
+            if should_chart and not stage_allowed("charts", expected("charts") + expected("llm"), fallback="answer without charts"):
+                should_chart = False
             if should_chart:
+                chart_start = time.perf_counter()
                 try:
                     # Build filtered inputs for visualizations
                     # recent_data filtered by year/month if provided
-                    where = ""
-                    if year and month:
-                        where = f" WHERE CAST(date AS VARCHAR) LIKE '{year}-{month:02d}%'"
-                    elif year:
-                        where = f" WHERE CAST(date AS VARCHAR) LIKE '{year}%'"
-                    recent_sql = (
-                        "SELECT date, monthly_expense_total, monthly_income FROM t" + where + " ORDER BY date ASC LIMIT 5000"
-                    )
-                    recent_data = query_csv(recent_sql, limit=5000)
+                    # (a month alone does not filter the trend rows)
+                    recent_data = recent_rows(year=year, month=month if year else None, limit=5000)
                     # attach meta label for time range
                     label_parts = []
                     if year:
@@ -181,7 +202,11 @@ class EnhancedOrchestrator:
                     merchants_data = {**merchants_data, "meta": {"label": time_label}}
 
                     # Generate dynamic visualizations based on user request
+                    from app.tools.visualization import generate_dynamic_visualizations
                     visualizations = generate_dynamic_visualizations(message, spending_data, recent_data, merchants_data)
+                    observe("charts", time.perf_counter() - chart_start)
+                except DeadlineExceeded:
+                    raise
                 except Exception as e:
                     print(f"Visualization error: {e}")
                     visualizations = {}
@@ -189,6 +214,8 @@ class EnhancedOrchestrator:
             analysis = "\n".join(context_parts)
             return analysis, visualizations
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             return f"Error analyzing transaction data: {str(e)}", {}
 
@@ -203,6 +230,27 @@ class EnhancedOrchestrator:
             print(f"Date range error: {e}")
             return "Unknown"
 
+    @traced("orchestrator.quick_answer")
+    def _quick_answer(self, message: str, user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Templated response for numeric spending questions (see app/quick_answers.py), else None"""
+        try:
+            return quick_answer(message, self._extract_year_month, self.llm_client, user_id=user_id)
+        except Exception as e:
+            print(f"Quick answer error: {e}")
+            return None
+
+    def _answer_cache(self, message: str, context: List[Dict[str, str]] = None):
+        """Semantic answer cache for this question (see vectordb/answer_cache.py), else None"""
+        # Short follow-ups ("and for 10 years?") depend on the conversation, not just the words
+        if context and len(message.split()) < 5:
+            return None
+        try:
+            from vectordb.answer_cache import answer_cache_enabled, get_answer_cache
+        except ImportError:
+            return None
+        return get_answer_cache() if answer_cache_enabled() else None
+
+    @traced("orchestrator.specific_analysis")
     def _get_specific_analysis(self, message: str) -> str:
         """Get specific analysis based on the user's question - optimized for speed"""
         try:
@@ -293,9 +341,30 @@ class EnhancedOrchestrator:
             
             return ""
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             return f"Error in specific analysis: {str(e)}"
 
+    def _data_only_answer(self, data_analysis: str = "", visualizations: Dict[str, str] = None,
+                          knowledge_context: List[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Answer from the computed data alone, when the deadline leaves no time for the LLM"""
+        parts = ["A full written answer did not fit in this request's time limit. Here is what the data shows:"]
+        if data_analysis:
+            parts.append(data_analysis)
+        elif knowledge_context:
+            parts.append("**Relevant guidance:**")
+            for chunk in knowledge_context[:3]:
+                parts.append(f"- {chunk.get('content', '')[:300].strip()}")
+        else:
+            parts.append("No figures matched this question yet; please ask again or allow more time.")
+        response = {"answer": "\n\n".join(parts), "status": "success", "type": "text"}
+        if visualizations:
+            response["visualizations"] = visualizations
+            response["type"] = "visualization"
+        return response
+
+    @traced("orchestrator.craft_advisor_reply")
     def craft_advisor_reply(self, user_message: str, observations_text: str = "") -> str:
         """
         Craft a concise advisor reply with data context (integrated from advisor_reply.py)
@@ -315,31 +384,50 @@ class EnhancedOrchestrator:
         except Exception:
             data_context = "Data columns: (unavailable)"
         
-        prompt = f"{system_advisor}\nData Context:\n{data_context}\nObservations:\n{observations_text}\nUser: {user_message}\n{guidance}\nFinal answer:"
+        prompt = f"{system_advisor_for()}\nData Context:\n{data_context}\nObservations:\n{observations_text}\nUser: {user_message}\n{guidance}\nFinal answer:"
         return self.llm_client.complete(prompt).strip()
 
+    @traced("orchestrator.vectordb_workflow")
     def _process_with_vectordb_workflow(
         self,
         message: str,
-        context: List[Dict[str, str]] = None
+        context: List[Dict[str, str]] = None,
+        user_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Process query using VectorDB workflow:
         User Query → Parsing Agent → Embedding → VectorDB Search → Strategy Agent → Risk Agent → Output Agent
         """
         try:
+            # Step 0: Semantic answer cache - a near-duplicate question skips all four LLM calls
+            started = time.perf_counter()
+            cache = self._answer_cache(message, context)
+            risk_profile = None
+            cache_vector = None
+            if cache is not None:
+                risk_profile = self.risk_agent.get_risk_profile(user_id)
+                try:
+                    cached, cache_vector = cache.lookup(message, risk_profile, user_id=user_id)
+                except Exception as e:
+                    print(f"Answer cache lookup failed: {e}")
+                    cached, cache = None, None
+                if cached is not None:
+                    return cached
+
             # Step 1: Parsing Agent - Extract intent and requirements
             parsed = self.parsing_agent.parse_query(message, context)
             
             # Step 2: Retrieve knowledge from VectorDB if needed
             knowledge_context = []
-            if parsed.get('requires_knowledge', False):
+            if parsed.get('requires_knowledge', False) and stage_allowed("knowledge", "knowledge", fallback="answer without knowledge"):
                 query_keywords = ' '.join(parsed.get('keywords', [message]))
+                knowledge_start = time.perf_counter()
                 knowledge_context = self.knowledge_store.retrieve_knowledge(
                     query=query_keywords,
                     namespace=None,  # Search all namespaces
                     top_k=5
                 )
+                observe("knowledge", time.perf_counter() - knowledge_start)
             
             # Step 3: Get transaction data if needed
             transaction_summary = None
@@ -369,18 +457,12 @@ class EnhancedOrchestrator:
                     }
                     
                     # Perform financial health analysis if analysis agent is available
-                    if self.analysis_agent:
+                    if self.analysis_agent and stage_allowed("financial_analysis", "analysis", fallback="answer without analysis"):
+                        analysis_start = time.perf_counter()
                         try:
                             # Load user profile for income/savings goals
-                            import json
-                            profile_path = os.path.join(
-                                os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-                                'state', 'profile.json'
-                            )
-                            profile = {}
-                            if os.path.exists(profile_path):
-                                with open(profile_path, 'r') as f:
-                                    profile = json.load(f)
+                            from database.profile_cache import get_profile_cache
+                            profile = get_profile_cache().get(user_id) or {}
                             
                             # Extract financial data
                             financial_data = self.analysis_agent.extract_financial_data_from_transactions(
@@ -389,6 +471,7 @@ class EnhancedOrchestrator:
                             
                             # Perform analysis (with user_id for personalization)
                             financial_analysis = self.analysis_agent.analyze(financial_data, user_id=user_id)
+                            observe("analysis", time.perf_counter() - analysis_start)
                         except Exception as e:
                             print(f"Financial analysis error: {e}")
                             
@@ -400,22 +483,35 @@ class EnhancedOrchestrator:
             is_investment_query = query_type in ['investment_advice', 'portfolio_question', 'market_question']
             
             if is_investment_query and knowledge_context:
-                # Step 5: Strategy Agent - Generate strategy
-                risk_profile = self.risk_agent.get_risk_profile()
-                strategy = self.strategy_agent.generate_strategy(
-                    user_query=message,
-                    knowledge_context=knowledge_context,
-                    risk_profile=risk_profile,
-                    transaction_summary=transaction_summary,
-                    market_context=None  # Could fetch real-time market data here
-                )
-                
-                # Step 6: Risk Agent - Assess risk alignment
-                risk_assessment = self.risk_agent.assess_risk(
-                    strategy=strategy,
-                    risk_profile=risk_profile,
-                    knowledge_context=knowledge_context
-                )
+                # Steps 5-6: Strategy Agent and Risk Agent, or both in one call (APEX_STRATEGY_MODE=fused)
+                risk_profile = risk_profile or self.risk_agent.get_risk_profile(user_id)
+                if not stage_allowed("strategy", "llm", fallback="data-only answer"):
+                    return self._data_only_answer(knowledge_context=knowledge_context)
+                mode = self.strategy_mode()
+                if mode == "two_call" and not stage_allowed("risk_review", expected("llm") * 2, fallback="fused strategy+risk"):
+                    mode = "fused"
+                if mode == "fused":
+                    strategy, risk_assessment = self.strategy_risk_agent.generate_strategy_with_risk(
+                        user_query=message,
+                        knowledge_context=knowledge_context,
+                        risk_profile=risk_profile,
+                        transaction_summary=transaction_summary,
+                        market_context=None
+                    )
+                else:
+                    strategy = self.strategy_agent.generate_strategy(
+                        user_query=message,
+                        knowledge_context=knowledge_context,
+                        risk_profile=risk_profile,
+                        transaction_summary=transaction_summary,
+                        market_context=None  # Could fetch real-time market data here
+                    )
+                    
+                    risk_assessment = self.risk_agent.assess_risk(
+                        strategy=strategy,
+                        risk_profile=risk_profile,
+                        knowledge_context=knowledge_context
+                    )
                 
                 # Step 7: Implementation Agent - Generate execution plan
                 implementation_plan = None
@@ -448,6 +544,8 @@ class EnhancedOrchestrator:
                     knowledge_sources=knowledge_context
                 )
                 
+                response["metadata"]["strategy_mode"] = mode
+                
                 # Add financial analysis if available
                 if financial_analysis:
                     response["financial_analysis"] = financial_analysis
@@ -464,6 +562,12 @@ class EnhancedOrchestrator:
                         response["type"] = "strategy_with_analysis_and_implementation"
                     else:
                         response["type"] = "strategy_with_implementation"
+
+                deadline = current_deadline()
+                if cache is not None and cache_vector is not None and not (deadline and deadline.skipped):
+                    # The financial analysis is the user's own; other answers are shared per profile
+                    cache.put(message, cache_vector, risk_profile, response, time.perf_counter() - started,
+                              user_id=user_id if financial_analysis else None)
                 
                 return response
             else:
@@ -471,7 +575,7 @@ class EnhancedOrchestrator:
                 data_analysis, visualizations = self._get_comprehensive_data_context(message)
                 
                 # Build prompt with knowledge context
-                full_prompt = f"{system_advisor}\n\n"
+                full_prompt = f"{system_advisor_for(user_id)}\n\n"
                 
                 if knowledge_context:
                     knowledge_text = "RELEVANT KNOWLEDGE:\n"
@@ -485,7 +589,9 @@ class EnhancedOrchestrator:
                 full_prompt += f"User Question: {message}\n\n"
                 
                 # Get response from LLM
-                response_text = self.llm_client.complete(full_prompt)
+                response_text = self.llm_client.complete_before_deadline(full_prompt, "answer", "data-only answer")
+                if response_text is None:
+                    return self._data_only_answer(data_analysis, visualizations, knowledge_context)
                 
                 # Format with Output Agent
                 response = self.output_agent.format_simple_response(
@@ -508,25 +614,45 @@ class EnhancedOrchestrator:
                 
                 return response
                 
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             # Fallback to original workflow on error
             print(f"VectorDB workflow error: {e}")
             return None
     
-    def chat(self, message: str, context: List[Dict[str, str]] = None, user_id: Optional[str] = None) -> Dict[str, Any]:
+    @traced("orchestrator.chat")
+    def chat(self, message: str, context: List[Dict[str, str]] = None, user_id: Optional[str] = None,
+             session_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Main chat function that processes user messages and returns structured responses
         Uses VectorDB workflow if available, otherwise falls back to original workflow
         
         Args:
             message: User's message
-            context: Conversation context
+            context: Conversation context sent by the client (used when there is no server-side session)
             user_id: Optional user ID for personalization
+            session_id: Optional session ID; the session's rolling summary and last turn
+                replace the client context, and this turn is recorded in it
         """
+        history = conversation(session_id, context)
+        response = self._respond(message, history, user_id)
+        if not cancelled():
+            # A cancelled turn was never seen by the user
+            remember(session_id, message, response)
+        return response
+
+    def _respond(self, message: str, context: List[Dict[str, str]] = None, user_id: Optional[str] = None) -> Dict[str, Any]:
+        """Answer one message given the conversation context"""
         try:
+            # Numeric spending questions are answered from templates, without the LLM
+            quick = self._quick_answer(message, user_id)
+            if quick:
+                return quick
+
             # Try VectorDB workflow first if available
             if self.use_vectordb:
-                vectordb_response = self._process_with_vectordb_workflow(message, context)
+                vectordb_response = self._process_with_vectordb_workflow(message, context, user_id=user_id)
                 if vectordb_response:
                     return vectordb_response
             
@@ -541,7 +667,7 @@ class EnhancedOrchestrator:
             data_analysis, visualizations = self._get_comprehensive_data_context(message)
             
             # Create the full prompt with rich data context
-            full_prompt = f"{system_advisor}\n\n"
+            full_prompt = f"{system_advisor_for(user_id)}\n\n"
             
             if data_analysis:
                 full_prompt += f"TRANSACTION DATA CONTEXT:\n{data_analysis}\n\n"
@@ -561,7 +687,9 @@ class EnhancedOrchestrator:
 - Focus on the most relevant data points"""
             
             # Get response from LLM
-            response = self.llm_client.complete(full_prompt)
+            response = self.llm_client.complete_before_deadline(full_prompt, "answer", "data-only answer")
+            if response is None:
+                return self._data_only_answer(data_analysis, visualizations)
             
             # Prepare response with visualizations
             response_data = {
@@ -588,6 +716,12 @@ class EnhancedOrchestrator:
             
             return response_data
                 
+        except DeadlineExceeded:
+            return {
+                "answer": "Sorry, this request ran out of time before the data could be read. Please try again.",
+                "status": "error",
+                "type": "deadline_exceeded"
+            }
         except Exception as e:
             return {
                 "answer": f"I apologize, but I encountered an error: {str(e)}",
@@ -595,17 +729,34 @@ class EnhancedOrchestrator:
                 "type": "error"
             }
 
-# Create global instance
-enhanced_orchestrator = EnhancedOrchestrator()
+# Global instance, built on first use (or by the API warm-up hook)
+_enhanced_orchestrator = None
+_enhanced_orchestrator_lock = threading.Lock()
+
+def get_enhanced_orchestrator() -> EnhancedOrchestrator:
+    """Get or create the shared orchestrator (thread-safe)"""
+    global _enhanced_orchestrator
+    if _enhanced_orchestrator is None:
+        with _enhanced_orchestrator_lock:
+            if _enhanced_orchestrator is None:
+                _enhanced_orchestrator = EnhancedOrchestrator()
+    return _enhanced_orchestrator
+
+def __getattr__(name: str):
+    # Backward compatibility for `from orchestrator import enhanced_orchestrator`
+    if name == "enhanced_orchestrator":
+        return get_enhanced_orchestrator()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-def chat(message: str, context: List[Dict[str, str]] = None, user_id: Optional[str] = None) -> Dict[str, Any]:
+def chat(message: str, context: List[Dict[str, str]] = None, user_id: Optional[str] = None,
+         session_id: Optional[str] = None) -> Dict[str, Any]:
     """
     Main chat function that can be imported by other modules
     """
-    return enhanced_orchestrator.chat(message, context, user_id=user_id)
+    return get_enhanced_orchestrator().chat(message, context, user_id=user_id, session_id=session_id)
 
 def craft_answer(user_message: str, observations_text: str = "") -> str:
     """
     Convenience function for backward compatibility with advisor_reply.py
     """
-    return enhanced_orchestrator.craft_advisor_reply(user_message, observations_text)
+    return get_enhanced_orchestrator().craft_advisor_reply(user_message, observations_text)
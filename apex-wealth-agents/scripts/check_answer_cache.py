@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Behaviour check for the semantic answer cache (vectordb/answer_cache.py).
+
+Uses a deterministic bag-of-words embedder in place of MiniLM so it runs
+without sentence-transformers, and checks:
+
+  - a reworded question hits, an unrelated one misses
+  - entries are scoped by risk profile, data version and (for personalized
+    answers) user
+  - TTL expiry and LRU eviction
+  - the strategy workflow answers a repeated question without LLM calls,
+    and the hit rate / saved latency are reported
+
+Exits 1 on any failure.
+
+Usage (from apex-wealth-agents/):
+    python scripts/check_answer_cache.py
+"""
+import hashlib
+import importlib
+import os
+import re
+import sys
+import time
+import types
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+os.environ.setdefault("APEX_WARMUP", "none")
+os.environ["APEX_QUICK_ANSWERS"] = "off"
+os.environ["APEX_SESSIONS"] = "0"
+
+try:
+    import vectordb  # noqa: F401
+except ImportError:
+    # vectordb/__init__ needs chromadb; load the package's own modules without it
+    package = types.ModuleType("vectordb")
+    package.__path__ = [os.path.join(BASE_DIR, "vectordb")]
+    sys.modules["vectordb"] = package
+
+answer_cache = importlib.import_module("vectordb.answer_cache")
+
+MODERATE = {"risk_tolerance": "moderate", "goals": ["retirement"], "time_horizon": "long"}
+AGGRESSIVE = {"risk_tolerance": "aggressive", "goals": ["retirement"], "time_horizon": "long"}
+STOPWORDS = {"i", "a", "an", "the", "my", "should", "do", "how", "what", "in", "to", "me", "is", "for"}
+
+
+class BagOfWordsEmbedder:
+    """Hashed word counts: rewordings that share content words score close to 1"""
+
+    def embed_single(self, text):
+        vector = np.zeros(256, dtype=np.float32)
+        for word in re.findall(r"[a-z0-9]+", text.lower()):
+            if word not in STOPWORDS:
+                vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % 256] += 1.0
+        return vector.tolist()
+
+
+def check_cache(failures):
+    cache = answer_cache.SemanticAnswerCache(BagOfWordsEmbedder(), threshold=0.9, ttl=60, max_entries=3)
+    response = {"answer": "Start a monthly SIP in an index fund.", "type": "strategy"}
+
+    hit, vector = cache.lookup("Should I start a SIP in an index fund?", MODERATE, version="v1")
+    if hit is not None:
+        failures.append("empty cache returned a hit")
+    cache.put("Should I start a SIP in an index fund?", vector, MODERATE, response, 4.0, version="v1")
+
+    hit, _ = cache.lookup("start SIP index fund", MODERATE, version="v1")
+    if not hit or hit["answer"] != response["answer"] or "cache" not in hit:
+        failures.append("reworded question missed")
+    if cache.lookup("How much did I spend on groceries?", MODERATE, version="v1")[0] is not None:
+        failures.append("unrelated question hit")
+    if cache.lookup("start SIP index fund", AGGRESSIVE, version="v1")[0] is not None:
+        failures.append("hit across risk profiles")
+    if cache.lookup("start SIP index fund", dict(MODERATE, user_id="u2"), version="v1")[0] is None:
+        failures.append("user_id in the profile split a shared scope")
+    if cache.lookup("start SIP index fund", MODERATE, version="v2")[0] is not None:
+        failures.append("hit across data versions")
+
+    _, vector = cache.lookup("Is gold a good hedge?", MODERATE, version="v1")
+    cache.put("Is gold a good hedge?", vector, MODERATE, {"answer": "yours"}, 2.0, user_id="u1", version="v1")
+    if cache.lookup("gold good hedge", MODERATE, user_id="u2", version="v1")[0] is not None:
+        failures.append("personalized answer served to another user")
+    if cache.lookup("gold good hedge", MODERATE, user_id="u1", version="v1")[0] is None:
+        failures.append("personalized answer missed for its user")
+
+    hit["answer"] = "mutated"
+    if cache.lookup("start SIP index fund", MODERATE, version="v1")[0]["answer"] != response["answer"]:
+        failures.append("returned response shares state with the cache")
+
+    for i, topic in enumerate(("bonds", "crypto", "real estate")):
+        _, vector = cache.lookup(f"Should I buy {topic}?", MODERATE, version="v1")
+        cache.put(f"Should I buy {topic}?", vector, MODERATE, {"answer": topic}, 1.0, version="v1")
+    if cache.stats()["entries"] != 3:
+        failures.append(f"{cache.stats()['entries']} entries kept (max 3)")
+    if cache.lookup("start SIP index fund", MODERATE, version="v1")[0] is not None:
+        failures.append("least recently used entry was not evicted")
+
+    cache.ttl = 0.05
+    time.sleep(0.1)
+    if cache.lookup("buy bonds", MODERATE, version="v1")[0] is not None:
+        failures.append("expired entry hit")
+    if cache.stats()["entries"] != 0:
+        failures.append("expired entries were not dropped on lookup")
+
+    stats = cache.stats()
+    if stats["hits"] != 4 or stats["saved_seconds"] != 14.0:
+        failures.append(f"unexpected stats {stats}")
+    return stats
+
+
+def check_workflow(failures):
+    import orchestrator
+    from agents.implementation_agent import ImplementationAgent
+    from agents.output_agent import OutputAgent
+    from agents.parsing_agent import ParsingAgent
+    from agents.risk_agent import RiskAgent
+    from agents.strategy_agent import StrategyAgent
+    from agents.strategy_risk_agent import StrategyRiskAgent, strategy_mode
+    from llm.llm_client import LLMClient
+
+    calls = []
+
+    def fake_complete(self, prompt, *args, **kwargs):
+        calls.append(prompt)
+        time.sleep(0.05)
+        if "query_type" in prompt:
+            return ('{"intent": "invest", "query_type": "investment_advice", "keywords": ["sip", "index"], '
+                    '"requires_knowledge": true, "requires_transaction_data": false, "requires_market_data": false}')
+        return '{"strategy_summary": "Invest monthly in a broad index fund.", "recommendations": []}'
+
+    class Knowledge:
+        def retrieve_knowledge(self, query, namespace=None, top_k=5):
+            return [{"content": "Index funds track a market index at low cost.", "metadata": {"title": "Index funds"}}]
+
+    LLMClient.complete = fake_complete
+    orch = orchestrator.EnhancedOrchestrator()
+    orch.knowledge_store = Knowledge()
+    orch.parsing_agent = ParsingAgent(orch.llm_client)
+    orch.strategy_agent = StrategyAgent(orch.llm_client)
+    orch.risk_agent = RiskAgent(orch.llm_client)
+    orch.strategy_risk_agent = StrategyRiskAgent(orch.llm_client, orch.risk_agent)
+    orch.strategy_mode = strategy_mode
+    orch.output_agent = OutputAgent()
+    orch.implementation_agent = ImplementationAgent()
+    orch.analysis_agent = None
+    orch.use_vectordb = True
+
+    cache = answer_cache.get_answer_cache()
+    cache._embedder = BagOfWordsEmbedder()
+    cache.threshold = 0.9
+
+    start = time.perf_counter()
+    first = orch._process_with_vectordb_workflow("Should I start a SIP in an index fund?")
+    cold = time.perf_counter() - start
+    cold_calls = len(calls)
+    start = time.perf_counter()
+    second = orch._process_with_vectordb_workflow("should i start an index fund SIP")
+    warm = time.perf_counter() - start
+    warm_calls = len(calls) - cold_calls
+
+    if not first or "cache" in first:
+        failures.append(f"first question did not run the pipeline: {first}")
+    elif not second or second.get("answer") != first.get("answer") or "cache" not in second:
+        failures.append("repeated question was not answered from the cache")
+    if warm_calls:
+        failures.append(f"cache hit still made {warm_calls} LLM call(s)")
+    follow_up = orch._process_with_vectordb_workflow("and index fund SIP?", context=[{"role": "user", "content": "hi"}])
+    if follow_up and "cache" in follow_up:
+        failures.append("short follow-up was answered from the cache")
+    print(f"workflow: cold {cold * 1000:.0f} ms / {cold_calls} LLM calls, "
+          f"cached {warm * 1000:.1f} ms / {warm_calls} LLM calls")
+    return cache.stats()
+
+
+def main():
+    failures = []
+    print("cache:", check_cache(failures))
+    print("workflow cache:", check_workflow(failures))
+    for failure in failures:
+        print("   FAIL", failure)
+    print("OK" if not failures else f"{len(failures)} FAILURES")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Behaviour check for cancelling work when a client disconnects.
+
+Runs the API under uvicorn against the stub LLM server (1.5 s per call) and
+checks:
+
+  - a /chat or /historical/analyze client that hangs up mid-request cancels
+    it: the handler stops waiting for the LLM call and returns within a
+    fraction of the LLM latency, no further LLM calls start, and
+    apex_cancelled_work_total counts the dropped work
+  - a request that completes normally is not counted as cancelled
+  - queued pool jobs and chart renders of a cancelled request are dropped
+  - a coalesced call's follower stops waiting for the leader when its own
+    request is cancelled or runs out of budget
+
+Exits 1 on any failure.
+
+Usage (from apex-wealth-agents/):
+    python scripts/check_cancellation.py
+"""
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, os.path.join(BASE_DIR, "scripts"))
+
+from stub_llm_server import start_stub_server  # noqa: E402
+
+LLM_LATENCY_MS = 1500
+
+os.environ.setdefault("APEX_WARMUP", "none")
+os.environ["APEX_QUICK_ANSWERS"] = "off"
+os.environ["APEX_SESSIONS"] = "0"
+os.environ["APEX_ANSWER_CACHE"] = "0"
+os.environ["LLM_PROVIDER"] = "free"
+
+stub = start_stub_server(latency_ms=LLM_LATENCY_MS)
+os.environ["LLM_BASE_URL"] = f"http://127.0.0.1:{stub.server_port}/api/chat"
+
+llm_calls = []
+_handler = stub.RequestHandlerClass
+_do_post = _handler.do_POST
+
+
+def counting_do_post(self):
+    llm_calls.append(time.monotonic())
+    _do_post(self)
+
+
+_handler.do_POST = counting_do_post
+
+
+def start_api():
+    import uvicorn
+    from app.main import app
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, port
+
+
+def post(port, path, payload, hang_up_after=None):
+    """POST payload; with hang_up_after, close the connection after that many seconds"""
+    body = json.dumps(payload).encode()
+    request = (f"POST {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\n"
+               f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n").encode() + body
+    conn = socket.create_connection(("127.0.0.1", port))
+    conn.sendall(request)
+    if hang_up_after is not None:
+        time.sleep(hang_up_after)
+        conn.close()
+        return None
+    chunks = []
+    while True:
+        chunk = conn.recv(65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    conn.close()
+    return json.loads(b"".join(chunks).split(b"\r\n\r\n", 1)[1])
+
+
+def wait_idle(pool, timeout=10.0):
+    """Seconds until the pool has no job in flight"""
+    start = time.monotonic()
+    while pool.stats()["in_flight"] and time.monotonic() - start < timeout:
+        time.sleep(0.01)
+    return time.monotonic() - start
+
+
+def check_disconnect(port, path, message, failures):
+    from app.concurrency import io_pool
+    from app.metrics import CANCELLED_WORK_TOTAL
+
+    before = CANCELLED_WORK_TOTAL.value(stage="request")
+    llm_calls.clear()
+    post(port, path, {"session_id": "c1", "message": message}, hang_up_after=0.4)
+    hung_up = time.monotonic()
+    drained = wait_idle(io_pool)
+    time.sleep(0.2)
+    calls_after = [t for t in llm_calls if t > hung_up]
+    if CANCELLED_WORK_TOTAL.value(stage="request") != before + 1:
+        failures.append(f"{path}: disconnect not detected")
+    if drained > 0.5:
+        failures.append(f"{path}: handler ran {drained:.2f} s after the client left (LLM call {LLM_LATENCY_MS} ms)")
+    if calls_after:
+        failures.append(f"{path}: {len(calls_after)} LLM call(s) started after the disconnect")
+    print(f"{path} disconnect: handler finished {drained * 1000:.0f} ms after the hang-up, "
+          f"{len(llm_calls)} LLM call(s) before it")
+
+
+def check_completed(port, path, message, failures):
+    from app.metrics import CANCELLED_WORK_TOTAL
+
+    before = CANCELLED_WORK_TOTAL.value(stage="request")
+    start = time.monotonic()
+    response = post(port, path, {"session_id": "c2", "message": message})
+    if response.get("deadline", {}).get("cancelled") is not False:
+        failures.append(f"completed request reported {response.get('deadline')}")
+    if CANCELLED_WORK_TOTAL.value(stage="request") != before:
+        failures.append("completed request counted as cancelled")
+    print(f"{path} completed in {(time.monotonic() - start) * 1000:.0f} ms: status {response.get('status')}, "
+          f"skipped {response.get('deadline', {}).get('skipped_stages')}")
+
+
+def check_dropped_work(failures):
+    from app.concurrency import io_pool
+    from app.deadline import RequestCancelled, start_deadline
+    from app.metrics import CANCELLED_WORK_TOTAL
+    from app.tools.visualization import create_spending_pie_chart
+
+    ran = []
+    with start_deadline(None, cancellable=True) as deadline:
+        deadline.cancel()
+        future = io_pool.submit(ran.append, 1)
+        try:
+            future.result()
+            failures.append("queued job of a cancelled request ran")
+        except RequestCancelled:
+            pass
+        if create_spending_pie_chart({"totals": [{"key": "Food", "spent": 10.0}]}) != "":
+            failures.append("chart rendered for a cancelled request")
+    print(f"dropped work: {dict((k[0], v) for k, v in CANCELLED_WORK_TOTAL._values.items())}")
+
+
+def check_coalesced_follower(failures):
+    from app.deadline import DeadlineExceeded, RequestCancelled, start_deadline
+    from app.singleflight import SingleFlight
+
+    group = SingleFlight("check", ttl=0)
+    release = threading.Event()
+    leader = threading.Thread(target=group.do, args=("key", release.wait, 5.0))
+    leader.start()
+    time.sleep(0.05)
+    try:
+        for budget_ms, cancel_after, expected in ((None, 0.1, RequestCancelled), (200, None, DeadlineExceeded)):
+            with start_deadline(budget_ms, cancellable=True) as deadline:
+                if cancel_after is not None:
+                    threading.Timer(cancel_after, deadline.cancel).start()
+                start = time.monotonic()
+                try:
+                    group.do("key", release.wait, 5.0)
+                    failures.append(f"follower waited for the leader instead of raising {expected.__name__}")
+                except DeadlineExceeded as e:
+                    waited = time.monotonic() - start
+                    if type(e) is not expected:
+                        failures.append(f"follower raised {type(e).__name__}, expected {expected.__name__}")
+                    elif waited > 0.5:
+                        failures.append(f"follower took {waited:.2f} s to give up ({expected.__name__})")
+                    print(f"coalesced follower: {type(e).__name__} after {waited * 1000:.0f} ms")
+    finally:
+        release.set()
+        leader.join()
+
+
+def main():
+    server, port = start_api()
+    failures = []
+    try:
+        # Also warms imports and data caches, so the timed requests below wait on the LLM
+        check_completed(port, "/chat", "hello", failures)
+        check_completed(port, "/historical/analyze", "expenditure analysis from 2019", failures)
+        check_disconnect(port, "/chat", "how are my finances looking?", failures)
+        check_disconnect(port, "/historical/analyze", "expenditure analysis from 2019", failures)
+        check_dropped_work(failures)
+        check_coalesced_follower(failures)
+    finally:
+        server.should_exit = True
+        stub.shutdown()
+    for failure in failures:
+        print("   FAIL", failure)
+    print("OK" if not failures else f"{len(failures)} FAILURES")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
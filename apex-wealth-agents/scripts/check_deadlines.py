@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Behaviour check for per-request deadlines (app/deadline.py).
+
+Replaces the LLM provider call with a fixed 0.3 s sleep and checks:
+
+  - without pressure nothing is skipped and the "deadline" block is reported
+  - a tight budget (X-Deadline-Ms or ChatReq.deadline_ms) skips charts,
+    parses by keywords and returns a data-only answer, within the budget
+  - the investment workflow downgrades two_call to fused strategy+risk,
+    or answers from the knowledge alone
+  - /historical/analyze drops charts and falls back to the computed summary
+  - LLM timeouts are capped by the remaining budget and the SQL tools
+    refuse to start after the deadline
+
+Exits 1 on any failure.
+
+Usage (from apex-wealth-agents/):
+    python scripts/check_deadlines.py
+"""
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+os.environ.setdefault("APEX_WARMUP", "none")
+os.environ["APEX_QUICK_ANSWERS"] = "off"
+os.environ["APEX_SESSIONS"] = "0"
+os.environ["APEX_ANSWER_CACHE"] = "0"
+os.environ["APEX_DEADLINE_ESTIMATES"] = "llm:0.3,charts:0.3,analysis:0.05,knowledge:0.05"
+
+LLM_SECONDS = 0.3
+calls = []
+
+
+def fake_provider(self, prompt, system):
+    calls.append(prompt)
+    time.sleep(LLM_SECONDS)
+    if "query_type" in prompt:
+        return ('{"intent": "invest", "query_type": "investment_advice", "keywords": ["sip", "index"], '
+                '"requires_knowledge": true, "requires_transaction_data": false, "requires_market_data": false}')
+    if "strategy_summary" in prompt:
+        return '{"strategy_summary": "Invest monthly in a broad index fund.", "recommendations": []}'
+    return "Here is your answer."
+
+
+def skipped(response):
+    return [s["stage"] for s in response.get("deadline", {}).get("skipped_stages", [])]
+
+
+def check_chat(client, failures):
+    calls.clear()
+    response = client.post("/chat", json={"session_id": "d1", "message": "show my spending by category"}).json()
+    if "deadline" not in response or skipped(response):
+        failures.append(f"default budget: unexpected deadline block {response.get('deadline')}")
+    if not calls:
+        failures.append("default budget: the LLM was not called")
+
+    for label, kwargs in (("header", {"headers": {"X-Deadline-Ms": "200"}}),
+                          ("field", {"json_extra": {"deadline_ms": 200}})):
+        calls.clear()
+        body = {"session_id": "d2", "message": "show my spending by category chart"}
+        body.update(kwargs.get("json_extra", {}))
+        start = time.perf_counter()
+        response = client.post("/chat", json=body, headers=kwargs.get("headers")).json()
+        elapsed = time.perf_counter() - start
+        stages = skipped(response)
+        if "answer" not in stages or calls:
+            failures.append(f"{label}: final LLM call not skipped ({stages}, {len(calls)} calls)")
+        if response.get("status") != "success" or "time limit" not in response.get("answer", ""):
+            failures.append(f"{label}: no data-only answer: {response.get('answer', '')[:80]}")
+        if elapsed > 1.0:
+            failures.append(f"{label}: took {elapsed:.2f} s on a 200 ms budget")
+        print(f"chat ({label}, 200 ms): {elapsed * 1000:.0f} ms, skipped {stages}")
+
+    # The field only tightens the header
+    response = client.post("/chat", json={"session_id": "d3", "message": "hello", "deadline_ms": 90000},
+                           headers={"X-Deadline-Ms": "5000"}).json()
+    if response.get("deadline", {}).get("budget_ms") != 5000:
+        failures.append(f"deadline_ms extended the header budget: {response.get('deadline')}")
+
+
+def check_historical(client, failures):
+    calls.clear()
+    response = client.post("/historical/analyze", json={"session_id": "h1", "message": "expenditure analysis from 2019",
+                                                        "deadline_ms": 200}).json()
+    stages = skipped(response)
+    if response.get("type") == "historical_analysis":
+        if response.get("charts") or "charts" not in stages or "answer" not in stages or calls:
+            failures.append(f"historical: charts/answer not skipped ({stages}, {len(calls)} calls)")
+    print(f"historical (200 ms): type {response.get('type')}, skipped {stages}")
+
+
+def check_workflow(failures):
+    import orchestrator
+    from agents.implementation_agent import ImplementationAgent
+    from agents.output_agent import OutputAgent
+    from agents.parsing_agent import ParsingAgent
+    from agents.risk_agent import RiskAgent
+    from agents.strategy_agent import StrategyAgent
+    from agents.strategy_risk_agent import StrategyRiskAgent
+    from app.deadline import start_deadline
+
+    class Knowledge:
+        def retrieve_knowledge(self, query, namespace=None, top_k=5):
+            return [{"content": "Index funds track a market index at low cost.", "metadata": {"title": "Index funds"}}]
+
+    orch = orchestrator.EnhancedOrchestrator()
+    orch.knowledge_store = Knowledge()
+    orch.parsing_agent = ParsingAgent(orch.llm_client)
+    orch.strategy_agent = StrategyAgent(orch.llm_client)
+    orch.risk_agent = RiskAgent(orch.llm_client)
+    orch.strategy_risk_agent = StrategyRiskAgent(orch.llm_client, orch.risk_agent)
+    orch.strategy_mode = lambda: "two_call"
+    orch.output_agent = OutputAgent()
+    orch.implementation_agent = ImplementationAgent()
+    orch.analysis_agent = None
+    orch.use_vectordb = True
+    question = "Should I start a SIP in an index fund?"
+
+    # Room for parse + one strategy call, not for two
+    calls.clear()
+    with start_deadline(1050) as deadline:
+        response = orch._process_with_vectordb_workflow(question)
+        stages = [s["stage"] for s in deadline.skipped]
+    mode = (response or {}).get("metadata", {}).get("strategy_mode")
+    if mode != "fused" or "risk_review" not in stages:
+        failures.append(f"workflow 1050 ms: expected fused mode, got {mode} ({stages})")
+    print(f"workflow (1050 ms): mode {mode}, {len(calls)} LLM calls, skipped {stages}")
+
+    calls.clear()
+    with start_deadline(100) as deadline:
+        response = orch._process_with_vectordb_workflow(question)
+        stages = [s["stage"] for s in deadline.skipped]
+    if calls or "parse" not in stages or "strategy" not in stages:
+        failures.append(f"workflow 100 ms: {len(calls)} LLM calls, skipped {stages}")
+    elif "Index funds" not in (response or {}).get("answer", ""):
+        failures.append("workflow 100 ms: data-only answer lacks the retrieved knowledge")
+    print(f"workflow (100 ms): {len(calls)} LLM calls, skipped {stages}")
+
+
+def check_primitives(failures):
+    from app.deadline import DeadlineExceeded, start_deadline
+    from app.tools.csv_tools import spend_aggregate
+    from llm.llm_client import LLMClient, LLMError
+
+    client = LLMClient()
+    with start_deadline(2000):
+        if not client._attempt_timeout() <= 2.0:
+            failures.append("LLM attempt timeout not capped by the deadline")
+    with start_deadline(300):
+        try:
+            client._attempt_timeout()
+            failures.append("LLM attempt started with under MIN_ATTEMPT_SECONDS left")
+        except LLMError as e:
+            if e.kind != "deadline":
+                failures.append(f"LLM deadline error kind {e.kind}")
+    with start_deadline(10):
+        time.sleep(0.02)
+        try:
+            spend_aggregate(None, "category")
+            failures.append("SQL tool ran after the deadline")
+        except DeadlineExceeded as e:
+            print(f"sql after deadline: {e}")
+
+
+def main():
+    from fastapi.testclient import TestClient
+    from llm.llm_client import LLMClient
+
+    LLMClient._complete_provider = fake_provider
+    from app.main import app
+
+    failures = []
+    with TestClient(app) as client:
+        check_chat(client, failures)
+        check_historical(client, failures)
+    check_workflow(failures)
+    check_primitives(failures)
+    for failure in failures:
+        print("   FAIL", failure)
+    print("OK" if not failures else f"{len(failures)} FAILURES")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Behaviour check for LLMClient's resilience layer (llm/resilience.py) against
+the fault-injecting stub server.
+
+Checks:
+  - 503s and dropped connections are retried with jittered exponential
+    backoff and the call succeeds
+  - 429 waits for Retry-After; a non-retryable 400 fails at once
+  - repeated failures open the circuit: calls then fail in microseconds
+    without reaching the provider, and after the reset time a probe closes it
+  - the token bucket keeps calls under the configured rate
+  - under a 30% error rate most calls still succeed
+
+Exits 1 on any failure.
+
+Usage (from apex-wealth-agents/):
+    python scripts/check_llm_resilience.py
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+os.environ["LLM_PROVIDER"] = "free"
+os.environ["APEX_COALESCE"] = "0"
+
+from scripts.stub_llm_server import Faults, start_stub_server  # noqa: E402
+from llm import resilience  # noqa: E402
+from llm.llm_client import LLMClient, LLMError  # noqa: E402
+
+STUB_LATENCY_MS = 20
+
+
+def client_for(server, retries=3):
+    return LLMClient(base_url=f"http://127.0.0.1:{server.server_port}/api/chat", timeout=5, retries=retries,
+                     backoff_seconds=0.05)
+
+
+def fresh(env=None):
+    """Reset shared breaker/limiter state, with these LLM_* settings"""
+    for name in ("LLM_BREAKER_FAILURES", "LLM_BREAKER_RESET_SECONDS", "LLM_RATE_LIMIT_RPS", "LLM_RATE_LIMIT_BURST"):
+        os.environ.pop(name, None)
+    os.environ.update(env or {})
+    resilience.reset_providers()
+
+
+def timed_call(client, prompt="hi"):
+    start = time.perf_counter()
+    try:
+        client.complete(prompt)
+        error = None
+    except LLMError as e:
+        error = e
+    return time.perf_counter() - start, error
+
+
+def check_retries(server, failures):
+    fresh()
+    client = client_for(server)
+    server.faults.script = [503, "drop", 502]
+    hits = server.hits
+    elapsed, error = timed_call(client)
+    if error is not None or server.hits - hits != 4:
+        failures.append(f"503/drop/502 then success: error={error}, {server.hits - hits} attempts")
+    print(f"retries: 3 faults then success in {elapsed * 1000:.0f} ms")
+
+    server.faults.script = [429]
+    server.faults.retry_after = 1
+    elapsed, error = timed_call(client, "429")
+    server.faults.retry_after = None
+    if error is not None or elapsed < 1.0:
+        failures.append(f"429 Retry-After 1: error={error}, retried after {elapsed:.2f} s")
+    print(f"retry-after: 429 then success in {elapsed * 1000:.0f} ms")
+
+    server.faults.script = [400]
+    hits = server.hits
+    elapsed, error = timed_call(client, "400")
+    if error is None or error.kind != "http" or server.hits - hits != 1:
+        failures.append(f"400 retried or not surfaced: {error}, {server.hits - hits} attempts")
+
+    backoffs = [resilience.RetryPolicy(0.5, 20).backoff(3) for _ in range(1000)]
+    if not (0 <= min(backoffs) and max(backoffs) <= 4.0 and 1.5 < sum(backoffs) / len(backoffs) < 2.5):
+        failures.append("backoff(3) is not uniform over [0, 4 s]")
+
+
+def check_breaker(server, failures):
+    fresh({"LLM_BREAKER_FAILURES": "3", "LLM_BREAKER_RESET_SECONDS": "0.5"})
+    client = client_for(server, retries=0)
+    server.faults.error_rate = 1.0
+    for _ in range(3):
+        timed_call(client)
+    hits = server.hits
+    elapsed, error = timed_call(client)
+    if error is None or error.kind != "circuit_open" or server.hits != hits:
+        failures.append(f"open circuit did not fail fast: {error}")
+    print(f"breaker: open after 3 failures, rejected in {elapsed * 1e6:.0f} us "
+          f"(state {resilience.get_breaker('free').state})")
+
+    server.faults.error_rate = 0.0
+    time.sleep(0.6)
+    elapsed, error = timed_call(client)
+    if error is not None or resilience.get_breaker("free").state != resilience.CLOSED:
+        failures.append(f"probe after reset did not close the circuit: {error}")
+    print(f"breaker: probe succeeded, state {resilience.get_breaker('free').state}")
+
+
+def check_rate_limit(server, failures):
+    fresh({"LLM_RATE_LIMIT_RPS": "10", "LLM_RATE_LIMIT_BURST": "2"})
+    client = client_for(server)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(8) as pool:
+        errors = [e for _, e in pool.map(lambda i: timed_call(client, f"rate {i}"), range(12))]
+    elapsed = time.perf_counter() - start
+    # 2 immediately, then 10 more at 10/s
+    if any(errors) or elapsed < 0.9:
+        failures.append(f"12 calls at 10 rps (burst 2) took {elapsed:.2f} s, errors {[e for e in errors if e]}")
+    print(f"rate limit: 12 calls at 10 rps, burst 2 in {elapsed:.2f} s")
+
+
+def check_degraded(server, failures):
+    fresh({"LLM_BREAKER_FAILURES": "10"})
+    client = client_for(server)
+    server.faults.error_rate = 0.3
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda i: timed_call(client, f"degraded {i}"), range(100)))
+    server.faults.error_rate = 0.0
+    ok = sum(1 for _, e in results if e is None)
+    if ok < 95:
+        failures.append(f"only {ok}/100 calls succeeded at a 30% error rate")
+    print(f"degraded provider (30% 503): {ok}/100 succeeded with retries")
+
+
+def main():
+    server = start_stub_server(latency_ms=STUB_LATENCY_MS, faults=Faults())
+    failures = []
+    try:
+        check_retries(server, failures)
+        check_breaker(server, failures)
+        check_rate_limit(server, failures)
+        check_degraded(server, failures)
+    finally:
+        server.shutdown()
+    for failure in failures:
+        print("   FAIL", failure)
+    print("OK" if not failures else f"{len(failures)} FAILURES")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
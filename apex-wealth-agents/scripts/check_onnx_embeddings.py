@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Accuracy check for the int8 ONNX embedding backend (vectordb/onnx_embedder.py)
+against the sentence-transformers (PyTorch) model it replaces.
+
+Checks:
+  - every sentence's ONNX vector has cosine >= --min-cosine (default 0.99)
+    with its PyTorch vector; ONNX vectors are unit length, same shape
+  - ranking a small knowledge corpus for each query gives the same top hit
+    with both backends, so collections built with one backend can be
+    queried with the other
+
+Needs sentence-transformers, onnxruntime and tokenizers (and torch plus
+transformers for the one-off export if it is not cached yet). Exits 1 on any
+failure.
+
+Usage (from apex-wealth-agents/):
+    python scripts/check_onnx_embeddings.py
+    python scripts/check_onnx_embeddings.py --min-cosine 0.995
+"""
+import argparse
+import importlib
+import os
+import sys
+import types
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+try:
+    import vectordb  # noqa: F401
+except ImportError:
+    # vectordb/__init__ needs chromadb; load the package's own modules without it
+    package = types.ModuleType("vectordb")
+    package.__path__ = [os.path.join(BASE_DIR, "vectordb")]
+    sys.modules["vectordb"] = package
+
+onnx_embedder = importlib.import_module("vectordb.onnx_embedder")
+
+CORPUS = [
+    "An index fund tracks a market index such as the S&P 500 at a low expense ratio.",
+    "A systematic investment plan (SIP) invests a fixed amount every month.",
+    "An emergency fund should cover three to six months of essential expenses.",
+    "Credit card debt often carries interest above 20% a year; pay it down before investing.",
+    "Bonds pay fixed interest and are usually less volatile than stocks.",
+    "Diversification spreads money across asset classes to reduce risk.",
+    "A Roth IRA is funded with after-tax money and grows tax-free.",
+    "Rebalancing brings a portfolio back to its target allocation.",
+]
+QUERIES = [
+    "Should I start a SIP in an index fund?",
+    "how many months of expenses for emergencies",
+    "pay off my credit card or invest?",
+    "are bonds safer than shares",
+    "what does rebalancing my portfolio mean",
+    "tax free retirement account",
+    "How much did I spend on groceries last month?",
+]
+# Only checked for cosine: empty input and text past the 256-token truncation
+EDGE_CASES = ["", "spending " * 600]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX vs PyTorch embedding tolerance check")
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    args = parser.parse_args()
+
+    try:
+        from sentence_transformers import SentenceTransformer
+        onnx_model = onnx_embedder.load_onnx_encoder()
+    except ImportError as e:
+        raise SystemExit(f"needs sentence-transformers, onnxruntime and tokenizers: {e}")
+    torch_model = SentenceTransformer("all-MiniLM-L6-v2")
+
+    texts = CORPUS + QUERIES + EDGE_CASES
+    reference = torch_model.encode(texts, convert_to_numpy=True)
+    candidate = onnx_model.encode(texts)
+    failures = []
+
+    if candidate.shape != reference.shape:
+        failures.append(f"shape {candidate.shape} != {reference.shape}")
+    else:
+        norms = np.linalg.norm(candidate, axis=1)
+        if np.abs(norms - 1.0).max() > 1e-3:
+            failures.append(f"ONNX vectors not unit length (norms {norms.min():.4f}..{norms.max():.4f})")
+        cosines = (candidate * reference).sum(axis=1) / (norms * np.linalg.norm(reference, axis=1))
+        worst = int(np.argmin(cosines))
+        print(f"cosine ONNX int8 vs PyTorch: min {cosines.min():.5f}, mean {cosines.mean():.5f} "
+              f"(worst: {texts[worst][:50]!r})")
+        if cosines.min() < args.min_cosine:
+            failures.append(f"cosine {cosines.min():.5f} below {args.min_cosine} for {texts[worst][:50]!r}")
+
+        n = len(CORPUS)
+        same_top = 0
+        for q in range(n, n + len(QUERIES)):
+            top_ref = int(np.argmax(reference[:n] @ reference[q]))
+            top_onnx = int(np.argmax(candidate[:n] @ candidate[q]))
+            same_top += top_ref == top_onnx
+            # Queries are matched against documents embedded by the other backend, too
+            if int(np.argmax(reference[:n] @ candidate[q])) != top_ref:
+                failures.append(f"mixed-backend top hit differs for {texts[q][:50]!r}")
+        print(f"top hit agreement: {same_top}/{len(QUERIES)} queries")
+        if same_top != len(QUERIES):
+            failures.append(f"top hit differs for {len(QUERIES) - same_top} queries")
+
+    for failure in failures:
+        print("   FAIL", failure)
+    print("OK" if not failures else f"{len(failures)} FAILURES")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
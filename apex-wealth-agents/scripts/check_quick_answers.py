@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Routing check for templated quick answers (app/quick_answers.py).
+
+Each phrasing below is run through match_question with the orchestrator's
+year/month extractor. Questions a template can answer must match with the
+expected shape and period; questions whose period or qualifier a template
+cannot honour ("last 3 months", "q1 2024", "since June 2024", "top
+merchants for food", "merchants I spend less at") must return None so they
+go to the full pipeline instead of getting a wrong figure.
+
+Exits 1 on any mismatch.
+
+Usage (from apex-wealth-agents/):
+    python scripts/check_quick_answers.py
+"""
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+os.environ.setdefault("APEX_WARMUP", "none")
+
+from app.quick_answers import CATEGORIES, MERCHANTS, MONTHLY, TOTAL, match_question  # noqa: E402
+from orchestrator import EnhancedOrchestrator  # noqa: E402
+
+# (question, kind, year, month); year/month None means "not checked" for relative periods
+ANSWERED = [
+    ("How much did I spend in March 2024?", TOTAL, 2024, 3),
+    ("how much did I spend in 2024", TOTAL, 2024, None),
+    ("total spending last month", TOTAL, None, None),
+    ("what did I spend this year", TOTAL, None, None),
+    ("top 5 merchants in 2023", MERCHANTS, 2023, None),
+    ("where did I spend the most in 2024", MERCHANTS, 2024, None),
+    ("spending by category in 2022", CATEGORIES, 2022, None),
+    ("monthly spending in 2024", MONTHLY, 2024, None),
+]
+
+DEFERRED = [
+    # Periods the templates cannot resolve
+    "how much did I spend in the last 3 months",
+    "how much did I spend last week",
+    "how much did I spend yesterday",
+    "how much did I spend today",
+    "how much did I spend in the past 6 months",
+    "how much did I spend in the last few months",
+    "how much did I spend in q1 2024",
+    "how much did I spend in the first half of 2024",
+    "how much did I spend before 2024",
+    "how much did I spend after 2022",
+    "how much did I spend since June 2024",
+    "how much did I spend until March 2024",
+    "how much have I spent so far this year",
+    "total spending year to date",
+    "top merchants in the last 30 days",
+    # Qualifiers a template would ignore
+    "top merchants for food in 2024",
+    "monthly spending on food in 2024",
+    "spending by category at zomato",
+    "which merchants did I spend less at",
+    "which merchants did I spend the least at",
+    "lowest spending categories in 2024",
+]
+
+
+def main():
+    extract = lambda msg: EnhancedOrchestrator._extract_year_month(None, msg)  # noqa: E731
+    failures = []
+    for question, kind, year, month in ANSWERED:
+        q = match_question(question, extract)
+        if q is None or q.kind != kind or (year is not None and (q.year, q.month) != (year, month)):
+            failures.append(f"{question!r}: expected {kind} {year}/{month}, got {q}")
+    for question in DEFERRED:
+        q = match_question(question, extract)
+        if q is not None:
+            failures.append(f"{question!r}: should defer to the full pipeline, matched {q}")
+    print(f"answered: {len(ANSWERED)} phrasings, deferred: {len(DEFERRED)} phrasings")
+    for failure in failures:
+        print("   FAIL", failure)
+    print("OK" if not failures else f"{len(failures)} FAILURES")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
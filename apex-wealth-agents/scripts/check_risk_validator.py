@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Behaviour check for the local allocation validator (agents/risk_agent.py).
+
+Checks:
+  - category names land in the right risk bucket; in particular
+    "Tax saving options (ELSS)" is equity, not options trading
+  - percentages written as strings ("60%", " 12.5 % ") are read as numbers,
+    so a valid allocation is not reported as adjusted
+  - an allocation that cannot be read is reported as a violation instead of
+    being counted as 0% (and nothing is presented as a risk adjustment)
+
+Exits 1 on any failure.
+
+Usage (from apex-wealth-agents/):
+    python scripts/check_risk_validator.py
+"""
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from agents.risk_agent import RiskAgent, asset_bucket  # noqa: E402
+
+BUCKETS = [
+    ("Tax saving options (ELSS)", "equity"),
+    ("ELSS Tax Saver Fund", "equity"),
+    ("Equity options trading", "speculative"),
+    ("F&O", "speculative"),
+    ("Index derivatives", "speculative"),
+    ("Cryptocurrency", "speculative"),
+    ("Large-cap Equity", "equity"),
+    ("Nifty 50 Index Fund", "equity"),
+    ("Mid-cap Equity", "small_mid_cap"),
+    ("Small Cap Fund", "small_mid_cap"),
+    ("Balanced Advantage Fund", "hybrid"),
+    ("Debt Funds", "debt"),
+    ("Government Bonds", "debt"),
+    ("Fixed Deposit", "debt"),
+    ("Gold", "other"),
+]
+MODERATE = {"risk_tolerance": "moderate"}
+
+
+def main():
+    failures = []
+    for category, expected in BUCKETS:
+        got = asset_bucket(category)
+        if got != expected:
+            failures.append(f"{category!r} in bucket {got}, expected {expected}")
+    print(f"buckets: {len(BUCKETS) - len(failures)}/{len(BUCKETS)} categories as expected")
+
+    agent = RiskAgent.__new__(RiskAgent)
+    result = agent.validate_allocation([
+        {"category": "Equity", "allocation_percentage": "60%"},
+        {"category": "Debt", "allocation_percentage": 40},
+    ], MODERATE)
+    if result["violations"]:
+        failures.append(f"60%/40 on a moderate profile reported {result['violations']}")
+    print(f"'60%' equity / 40 debt, moderate: violations {result['violations']}")
+
+    result = agent.validate_allocation([
+        {"category": "Large-cap Equity", "allocation_percentage": " 50 % "},
+        {"category": "Tax saving options (ELSS)", "allocation_percentage": "10%"},
+        {"category": "Debt Funds", "allocation_percentage": "40"},
+    ], MODERATE)
+    if result["violations"]:
+        failures.append(f"50/10 ELSS/40 on a moderate profile reported {result['violations']}")
+
+    result = agent.validate_allocation([
+        {"category": "Equity", "allocation_percentage": "about sixty"},
+        {"category": "Debt", "allocation_percentage": 40},
+    ], MODERATE)
+    unreadable = [v for v in result["violations"] if "not a percentage" in v]
+    if not unreadable or result["adjusted_recommendations"]:
+        failures.append(f"unreadable allocation not reported: {result['violations']}")
+    print(f"unreadable equity value: {unreadable}")
+
+    for failure in failures:
+        print("   FAIL", failure)
+    print("OK" if not failures else f"{len(failures)} FAILURES")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Parity check for the parameterized SQL layer (app/tools/sql_layer.py).
+
+For each CSV, every enhanced aggregate (total/monthly/daily/category/merchant
+spend and recent_rows) is run through the bound DuckDB statements and through
+the pandas path over a grid of year/month filters, and the results compared.
+For ISO-dated files recent_rows is also compared with the LIKE query the
+orchestrator used to build. It also checks that values cannot reach the SQL
+text (non-integer years, unknown columns) and that queries reuse one
+connection per worker thread.
+
+Exits 1 on any mismatch.
+
+Usage (from apex-wealth-agents/):
+    python scripts/check_sql_parity.py
+    python scripts/check_sql_parity.py data/transactions.csv benchmarks/.data/tx_200000_42.csv
+"""
+import math
+import os
+import sys
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+# Results must come from the code path under test, not the coalescing cache
+os.environ["APEX_COALESCE"] = "0"
+os.environ["APEX_STREAMING"] = "0"
+os.environ.setdefault("APEX_WARMUP", "none")
+
+from app.metrics import SQL_CONNECTIONS_TOTAL  # noqa: E402
+from app.tools import enhanced_csv_tools as ect  # noqa: E402
+from app.tools import sql_layer  # noqa: E402
+from app.tools.csv_tools import query_csv  # noqa: E402
+
+UNDATED = ("None", "NaT", "nan")
+
+
+def same(a: Any, b: Any, where: str, problems: List[str]) -> None:
+    """Recursive comparison; floats to the cent, undated group labels unified"""
+    if isinstance(a, dict) and isinstance(b, dict):
+        if set(a) != set(b):
+            problems.append(f"{where}: keys {sorted(set(a) ^ set(b))}")
+            return
+        for k in a:
+            same(a[k], b[k], f"{where}.{k}", problems)
+    elif isinstance(a, list) and isinstance(b, list):
+        if len(a) != len(b):
+            problems.append(f"{where}: {len(a)} vs {len(b)} items")
+            return
+        for i, (x, y) in enumerate(zip(a, b)):
+            same(x, y, f"{where}[{i}]", problems)
+    elif isinstance(a, float) or isinstance(b, float):
+        if not math.isclose(float(a), float(b), abs_tol=0.011):
+            problems.append(f"{where}: {a!r} vs {b!r}")
+    elif a != b and not (str(a) in UNDATED and str(b) in UNDATED):
+        problems.append(f"{where}: {a!r} vs {b!r}")
+
+
+def filters(csv_path: str) -> List[Tuple[Optional[int], Optional[int]]]:
+    years = ect.get_available_years(csv_path=csv_path)
+    grid: List[Tuple[Optional[int], Optional[int]]] = [(None, None), (None, 3), (1999, None), (1999, 1)]
+    for year in years[:1] + years[-1:]:
+        grid += [(year, None), (year, 1), (year, 12)]
+    return list(dict.fromkeys(grid))
+
+
+def run_tools(csv_path: str, year: Optional[int], month: Optional[int]) -> Dict[str, Any]:
+    return {
+        "total_spend": ect.total_spend(year, month, csv_path=csv_path),
+        "monthly_spend": ect.monthly_spend(year, csv_path=csv_path),
+        "daily_spend": ect.daily_spend(year, month, csv_path=csv_path),
+        "category_stats": ect.category_stats(year, month, csv_path=csv_path),
+        "merchant_stats": ect.merchant_stats(year, month, top_n=7, csv_path=csv_path),
+        "recent_rows": ect.recent_rows(year, month, limit=50, csv_path=csv_path),
+    }
+
+
+def with_duckdb(enabled: bool, fn: Callable[[], Any]) -> Any:
+    saved = ect._HAS_DUCKDB
+    ect._HAS_DUCKDB = enabled
+    try:
+        return fn()
+    finally:
+        ect._HAS_DUCKDB = saved
+
+
+def legacy_recent(year: int, month: Optional[int], csv_path: str) -> Dict[str, Any]:
+    """The orchestrator's former LIKE query (only correct for ISO dates)"""
+    like = f"{year}-{month:02d}%" if month else f"{year}%"
+    sql = ("SELECT date, monthly_expense_total, monthly_income FROM t "
+           f"WHERE CAST(date AS VARCHAR) LIKE '{like}' ORDER BY date ASC LIMIT 5000")
+    return query_csv(sql, limit=5000, csv_path=csv_path)
+
+
+def check_csv(csv_path: str) -> List[str]:
+    problems: List[str] = []
+    grid = filters(csv_path)
+    for year, month in grid:
+        bound = with_duckdb(True, lambda: run_tools(csv_path, year, month))
+        frame = with_duckdb(False, lambda: run_tools(csv_path, year, month))
+        for name in bound:
+            same(bound[name], frame[name], f"{name}({year}, {month})", problems)
+
+    head = ect.recent_rows(limit=1, csv_path=csv_path)["rows"]
+    iso = bool(head) and str(head[0].get("date", ""))[4:5] == "-"
+    if iso and "monthly_income" in ect.pd.read_csv(csv_path, nrows=1).columns:
+        for year, month in grid:
+            if year is None:
+                continue
+            new = ect.recent_rows(year, month, csv_path=csv_path)["rows"]
+            old = legacy_recent(year, month, csv_path)["rows"]
+            same([r["date"] for r in new], [r["date"] for r in old],
+                 f"recent_rows_vs_like({year}, {month}).dates", problems)
+            if len(old) == 5000:
+                # The LIMIT cut through the last day; the LIKE query kept arbitrary rows of it
+                new = [r for r in new if r["date"] != old[-1]["date"]]
+                old = [r for r in old if r["date"] != old[-1]["date"]]
+            same(sorted(r["monthly_expense_total"] for r in new),
+                 sorted(r["monthly_expense_total"] for r in old),
+                 f"recent_rows_vs_like({year}, {month}).amounts", problems)
+    return problems
+
+
+def check_guards(csv_path: str) -> List[str]:
+    problems: List[str] = []
+    try:
+        sql_layer.date_filter("2022' OR '1'='1", None)
+        problems.append("date_filter accepted a non-integer year")
+    except ValueError:
+        pass
+    try:
+        ect.recent_rows(2022, columns=("date", 'x" FROM t; --'), csv_path=csv_path)
+    except ValueError:
+        problems.append("recent_rows should drop unknown columns, not fail")
+    try:
+        ect._run_duckdb(ect._TOTAL_SPEND, csv_path, (), "TRUE", amount="amount; DROP TABLE t")
+        problems.append("unknown column reached the SQL text")
+    except ValueError:
+        pass
+    return problems
+
+
+def main():
+    paths = sys.argv[1:] or [ect.DATA_PATH]
+    failed = False
+    for path in paths:
+        sql_layer.close_thread_connections()
+        before = SQL_CONNECTIONS_TOTAL.value(kind="persistent")
+        problems = check_csv(path) + check_guards(path)
+        opened = SQL_CONNECTIONS_TOTAL.value(kind="persistent") - before
+        if opened > 1:
+            problems.append(f"{opened:.0f} persistent connections opened (expected 1)")
+        status = "OK" if not problems else f"{len(problems)} MISMATCHES"
+        print(f"{path}: {len(filters(path))} filters, {opened:.0f} connection(s) - {status}")
+        for p in problems[:20]:
+            print("   ", p)
+        failed = failed or bool(problems)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Parity check: spend_aggregate answers the same whether the file is streamed
+(app/tools/streaming_agg.py) or loaded into memory.
+
+Checks, for several group_by columns on a small CSV streamed in 2-row chunks:
+  - the same keys with the same Python types (amount columns such as
+    monthly_income give 80000.0 on both paths, not "80000" when streamed)
+  - the same totals per key; a missing key (blank cell) forms one group
+
+Exits 1 on any failure.
+
+Usage (from apex-wealth-agents/):
+    python scripts/check_streaming_parity.py
+"""
+import math
+import os
+import sys
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+os.environ["APEX_COALESCE"] = "0"
+os.environ["APEX_STREAMING_CHUNK_ROWS"] = "2"
+
+from app.tools import csv_tools  # noqa: E402
+
+CSV = """date,category,merchant,amount,monthly_expense_total,monthly_income,budget_goal
+2023-01-05,Food,Cafe,120.50,120.50,80000,60000
+2023-01-09,Travel,Metro,40,300.25,,
+2023-02-11,Food,Cafe,99.99,99.99,90000,
+2023-03-02,Rent,Landlord,15000,15000,,65000
+2023-03-15,Food,Grocer,310.10,310.10,80000,60000
+"""
+GROUP_BY = ["category", "merchant", "monthly_income", "budget_goal"]
+
+
+def _normalized(totals):
+    # Missing keys: NaN in memory, None when streamed; both mean "blank cell"
+    return sorted((((None if isinstance(t["key"], float) and math.isnan(t["key"]) else t["key"]), t["spent"])
+                   for t in totals), key=repr)
+
+
+def _types(totals):
+    return sorted({type(t["key"]).__name__ for t in totals
+                   if not (t["key"] is None or isinstance(t["key"], float) and math.isnan(t["key"]))})
+
+
+def main():
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "transactions.csv")
+        with open(path, "w") as f:
+            f.write(CSV)
+        for group_by in GROUP_BY:
+            os.environ["APEX_STREAMING"] = "0"
+            loaded = csv_tools.spend_aggregate(group_by=group_by, csv_path=path)["totals"]
+            os.environ["APEX_STREAMING"] = "1"
+            streamed = csv_tools.spend_aggregate(group_by=group_by, csv_path=path)["totals"]
+            if _types(loaded) != _types(streamed):
+                failures.append(f"{group_by}: key types {_types(streamed)} streamed, {_types(loaded)} in memory")
+            if _normalized(loaded) != _normalized(streamed):
+                failures.append(f"{group_by}: streamed {_normalized(streamed)} != in memory {_normalized(loaded)}")
+            print(f"{group_by}: {len(streamed)} groups, key types {_types(streamed)}")
+
+    for failure in failures:
+        print("   FAIL", failure)
+    print("OK" if not failures else f"{len(failures)} FAILURES")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
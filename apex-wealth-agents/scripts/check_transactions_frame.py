@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Behaviour check for the compact transactions frame
+(app/tools/transactions_frame.py).
+
+Checks:
+  - a blank transaction amount still counts as 0 (sums are unchanged)
+  - a blank monthly_income or budget_goal stays missing instead of becoming
+    a zero income or goal, so averages only cover the recorded months
+  - to_rupees turns those missing values into NaN, and grouping by the
+    column gives the same keys as plain pandas
+  - one-off reads (read_transactions) leave the shared string pool alone,
+    and labels of a cached file that changed are dropped from it
+
+Exits 1 on any failure.
+
+Usage (from apex-wealth-agents/):
+    python scripts/check_transactions_frame.py
+"""
+import math
+import os
+import sys
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import pandas as pd  # noqa: E402
+
+from app.tools.transactions_frame import STRING_POOL, load_transactions, read_transactions, to_rupees  # noqa: E402
+
+CSV = """date,category,amount,monthly_expense_total,monthly_income,budget_goal
+2023-01-05,Food,120.50,120.50,80000,60000
+2023-01-09,Travel,,300.25,,
+2023-02-11,Food,99.99,99.99,90000,
+2023-03-02,Rent,15000,15000,,65000
+"""
+
+
+def check_string_pool(failures):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "transactions.csv")
+        with open(path, "w") as f:
+            # Repeated rows, so category has few enough labels to be a categorical
+            f.write(CSV.replace("Travel", "UploadOnlyLabel") + CSV.split("\n", 1)[1] * 3)
+        read_transactions(path)
+        if "UploadOnlyLabel" in STRING_POOL._values:
+            failures.append("read_transactions added its labels to the shared string pool")
+
+        load_transactions(path)
+        if "UploadOnlyLabel" not in STRING_POOL._values:
+            failures.append("load_transactions did not share its labels through the pool")
+        with open(path, "w") as f:
+            f.write(CSV.replace("Travel", "ReplacedLabel") + CSV.split("\n", 1)[1] * 3 + "2023-04-01,Food,1,1,,\n")
+        load_transactions(path)
+        if "UploadOnlyLabel" in STRING_POOL._values or "ReplacedLabel" not in STRING_POOL._values:
+            failures.append("labels of the replaced frame were kept in the string pool")
+    print(f"shared string pool: {len(STRING_POOL)} labels")
+
+
+def main():
+    failures = []
+    with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+        f.write(CSV)
+    try:
+        df = read_transactions(f.name, amount_dtype="paise")
+        raw = pd.read_csv(f.name)
+    finally:
+        os.unlink(f.name)
+
+    if int(df["amount"].sum()) != 1522049:
+        failures.append(f"amount sum {int(df['amount'].sum())} paise, expected 1522049 (blank as 0)")
+    for col in ("monthly_income", "budget_goal"):
+        missing, expected_missing = int(df[col].isna().sum()), int(raw[col].isna().sum())
+        if missing != expected_missing:
+            failures.append(f"{col}: {missing} missing values, expected {expected_missing}")
+        mean, expected_mean = float(to_rupees(df[col]).mean()), float(raw[col].mean())
+        if not math.isclose(mean, expected_mean):
+            failures.append(f"{col}: mean {mean} rupees, expected {expected_mean}")
+        print(f"{col}: dtype {df[col].dtype}, {missing} missing, mean {mean:.2f}")
+
+    income = to_rupees(df["monthly_income"])
+    if str(income.dtype) != "float64" or not math.isnan(income.iloc[1]):
+        failures.append(f"to_rupees gave {income.dtype} {income.tolist()}, expected float64 with NaN")
+    if not math.isnan(to_rupees(df["monthly_income"].iloc[1])):
+        failures.append("to_rupees of a missing scalar is not NaN")
+    keys = sorted(to_rupees(df.groupby("monthly_income", dropna=False)["amount"].sum().index).tolist(), key=str)
+    expected_keys = sorted(raw.groupby("monthly_income", dropna=False)["amount"].sum().index.tolist(), key=str)
+    if str(keys) != str(expected_keys):
+        failures.append(f"group keys {keys}, expected {expected_keys}")
+
+    check_string_pool(failures)
+
+    for failure in failures:
+        print("   FAIL", failure)
+    print("OK" if not failures else f"{len(failures)} FAILURES")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
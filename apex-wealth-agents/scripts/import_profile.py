@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Cold-start profile for the API.
+
+Runs `python -X importtime -c "import app.main"` in a fresh interpreter and
+reports the total import wall time plus the slowest top-level packages,
+then (in another fresh interpreter) measures first-request latency of a few
+routes with warm-up disabled vs. waiting for /health/ready.
+
+Usage (from apex-wealth-agents/):
+    python scripts/import_profile.py --top 20
+    python scripts/import_profile.py --routes /historical/years /tools/describe_csv
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_FIRST_REQUEST_SNIPPET = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import app.main
+from fastapi.testclient import TestClient
+import_s = time.perf_counter() - t0
+out = {"import_s": round(import_s, 3), "routes": {}}
+with TestClient(app.main.app, raise_server_exceptions=False) as client:
+    if WAIT_READY:
+        start = time.perf_counter()
+        while client.get("/health/ready").status_code != 200 and time.perf_counter() - start < 300:
+            time.sleep(0.1)
+        out["ready_s"] = round(time.perf_counter() - start, 3)
+    for route in ROUTES:
+        start = time.perf_counter()
+        resp = client.get(route)
+        out["routes"][route] = {"status": resp.status_code, "first_ms": round((time.perf_counter() - start) * 1000, 1)}
+        start = time.perf_counter()
+        client.get(route)
+        out["routes"][route]["second_ms"] = round((time.perf_counter() - start) * 1000, 1)
+print("RESULT " + json.dumps(out))
+"""
+
+
+def profile_imports(module: str = "app.main") -> Tuple[float, List[Tuple[str, int, int]]]:
+    """Return (wall seconds, [(package, self_us, cumulative_us)]) for importing module"""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BASE_DIR, capture_output=True, text=True, env={**os.environ, "APEX_WARMUP": "none"}
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+
+    packages: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, raw_name = line[len("import time:"):].split("|")
+        except ValueError:
+            continue
+        # Nested imports are indented two spaces per level; only level-0
+        # entries are summed for cumulative time to avoid double counting
+        depth = (len(raw_name) - len(raw_name.lstrip()) - 1) // 2
+        top = raw_name.strip().split(".")[0]
+        packages[top][0] += int(self_us)
+        if depth == 0:
+            packages[top][1] += int(cumulative_us)
+    rows = sorted(((k, v[0], v[1]) for k, v in packages.items()), key=lambda r: r[1], reverse=True)
+    return wall, rows
+
+
+def first_request(routes: List[str], wait_ready: bool) -> Dict[str, object]:
+    snippet = f"WAIT_READY = {wait_ready!r}\nROUTES = {routes!r}\n" + _FIRST_REQUEST_SNIPPET
+    env = {**os.environ}
+    if not wait_ready:
+        env["APEX_WARMUP"] = "none"
+    proc = subprocess.run([sys.executable, "-c", snippet], cwd=BASE_DIR, capture_output=True, text=True, env=env)
+    for line in proc.stdout.splitlines():
+        if line.startswith("RESULT "):
+            return json.loads(line[len("RESULT "):])
+    raise RuntimeError(proc.stderr[-2000:])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time and first-request profile")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--routes", nargs="*", default=["/health", "/historical/years", "/tools/describe_csv"])
+    parser.add_argument("--json", action="store_true", help="Print a JSON report")
+    args = parser.parse_args()
+
+    wall, rows = profile_imports()
+    cold = first_request(args.routes, wait_ready=False)
+    warm = first_request(args.routes, wait_ready=True)
+
+    if args.json:
+        print(json.dumps({
+            "import_wall_s": round(wall, 3),
+            "top_packages": [{"package": n, "self_ms": s / 1000, "cumulative_ms": c / 1000} for n, s, c in rows[:args.top]],
+            "first_request_cold": cold,
+            "first_request_after_warmup": warm,
+        }, indent=2))
+        return
+
+    print(f"import app.main (fresh interpreter, incl. startup): {wall:.2f}s")
+    print(f"{'package':<28}{'self ms':>12}{'cumulative ms':>16}")
+    for name, self_us, cumulative_us in rows[:args.top]:
+        print(f"{name:<28}{self_us / 1000:>12.1f}{cumulative_us / 1000:>16.1f}")
+    print("\nFirst request, warm-up disabled:")
+    print(json.dumps(cold, indent=2))
+    print("\nFirst request after /health/ready:")
+    print(json.dumps(warm, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Load test for the API against a stub LLM.
+
+Starts scripts/stub_llm_server.py in-process, launches uvicorn with
+LLM_BASE_URL pointing at it, then fires concurrent /chat requests while
+probing /health. Reports latency percentiles per endpoint and how many
+requests were shed with 429.
+
+Usage (from apex-wealth-agents/):
+    python scripts/load_test.py --concurrency 200 --requests 1000 --llm-latency-ms 2000
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+from scripts.stub_llm_server import start_stub_server
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def _summary(latencies: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(latencies),
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(max(latencies) * 1000, 1) if latencies else 0.0,
+    }
+
+
+def _wait_for_server(url: str, timeout: float = 60.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{url}/health", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"API did not become healthy at {url}")
+
+
+async def _run(url: str, concurrency: int, total: int, health_interval: float) -> Dict[str, object]:
+    chat_latencies: List[float] = []
+    health_latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    sem = asyncio.Semaphore(concurrency)
+    done = asyncio.Event()
+
+    async with httpx.AsyncClient(base_url=url, timeout=300.0) as client:
+        async def one_chat(i: int):
+            async with sem:
+                start = time.perf_counter()
+                resp = await client.post("/chat", json={
+                    "session_id": f"load-{i}",
+                    "message": "how much did I spend on groceries",
+                    "context": []
+                })
+                statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+                if resp.status_code == 200:
+                    chat_latencies.append(time.perf_counter() - start)
+
+        async def probe_health():
+            while not done.is_set():
+                start = time.perf_counter()
+                resp = await client.get("/health")
+                if resp.status_code == 200:
+                    health_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(health_interval)
+
+        prober = asyncio.create_task(probe_health())
+        started = time.perf_counter()
+        await asyncio.gather(*(one_chat(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await prober
+
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(chat_latencies) / elapsed, 2) if elapsed else 0.0,
+        "status_codes": statuses,
+        "rejected_429": statuses.get(429, 0),
+        "chat": _summary(chat_latencies),
+        "health": _summary(health_latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API load test against a stub LLM")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--llm-latency-ms", type=float, default=1500.0)
+    parser.add_argument("--health-interval", type=float, default=0.1)
+    parser.add_argument("--url", default=None, help="Use an already running API instead of spawning one")
+    args = parser.parse_args()
+
+    stub = start_stub_server(latency_ms=args.llm_latency_ms)
+    proc = None
+    url = args.url
+    try:
+        if url is None:
+            port = _free_port()
+            env = dict(os.environ)
+            env["LLM_PROVIDER"] = "free"
+            env["LLM_BASE_URL"] = f"http://127.0.0.1:{stub.server_port}/api/chat"
+            proc = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+                 "--port", str(port), "--log-level", "warning"],
+                cwd=BASE_DIR, env=env
+            )
+            url = f"http://127.0.0.1:{port}"
+            _wait_for_server(url)
+
+        report = asyncio.run(_run(url, args.concurrency, args.requests, args.health_interval))
+        print(f"LLM stub latency: {args.llm_latency_ms}ms, concurrency: {args.concurrency}, requests: {args.requests}")
+        for key, value in report.items():
+            print(f"  {key}: {value}")
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+        stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Deterministic stub of the FreeLLM-compatible chat endpoint for load tests.
+
+Answers every POST with {"status": "success", "response": "..."} after a
+configurable delay, so LLM latency can be controlled without network calls.
+
+Faults can be injected to exercise LLMClient's retry, circuit breaker and
+rate limiting (see llm/resilience.py):
+  - --error-rate / --error-status: answer that share of requests with an
+    error status (default 503), with Retry-After when --retry-after is set
+  - --drop-rate: close that share of connections without answering
+  - --quota-rps: answer 429 (with Retry-After) above this request rate
+  - --slow-rate / --slow-ms: answer that share of requests after slow-ms
+    instead of the normal latency (a heavy latency tail)
+In-process users can change server.faults at run time, including
+faults.script, a list of statuses ("drop" closes the connection) served
+to the next requests in order. server.hits counts requests received.
+
+--shape gemini answers in the Gemini generateContent format instead (any
+POST path), for routing tests with GEMINI_BASE_URL pointed at the stub.
+
+Usage:
+    python scripts/stub_llm_server.py --port 8099 --latency-ms 800
+    python scripts/stub_llm_server.py --port 8099 --error-rate 0.3 --retry-after 1
+    export LLM_BASE_URL=http://127.0.0.1:8099/api/chat
+    python scripts/stub_llm_server.py --port 8098 --shape gemini --latency-ms 900
+    export GEMINI_BASE_URL=http://127.0.0.1:8098/v1beta GEMINI_API_KEY=stub
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_ANSWER = json.dumps({
+    "query_type": "transaction_analysis",
+    "intent": "stub",
+    "requires_knowledge": False,
+    "requires_transaction_data": True,
+    "requires_market_data": False,
+    "keywords": ["spending"],
+    "risk_profile_needed": False
+})
+
+
+class Faults:
+    """Fault plan of a stub server (thread-safe; attributes may be changed while it runs)"""
+
+    def __init__(self, error_rate: float = 0.0, error_status: int = 503, retry_after: float = None,
+                 drop_rate: float = 0.0, quota_rps: float = 0.0, slow_rate: float = 0.0, slow_ms: float = 0.0):
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.drop_rate = drop_rate
+        self.quota_rps = quota_rps
+        self.slow_rate = slow_rate
+        self.slow_ms = slow_ms
+        self.script = []
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._window_count = 0
+
+    def next_fault(self):
+        """Status to answer with, "drop", or None for a normal answer"""
+        with self._lock:
+            if self.script:
+                return self.script.pop(0)
+            if self.quota_rps > 0:
+                now = time.monotonic()
+                if now - self._window_start >= 1.0:
+                    self._window_start, self._window_count = now, 0
+                self._window_count += 1
+                if self._window_count > self.quota_rps:
+                    return 429
+        if random.random() < self.drop_rate:
+            return "drop"
+        if random.random() < self.error_rate:
+            return self.error_status
+        return None
+
+
+def _answer_body(shape: str) -> bytes:
+    if shape == "gemini":
+        return json.dumps({"candidates": [{"content": {"parts": [{"text": STUB_ANSWER}]}}]}).encode("utf-8")
+    return json.dumps({"status": "success", "response": STUB_ANSWER}).encode("utf-8")
+
+
+def make_handler(latency_ms: float, jitter_ms: float, faults: Faults = None, server_state: dict = None,
+                 shape: str = "free"):
+    faults = faults or Faults()
+    state = server_state if server_state is not None else {"hits": 0}
+    state_lock = threading.Lock()
+
+    class StubLLMHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            with state_lock:
+                state["hits"] += 1
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                self.rfile.read(length)
+            fault = faults.next_fault()
+            if fault == "drop":
+                self.close_connection = True
+                self.connection.shutdown(2)
+                return
+            if fault is not None:
+                body = json.dumps({"status": "error", "error": f"injected {fault}"}).encode("utf-8")
+                self.send_response(int(fault))
+                if faults.retry_after is not None or fault == 429:
+                    self.send_header("Retry-After", str(faults.retry_after if faults.retry_after is not None else 1))
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            delay = max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000.0
+            if faults.slow_rate and random.random() < faults.slow_rate:
+                delay = faults.slow_ms / 1000.0
+            time.sleep(delay)
+            body = _answer_body(shape)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubLLMHandler
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency_ms: float, jitter_ms: float, faults: Faults = None, shape: str = "free"):
+        self.faults = faults or Faults()
+        self._state = {"hits": 0}
+        super().__init__(address, make_handler(latency_ms, jitter_ms, self.faults, self._state, shape))
+
+    @property
+    def hits(self) -> int:
+        return self._state["hits"]
+
+
+def start_stub_server(port: int = 0, latency_ms: float = 500.0, jitter_ms: float = 0.0,
+                      faults: Faults = None, shape: str = "free") -> StubServer:
+    """Start the stub in a daemon thread and return the server (server_port holds the bound port)"""
+    server = StubServer(("127.0.0.1", port), latency_ms, jitter_ms, faults, shape)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub LLM server")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=500.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--retry-after", type=float, default=None, help="Retry-After seconds on error answers")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="share of connections closed without an answer")
+    parser.add_argument("--quota-rps", type=float, default=0.0, help="answer 429 above this many requests per second")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="share of requests answered after --slow-ms")
+    parser.add_argument("--slow-ms", type=float, default=5000.0)
+    parser.add_argument("--shape", choices=("free", "gemini"), default="free", help="response format")
+    args = parser.parse_args()
+
+    faults = Faults(args.error_rate, args.error_status, args.retry_after, args.drop_rate, args.quota_rps,
+                    args.slow_rate, args.slow_ms)
+    server = StubServer(("127.0.0.1", args.port), args.latency_ms, args.jitter_ms, faults, args.shape)
+    path = "/v1beta" if args.shape == "gemini" else "/api/chat"
+    print(f"Stub LLM ({args.shape}) listening on http://127.0.0.1:{args.port}{path} (latency {args.latency_ms}ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Semantic cache of strategy answers
+
+Many users ask essentially the same investment questions ("should I start
+a SIP", "how do I invest in index funds"), and each one runs four LLM
+calls: parse, strategy, risk and the final answer. The cache embeds the
+incoming question with the EmbeddingService and returns the OutputAgent
+response of an earlier question whose embedding is within the similarity
+threshold (cosine), skipping all four.
+
+Entries are scoped so a hit is an answer the pipeline would have given:
+
+  - risk profile: risk tolerance, time horizon and goals (not the user,
+    so users with the same profile share answers); answers that carry a
+    personalized financial analysis are also scoped to the user
+  - data version: checksum of the transactions CSV plus a counter bumped
+    by KnowledgeStore writes (and APEX_ANSWER_CACHE_VERSION, for
+    knowledge loaded by another process)
+
+Entries expire after a TTL; past the size limit the least recently used
+are evicted. Hit rate and the latency saved (the original pipeline time
+of each hit) are exported as metrics.
+
+Environment overrides:
+  - APEX_ANSWER_CACHE=0 disables the cache
+  - APEX_ANSWER_CACHE_THRESHOLD=0.92 minimum cosine similarity for a hit
+  - APEX_ANSWER_CACHE_TTL=86400 seconds an answer stays valid
+  - APEX_ANSWER_CACHE_MAX=512 entries kept
+  - APEX_ANSWER_CACHE_VERSION=<any> manual invalidation
+"""
+import copy
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.metrics import ANSWER_CACHE_ENTRIES, ANSWER_CACHE_LOOKUPS_TOTAL, ANSWER_CACHE_SAVED_SECONDS
+from app.tracing import span
+
+_knowledge_version = 0
+_knowledge_version_lock = threading.Lock()
+
+
+def answer_cache_enabled() -> bool:
+    return os.getenv("APEX_ANSWER_CACHE", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def bump_knowledge_version() -> None:
+    """Invalidate cached answers after knowledge is added (called by KnowledgeStore)"""
+    global _knowledge_version
+    with _knowledge_version_lock:
+        _knowledge_version += 1
+
+
+def data_version(csv_path: Optional[str] = None) -> str:
+    """Version of the data answers depend on (transactions CSV and knowledge base)"""
+    from app.tools import columnar_cache
+    from app.tools.enhanced_csv_tools import DATA_PATH
+
+    csv_path = csv_path or DATA_PATH
+    try:
+        entry = columnar_cache.ensure_cache(csv_path)
+        transactions = entry.checksum if entry is not None else "%s-%s" % columnar_cache._file_signature(csv_path)
+    except OSError:
+        transactions = "none"
+    manual = os.getenv("APEX_ANSWER_CACHE_VERSION", "")
+    return f"{transactions}:{_knowledge_version}:{manual}"
+
+
+def profile_scope(risk_profile: Optional[Dict[str, Any]]) -> str:
+    """Scope key for a risk profile (ignores user_id)"""
+    profile = risk_profile or {}
+    goals = profile.get("goals") or []
+    key = {
+        "risk_tolerance": str(profile.get("risk_tolerance", "moderate")).lower(),
+        "time_horizon": str(profile.get("time_horizon", "medium")).lower(),
+        "goals": sorted(str(g).lower() for g in (goals if isinstance(goals, (list, tuple)) else [goals])),
+    }
+    return json.dumps(key, sort_keys=True)
+
+
+class _Entry:
+    __slots__ = ("question", "vector", "response", "latency_s", "created", "hits")
+
+    def __init__(self, question: str, vector: np.ndarray, response: Dict[str, Any], latency_s: float):
+        self.question = question
+        self.vector = vector
+        self.response = response
+        self.latency_s = latency_s
+        self.created = time.monotonic()
+        self.hits = 0
+
+
+def _unit(vector: Iterable[float]) -> np.ndarray:
+    v = np.asarray(vector, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(v))
+    return v / norm if norm else v
+
+
+class SemanticAnswerCache:
+    """Answers keyed by question embedding within (profile, data version, user) scopes"""
+
+    def __init__(self, embedder: Any = None, threshold: Optional[float] = None, ttl: Optional[float] = None,
+                 max_entries: Optional[int] = None):
+        """
+        Args:
+            embedder: Object with embed_single(text) (default: the shared EmbeddingService)
+            threshold: Minimum cosine similarity (default: APEX_ANSWER_CACHE_THRESHOLD or 0.92)
+            ttl: Seconds an entry stays valid (default: APEX_ANSWER_CACHE_TTL or 86400)
+            max_entries: Least recently used entries are evicted beyond this (default: APEX_ANSWER_CACHE_MAX or 512)
+        """
+        self._embedder = embedder
+        self.threshold = float(threshold if threshold is not None else os.getenv("APEX_ANSWER_CACHE_THRESHOLD", 0.92))
+        self.ttl = float(ttl if ttl is not None else os.getenv("APEX_ANSWER_CACHE_TTL", 86400))
+        self.max_entries = int(max_entries or os.getenv("APEX_ANSWER_CACHE_MAX", 512))
+        # scope -> {entry id -> entry}; _lru orders (scope, entry id) by last use
+        self._scopes: Dict[Tuple[str, ...], Dict[int, _Entry]] = {}
+        self._lru: "OrderedDict[Tuple[Tuple[str, ...], int], None]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            from vectordb.embedding_service import get_embedding_service
+            self._embedder = get_embedding_service()
+        return self._embedder
+
+    def embed(self, question: str) -> np.ndarray:
+        with span("answer_cache.embed"):
+            return _unit(self.embedder.embed_single(question))
+
+    def _scopes_for(self, profile_key: str, version: str, user_id: Optional[str]) -> List[Tuple[str, ...]]:
+        scopes = [(profile_key, version)]
+        if user_id:
+            scopes.append((profile_key, version, user_id))
+        return scopes
+
+    def _drop(self, scope: Tuple[str, ...], entry_id: int) -> None:
+        entries = self._scopes.get(scope)
+        if entries is not None:
+            entries.pop(entry_id, None)
+            if not entries:
+                del self._scopes[scope]
+        self._lru.pop((scope, entry_id), None)
+
+    def lookup(self, question: str, risk_profile: Optional[Dict[str, Any]], user_id: Optional[str] = None,
+               version: Optional[str] = None) -> Tuple[Optional[Dict[str, Any]], np.ndarray]:
+        """
+        Cached response for a near-duplicate question
+
+        Args:
+            question: User question
+            risk_profile: RiskAgent profile of the asking user
+            user_id: Asking user (matches answers personalized for them)
+            version: Data version (default: data_version())
+
+        Returns:
+            (response copy or None, question embedding for put())
+        """
+        vector = self.embed(question)
+        version = version if version is not None else data_version()
+        now = time.monotonic()
+        best: Optional[Tuple[float, Tuple[str, ...], int, _Entry]] = None
+        with self._lock:
+            for scope in self._scopes_for(profile_scope(risk_profile), version, user_id):
+                entries = self._scopes.get(scope)
+                if not entries:
+                    continue
+                for entry_id, entry in list(entries.items()):
+                    if now - entry.created > self.ttl:
+                        self._drop(scope, entry_id)
+                ids = list(entries)
+                if not ids:
+                    continue
+                sims = np.stack([entries[i].vector for i in ids]) @ vector
+                top = int(np.argmax(sims))
+                if best is None or sims[top] > best[0]:
+                    best = (float(sims[top]), scope, ids[top], entries[ids[top]])
+            if best is None or best[0] < self.threshold:
+                self.misses += 1
+                ANSWER_CACHE_LOOKUPS_TOTAL.inc(result="miss")
+                ANSWER_CACHE_ENTRIES.set(len(self._lru))
+                return None, vector
+            similarity, scope, entry_id, entry = best
+            entry.hits += 1
+            self._lru.move_to_end((scope, entry_id))
+            self.hits += 1
+            self.saved_seconds += entry.latency_s
+            ANSWER_CACHE_LOOKUPS_TOTAL.inc(result="hit")
+            ANSWER_CACHE_SAVED_SECONDS.inc(entry.latency_s)
+            response = copy.deepcopy(entry.response)
+            age = now - entry.created
+        response["cache"] = {"similarity": round(similarity, 4), "age_seconds": round(age, 1),
+                             "matched_question": entry.question}
+        return response, vector
+
+    def put(self, question: str, vector: np.ndarray, risk_profile: Optional[Dict[str, Any]],
+            response: Dict[str, Any], latency_s: float, user_id: Optional[str] = None,
+            version: Optional[str] = None) -> None:
+        """
+        Store a pipeline response
+
+        Args:
+            question: User question
+            vector: Embedding returned by lookup()
+            risk_profile: RiskAgent profile the answer was generated for
+            response: OutputAgent response (copied)
+            latency_s: Pipeline time the answer took (counted as saved on each hit)
+            user_id: Set when the answer is personalized beyond the risk profile
+            version: Data version (default: data_version())
+        """
+        version = version if version is not None else data_version()
+        scope = self._scopes_for(profile_scope(risk_profile), version, user_id)[-1]
+        entry = _Entry(question, vector, copy.deepcopy(response), float(latency_s))
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._scopes.setdefault(scope, {})[entry_id] = entry
+            self._lru[(scope, entry_id)] = None
+            while len(self._lru) > self.max_entries:
+                old_scope, old_id = next(iter(self._lru))
+                self._drop(old_scope, old_id)
+            ANSWER_CACHE_ENTRIES.set(len(self._lru))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._scopes.clear()
+            self._lru.clear()
+            ANSWER_CACHE_ENTRIES.set(0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._lru)
+        total = self.hits + self.misses
+        return {
+            "entries": size,
+            "threshold": self.threshold,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "saved_seconds": round(self.saved_seconds, 3),
+        }
+
+
+# Default instance
+_default_answer_cache: Optional[SemanticAnswerCache] = None
+_default_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> SemanticAnswerCache:
+    """Get or create the process-wide answer cache"""
+    global _default_answer_cache
+    if _default_answer_cache is None:
+        with _default_answer_cache_lock:
+            if _default_answer_cache is None:
+                _default_answer_cache = SemanticAnswerCache()
+    return _default_answer_cache
@@ -3,9 +3,12 @@ Chroma VectorDB Client for semantic knowledge retrieval
 Organized by namespaces for different knowledge types
 """
 import os
+import threading
 import chromadb
 from chromadb.config import Settings
 from typing import List, Dict, Optional, Any
+from app.metrics import CHROMA_QUERY_SECONDS
+from app.tracing import span, traced
 from .embedding_service import EmbeddingService, get_embedding_service
 
 
@@ -170,6 +173,7 @@ class ChromaVectorDB:
         
         return ids
     
+    @traced("chroma.search")
     def search(
         self,
         query: str,
@@ -204,11 +208,12 @@ class ChromaVectorDB:
             collection = self.collections[ns_key]
             
             # Perform search
-            search_results = collection.query(
-                query_embeddings=[query_embedding],
-                n_results=top_k,
-                where=filter_metadata
-            )
+            with span("chroma.query", namespace=ns_key, top_k=top_k), CHROMA_QUERY_SECONDS.time(namespace=ns_key):
+                search_results = collection.query(
+                    query_embeddings=[query_embedding],
+                    n_results=top_k,
+                    where=filter_metadata
+                )
             
             # Format results
             if search_results.get("documents") and search_results["documents"][0]:
@@ -257,12 +262,14 @@ class ChromaVectorDB:
 
 # Default instance
 _default_vectordb = None
+_default_vectordb_lock = threading.Lock()
 
 def get_vectordb() -> ChromaVectorDB:
-    """Get or create default VectorDB instance"""
+    """Get or create default VectorDB instance (thread-safe)"""
     global _default_vectordb
     if _default_vectordb is None:
-        # Auto-detect cloud vs local based on environment variables
-        _default_vectordb = ChromaVectorDB()
+        with _default_vectordb_lock:
+            if _default_vectordb is None:
+                # Auto-detect cloud vs local based on environment variables
+                _default_vectordb = ChromaVectorDB()
     return _default_vectordb
-
@@ -1,11 +1,28 @@
 """
 Embedding Service for converting text to embeddings
 Supports OpenAI text-embedding-3-large and local models
+
+Concurrent embed_single calls (one query per request) are micro-batched:
+a background worker encodes the texts that arrive within a few
+milliseconds in one call (see app.batching).
+
+The local model runs on sentence-transformers (PyTorch) by default, or on
+an int8 quantized ONNX export with APEX_EMBED_BACKEND=onnx (see
+vectordb.onnx_embedder).
+
+Environment overrides:
+  - APEX_EMBED_BACKEND: torch | onnx for model="local" (default: torch)
+  - APEX_EMBED_BATCH=0 encodes each embed_single call on its own
+  - APEX_EMBED_BATCH_MAX=32 most texts per batch
+  - APEX_EMBED_BATCH_WAIT_MS=5 how long the first text waits for others
 """
 import os
+import threading
 import requests
 from typing import List, Optional
 import numpy as np
+from app.batching import MicroBatcher
+from app.tracing import span, traced
 
 # Note: We use local embeddings (sentence-transformers) by default
 # OpenAI embeddings are optional and only used if explicitly configured
@@ -14,7 +31,8 @@ import numpy as np
 class EmbeddingService:
     """Service for generating text embeddings"""
     
-    def __init__(self, model: str = "text-embedding-3-large", api_key: Optional[str] = None):
+    def __init__(self, model: str = "text-embedding-3-large", api_key: Optional[str] = None,
+                 backend: Optional[str] = None):
         """
         Initialize embedding service
         
@@ -24,13 +42,32 @@ class EmbeddingService:
                   - "text-embedding-3-small" (OpenAI)
                   - "local" (for local models like sentence-transformers)
             api_key: API key for OpenAI (if using OpenAI models)
+            backend: Runtime for "local": "torch" (sentence-transformers) or "onnx"
+                  (int8 ONNX Runtime; default: APEX_EMBED_BACKEND or torch)
         """
         self.model = model
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         self.local_model = None
+        self.backend = (backend or os.getenv("APEX_EMBED_BACKEND", "torch")).strip().lower()
+        self.batcher = None
+        if os.getenv("APEX_EMBED_BATCH", "1").strip().lower() not in ("0", "false", "no", "off"):
+            self.batcher = MicroBatcher(
+                "embedding",
+                self.embed,
+                max_batch=int(_env_float("APEX_EMBED_BATCH_MAX", 32)),
+                max_wait_ms=_env_float("APEX_EMBED_BATCH_WAIT_MS", 5.0),
+            )
         
         # Initialize local model if needed
-        if model == "local":
+        if model == "local" and self.backend == "onnx":
+            try:
+                from .onnx_embedder import load_onnx_encoder
+                self.local_model = load_onnx_encoder()
+            except Exception as e:
+                # Missing onnxruntime/tokenizers, or no cached export and no torch to build one
+                print(f"ONNX embedding backend unavailable ({e}); using sentence-transformers")
+                self.backend = "torch"
+        if model == "local" and self.local_model is None:
             try:
                 from sentence_transformers import SentenceTransformer
                 # Use a good default local model
@@ -41,6 +78,7 @@ class EmbeddingService:
                     "Install with: pip install sentence-transformers"
                 )
     
+    @traced("embedding.embed")
     def embed(self, texts: List[str]) -> List[List[float]]:
         """
         Generate embeddings for a list of texts
@@ -102,35 +140,49 @@ class EmbeddingService:
         return all_embeddings
     
     def embed_single(self, text: str) -> List[float]:
-        """Generate embedding for a single text"""
-        return self.embed([text])[0]
+        """Generate embedding for a single text (batched with concurrent callers)"""
+        if self.batcher is None:
+            return self.embed([text])[0]
+        with span("embedding.embed_single", batched=True):
+            return self.batcher.submit(text)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
 
 
 # Default instance
 _default_embedding_service = None
+_default_embedding_service_lock = threading.Lock()
 
 def get_embedding_service(model: Optional[str] = None) -> EmbeddingService:
-    """Get or create default embedding service instance"""
+    """Get or create default embedding service instance (thread-safe, loads the model once)"""
     global _default_embedding_service
     
-    if _default_embedding_service is None:
-        # Default to local embeddings (sentence-transformers) since we're using FreeLLM
-        # Only use OpenAI if explicitly requested and API key is available
-        use_local = model != "openai" and not os.getenv("OPENAI_API_KEY")
-        
-        if use_local:
-            try:
-                _default_embedding_service = EmbeddingService(model="local")
-            except ImportError:
-                raise ImportError(
-                    "sentence-transformers is required for local embeddings. "
-                    "Install with: pip install sentence-transformers"
+    if _default_embedding_service is not None:
+        return _default_embedding_service
+    
+    with _default_embedding_service_lock:
+        if _default_embedding_service is None:
+            # Default to local embeddings (sentence-transformers) since we're using FreeLLM
+            # Only use OpenAI if explicitly requested and API key is available
+            use_local = model != "openai" and not os.getenv("OPENAI_API_KEY")
+            
+            if use_local:
+                try:
+                    _default_embedding_service = EmbeddingService(model="local")
+                except ImportError:
+                    raise ImportError(
+                        "sentence-transformers is required for local embeddings. "
+                        "Install with: pip install sentence-transformers"
+                    )
+            else:
+                # Use OpenAI only if explicitly requested
+                _default_embedding_service = EmbeddingService(
+                    model=model or "text-embedding-3-large"
                 )
-        else:
-            # Use OpenAI only if explicitly requested
-            _default_embedding_service = EmbeddingService(
-                model=model or "text-embedding-3-large"
-            )
     
     return _default_embedding_service
-
@@ -3,7 +3,10 @@ Knowledge Store for managing financial knowledge documents
 Handles chunking, storage, and retrieval of knowledge content
 """
 import re
+import threading
 from typing import List, Dict, Any, Optional
+from app.tracing import traced
+from .answer_cache import bump_knowledge_version
 from .chroma_client import ChromaVectorDB, get_vectordb
 from .embedding_service import EmbeddingService
 
@@ -149,13 +152,17 @@ class KnowledgeStore:
             metadatas.append(chunk_metadata)
         
         # Store in VectorDB
-        return self.vectordb.add_documents(
+        chunk_ids = self.vectordb.add_documents(
             documents=documents,
             metadatas=metadatas,
             namespace=namespace,
             ids=ids
         )
+        # Cached answers were built from the previous knowledge
+        bump_knowledge_version()
+        return chunk_ids
     
+    @traced("knowledge.retrieve")
     def retrieve_knowledge(
         self,
         query: str,
@@ -250,11 +257,13 @@ class KnowledgeStore:
 
 # Default instance
 _default_knowledge_store = None
+_default_knowledge_store_lock = threading.Lock()
 
 def get_knowledge_store() -> KnowledgeStore:
-    """Get or create default Knowledge Store instance"""
+    """Get or create default Knowledge Store instance (thread-safe)"""
     global _default_knowledge_store
     if _default_knowledge_store is None:
-        _default_knowledge_store = KnowledgeStore()
+        with _default_knowledge_store_lock:
+            if _default_knowledge_store is None:
+                _default_knowledge_store = KnowledgeStore()
     return _default_knowledge_store
-
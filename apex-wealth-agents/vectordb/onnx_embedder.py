@@ -0,0 +1,179 @@
+"""
+Quantized ONNX backend for the local all-MiniLM-L6-v2 embedding model.
+
+EmbeddingService(model="local") normally loads the model through
+sentence-transformers, which imports PyTorch. With APEX_EMBED_BACKEND=onnx
+it uses OnnxSentenceEncoder instead. This runs an int8 dynamically
+quantized export of the same model on onnxruntime's CPU provider and
+tokenizes with the Rust `tokenizers` package, so serving needs neither
+torch nor transformers. Output matches SentenceTransformer.encode: mean
+pooling over the attention mask, then L2 normalization, 384 dimensions.
+Vectors stay within the cosine tolerance checked by
+scripts/check_onnx_embeddings.py, so existing collections remain usable.
+
+The export is built once into the cache directory: the PyTorch model is
+exported with torch.onnx.export and quantized with
+onnxruntime.quantization.quantize_dynamic. Building it needs torch and
+transformers; later loads only read the cached files. It can also be built
+ahead of time (e.g. in an image build):
+
+    python -m vectordb.onnx_embedder --export
+
+Environment overrides:
+  - APEX_EMBED_BACKEND=onnx selects this backend (default: torch, i.e. sentence-transformers)
+  - APEX_ONNX_CACHE_DIR: where exported models are kept (default .apex_cache/onnx)
+  - APEX_ONNX_THREADS: onnxruntime intra-op threads (default 0 = onnxruntime's choice)
+"""
+import argparse
+import os
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+HF_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+# all-MiniLM-L6-v2's max_seq_length in sentence-transformers
+MAX_SEQ_LENGTH = 256
+FP32_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+_INPUT_NAMES = ("input_ids", "attention_mask", "token_type_ids")
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def onnx_cache_dir(model_name: str = HF_MODEL) -> str:
+    root = os.getenv("APEX_ONNX_CACHE_DIR") or os.path.join(BASE_DIR, ".apex_cache", "onnx")
+    return os.path.join(root, model_name.split("/")[-1])
+
+
+def export_quantized(model_name: str = HF_MODEL, out_dir: Optional[str] = None) -> str:
+    """
+    Export the model to ONNX and quantize its weights to int8 (needs torch and transformers)
+
+    Files are written under temporary names and renamed into place, so
+    concurrent loaders never see a partial model.
+
+    Returns:
+        Path of the quantized model
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+
+    out_dir = out_dir or onnx_cache_dir(model_name)
+    os.makedirs(out_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+
+    sample = tokenizer(["export sample", "a second, longer export sample"], padding=True, return_tensors="pt")
+    axes = {0: "batch", 1: "sequence"}
+    fp32_tmp = os.path.join(out_dir, f".{FP32_FILE}.{os.getpid()}")
+    int8_tmp = os.path.join(out_dir, f".{INT8_FILE}.{os.getpid()}")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in _INPUT_NAMES),
+            fp32_tmp,
+            input_names=list(_INPUT_NAMES),
+            output_names=["last_hidden_state", "pooler_output"],
+            dynamic_axes={**{name: axes for name in _INPUT_NAMES}, "last_hidden_state": axes, "pooler_output": {0: "batch"}},
+            opset_version=14,
+            do_constant_folding=True,
+        )
+    quantize_dynamic(fp32_tmp, int8_tmp, weight_type=QuantType.QInt8)
+    tokenizer.save_pretrained(out_dir)
+    os.replace(fp32_tmp, os.path.join(out_dir, FP32_FILE))
+    os.replace(int8_tmp, os.path.join(out_dir, INT8_FILE))
+    return os.path.join(out_dir, INT8_FILE)
+
+
+class OnnxSentenceEncoder:
+    """Drop-in for SentenceTransformer.encode backed by an int8 ONNX model"""
+
+    def __init__(self, model_dir: str, model_file: str = INT8_FILE, threads: Optional[int] = None):
+        """
+        Args:
+            model_dir: Directory holding the exported model and tokenizer.json
+            model_file: Model file in model_dir (model.onnx for the unquantized export)
+            threads: onnxruntime intra-op threads (default: APEX_ONNX_THREADS, 0 = automatic)
+        """
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_dir = model_dir
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id("[PAD]") or 0, pad_token="[PAD]")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads is None:
+            threads = int(os.getenv("APEX_ONNX_THREADS", "0") or 0)
+        options.intra_op_num_threads = max(0, threads)
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, model_file), sess_options=options, providers=["CPUExecutionProvider"])
+        self._inputs = [i.name for i in self.session.get_inputs()]
+
+    def encode(self, texts: List[str], batch_size: int = 32, convert_to_numpy: bool = True,
+               normalize_embeddings: bool = True) -> np.ndarray:
+        """Embed texts (same signature subset and output as SentenceTransformer.encode)"""
+        if isinstance(texts, str):
+            texts = [texts]
+        if not texts:
+            return np.zeros((0, 384), dtype=np.float32)
+        # Similar lengths per batch keep padding (wasted compute) small
+        order = np.argsort([len(t) for t in texts], kind="stable")
+        vectors = np.concatenate([
+            self._encode_batch([texts[i] for i in order[start:start + batch_size]], normalize_embeddings)
+            for start in range(0, len(texts), batch_size)
+        ])
+        out = np.empty_like(vectors)
+        out[order] = vectors
+        return out
+
+    def _encode_batch(self, texts: List[str], normalize: bool) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        feeds: Dict[str, np.ndarray] = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(["last_hidden_state"], {name: feeds[name] for name in self._inputs})[0]
+        # Mean pooling over real tokens (sentence-transformers Pooling, mode mean)
+        mask = feeds["attention_mask"][:, :, None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if normalize:
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32)
+
+
+_export_lock = threading.Lock()
+
+
+def load_onnx_encoder(model_name: str = HF_MODEL) -> OnnxSentenceEncoder:
+    """Load the quantized model, exporting it first if the cache does not have it yet"""
+    model_dir = onnx_cache_dir(model_name)
+    ready = all(os.path.exists(os.path.join(model_dir, f)) for f in (INT8_FILE, TOKENIZER_FILE))
+    if not ready:
+        with _export_lock:
+            if not os.path.exists(os.path.join(model_dir, INT8_FILE)):
+                print(f"Exporting {model_name} to int8 ONNX in {model_dir} (one-off)...")
+                export_quantized(model_name, model_dir)
+    return OnnxSentenceEncoder(model_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the int8 ONNX export of the local embedding model")
+    parser.add_argument("--export", action="store_true", help="(re)build the export even if it is cached")
+    parser.add_argument("--model", default=HF_MODEL)
+    args = parser.parse_args()
+    if args.export:
+        path = export_quantized(args.model)
+    else:
+        path = load_onnx_encoder(args.model).model_dir
+    print(f"ONNX model ready: {path}")
+
+
+if __name__ == "__main__":
+    main()